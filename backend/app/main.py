@@ -1,17 +1,33 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import trades, analytics, calculator
+from fastapi.responses import PlainTextResponse
+from app.routers import trades, analytics, calculator, stream, backtest, tags, portfolio, jobs
+from app.services.metrics import metrics_middleware, render_metrics, get_slow_request_profiler
+from app.services import lifecycle
+from app.services.rate_limit import rate_limit_middleware
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Each worker process initializes and warms up before accepting requests
+    await lifecycle.startup()
+    yield
+    await lifecycle.shutdown()
+
 app = FastAPI(
     title="McKay Trader API",
     description="Forex trading analytics and position sizing API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Per-user token buckets; inside CORS so browsers can read the 429 and its Retry-After
+app.middleware("http")(rate_limit_middleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -19,12 +35,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
+# Per-route latency histograms and Server-Timing headers
+app.middleware("http")(metrics_middleware)
+
 # Include routers
 app.include_router(trades.router, prefix="/api/trades", tags=["trades"])
 app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
 app.include_router(calculator.router, prefix="/api/calculator", tags=["calculator"])
+app.include_router(stream.router, prefix="/api/stream", tags=["stream"])
+app.include_router(backtest.router, prefix="/api/backtest", tags=["backtest"])
+app.include_router(tags.router, prefix="/api/tags", tags=["tags"])
+app.include_router(portfolio.router, prefix="/api/portfolio", tags=["portfolio"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
 
 @app.get("/")
 async def root():
@@ -33,3 +58,14 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "McKay Trader API"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/slow-requests")
+async def slow_requests():
+    """Stack samples of recent slow requests (requires SLOW_REQUEST_PROFILE_MS)"""
+    profiler = get_slow_request_profiler()
+    return {"enabled": profiler is not None, "reports": list(profiler.reports) if profiler else []}
@@ -51,6 +51,10 @@ class PositionSizingRequest(BaseModel):
     stop_loss: float = Field(..., gt=0, description="Stop loss price")
     pair: str = Field(..., description="Currency pair")
 
+class PortfolioSizingRequest(PositionSizingRequest):
+    direction: TradeDirection = Field(..., description="Trade direction")
+    confidence: float = Field(0.99, gt=0.5, lt=1, description="VaR confidence level")
+
 class PositionSizingResponse(BaseModel):
     lot_size: float = Field(..., description="Recommended lot size")
     risk_amount: float = Field(..., description="Amount at risk")
@@ -58,6 +62,40 @@ class PositionSizingResponse(BaseModel):
     pip_value: float = Field(..., description="Pip value")
     pips_at_risk: float = Field(..., description="Number of pips at risk")
 
+class PositionSizingColumns(BaseModel):
+    account_balance: List[float] = Field(..., description="Account balance per setup")
+    risk_percentage: List[float] = Field(..., description="Risk percentage per setup")
+    entry_price: List[float] = Field(..., description="Entry price per setup")
+    stop_loss: List[float] = Field(..., description="Stop loss price per setup")
+    pair: List[str] = Field(..., description="Currency pair per setup")
+
+class PositionSizingBatchRequest(BaseModel):
+    items: Optional[List[dict]] = Field(None, description="Sizing requests as individual objects")
+    columns: Optional[PositionSizingColumns] = Field(None, description="Sizing requests as parallel arrays")
+
+class BacktestSignal(str, Enum):
+    BREAKOUT = "breakout"
+    SMA_CROSS = "sma_cross"
+
+class BacktestRule(BaseModel):
+    tag: str = Field(..., description="Tag the simulated trades are reported under")
+    direction: TradeDirection = Field(..., description="Trade direction")
+    signal: BacktestSignal = Field(BacktestSignal.BREAKOUT, description="Entry signal")
+    lookback: int = Field(20, ge=2, description="Breakout range or slow SMA period in bars")
+    fast_period: int = Field(5, ge=1, description="Fast SMA period in bars (sma_cross only)")
+    stop_pips: float = Field(..., gt=0, description="Stop loss distance in pips")
+    target_pips: float = Field(..., gt=0, description="Take profit distance in pips")
+    max_bars: int = Field(1440, ge=1, description="Close at market after this many bars")
+
+class BacktestRequest(BaseModel):
+    pairs: List[str] = Field(..., min_length=1, description="Currency pairs to replay")
+    rules: List[BacktestRule] = Field(..., min_length=1, description="Entry/stop/target rules")
+    start: Optional[datetime] = Field(None, description="First bar time (inclusive)")
+    end: Optional[datetime] = Field(None, description="Last bar time (exclusive)")
+    account_balance: float = Field(10000, gt=0, description="Account balance used for sizing")
+    risk_percentage: float = Field(1.0, gt=0, le=100, description="Risk percentage per trade")
+    include_trades: bool = Field(False, description="Return the simulated trades")
+
 class TradeTag(BaseModel):
     id: str = Field(..., description="Tag ID")
     name: str = Field(..., description="Tag name")
@@ -65,6 +103,10 @@ class TradeTag(BaseModel):
     description: Optional[str] = Field(None, description="Tag description")
     created_at: datetime = Field(..., description="Created timestamp")
 
+class TradeTagUpdate(BaseModel):
+    color: Optional[str] = Field(None, pattern=r"^#[0-9a-fA-F]{6}$", description="Tag color as #rrggbb")
+    description: Optional[str] = Field(None, description="Tag description")
+
 class AnalyticsResponse(BaseModel):
     total_trades: int = Field(..., description="Total number of trades")
     win_rate: float = Field(..., description="Overall win rate percentage")
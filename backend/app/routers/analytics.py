@@ -1,174 +1,236 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
 from app.models import AnalyticsResponse, ApiResponse
-from app.services.firebase_service import get_firestore_client
+from app.services.firestore_repository import get_repository
+from app.services.analytics_aggregate import get_aggregate, rebuild_aggregate, aggregate_to_analytics
+from app.services import analytics_engine, analytics_rollups, monte_carlo
+from app.services.job_runner import get_job_runner
+from app.services.response_cache import get_response_cache
+from app.services.metrics import InstrumentedRoute, timed
 from collections import defaultdict
-import statistics
-from datetime import datetime, timedelta
+from datetime import datetime
+from typing import Optional
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 @router.get("/overview", response_model=ApiResponse)
-async def get_analytics_overview(user_id: str = "demo_user"):
+async def get_analytics_overview(request: Request, user_id: str = "demo_user"):
     """Get overall trading analytics"""
     try:
-        db = get_firestore_client()
-        trades = db.collection("trades").where("user_id", "==", user_id).get()
+        repo = get_repository()
         
-        if not trades:
+        async def compute():
+            aggregate = await get_aggregate(repo, user_id)
+            analytics = AnalyticsResponse(**aggregate_to_analytics(aggregate))
+            return ApiResponse(success=True, data=analytics.dict())
+        
+        return await get_response_cache().respond(request, user_id, "overview", {}, compute)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/rebuild", response_model=ApiResponse)
+async def rebuild_analytics(
+    user_id: str = "demo_user",
+    background: bool = Query(False, description="Queue the rebuild and return a job id to poll at /api/jobs")
+):
+    """Recompute the user's analytics aggregate and period rollups from raw trades"""
+    try:
+        repo = get_repository()
+        runner = get_job_runner()
+        
+        async def rebuild(job=None):
+            aggregate = await rebuild_aggregate(repo, user_id, run_cpu=runner.run_cpu if job else None)
+            await analytics_rollups.rebuild_rollups(repo, user_id)
+            get_response_cache().invalidate_user(user_id)
+            return AnalyticsResponse(**aggregate_to_analytics(aggregate)).dict()
+        
+        if background:
+            job = await runner.submit(repo, "analytics-rebuild", user_id, rebuild, priority="bulk")
+            return queued_job_response(job, "Analytics rebuild queued")
+        
+        return ApiResponse(
+            success=True,
+            message="Analytics rebuilt successfully",
+            data=await rebuild()
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/wins-by-tag", response_model=ApiResponse)
+async def get_wins_by_tag(request: Request, user_id: str = "demo_user"):
+    """Get win rates broken down by trading tags/patterns"""
+    try:
+        repo = get_repository()
+        
+        async def compute():
+            trades = await repo.query("trades", [("user_id", "==", user_id), ("status", "==", "closed")])
+            
+            with timed("analytics"):
+                frame = analytics_engine.load_closed_trades(trades)
+                wins_by_tag = analytics_engine.wins_by_tag(frame)
+            
             return ApiResponse(
                 success=True,
-                data=AnalyticsResponse(
-                    total_trades=0,
-                    win_rate=0.0,
-                    total_profit=0.0,
-                    average_win=0.0,
-                    average_loss=0.0,
-                    profit_factor=0.0,
-                    max_drawdown=0.0,
-                    best_trade=0.0,
-                    worst_trade=0.0,
-                    wins_by_tag={}
-                ).dict()
+                data={"wins_by_tag": wins_by_tag}
             )
         
-        # Process trades data
-        trade_data = []
-        for trade in trades:
-            data = trade.to_dict()
-            if data.get("status") == "closed" and "profit" in data:
-                trade_data.append(data)
+        return await get_response_cache().respond(request, user_id, "wins-by-tag", {}, compute)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/monthly-performance", response_model=ApiResponse)
+async def get_monthly_performance(request: Request, user_id: str = "demo_user", months: int = 12):
+    """Get monthly trading performance"""
+    try:
+        repo = get_repository()
         
-        if not trade_data:
+        async def compute():
+            # The current month and the months - 1 full calendar months before it
+            end_date = datetime.utcnow()
+            start_date = analytics_rollups.add_months(end_date, -(max(months, 1) - 1))
+            
+            buckets = await analytics_rollups.get_rollups(repo, user_id, "month", start_date)
+            performance_data = [
+                {"month": row["period"], "profit": row["profit"], "trades": row["trades"]}
+                for row in map(analytics_rollups.rollup_to_performance, buckets)
+            ]
+            
             return ApiResponse(
                 success=True,
-                data=AnalyticsResponse(
-                    total_trades=len(trades),
-                    win_rate=0.0,
-                    total_profit=0.0,
-                    average_win=0.0,
-                    average_loss=0.0,
-                    profit_factor=0.0,
-                    max_drawdown=0.0,
-                    best_trade=0.0,
-                    worst_trade=0.0,
-                    wins_by_tag={}
-                ).dict()
+                data={"monthly_performance": performance_data}
             )
         
-        # Calculate metrics
-        profits = [t["profit"] for t in trade_data]
-        wins = [p for p in profits if p > 0]
-        losses = [p for p in profits if p < 0]
-        
-        total_trades = len(trade_data)
-        win_count = len(wins)
-        win_rate = (win_count / total_trades * 100) if total_trades > 0 else 0
-        total_profit = sum(profits)
-        average_win = statistics.mean(wins) if wins else 0
-        average_loss = statistics.mean(losses) if losses else 0
-        best_trade = max(profits) if profits else 0
-        worst_trade = min(profits) if profits else 0
-        
-        # Profit factor
-        gross_profit = sum(wins) if wins else 0
-        gross_loss = abs(sum(losses)) if losses else 0
-        profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
-        
-        # Calculate max drawdown
-        max_drawdown = calculate_max_drawdown(trade_data)
-        
-        # Calculate wins by tag
-        wins_by_tag = calculate_wins_by_tag(trade_data)
-        
-        analytics = AnalyticsResponse(
-            total_trades=total_trades,
-            win_rate=round(win_rate, 2),
-            total_profit=round(total_profit, 2),
-            average_win=round(average_win, 2),
-            average_loss=round(average_loss, 2),
-            profit_factor=round(profit_factor, 2),
-            max_drawdown=round(max_drawdown, 2),
-            best_trade=round(best_trade, 2),
-            worst_trade=round(worst_trade, 2),
-            wins_by_tag=wins_by_tag
-        )
-        
-        return ApiResponse(success=True, data=analytics.dict())
+        # The window slides with the clock, so cached results only live for the month
+        params = {"months": months, "as_of": datetime.utcnow().strftime("%Y-%m")}
+        return await get_response_cache().respond(request, user_id, "monthly-performance", params, compute)
         
+    except HTTPException:
+        raise
+    except analytics_rollups.RollupsUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/wins-by-tag", response_model=ApiResponse)
-async def get_wins_by_tag(user_id: str = "demo_user"):
-    """Get win rates broken down by trading tags/patterns"""
+@router.get("/performance", response_model=ApiResponse)
+async def get_performance(
+    request: Request,
+    user_id: str = "demo_user",
+    granularity: str = Query("month", pattern="^(day|week|month)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Get profit, trade counts and per-pair/per-tag splits by day, week or month"""
     try:
-        db = get_firestore_client()
-        trades = db.collection("trades").where("user_id", "==", user_id).where("status", "==", "closed").get()
-        
-        trade_data = []
-        for trade in trades:
-            data = trade.to_dict()
-            if "profit" in data:
-                trade_data.append(data)
+        repo = get_repository()
         
-        wins_by_tag = calculate_wins_by_tag(trade_data)
+        async def compute():
+            buckets = await analytics_rollups.get_rollups(repo, user_id, granularity, start, end)
+            
+            return ApiResponse(
+                success=True,
+                data={
+                    "granularity": granularity,
+                    "performance": [analytics_rollups.rollup_to_performance(b) for b in buckets]
+                }
+            )
         
-        return ApiResponse(
-            success=True,
-            data={"wins_by_tag": wins_by_tag}
-        )
+        params = {"granularity": granularity, "start": start, "end": end}
+        return await get_response_cache().respond(request, user_id, "performance", params, compute)
         
+    except HTTPException:
+        raise
+    except analytics_rollups.RollupsUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/monthly-performance", response_model=ApiResponse)
-async def get_monthly_performance(user_id: str = "demo_user", months: int = 12):
-    """Get monthly trading performance"""
+@router.get("/monte-carlo", response_model=ApiResponse)
+async def get_monte_carlo(
+    request: Request,
+    user_id: str = "demo_user",
+    paths: int = Query(10000, ge=100, le=100000),
+    horizon: Optional[int] = Query(None, ge=1, le=10000),
+    method: str = Query("bootstrap", pattern="^(bootstrap|block)$"),
+    block_size: int = Query(5, ge=2, le=500),
+    seed: int = Query(0, ge=0),
+    account_balance: float = Query(10000, gt=0),
+    risk_percentage: Optional[float] = Query(None, gt=0, le=100),
+    ruin_level: float = Query(50, gt=0, le=100),
+    background: bool = Query(False, description="Queue the simulation and return a job id to poll at /api/jobs")
+):
+    """Simulate equity paths by resampling closed-trade results"""
     try:
-        db = get_firestore_client()
-        
-        # Calculate date range
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=months * 30)
-        
-        trades = (db.collection("trades")
-                 .where("user_id", "==", user_id)
-                 .where("status", "==", "closed")
-                 .where("close_time", ">=", start_date)
-                 .where("close_time", "<=", end_date)
-                 .get())
-        
-        # Group trades by month
-        monthly_data = defaultdict(lambda: {"profit": 0, "trades": 0})
-        
-        for trade in trades:
-            data = trade.to_dict()
-            if "profit" in data and "close_time" in data:
-                close_time = data["close_time"]
-                if isinstance(close_time, str):
-                    close_time = datetime.fromisoformat(close_time.replace('Z', '+00:00'))
-                
-                month_key = close_time.strftime("%Y-%m")
-                monthly_data[month_key]["profit"] += data["profit"]
-                monthly_data[month_key]["trades"] += 1
-        
-        # Convert to list format
-        performance_data = []
-        for month_key, data in sorted(monthly_data.items()):
-            performance_data.append({
-                "month": month_key,
-                "profit": round(data["profit"], 2),
-                "trades": data["trades"]
-            })
+        repo = get_repository()
+        params = {
+            "paths": paths, "horizon": horizon, "method": method, "block_size": block_size, "seed": seed,
+            "account_balance": account_balance, "risk_percentage": risk_percentage, "ruin_level": ruin_level
+        }
         
-        return ApiResponse(
-            success=True,
-            data={"monthly_performance": performance_data}
-        )
+        if background:
+            job = await get_job_runner().submit(
+                repo, "monte-carlo", user_id,
+                lambda job: simulate_user_trades(repo, user_id, params, job.report), params
+            )
+            return queued_job_response(job, "Simulation queued")
+        
+        async def compute():
+            return ApiResponse(success=True, data=await simulate_user_trades(repo, user_id, params))
+        
+        return await get_response_cache().respond(request, user_id, "monte-carlo", params, compute)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def simulate_user_trades(repo, user_id: str, params: dict, progress=None) -> dict:
+    """Monte Carlo summary of the user's closed trades for the monte-carlo endpoint's parameters"""
+    trades = await repo.query("trades", [("user_id", "==", user_id), ("status", "==", "closed")])
+    returns = monte_carlo.trade_returns(trades)
+    if len(returns["profits"]) < 2:
+        raise HTTPException(status_code=400, detail="At least 2 closed trades are needed to simulate")
+    
+    # Without a risk percentage, replay the dollar results at their recorded size
+    balance = params["account_balance"]
+    if params["risk_percentage"] is None:
+        samples, risk_fraction = returns["profits"], None
+    else:
+        samples, risk_fraction = returns["r_multiples"], params["risk_percentage"] / 100
+    steps = params["horizon"] or len(samples)
+    
+    with timed("simulation"):
+        summary = await monte_carlo.run_simulation(
+            samples, params["paths"], steps, params["block_size"] if params["method"] == "block" else 1,
+            params["seed"], balance, risk_fraction, balance * (1 - params["ruin_level"] / 100), progress
+        )
+    
+    return {
+        "paths": params["paths"],
+        "horizon": steps,
+        "method": params["method"],
+        "seed": params["seed"],
+        "trades_sampled": len(samples),
+        **summary
+    }
+
+def queued_job_response(job, message: str) -> ApiResponse:
+    """Reply for a request handed to the job runner; an identical finished job answers with its result"""
+    return ApiResponse(
+        success=True,
+        message=message if not job.finished else "Result from an identical recent job",
+        data={"job_id": job.id, "job": job.to_dict(include_result=job.finished)}
+    )
+
+# Per-trade reference versions of the engine's math: tests/test_analytics_engine.py checks parity
+# against them and benchmarks/micro.py times them next to the engine
 def calculate_max_drawdown(trades):
     """Calculate maximum drawdown from trade data"""
     if not trades:
@@ -0,0 +1,113 @@
+from fastapi import APIRouter, HTTPException
+from app.models import AnalyticsResponse, ApiResponse, BacktestRequest
+from app.services import analytics_engine
+from app.services.backtest import EXIT_REASONS, scan_pairs
+from app.services.price_history import history_path
+from app.services.rate_service import normalize_pair
+from app.services.metrics import InstrumentedRoute, timed
+from app.services.instruments import instrument_spec
+from app.services.pnl import trade_profits
+from app.services.position_sizing import size_positions
+import numpy as np
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+BACKTEST_COLUMNS = ("pair", "tag", "direction", "open_time", "close_time", "entry_price",
+                    "exit_price", "stop_loss", "take_profit", "exit_reason")
+
+@router.post("/run", response_model=ApiResponse)
+async def run_backtest(request: BacktestRequest):
+    """Replay price history through tagged entry/stop/target rules"""
+    try:
+        pairs = list(dict.fromkeys(normalize_pair(p) for p in request.pairs))
+        paths = {pair: history_path(pair) for pair in pairs}
+        missing = [pair for pair, path in paths.items() if path is None]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"No price history for {', '.join(missing)}")
+        
+        rules = [{**rule.dict(), "direction": rule.direction.value, "signal": rule.signal.value} for rule in request.rules]
+        jobs = [(paths[pair], pair, instrument_spec(pair).pip_multiplier) for pair in pairs]
+        
+        with timed("backtest"):
+            scans = await scan_pairs(jobs, rules, request.start, request.end)
+            columns = price_backtest_trades(scans, request.account_balance, request.risk_percentage)
+            data = {
+                "overview": AnalyticsResponse(**backtest_overview(columns)).dict(),
+                "by_pair": {
+                    pair: AnalyticsResponse(**backtest_overview(columns, columns["pair"] == pair)).dict()
+                    for pair in pairs
+                },
+                "bars": {scan["pair"]: scan["bars"] for scan in scans}
+            }
+            if request.include_trades:
+                data["trades"] = columns_to_trades(columns)
+        
+        return ApiResponse(
+            success=True,
+            message="Backtest completed successfully",
+            data=data
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def price_backtest_trades(scans: list, account_balance: float, risk_percentage: float) -> dict:
+    """Size and price simulated fills with the live calculator and P&L formulas"""
+    parts = {field: [] for field in BACKTEST_COLUMNS}
+    for scan in scans:
+        for result in scan["results"]:
+            count = len(result["entry_price"])
+            parts["pair"].append(np.full(count, scan["pair"], dtype=object))
+            parts["tag"].append(np.full(count, result["tag"], dtype=object))
+            parts["direction"].append(np.full(count, result["direction"], dtype=object))
+            for field in BACKTEST_COLUMNS[3:]:
+                parts[field].append(result[field])
+    columns = {field: np.concatenate(values) for field, values in parts.items()}
+    count = len(columns["pair"])
+    if count == 0:
+        columns.update(lot_size=np.zeros(0), profit=np.zeros(0))
+        return columns
+    
+    pairs = columns["pair"].astype(str)
+    sized = size_positions(np.full(count, account_balance), np.full(count, risk_percentage),
+                           columns["entry_price"], columns["stop_loss"], pairs)
+    columns = {field: values[sized["valid"]] for field, values in columns.items()}
+    columns["lot_size"] = sized["lot_size"][sized["valid"]]
+    columns["profit"] = trade_profits(
+        columns["entry_price"], columns["exit_price"], columns["lot_size"],
+        columns["direction"].astype(str), pairs[sized["valid"]]
+    )
+    return columns
+
+def backtest_overview(columns: dict, mask=None) -> dict:
+    """AnalyticsResponse fields for simulated trades, without materializing them"""
+    profits = columns["profit"] if mask is None else columns["profit"][mask]
+    close_times = columns["close_time"] if mask is None else columns["close_time"][mask]
+    tags = columns["tag"] if mask is None else columns["tag"][mask]
+    frame = analytics_engine.frame_from_columns(profits, close_times, tags, np.arange(len(tags)))
+    return analytics_engine.compute_overview(frame)
+
+def columns_to_trades(columns: dict) -> list:
+    """Materialize simulated trades as trade-shaped dicts"""
+    open_times = columns["open_time"].astype("datetime64[us]").tolist()
+    close_times = columns["close_time"].astype("datetime64[us]").tolist()
+    return [
+        {
+            "pair": columns["pair"][i],
+            "direction": columns["direction"][i],
+            "entry_price": float(columns["entry_price"][i]),
+            "exit_price": float(columns["exit_price"][i]),
+            "stop_loss": round(float(columns["stop_loss"][i]), 6),
+            "take_profit": round(float(columns["take_profit"][i]), 6),
+            "lot_size": float(columns["lot_size"][i]),
+            "open_time": open_times[i],
+            "close_time": close_times[i],
+            "profit": float(columns["profit"][i]),
+            "tags": [columns["tag"][i]],
+            "status": "closed",
+            "exit_reason": EXIT_REASONS[columns["exit_reason"][i]],
+        }
+        for i in range(len(columns["profit"]))
+    ]
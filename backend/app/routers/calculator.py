@@ -1,8 +1,13 @@
 from fastapi import APIRouter, HTTPException
-from app.models import PositionSizingRequest, PositionSizingResponse, ApiResponse
+from app.models import PositionSizingRequest, PositionSizingResponse, PositionSizingBatchRequest, ApiResponse
 import math
+import numpy as np
+from app.services.instruments import instrument_spec
+from app.services.rate_service import get_rate_cache
+from app.services.metrics import InstrumentedRoute
+from app.services.position_sizing import size_positions
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 @router.post("/position-size", response_model=ApiResponse)
 async def calculate_position_size(request: PositionSizingRequest):
@@ -24,7 +29,7 @@ async def calculate_position_size(request: PositionSizingRequest):
             raise ValueError("Stop loss must be different from entry price")
         
         # Calculate position value
-        position_value = lot_size * 100000 * request.entry_price  # Standard lot = 100,000 units
+        position_value = lot_size * instrument_spec(request.pair).contract_size * request.entry_price
         
         result = PositionSizingResponse(
             lot_size=round(lot_size, 2),
@@ -43,6 +48,48 @@ async def calculate_position_size(request: PositionSizingRequest):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/position-size/batch", response_model=ApiResponse)
+async def calculate_position_sizes(request: PositionSizingBatchRequest):
+    """Calculate position sizes for many setups in one vectorized pass"""
+    if (request.items is None) == (request.columns is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'items' or 'columns'")
+    
+    try:
+        if request.columns is not None:
+            columns = request.columns.dict()
+            lengths = {len(values) for values in columns.values()}
+            if len(lengths) > 1:
+                raise ValueError("All columns must have the same length")
+        else:
+            columns = items_to_columns(request.items)
+        
+        sized = size_positions(**columns)
+        errors = [{"index": int(i), "error": sized["error"][i]} for i in np.flatnonzero(~sized["valid"])]
+        
+        if request.columns is not None:
+            data = {
+                "columns": {field: sized_column(sized, field) for field in POSITION_SIZE_FIELDS},
+                "errors": errors
+            }
+        else:
+            results = [None] * len(sized["valid"])
+            output = {field: sized_column(sized, field) for field in POSITION_SIZE_FIELDS}
+            for i in np.flatnonzero(sized["valid"]):
+                results[i] = {field: output[field][i] for field in POSITION_SIZE_FIELDS}
+            data = {"results": results, "errors": errors}
+        
+        data["count"] = len(sized["valid"])
+        data["succeeded"] = int(sized["valid"].sum())
+        
+        return ApiResponse(
+            success=True,
+            message="Position sizes calculated successfully",
+            data=data
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/pip-value/{pair}")
 async def get_pair_pip_value(pair: str):
     """Get pip value for a currency pair"""
@@ -93,27 +140,33 @@ async def calculate_risk_reward(
         raise HTTPException(status_code=400, detail=str(e))
 
 def get_pip_value(pair: str) -> float:
-    """Get pip value for different currency pairs"""
-    # Standard pip values for major pairs (per standard lot)
-    pip_values = {
-        "EUR/USD": 10.0,
-        "GBP/USD": 10.0,
-        "AUD/USD": 10.0,
-        "NZD/USD": 10.0,
-        "USD/CAD": 10.0,
-        "USD/CHF": 10.0,
-        "USD/JPY": 10.0,  # Simplified - actual calculation is more complex
-        "EUR/GBP": 10.0,
-        "EUR/JPY": 10.0,
-        "GBP/JPY": 10.0,
-    }
-    
-    return pip_values.get(pair.upper(), 10.0)
+    """Get pip value per standard lot in the account currency from cached rates"""
+    return get_rate_cache().pip_value(pair)
 
 def get_pip_multiplier(pair: str) -> int:
     """Get pip multiplier for different currency pairs"""
     # Most pairs have 4 decimal places, JPY pairs have 2
-    if "JPY" in pair.upper():
-        return 100  # 2 decimal places
-    else:
-        return 10000  # 4 decimal places
+    return instrument_spec(pair).pip_multiplier
+
+POSITION_SIZE_FIELDS = ("lot_size", "risk_amount", "position_value", "pip_value", "pips_at_risk")
+
+def items_to_columns(items: list) -> dict:
+    """Split a list of sizing request objects into parallel columns"""
+    def number(item, field):
+        try:
+            return float(item[field])
+        except (KeyError, TypeError, ValueError):
+            return math.nan
+    
+    return {
+        "account_balance": [number(item, "account_balance") for item in items],
+        "risk_percentage": [number(item, "risk_percentage") for item in items],
+        "entry_price": [number(item, "entry_price") for item in items],
+        "stop_loss": [number(item, "stop_loss") for item in items],
+        "pair": [str(item.get("pair") or "") for item in items],
+    }
+
+def sized_column(sized: dict, field: str) -> list:
+    """Convert a sized column to a JSON list with None for invalid rows"""
+    values = sized[field].tolist()
+    return [value if ok else None for value, ok in zip(values, sized["valid"].tolist())]
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, HTTPException
+from app.models import ApiResponse
+from app.services.firestore_repository import get_repository
+from app.services.job_runner import get_job_runner
+from app.services.metrics import InstrumentedRoute
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.get("/", response_model=ApiResponse)
+async def list_jobs(user_id: str = "demo_user"):
+    """List the user's queued, running and recently finished background jobs"""
+    try:
+        jobs = await get_job_runner().list_jobs(get_repository(), user_id)
+        
+        return ApiResponse(
+            success=True,
+            data={"jobs": [job.to_dict(include_result=False) for job in jobs], "count": len(jobs)}
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{job_id}", response_model=ApiResponse)
+async def get_job(job_id: str, user_id: str = "demo_user"):
+    """Get a background job's status and progress, and its result once completed"""
+    try:
+        job = await get_job_runner().get(get_repository(), job_id)
+        if job is None or job.user_id != user_id:
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        return ApiResponse(
+            success=True,
+            data={"job": job.to_dict()}
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/{job_id}", response_model=ApiResponse)
+async def cancel_job(job_id: str, user_id: str = "demo_user"):
+    """Cancel a queued or running background job"""
+    try:
+        repo = get_repository()
+        runner = get_job_runner()
+        job = await runner.get(repo, job_id)
+        if job is None or job.user_id != user_id:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if not await runner.cancel(repo, job):
+            raise HTTPException(status_code=409, detail=f"Job is {job.status} or runs in another worker")
+        
+        return ApiResponse(
+            success=True,
+            message="Job cancelled",
+            data={"job": job.to_dict(include_result=False)}
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, HTTPException, Query
+from app.models import ApiResponse, PortfolioSizingRequest
+from app.services.firestore_repository import get_repository
+from app.services.portfolio_risk import PortfolioRisk, get_risk_models, net_exposures
+from app.services.rate_service import get_rate_cache, normalize_pair
+from app.services.metrics import InstrumentedRoute, timed
+from app.services.position_sizing import size_positions
+import asyncio
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.get("/exposure", response_model=ApiResponse)
+async def get_exposure(
+    user_id: str = "demo_user",
+    confidence: float = Query(0.99, gt=0.5, lt=1),
+    horizon_days: int = Query(1, ge=1, le=250)
+):
+    """Net currency exposure of the user's open trades with parametric VaR and correlations"""
+    try:
+        portfolio = await load_portfolio(user_id)
+        
+        with timed("risk"):
+            data = portfolio.summary(confidence, horizon_days)
+        
+        return ApiResponse(success=True, data=data)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/position-size", response_model=ApiResponse)
+async def calculate_portfolio_position_size(request: PortfolioSizingRequest, user_id: str = "demo_user"):
+    """Position size from the risk rule, scaled down for correlation with the open book"""
+    try:
+        pair = normalize_pair(request.pair)
+        sized = size_positions([request.account_balance], [request.risk_percentage], [request.entry_price],
+                               [request.stop_loss], [pair])
+        if not sized["valid"][0]:
+            raise HTTPException(status_code=400, detail=sized["error"][0])
+        standalone = float(sized["lot_size"][0])
+        
+        portfolio = await load_portfolio(user_id)
+        
+        with timed("risk"):
+            adjusted = portfolio.size_trade(pair, request.direction.value, request.entry_price, standalone,
+                                            request.confidence)
+        
+        return ApiResponse(
+            success=True,
+            message="Position size calculated successfully",
+            data={
+                "standalone_lot_size": standalone,
+                "risk_amount": float(sized["risk_amount"][0]),
+                "pips_at_risk": float(sized["pips_at_risk"][0]),
+                **adjusted,
+                "unmodelled": portfolio.unmodelled()
+            }
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def load_portfolio(user_id: str) -> PortfolioRisk:
+    """The user's open trades netted against the current risk model"""
+    repo = get_repository()
+    trades = await repo.query("trades", [("user_id", "==", user_id), ("status", "==", "open")])
+    model = await asyncio.to_thread(get_risk_models().get)
+    return PortfolioRisk(model, net_exposures(trades), get_rate_cache().account_currency)
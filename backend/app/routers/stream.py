@@ -0,0 +1,74 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List
+from app.models import ApiResponse
+from app.services.firestore_repository import get_repository
+from app.services.position_book import Tick, ensure_tick_feed, get_position_book, tick_push_enabled
+from app.services.metrics import InstrumentedRoute
+import asyncio
+import json
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+HEARTBEAT_SECONDS = 15
+
+class TickIn(BaseModel):
+    pair: str
+    bid: float
+    ask: float
+
+@router.get("/pnl")
+async def stream_pnl(request: Request, user_id: str = "demo_user"):
+    """Stream floating P&L of the user's open trades as server-sent events"""
+    try:
+        book = get_position_book()
+        queue = await book.subscribe(get_repository(), user_id)
+        ensure_tick_feed()
+        
+        return StreamingResponse(
+            pnl_events(request, book, user_id, queue),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/ticks", response_model=ApiResponse)
+async def push_ticks(ticks: List[TickIn]):
+    """Feed prices into the position book; only enabled by TICK_PUSH_ENABLED, for tests and replays"""
+    if not tick_push_enabled():
+        raise HTTPException(status_code=404, detail="Tick push is disabled")
+    try:
+        book = get_position_book()
+        changed = sum(book.apply_tick(Tick(t.pair, t.bid, t.ask)) for t in ticks)
+        
+        return ApiResponse(
+            success=True,
+            message="Ticks applied",
+            data={"ticks": len(ticks), "positions_changed": changed}
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def format_event(event: str, data) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+async def pnl_events(request: Request, book, user_id: str, queue: asyncio.Queue):
+    """Snapshot first, then P&L deltas as ticks arrive, with keep-alive comments"""
+    try:
+        yield format_event("snapshot", {"positions": book.snapshot(user_id)})
+        while True:
+            try:
+                update = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event("pnl", update)
+    finally:
+        book.unsubscribe(user_id, queue)
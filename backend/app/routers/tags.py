@@ -0,0 +1,116 @@
+from fastapi import APIRouter, HTTPException, Query
+from app.models import ApiResponse, TradeTag, TradeTagUpdate
+from app.services.firestore_repository import get_repository
+from app.services.tag_index import COMBINATION_METRICS, DEFAULT_TAG_COLOR, TAGS_COLLECTION, get_tag_indexes, tag_id
+from app.services.metrics import InstrumentedRoute, timed
+from datetime import datetime
+from typing import List, Optional
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.get("/", response_model=ApiResponse)
+async def list_tags(user_id: str = "demo_user"):
+    """List the user's tags with metadata and closed-trade stats"""
+    try:
+        index = await get_tag_indexes().get(get_repository(), user_id)
+        
+        with timed("analytics"):
+            tags = index.tag_summary()
+        
+        return ApiResponse(
+            success=True,
+            data={"tags": tags, "count": len(tags)}
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/{name}", response_model=ApiResponse)
+async def update_tag(name: str, update: TradeTagUpdate, user_id: str = "demo_user"):
+    """Create or update a tag's color and description"""
+    try:
+        repo = get_repository()
+        doc_id = tag_id(user_id, name)
+        existing = await repo.get_document(TAGS_COLLECTION, doc_id) or {}
+        
+        tag = TradeTag(
+            id=doc_id,
+            name=name,
+            color=update.color or existing.get("color", DEFAULT_TAG_COLOR),
+            description=update.description if update.description is not None else existing.get("description"),
+            created_at=existing.get("created_at", datetime.utcnow())
+        )
+        tag_data = {**tag.dict(), "user_id": user_id}
+        await repo.set_document(TAGS_COLLECTION, doc_id, tag_data)
+        get_tag_indexes().set_metadata(user_id, tag_data)
+        
+        return ApiResponse(
+            success=True,
+            message="Tag saved",
+            data={"tag": tag.dict()}
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/filter", response_model=ApiResponse)
+async def filter_by_tags(
+    user_id: str = "demo_user",
+    all_of: List[str] = Query([], alias="all"),
+    any_of: List[str] = Query([], alias="any"),
+    none_of: List[str] = Query([], alias="none"),
+    include_trades: bool = False
+):
+    """Stats of closed trades matching a tag filter: every `all` tag, any `any` tag, no `none` tag"""
+    try:
+        if not (all_of or any_of or none_of):
+            raise HTTPException(status_code=400, detail="Give at least one of all, any or none")
+        
+        index = await get_tag_indexes().get(get_repository(), user_id)
+        
+        with timed("analytics"):
+            bits = index.select(all_of, any_of, none_of)
+            data = {"all": all_of, "any": any_of, "none": none_of, **index.stats(bits)}
+            if include_trades:
+                data["trade_ids"] = index.trade_ids(bits)
+        
+        return ApiResponse(success=True, data=data)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/combinations", response_model=ApiResponse)
+async def get_top_combinations(
+    user_id: str = "demo_user",
+    k: int = Query(10, ge=1, le=500),
+    min_size: int = Query(2, ge=1, le=5),
+    max_size: int = Query(2, ge=1, le=5),
+    min_trades: int = Query(10, ge=1),
+    sort: str = Query("expectancy", pattern=f"^({'|'.join(COMBINATION_METRICS)})$"),
+    tags: Optional[List[str]] = Query(None)
+):
+    """Top-k tag combinations (trades carrying all of the tags) ranked by a metric"""
+    try:
+        if min_size > max_size:
+            raise HTTPException(status_code=400, detail="min_size cannot exceed max_size")
+        
+        index = await get_tag_indexes().get(get_repository(), user_id)
+        
+        with timed("analytics"):
+            combinations = index.top_combinations(k, min_size, max_size, min_trades, sort, tags)
+        
+        return ApiResponse(
+            success=True,
+            data={"combinations": combinations, "sort": sort, "min_trades": min_trades}
+        )
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,17 +1,38 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, File, Query, Request, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from typing import List, Optional
 from app.models import Trade, TradeCreate, TradeUpdate, ApiResponse
-from app.services.firebase_service import get_firestore_client
+from app.services.firestore_repository import get_repository, BATCH_WRITE_LIMIT
+from app.services.trade_hooks import commit_trade_change, log_trade_events, on_trades_bulk_changed
+from app.services import trade_export, trade_import
+from app.services.analytics_engine import normalize_time
+from app.services.event_log import EventLogCompacted, get_event_log
+from app.services.job_runner import get_job_runner
+from app.services.pnl import trade_profit, trade_profits
+from app.services.response_cache import get_response_cache
+from app.services.metrics import InstrumentedRoute, timed
+from app.services.serialization import VARY_ACCEPT, fast_response, negotiate_fast_format
+from app.services.trade_records import TradeRecord
+from app.services.trade_search import SORT_FIELDS, get_trade_search
+import asyncio
+import base64
+import json
+import os
+import tempfile
 import uuid
 from datetime import datetime
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+# Largest page GET /api/trades/ serves; format=ndjson&full=true streams past it
+MAX_PAGE_SIZE = 1000
 
 @router.post("/", response_model=ApiResponse)
 async def create_trade(trade: TradeCreate, user_id: str = "demo_user"):
     """Create a new trade"""
     try:
-        db = get_firestore_client()
+        repo = get_repository()
         
         trade_id = str(uuid.uuid4())
         trade_data = {
@@ -26,51 +47,250 @@ async def create_trade(trade: TradeCreate, user_id: str = "demo_user"):
         
         # Calculate profit if exit price is provided
         if hasattr(trade, 'exit_price') and trade.exit_price:
-            profit = calculate_trade_profit(trade.entry_price, trade.exit_price, 
-                                          trade.lot_size, trade.direction, trade.pair)
+            profit = trade_profit(trade.entry_price, trade.exit_price, 
+                                  trade.lot_size, trade.direction, trade.pair)
             trade_data["profit"] = profit
             trade_data["status"] = "closed"
             trade_data["close_time"] = datetime.utcnow()
         
-        db.collection("trades").document(trade_id).set(trade_data)
+        await commit_trade_change(repo, user_id, trade_id, "set", trade_data)
         
         return ApiResponse(
             success=True,
             message="Trade created successfully",
             data={"trade_id": trade_id}
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/import", response_model=ApiResponse)
+async def import_trades(file: UploadFile = File(...), user_id: str = "demo_user", format: Optional[str] = None):
+    """Bulk import trades from a CSV or NDJSON upload as a background job"""
+    file_format = format or trade_import.detect_format(file.filename, file.content_type)
+    if file_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Upload must be CSV or NDJSON")
+    
+    try:
+        # Spool to a file we own so the job outlives the request, copying in fixed-size chunks
+        fd, path = tempfile.mkstemp(prefix="trade-import-", suffix=f".{file_format}")
+        try:
+            max_bytes = trade_import.max_upload_bytes()
+            size = 0
+            with os.fdopen(fd, "wb") as out:
+                while chunk := await file.read(1024 * 1024):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+                    out.write(chunk)
+            
+            job = await get_job_runner().submit(
+                get_repository(), "import", user_id, lambda job: run_trade_import(job, path),
+                {"filename": file.filename, "format": file_format}, priority="bulk", dedupe=False,
+                on_finish=[lambda: os.remove(path)], progress=trade_import.import_progress()
+            )
+        except BaseException:
+            os.remove(path)
+            raise
+        
+        return ApiResponse(
+            success=True,
+            message="Import started",
+            data={"job_id": job.id}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/import/{job_id}", response_model=ApiResponse)
+async def get_import_status(job_id: str, user_id: str = "demo_user"):
+    """Get progress of a bulk import job"""
+    job = await get_job_runner().get(get_repository(), job_id)
+    if job is None or job.kind != "import" or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    
+    return ApiResponse(
+        success=True,
+        data={"job": job.to_dict()}
+    )
+
+@router.post("/recompute-profits", response_model=ApiResponse)
+async def recompute_profits(user_id: str = "demo_user"):
+    """Rewrite stored profit of the user's closed trades with the current P&L formula and rates as a background job"""
+    try:
+        job = await get_job_runner().submit(
+            get_repository(), "profit-recompute", user_id,
+            lambda job: run_profit_recompute(job, user_id), priority="bulk"
+        )
+        
+        return ApiResponse(
+            success=True,
+            message="Profit recompute queued",
+            data={"job_id": job.id}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/", response_model=ApiResponse)
 async def get_trades(
+    request: Request,
+    response: Response,
     user_id: str = "demo_user",
     status: Optional[str] = None,
     pair: Optional[str] = None,
-    limit: int = 50
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: str = "json",
+    full: bool = Query(False, description="With format=ndjson, stream every matching trade instead of one page")
 ):
-    """Get user's trades with optional filters"""
+    """Get user's trades with optional filters, paged by cursor or streamed as NDJSON"""
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    if full and format != "ndjson":
+        raise HTTPException(status_code=400, detail="full is only supported with format=ndjson")
+    start_after = decode_cursor(cursor) if cursor else None
+    
     try:
-        db = get_firestore_client()
-        query = db.collection("trades").where("user_id", "==", user_id)
+        repo = get_repository()
+        filters = [("user_id", "==", user_id)]
         
         if status:
-            query = query.where("status", "==", status)
+            filters.append(("status", "==", status))
         if pair:
-            query = query.where("pair", "==", pair)
-            
-        trades = query.order_by("created_at", direction="DESCENDING").limit(limit).get()
+            filters.append(("pair", "==", pair))
+        
+        # (created_at, id) gives a total order, so a page boundary is never ambiguous
+        order_by = [("created_at", "DESCENDING"), ("id", "DESCENDING")]
+        
+        if format == "ndjson":
+            trades = repo.stream("trades", filters, order_by, limit=None if full else limit, start_after=start_after)
+            return StreamingResponse(stream_trades(trades), media_type="application/x-ndjson")
+        
+        # Accept: application/vnd.mckay+json or application/msgpack skips per-row dicts and models
+        fast_format = negotiate_fast_format(request.headers.get("accept"))
+        
+        trades = await repo.query("trades", filters, order_by, limit=limit + 1, start_after=start_after,
+                                  record_type=TradeRecord if fast_format else None)
+        trade_list = trades[:limit]
+        
+        next_cursor = encode_cursor(trade_list[-1]) if len(trades) > limit else None
+        data = {"trades": trade_list, "count": len(trade_list), "next_cursor": next_cursor}
+        
+        if fast_format:
+            return fast_response(data, fast_format)
+        
+        response.headers.update(VARY_ACCEPT)
+        return ApiResponse(
+            success=True,
+            data=data
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/search", response_model=ApiResponse)
+async def search_trades(
+    user_id: str = "demo_user",
+    q: Optional[str] = Query(None, description="Words to find in notes; each matches as a prefix"),
+    status: Optional[str] = None,
+    pair: Optional[str] = None,
+    direction: Optional[str] = None,
+    tags: List[str] = Query([], description="Trades must carry every one of these tags"),
+    any_tags: List[str] = Query([], description="Trades must carry at least one of these tags"),
+    opened_from: Optional[datetime] = None,
+    opened_to: Optional[datetime] = None,
+    closed_from: Optional[datetime] = None,
+    closed_to: Optional[datetime] = None,
+    min_profit: Optional[float] = None,
+    max_profit: Optional[float] = None,
+    sort: str = Query("created_at", pattern=f"^({'|'.join(SORT_FIELDS)})$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0)
+):
+    """Filter, sort and full-text search the user's trades server-side, one page at a time"""
+    try:
+        index = await get_trade_search().get(get_repository(), user_id)
+        
+        equals = {field: value for field, value in (("status", status), ("pair", pair), ("direction", direction))
+                  if value is not None}
+        ranges = {}
+        if opened_from or opened_to:
+            ranges["open_time"] = (opened_from, opened_to)
+        if closed_from or closed_to:
+            ranges["close_time"] = (closed_from, closed_to)
+        if min_profit is not None or max_profit is not None:
+            ranges["profit"] = (min_profit, max_profit)
         
-        trade_list = []
-        for trade in trades:
-            trade_data = trade.to_dict()
-            trade_data["id"] = trade.id
-            trade_list.append(trade_data)
+        with timed("search"):
+            total, trade_list = index.search(q, equals, tags, any_tags, ranges, sort, order == "desc", offset, limit)
         
+        next_offset = offset + len(trade_list) if offset + len(trade_list) < total else None
         return ApiResponse(
             success=True,
-            data={"trades": trade_list, "count": len(trade_list)}
+            data={"trades": trade_list, "count": len(trade_list), "total": total, "next_offset": next_offset}
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/export")
+async def export_trades(
+    request: Request,
+    user_id: str = "demo_user",
+    format: str = Query("csv", pattern=f"^({'|'.join(trade_export.EXPORT_FORMATS)})$")
+):
+    """Download the user's full trade history as CSV, Arrow IPC stream or Parquet"""
+    if not trade_export.format_available(format):
+        raise HTTPException(status_code=400, detail=f"{format} export requires pyarrow")
+    
+    version_tag = get_response_cache().version_tag(user_id)
+    media_type, extension = trade_export.EXPORT_FORMATS[format]
+    etag = f'"{version_tag}-{format}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'attachment; filename="trades.{extension}"'
+    }
+    if etag in {tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")}:
+        return Response(status_code=304, headers=headers)
+    
+    path = trade_export.cached_export(user_id, format, version_tag)
+    if path:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    
+    try:
+        chunks = trade_export.stream_export(get_repository(), user_id, format, version_tag)
+        return StreamingResponse(chunks, media_type=media_type, headers=headers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/events", response_model=ApiResponse)
+async def get_trade_events(
+    user_id: str = "demo_user",
+    after: int = Query(-1, ge=-1, description="Offset of the last event already seen; -1 for the start"),
+    limit: int = Query(500, ge=1, le=5000)
+):
+    """Trade created/updated/closed/deleted events after an offset, for consumers catching up incrementally"""
+    log = get_event_log()
+    if log is None:
+        raise HTTPException(status_code=404, detail="Trade event log is disabled")
+    try:
+        with timed("events"):
+            events, last = await asyncio.to_thread(log.read, after, user_id, limit)
+        return ApiResponse(
+            success=True,
+            data={"events": events, "count": len(events), "next_after": last}
+        )
+    except EventLogCompacted as e:
+        # Too far behind: rebuild from current state, then follow from the snapshot offset
+        raise HTTPException(status_code=410, detail=str(e), headers={"X-Snapshot-Offset": str(e.snapshot_offset)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -78,19 +298,18 @@ async def get_trades(
 async def get_trade(trade_id: str, user_id: str = "demo_user"):
     """Get a specific trade"""
     try:
-        db = get_firestore_client()
-        trade_ref = db.collection("trades").document(trade_id)
-        trade = trade_ref.get()
+        repo = get_repository()
+        trade_data = await repo.get_document("trades", trade_id)
         
-        if not trade.exists:
+        if trade_data is None:
             raise HTTPException(status_code=404, detail="Trade not found")
         
-        trade_data = trade.to_dict()
         if trade_data.get("user_id") != user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        trade_data["id"] = trade.id
         return ApiResponse(success=True, data={"trade": trade_data})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -98,14 +317,12 @@ async def get_trade(trade_id: str, user_id: str = "demo_user"):
 async def update_trade(trade_id: str, trade_update: TradeUpdate, user_id: str = "demo_user"):
     """Update a trade (usually to close it)"""
     try:
-        db = get_firestore_client()
-        trade_ref = db.collection("trades").document(trade_id)
-        trade = trade_ref.get()
+        repo = get_repository()
+        trade_data = await repo.get_document("trades", trade_id)
         
-        if not trade.exists:
+        if trade_data is None:
             raise HTTPException(status_code=404, detail="Trade not found")
         
-        trade_data = trade.to_dict()
         if trade_data.get("user_id") != user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         
@@ -118,7 +335,7 @@ async def update_trade(trade_id: str, trade_update: TradeUpdate, user_id: str =
         
         # Calculate profit if exit price is provided
         if "exit_price" in update_data:
-            profit = calculate_trade_profit(
+            profit = trade_profit(
                 trade_data["entry_price"], 
                 update_data["exit_price"],
                 trade_data["lot_size"], 
@@ -130,12 +347,16 @@ async def update_trade(trade_id: str, trade_update: TradeUpdate, user_id: str =
             if "close_time" not in update_data:
                 update_data["close_time"] = datetime.utcnow()
         
-        trade_ref.update(update_data)
+        _, after = await commit_trade_change(repo, user_id, trade_id, "update", update_data)
+        if after is None:
+            raise HTTPException(status_code=404, detail="Trade not found")
         
         return ApiResponse(
             success=True,
             message="Trade updated successfully"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -143,40 +364,169 @@ async def update_trade(trade_id: str, trade_update: TradeUpdate, user_id: str =
 async def delete_trade(trade_id: str, user_id: str = "demo_user"):
     """Delete a trade"""
     try:
-        db = get_firestore_client()
-        trade_ref = db.collection("trades").document(trade_id)
-        trade = trade_ref.get()
+        repo = get_repository()
+        trade_data = await repo.get_document("trades", trade_id)
         
-        if not trade.exists:
+        if trade_data is None:
             raise HTTPException(status_code=404, detail="Trade not found")
         
-        trade_data = trade.to_dict()
         if trade_data.get("user_id") != user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        trade_ref.delete()
+        before, _ = await commit_trade_change(repo, user_id, trade_id, "delete")
+        if before is None:
+            raise HTTPException(status_code=404, detail="Trade not found")
         
         return ApiResponse(
             success=True,
             message="Trade deleted successfully"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def calculate_trade_profit(entry_price: float, exit_price: float, 
-                          lot_size: float, direction: str, pair: str) -> float:
-    """Calculate trade profit based on prices and direction"""
-    pip_difference = (exit_price - entry_price) if direction == "long" else (entry_price - exit_price)
+def encode_cursor(trade_data) -> str:
+    """Encode the (created_at, id) position of a trade dict or record as an opaque cursor"""
+    if isinstance(trade_data, TradeRecord):
+        trade_data = {"created_at": trade_data.created_at, "id": trade_data.id}
+    created_at = normalize_time(trade_data["created_at"])
+    payload = json.dumps({"created_at": created_at.isoformat(), "id": trade_data["id"]})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor into start-after values for the trades query"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {
+            "created_at": datetime.fromisoformat(payload["created_at"]),
+            "id": payload["id"]
+        }
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def stream_trades(trades):
+    """Yield trades as NDJSON lines straight off the query iterator"""
+    async for trade_data in trades:
+        yield json.dumps(jsonable_encoder(trade_data)) + "\n"
+
+async def run_trade_import(job, path: str) -> dict:
+    """Parse an uploaded file and write its trades in batches of up to 500"""
+    repo = get_repository()
+    user_id = job.user_id
+    progress = job.progress
     
-    # Standard pip values for major pairs (simplified)
-    pip_values = {
-        "EUR/USD": 10,
-        "GBP/USD": 10,
-        "AUD/USD": 10,
-        "USD/JPY": 10,
-    }
+    rows = trade_import.iter_raw_rows(path, job.params["format"])
+    try:
+        while True:
+            # Parsing runs off the event loop; only one batch is held in memory
+            chunk = await asyncio.to_thread(_read_import_chunk, progress, job.params["format"], rows)
+            if not chunk:
+                break
+            await _write_import_chunk(repo, user_id, chunk, progress)
+    finally:
+        # One rebuild instead of folding thousands of rows into the aggregate, also when the
+        # job is cancelled or a batch fails after earlier ones were written
+        if progress["rows_imported"]:
+            await on_trades_bulk_changed(repo, user_id)
+    return {key: progress[key] for key in ("rows_read", "rows_imported", "rows_failed")}
+
+async def _write_import_chunk(repo, user_id: str, chunk: list, progress: dict):
+    """Price and write one batch of parsed rows"""
+    closing = [i for i, row in enumerate(chunk) if row["exit_price"] is not None]
+    if closing:
+        profits = trade_profits(
+            [chunk[i]["entry_price"] for i in closing],
+            [chunk[i]["exit_price"] for i in closing],
+            [chunk[i]["lot_size"] for i in closing],
+            [chunk[i]["direction"] for i in closing],
+            [chunk[i]["pair"] for i in closing],
+        )
+        for i, profit in zip(closing, profits.tolist()):
+            chunk[i]["profit"] = profit
+    
+    now = datetime.utcnow()
+    writes = []
+    for row in chunk:
+        trade_id = str(uuid.uuid4())
+        exit_price = row.pop("exit_price")
+        open_time = row.pop("open_time") or now
+        close_time = row.pop("close_time")
+        trade_data = {
+            "id": trade_id,
+            "user_id": user_id,
+            **row,
+            "status": "open",
+            "open_time": open_time,
+            "created_at": now,
+            "updated_at": now
+        }
+        if exit_price is not None:
+            trade_data["exit_price"] = exit_price
+            trade_data["status"] = "closed"
+            trade_data["close_time"] = close_time or now
+        writes.append(("set", "trades", trade_id, trade_data))
     
-    pip_value = pip_values.get(pair, 10)
-    pips = pip_difference * 10000  # Convert to pips
+    await repo.batch_write(writes)
+    progress["rows_imported"] += len(writes)
+    await log_trade_events(user_id, [(None, trade_data) for _, _, _, trade_data in writes])
+
+async def run_profit_recompute(job, user_id: str) -> dict:
+    """Recompute profit of the user's closed trades in batches of up to 500"""
+    repo = get_repository()
+    progress = job.progress
+    progress.update(trades_checked=0, trades_updated=0)
     
-    return round(pips * pip_value * lot_size, 2)
+    chunk = []
+    async for trade_data in repo.stream("trades", [("user_id", "==", user_id), ("status", "==", "closed")]):
+        if trade_data.get("exit_price") is None:
+            continue
+        chunk.append(trade_data)
+        if len(chunk) >= BATCH_WRITE_LIMIT:
+            await _recompute_chunk(repo, user_id, chunk, progress)
+            chunk = []
+    if chunk:
+        await _recompute_chunk(repo, user_id, chunk, progress)
+    
+    if progress["trades_updated"]:
+        await on_trades_bulk_changed(repo, user_id)
+    return {key: progress[key] for key in ("trades_checked", "trades_updated")}
+
+async def _recompute_chunk(repo, user_id: str, chunk: list, progress: dict):
+    """Write back the profits that differ from the stored ones"""
+    profits = trade_profits(
+        [t["entry_price"] for t in chunk],
+        [t["exit_price"] for t in chunk],
+        [t["lot_size"] for t in chunk],
+        [t["direction"] for t in chunk],
+        [t["pair"] for t in chunk],
+    ).tolist()
+    
+    now = datetime.utcnow()
+    writes = []
+    changes = []
+    for trade_data, profit in zip(chunk, profits):
+        if trade_data.get("profit") is not None and abs(trade_data["profit"] - profit) < 0.005:
+            continue
+        update_data = {"profit": profit, "updated_at": now}
+        writes.append(("update", "trades", trade_data["id"], update_data))
+        changes.append((trade_data, {**trade_data, **update_data}))
+    
+    if writes:
+        await repo.batch_write(writes)
+        await log_trade_events(user_id, changes)
+    progress["trades_checked"] += len(chunk)
+    progress["trades_updated"] += len(writes)
+
+def _read_import_chunk(progress: dict, file_format: str, rows) -> list:
+    chunk = []
+    for row_number, raw in rows:
+        progress["rows_read"] += 1
+        try:
+            chunk.append(trade_import.parse_trade_row(raw, file_format))
+        except Exception as e:
+            trade_import.record_row_error(progress, row_number, trade_import.format_row_error(e))
+            continue
+        if len(chunk) >= BATCH_WRITE_LIMIT:
+            break
+    return chunk
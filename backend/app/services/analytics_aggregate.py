@@ -0,0 +1,233 @@
+from datetime import datetime
+from typing import Callable, List, Optional
+from app.services.analytics_engine import is_closed_trade, normalize_time, load_closed_trades, summarize
+from app.services.firestore_repository import Write, document_version
+from app.services.metrics import timed
+
+AGGREGATES_COLLECTION = "analytics_aggregates"
+REBUILD_ATTEMPTS = 3
+
+def empty_aggregate(user_id: str) -> dict:
+    """Create an empty analytics aggregate document"""
+    return {
+        "user_id": user_id,
+        "trade_count": 0,
+        "closed_count": 0,
+        "win_count": 0,
+        "loss_count": 0,
+        "total_profit": 0.0,
+        "gross_profit": 0.0,
+        "gross_loss": 0.0,
+        "best_trade": None,
+        "worst_trade": None,
+        "equity": 0.0,
+        "equity_peak": 0.0,
+        "max_drawdown": 0.0,
+        "last_close_time": None,
+        "last_trade_id": None,
+        "tags": {},
+        "stale": False,
+        "version": 0,
+        "updated_at": datetime.utcnow(),
+    }
+
+async def get_aggregate(repo, user_id: str) -> dict:
+    """Read the user's aggregate, rebuilding it when missing or stale"""
+    aggregate = await repo.get_document(AGGREGATES_COLLECTION, user_id)
+    if aggregate is None or aggregate.get("stale"):
+        return await rebuild_aggregate(repo, user_id)
+    return aggregate
+
+async def rebuild_aggregate(repo, user_id: str, run_cpu: Optional[Callable] = None) -> dict:
+    """Recompute the user's aggregate from raw trades; run_cpu(fn, *args) can move the math off the event loop.
+
+    Every trade change bumps the stored aggregate's version in the transaction that
+    writes the trade, so the result is only stored if no change committed while it
+    was computed. Otherwise it starts over; after REBUILD_ATTEMPTS the fresh result
+    is returned and the stored aggregate is left stale for the next read.
+    """
+    for _ in range(REBUILD_ATTEMPTS):
+        version = document_version(await repo.get_document(AGGREGATES_COLLECTION, user_id))
+        trades = await repo.query("trades", [("user_id", "==", user_id)])
+
+        aggregate = empty_aggregate(user_id)
+        aggregate["trade_count"] = len(trades)
+        aggregate["version"] = version + 1
+        with timed("analytics"):
+            if run_cpu is None:
+                aggregate.update(summarize_trades(trades))
+            else:
+                aggregate.update(await run_cpu(summarize_trades, trades))
+        if await repo.set_if_version(AGGREGATES_COLLECTION, user_id, version, aggregate):
+            return aggregate
+
+    await repo.update_document(AGGREGATES_COLLECTION, user_id, {"stale": True})
+    return aggregate
+
+def summarize_trades(trades: list) -> dict:
+    """Aggregate fields of a user's closed trades"""
+    return summarize(load_closed_trades(trades))
+
+def record_trade_change(transaction, user_id: str, before: Optional[dict], after: Optional[dict]) -> List[Write]:
+    """Aggregate writes for a trade create/update/delete, to commit in the transaction that writes the trade"""
+    aggregate = transaction.get_document(AGGREGATES_COLLECTION, user_id)
+
+    if aggregate is None or aggregate.get("stale"):
+        # Derived from the trades on the next read; the version bump makes a rebuild already under way start over
+        marker = {"user_id": user_id, "stale": True, "version": document_version(aggregate) + 1}
+        return [("set" if aggregate is None else "update", AGGREGATES_COLLECTION, user_id, marker)]
+
+    aggregate.pop("id", None)
+    aggregate["version"] = document_version(aggregate) + 1
+    aggregate["trade_count"] += (after is not None) - (before is not None)
+
+    was_closed = is_closed_trade(before)
+    now_closed = is_closed_trade(after)
+
+    if was_closed and now_closed and _same_result(before, after):
+        # Only metadata changed; the equity curve is untouched
+        _apply_tags(aggregate, before.get("tags", []), before["profit"] > 0, -1)
+        _apply_tags(aggregate, after.get("tags", []), after["profit"] > 0, 1)
+    else:
+        if was_closed:
+            _remove_closed_trade(aggregate, before)
+        if now_closed:
+            _add_closed_trade(aggregate, after)
+
+    aggregate["updated_at"] = datetime.utcnow()
+    return [("set", AGGREGATES_COLLECTION, user_id, aggregate)]
+
+def aggregate_to_analytics(aggregate: dict) -> dict:
+    """Convert an aggregate document into AnalyticsResponse fields"""
+    closed_count = aggregate["closed_count"]
+
+    if closed_count == 0:
+        return {
+            "total_trades": aggregate["trade_count"],
+            "win_rate": 0.0,
+            "total_profit": 0.0,
+            "average_win": 0.0,
+            "average_loss": 0.0,
+            "profit_factor": 0.0,
+            "max_drawdown": 0.0,
+            "best_trade": 0.0,
+            "worst_trade": 0.0,
+            "wins_by_tag": {},
+        }
+
+    win_count = aggregate["win_count"]
+    loss_count = aggregate["loss_count"]
+    gross_profit = aggregate["gross_profit"]
+    gross_loss = abs(aggregate["gross_loss"])
+
+    wins_by_tag = {}
+    for tag, stats in aggregate["tags"].items():
+        if stats["total"] > 0:
+            wins_by_tag[tag] = {
+                "wins": stats["wins"],
+                "total": stats["total"],
+                "win_rate": round(stats["wins"] / stats["total"] * 100, 2)
+            }
+
+    return {
+        "total_trades": closed_count,
+        "win_rate": round(win_count / closed_count * 100, 2),
+        "total_profit": round(aggregate["total_profit"], 2),
+        "average_win": round(gross_profit / win_count, 2) if win_count else 0.0,
+        "average_loss": round(aggregate["gross_loss"] / loss_count, 2) if loss_count else 0.0,
+        "profit_factor": round(gross_profit / gross_loss, 2) if gross_loss > 0 else 0.0,
+        "max_drawdown": round(aggregate["max_drawdown"] * 100, 2),
+        "best_trade": round(aggregate["best_trade"], 2),
+        "worst_trade": round(aggregate["worst_trade"], 2),
+        "wins_by_tag": wins_by_tag,
+    }
+
+def _same_result(before: dict, after: dict) -> bool:
+    return (before["profit"] == after["profit"]
+            and normalize_time(before.get("close_time")) == normalize_time(after.get("close_time")))
+
+def _apply_tags(aggregate: dict, tags, is_win: bool, sign: int):
+    tag_stats = aggregate["tags"]
+    for tag in tags:
+        stats = tag_stats.setdefault(tag, {"wins": 0, "total": 0})
+        stats["total"] += sign
+        if is_win:
+            stats["wins"] += sign
+        if stats["total"] <= 0:
+            del tag_stats[tag]
+
+def _add_closed_trade(aggregate: dict, trade: dict):
+    profit = trade["profit"]
+    close_time = normalize_time(trade.get("close_time"))
+
+    aggregate["closed_count"] += 1
+    aggregate["total_profit"] += profit
+    if profit > 0:
+        aggregate["win_count"] += 1
+        aggregate["gross_profit"] += profit
+    elif profit < 0:
+        aggregate["loss_count"] += 1
+        aggregate["gross_loss"] += profit
+
+    if aggregate["best_trade"] is None or profit > aggregate["best_trade"]:
+        aggregate["best_trade"] = profit
+    if aggregate["worst_trade"] is None or profit < aggregate["worst_trade"]:
+        aggregate["worst_trade"] = profit
+
+    _apply_tags(aggregate, trade.get("tags", []), profit > 0, 1)
+
+    # The running drawdown is only valid while trades arrive in close-time order
+    last_close_time = normalize_time(aggregate["last_close_time"])
+    if last_close_time is not None and close_time is not None and close_time < last_close_time:
+        aggregate["stale"] = True
+        return
+
+    aggregate["equity"] += profit
+    if aggregate["equity"] > aggregate["equity_peak"]:
+        aggregate["equity_peak"] = aggregate["equity"]
+    peak = aggregate["equity_peak"]
+    drawdown = (peak - aggregate["equity"]) / peak if peak > 0 else 0
+    aggregate["max_drawdown"] = max(aggregate["max_drawdown"], drawdown)
+    if close_time is not None:
+        aggregate["last_close_time"] = close_time
+        aggregate["last_trade_id"] = trade.get("id")
+
+def _remove_closed_trade(aggregate: dict, trade: dict):
+    profit = trade["profit"]
+
+    aggregate["closed_count"] -= 1
+    aggregate["total_profit"] -= profit
+    if profit > 0:
+        aggregate["win_count"] -= 1
+        aggregate["gross_profit"] -= profit
+    elif profit < 0:
+        aggregate["loss_count"] -= 1
+        aggregate["gross_loss"] -= profit
+
+    _apply_tags(aggregate, trade.get("tags", []), profit > 0, -1)
+
+    if aggregate["closed_count"] == 0:
+        aggregate.update(best_trade=None, worst_trade=None, equity=0.0, equity_peak=0.0,
+                         max_drawdown=0.0, last_close_time=None, last_trade_id=None)
+        return
+
+    # The next best or worst trade is unknown; recompute on next read
+    if profit == aggregate["best_trade"] or profit == aggregate["worst_trade"]:
+        aggregate["stale"] = True
+        return
+
+    # Only the last trade applied to the equity curve can be taken off its end, and only
+    # when it set neither the equity peak nor the max drawdown
+    if trade.get("id") is None or trade.get("id") != aggregate.get("last_trade_id"):
+        aggregate["stale"] = True
+        return
+    equity = aggregate["equity"]
+    peak = aggregate["equity_peak"]
+    drawdown = (peak - equity) / peak if peak > 0 else 0
+    if (profit > 0 and equity >= peak) or (drawdown > 0 and drawdown >= aggregate["max_drawdown"]):
+        aggregate["stale"] = True
+        return
+
+    aggregate["equity"] = equity - profit
+    # The trade before it is unknown; keeping its close time only makes earlier closes rebuild
+    aggregate["last_trade_id"] = None
@@ -0,0 +1,186 @@
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+import numpy as np
+import pandas as pd
+
+def normalize_time(value) -> Optional[datetime]:
+    """Convert a stored timestamp into a naive UTC datetime"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def is_closed_trade(trade: Optional[dict]) -> bool:
+    """Check whether a trade contributes to closed-trade analytics"""
+    return bool(trade) and trade.get("status") == "closed" and trade.get("profit") is not None
+
+class TradeFrame:
+    """Columnar view of a user's closed trades, ordered by close time"""
+
+    def __init__(self, profits: np.ndarray, close_times: np.ndarray,
+                 tag_names: np.ndarray, tag_owner: np.ndarray):
+        self.profits = profits
+        self.close_times = close_times
+        self.tag_names = tag_names
+        self.tag_owner = tag_owner
+
+    def __len__(self):
+        return len(self.profits)
+
+def load_closed_trades(trades: Iterable[dict]) -> TradeFrame:
+    """Load closed trades into columnar arrays sorted by close time"""
+    closed = [t for t in trades if is_closed_trade(t)]
+
+    profits = np.fromiter((t["profit"] for t in closed), dtype=np.float64, count=len(closed))
+    # Missing close times become NaT, which sorts first like datetime.min did
+    close_times = np.array(
+        [normalize_time(t.get("close_time")) for t in closed], dtype="datetime64[us]"
+    ).reshape(len(closed))
+
+    order = np.argsort(close_times.view(np.int64), kind="stable")
+    profits = profits[order]
+    close_times = close_times[order]
+
+    tag_lists = [closed[i].get("tags") or [] for i in order]
+    lengths = np.fromiter((len(tags) for tags in tag_lists), dtype=np.int64, count=len(tag_lists))
+    tag_names = np.array([tag for tags in tag_lists for tag in tags], dtype=object)
+    tag_owner = np.repeat(np.arange(len(tag_lists)), lengths)
+
+    return TradeFrame(profits, close_times, tag_names, tag_owner)
+
+def frame_from_columns(profits: np.ndarray, close_times: np.ndarray,
+                       tag_names: np.ndarray, tag_owner: np.ndarray) -> TradeFrame:
+    """Build a TradeFrame from unsorted columns; tag_owner indexes into profits"""
+    close_times = close_times.astype("datetime64[us]")
+    order = np.argsort(close_times.view(np.int64), kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return TradeFrame(profits[order], close_times[order], tag_names, rank[tag_owner])
+
+def equity_summary(frame: TradeFrame) -> dict:
+    """Compute the final equity, equity peak and max drawdown fraction"""
+    if len(frame) == 0:
+        return {"equity": 0.0, "equity_peak": 0.0, "max_drawdown": 0.0}
+
+    equity = np.cumsum(frame.profits)
+    peaks = np.maximum.accumulate(np.maximum(equity, 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdowns = np.where(peaks > 0, (peaks - equity) / peaks, 0.0)
+
+    return {
+        "equity": float(equity[-1]),
+        "equity_peak": float(peaks[-1]),
+        "max_drawdown": float(drawdowns.max()),
+    }
+
+def tag_counts(frame: TradeFrame) -> dict:
+    """Count wins and totals per tag"""
+    if len(frame.tag_names) == 0:
+        return {}
+
+    stats = (pd.DataFrame({"tag": frame.tag_names, "win": frame.profits[frame.tag_owner] > 0})
+             .groupby("tag", sort=False)["win"]
+             .agg(["sum", "count"]))
+
+    return {
+        tag: {"wins": int(wins), "total": int(total)}
+        for tag, wins, total in zip(stats.index, stats["sum"], stats["count"])
+    }
+
+def wins_by_tag(frame: TradeFrame) -> dict:
+    """Calculate win rates by trading tags"""
+    return {
+        tag: {
+            "wins": stats["wins"],
+            "total": stats["total"],
+            "win_rate": round(stats["wins"] / stats["total"] * 100, 2)
+        }
+        for tag, stats in tag_counts(frame).items()
+    }
+
+def max_drawdown(frame: TradeFrame) -> float:
+    """Calculate maximum drawdown percentage"""
+    return equity_summary(frame)["max_drawdown"] * 100
+
+def summarize(frame: TradeFrame) -> dict:
+    """Compute the running totals stored in the analytics aggregate"""
+    profits = frame.profits
+    wins = profits[profits > 0]
+    losses = profits[profits < 0]
+
+    summary = {
+        "closed_count": len(frame),
+        "win_count": len(wins),
+        "loss_count": len(losses),
+        "total_profit": float(profits.sum()),
+        "gross_profit": float(wins.sum()),
+        "gross_loss": float(losses.sum()),
+        "best_trade": float(profits.max()) if len(frame) else None,
+        "worst_trade": float(profits.min()) if len(frame) else None,
+        "last_close_time": None,
+        "tags": tag_counts(frame),
+    }
+    summary.update(equity_summary(frame))
+
+    if len(frame) and not np.isnat(frame.close_times[-1]):
+        summary["last_close_time"] = frame.close_times[-1].astype(datetime)
+
+    return summary
+
+def compute_overview(frame: TradeFrame, total_trades: Optional[int] = None) -> dict:
+    """Compute AnalyticsResponse fields for a set of closed trades"""
+    if len(frame) == 0:
+        return {
+            "total_trades": total_trades or 0,
+            "win_rate": 0.0,
+            "total_profit": 0.0,
+            "average_win": 0.0,
+            "average_loss": 0.0,
+            "profit_factor": 0.0,
+            "max_drawdown": 0.0,
+            "best_trade": 0.0,
+            "worst_trade": 0.0,
+            "wins_by_tag": {},
+        }
+
+    summary = summarize(frame)
+    win_count = summary["win_count"]
+    loss_count = summary["loss_count"]
+    gross_loss = abs(summary["gross_loss"])
+
+    return {
+        "total_trades": summary["closed_count"],
+        "win_rate": round(win_count / summary["closed_count"] * 100, 2),
+        "total_profit": round(summary["total_profit"], 2),
+        "average_win": round(summary["gross_profit"] / win_count, 2) if win_count else 0.0,
+        "average_loss": round(summary["gross_loss"] / loss_count, 2) if loss_count else 0.0,
+        "profit_factor": round(summary["gross_profit"] / gross_loss, 2) if gross_loss > 0 else 0.0,
+        "max_drawdown": round(summary["max_drawdown"] * 100, 2),
+        "best_trade": round(summary["best_trade"], 2),
+        "worst_trade": round(summary["worst_trade"], 2),
+        "wins_by_tag": wins_by_tag(frame),
+    }
+
+def monthly_performance(frame: TradeFrame, start: Optional[datetime] = None,
+                        end: Optional[datetime] = None) -> list:
+    """Group closed-trade profit by calendar month"""
+    mask = ~np.isnat(frame.close_times)
+    if start is not None:
+        mask &= frame.close_times >= np.datetime64(normalize_time(start))
+    if end is not None:
+        mask &= frame.close_times <= np.datetime64(normalize_time(end))
+
+    if not mask.any():
+        return []
+
+    series = pd.Series(frame.profits[mask], index=pd.DatetimeIndex(frame.close_times[mask]))
+    monthly = series.resample("MS").agg(["sum", "count"])
+    monthly = monthly[monthly["count"] > 0]
+
+    return [
+        {"month": month.strftime("%Y-%m"), "profit": round(float(profit), 2), "trades": int(count)}
+        for month, profit, count in zip(monthly.index, monthly["sum"], monthly["count"])
+    ]
@@ -0,0 +1,264 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from app.services.analytics_aggregate import AGGREGATES_COLLECTION
+from app.services.analytics_engine import is_closed_trade, normalize_time
+from app.services.firestore_repository import BATCH_WRITE_LIMIT, Write, document_version
+from app.services.metrics import timed
+from app.services.rate_service import normalize_pair
+from app.services.single_flight import SingleFlight
+
+ROLLUPS_COLLECTION = "analytics_rollups"
+GRANULARITIES = ("day", "week", "month")
+REBUILD_ATTEMPTS = 3
+PROFIT_TOLERANCE = 0.005
+
+# Readers that find the same user's rollups stale share one rebuild
+_rebuilds = SingleFlight()
+
+class RollupsUnavailable(Exception):
+    """The rollups kept changing while being rebuilt and are still stale; retry shortly"""
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Start of the calendar bucket containing a (naive UTC) time; weeks start on Monday"""
+    day = datetime(moment.year, moment.month, moment.day)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+def next_bucket(start: datetime, granularity: str) -> datetime:
+    """Start of the bucket after the one beginning at start"""
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "week":
+        return start + timedelta(days=7)
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+def add_months(moment: datetime, months: int) -> datetime:
+    """Shift the start of moment's month by a whole number of calendar months"""
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def bucket_label(start: datetime, granularity: str) -> str:
+    if granularity == "month":
+        return start.strftime("%Y-%m")
+    if granularity == "week":
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}"
+    return start.strftime("%Y-%m-%d")
+
+def rollup_id(user_id: str, granularity: str, start: datetime) -> str:
+    return f"{user_id}:{granularity}:{start.strftime('%Y-%m-%d')}"
+
+def state_id(user_id: str) -> str:
+    return f"{user_id}:state"
+
+def empty_rollup(user_id: str, granularity: str, start: datetime) -> dict:
+    """Create an empty rollup bucket document"""
+    return {
+        "user_id": user_id,
+        "granularity": granularity,
+        "bucket": start,
+        "profit": 0.0,
+        "trades": 0,
+        "wins": 0,
+        "losses": 0,
+        "pairs": {},
+        "tags": {},
+        "updated_at": datetime.utcnow(),
+    }
+
+def empty_state(user_id: str) -> dict:
+    """Create the state document describing a user's rollups as a whole"""
+    return {
+        "user_id": user_id,
+        "granularity": None,  # never matches a bucket query
+        "trades": 0,
+        "profit": 0.0,
+        "stale": False,
+        "version": 0,
+        "rebuilt_at": None,
+    }
+
+async def ensure_rollups(repo, user_id: str) -> bool:
+    """Rebuild the user's rollups from raw trades if missing, stale or drifted; returns True if rebuilt.
+
+    Raises RollupsUnavailable rather than let callers read buckets a failed rebuild left half-written.
+    """
+    state = await repo.get_document(ROLLUPS_COLLECTION, state_id(user_id))
+    if state is not None and not state.get("stale") and not await _drifted(repo, user_id, state):
+        return False
+    rebuilt, _ = await _rebuilds.do((repo, user_id), lambda: rebuild_rollups(repo, user_id))
+    if not rebuilt:
+        raise RollupsUnavailable(f"Rollups of {user_id} are being rewritten; retry shortly")
+    return True
+
+async def rebuild_rollups(repo, user_id: str) -> bool:
+    """Recompute every rollup bucket for a user from raw trades; returns False if left stale.
+
+    The state is marked stale first, so trade changes committed meanwhile only bump
+    its version instead of editing buckets being rewritten; the rebuild is kept only
+    if the version is unchanged at the end. Otherwise it starts over, and after
+    REBUILD_ATTEMPTS the state is left stale for the next read.
+    """
+    for _ in range(REBUILD_ATTEMPTS):
+        version = document_version(await repo.get_document(ROLLUPS_COLLECTION, state_id(user_id)))
+        marker = {**empty_state(user_id), "stale": True, "version": version + 1}
+        if not await repo.set_if_version(ROLLUPS_COLLECTION, state_id(user_id), version, marker):
+            continue
+
+        trades = await repo.query("trades", [("user_id", "==", user_id), ("status", "==", "closed")])
+        state = {**empty_state(user_id), "version": version + 2, "rebuilt_at": datetime.utcnow()}
+        with timed("analytics"):
+            buckets: Dict[str, dict] = {}
+            for trade in trades:
+                if is_closed_trade(trade):
+                    _apply_trade(buckets, user_id, trade, 1)
+                    _apply_stats(state, trade["profit"], 1)
+
+        existing = await repo.query(ROLLUPS_COLLECTION, [("user_id", "==", user_id)])
+        writes = [("delete", ROLLUPS_COLLECTION, doc["id"], None) for doc in existing
+                  if doc["id"] not in buckets and doc["id"] != state_id(user_id)]
+        writes += [("set", ROLLUPS_COLLECTION, doc_id, bucket) for doc_id, bucket in buckets.items()]
+        for i in range(0, len(writes), BATCH_WRITE_LIMIT):
+            await repo.batch_write(writes[i:i + BATCH_WRITE_LIMIT])
+
+        if await repo.set_if_version(ROLLUPS_COLLECTION, state_id(user_id), version + 1, state):
+            return True
+    return False
+
+def record_trade_change(transaction, user_id: str, before: Optional[dict], after: Optional[dict]) -> List[Write]:
+    """Rollup writes moving a trade's contribution between buckets, to commit in the transaction that writes the trade"""
+    was_closed = is_closed_trade(before)
+    now_closed = is_closed_trade(after)
+    if not was_closed and not now_closed:
+        return []
+    if was_closed and now_closed and _contribution(before) == _contribution(after):
+        return []
+
+    state = transaction.get_document(ROLLUPS_COLLECTION, state_id(user_id))
+    if state is None or state.get("stale"):
+        # Built from the trades on the next read; the version bump makes a rebuild already under way start over
+        marker = {"user_id": user_id, "granularity": None, "stale": True, "version": document_version(state) + 1}
+        return [("set" if state is None else "update", ROLLUPS_COLLECTION, state_id(user_id), marker)]
+
+    touched = set()
+    if was_closed:
+        touched.update(_bucket_ids(user_id, before))
+    if now_closed:
+        touched.update(_bucket_ids(user_id, after))
+
+    buckets = {}
+    for doc_id in sorted(touched):
+        bucket = transaction.get_document(ROLLUPS_COLLECTION, doc_id)
+        if bucket is not None:
+            bucket.pop("id", None)
+            buckets[doc_id] = bucket
+
+    state.pop("id", None)
+    state["version"] = document_version(state) + 1
+    if was_closed:
+        _apply_trade(buckets, user_id, before, -1)
+        _apply_stats(state, before["profit"], -1)
+    if now_closed:
+        _apply_trade(buckets, user_id, after, 1)
+        _apply_stats(state, after["profit"], 1)
+
+    writes = [
+        ("set", ROLLUPS_COLLECTION, doc_id, bucket) if bucket["trades"] > 0
+        else ("delete", ROLLUPS_COLLECTION, doc_id, None)
+        for doc_id, bucket in buckets.items()
+    ]
+    writes.append(("set", ROLLUPS_COLLECTION, state_id(user_id), state))
+    return writes
+
+async def get_rollups(repo, user_id: str, granularity: str,
+                      start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[dict]:
+    """Read the rollup buckets overlapping [start, end), oldest first"""
+    await ensure_rollups(repo, user_id)
+
+    filters = [("user_id", "==", user_id), ("granularity", "==", granularity)]
+    if start is not None:
+        filters.append(("bucket", ">=", bucket_start(normalize_time(start), granularity)))
+    if end is not None:
+        filters.append(("bucket", "<", normalize_time(end)))
+    return await repo.query(ROLLUPS_COLLECTION, filters, order_by=[("bucket", "ASCENDING")])
+
+def rollup_to_performance(bucket: dict) -> dict:
+    """Convert a rollup bucket into a performance row"""
+    start = normalize_time(bucket["bucket"])
+    granularity = bucket["granularity"]
+    return {
+        "period": bucket_label(start, granularity),
+        "start": start,
+        "end": next_bucket(start, granularity),
+        "profit": round(bucket["profit"], 2),
+        "trades": bucket["trades"],
+        "wins": bucket["wins"],
+        "losses": bucket["losses"],
+        "win_rate": round(bucket["wins"] / bucket["trades"] * 100, 2) if bucket["trades"] else 0.0,
+        "pairs": {pair: _rounded_split(stats) for pair, stats in bucket["pairs"].items()},
+        "tags": {tag: _rounded_split(stats) for tag, stats in bucket["tags"].items()},
+    }
+
+async def _drifted(repo, user_id: str, state: dict) -> bool:
+    # Rollups and the aggregate change in the same transactions, so their closed-trade
+    # totals only disagree if one of them was written some other way
+    if "trades" not in state:
+        return True
+    aggregate = await repo.get_document(AGGREGATES_COLLECTION, user_id)
+    if aggregate is None or aggregate.get("stale"):
+        return False
+    return (aggregate["closed_count"] != state["trades"]
+            or abs(aggregate["total_profit"] - state["profit"]) > PROFIT_TOLERANCE)
+
+def _contribution(trade: dict) -> tuple:
+    # Everything a trade contributes to its buckets; unchanged means nothing to move
+    return (trade["profit"], normalize_time(trade.get("close_time")), trade.get("pair"),
+            tuple(sorted(trade.get("tags") or [])))
+
+def _bucket_ids(user_id: str, trade: dict) -> List[str]:
+    close_time = normalize_time(trade.get("close_time"))
+    if close_time is None:
+        return []
+    return [rollup_id(user_id, g, bucket_start(close_time, g)) for g in GRANULARITIES]
+
+def _apply_trade(buckets: Dict[str, dict], user_id: str, trade: dict, sign: int):
+    close_time = normalize_time(trade.get("close_time"))
+    if close_time is None:
+        return
+    profit = trade["profit"]
+    for granularity in GRANULARITIES:
+        start = bucket_start(close_time, granularity)
+        doc_id = rollup_id(user_id, granularity, start)
+        bucket = buckets.get(doc_id)
+        if bucket is None:
+            bucket = buckets[doc_id] = empty_rollup(user_id, granularity, start)
+
+        _apply_stats(bucket, profit, sign)
+        bucket["wins"] += sign if profit > 0 else 0
+        bucket["losses"] += sign if profit < 0 else 0
+        _apply_split(bucket["pairs"], normalize_pair(trade["pair"]) if trade.get("pair") else None, profit, sign)
+        for tag in trade.get("tags") or []:
+            _apply_split(bucket["tags"], tag, profit, sign)
+        bucket["updated_at"] = datetime.utcnow()
+
+def _apply_stats(stats: dict, profit: float, sign: int):
+    # Stored at full precision; rounded for display in rollup_to_performance
+    stats["profit"] += sign * profit
+    stats["trades"] += sign
+
+def _rounded_split(stats: dict) -> dict:
+    return {**stats, "profit": round(stats["profit"], 2)}
+
+def _apply_split(splits: dict, key: Optional[str], profit: float, sign: int):
+    if not key:
+        return
+    stats = splits.setdefault(key, {"profit": 0.0, "trades": 0, "wins": 0})
+    _apply_stats(stats, profit, sign)
+    stats["wins"] += sign if profit > 0 else 0
+    if stats["trades"] <= 0:
+        del splits[key]
@@ -0,0 +1,149 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from app.services.price_history import Bars, load_bars
+
+EXIT_REASONS = ("stop", "target", "timeout")
+
+def entry_signals(bars: Bars, rule: dict) -> np.ndarray:
+    """Bars whose close triggers a fresh entry for the rule (vectorized)"""
+    n = len(bars)
+    close = bars.close
+    is_long = rule["direction"] == "long"
+    active = np.zeros(n, dtype=bool)
+
+    if rule["signal"] == "breakout":
+        lookback = rule["lookback"]
+        if n > lookback:
+            # Range of the previous `lookback` bars, excluding the signal bar itself
+            if is_long:
+                prior = sliding_window_view(bars.high, lookback)[:n - lookback].max(axis=1)
+                active[lookback:] = close[lookback:] > prior
+            else:
+                prior = sliding_window_view(bars.low, lookback)[:n - lookback].min(axis=1)
+                active[lookback:] = close[lookback:] < prior
+    else:
+        fast = _sma(close, rule["fast_period"])
+        slow = _sma(close, rule["lookback"])
+        with np.errstate(invalid="ignore"):
+            active = fast > slow if is_long else fast < slow
+
+    # Only the first bar of a run counts, so a persisting condition isn't re-entered every bar
+    fresh = active.copy()
+    fresh[1:] &= ~active[:-1]
+    return fresh
+
+def simulate_rule(bars: Bars, rule: dict, pip_multiplier: float) -> dict:
+    """Replay one rule over one pair's bars, holding at most one position at a time.
+
+    Entries fill at the signal bar's close; each later bar is checked against the
+    stop and the target, and a bar that touches both is assumed to hit the stop first.
+    """
+    is_long = rule["direction"] == "long"
+    sign = 1.0 if is_long else -1.0
+    stop_distance = rule["stop_pips"] / pip_multiplier
+    target_distance = rule["target_pips"] / pip_multiplier
+    max_bars = rule["max_bars"]
+    n = len(bars)
+
+    candidates = np.flatnonzero(entry_signals(bars, rule))
+    entry_index, exit_index, exit_price, reason = [], [], [], []
+
+    pos = 0
+    while pos < len(candidates):
+        i = int(candidates[pos])
+        entry = bars.close[i]
+        stop = entry - sign * stop_distance
+        target = entry + sign * target_distance
+        last = min(i + max_bars, n - 1)
+
+        if is_long:
+            stop_hits = bars.low[i + 1:last + 1] <= stop
+            target_hits = bars.high[i + 1:last + 1] >= target
+        else:
+            stop_hits = bars.high[i + 1:last + 1] >= stop
+            target_hits = bars.low[i + 1:last + 1] <= target
+        first_stop = int(stop_hits.argmax()) if stop_hits.any() else None
+        first_target = int(target_hits.argmax()) if target_hits.any() else None
+
+        if first_stop is not None and (first_target is None or first_stop <= first_target):
+            exit_at, price, why = i + 1 + first_stop, stop, 0
+        elif first_target is not None:
+            exit_at, price, why = i + 1 + first_target, target, 1
+        elif i + max_bars < n:
+            exit_at, price, why = last, bars.close[last], 2
+        else:
+            # Still open when the history runs out
+            break
+
+        entry_index.append(i)
+        exit_index.append(exit_at)
+        exit_price.append(price)
+        reason.append(why)
+        pos = int(np.searchsorted(candidates, exit_at, side="right"))
+
+    entry_index = np.asarray(entry_index, dtype=np.int64)
+    exit_index = np.asarray(exit_index, dtype=np.int64)
+    entry_price = bars.close[entry_index]
+    return {
+        "tag": rule["tag"],
+        "direction": rule["direction"],
+        "open_time": bars.time[entry_index],
+        "close_time": bars.time[exit_index],
+        "entry_price": entry_price,
+        "exit_price": np.asarray(exit_price, dtype=np.float64),
+        "stop_loss": entry_price - sign * stop_distance,
+        "take_profit": entry_price + sign * target_distance,
+        "exit_reason": np.asarray(reason, dtype=np.int8),
+    }
+
+def scan_pair(path: str, pair: str, rules: List[dict], pip_multiplier: float,
+              start: Optional[datetime] = None, end: Optional[datetime] = None) -> dict:
+    """Run every rule over one pair's history; safe to call in a worker process"""
+    bars = load_bars(path, pair, start, end)
+    return {
+        "pair": pair,
+        "bars": len(bars),
+        "results": [simulate_rule(bars, rule, pip_multiplier) for rule in rules],
+    }
+
+async def scan_pairs(jobs: List[tuple], rules: List[dict],
+                     start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[dict]:
+    """Scan (path, pair, pip_multiplier) jobs, one pair per worker process when a pool is configured"""
+    pool = get_backtest_pool() if len(jobs) > 1 else None
+    loop = asyncio.get_running_loop()
+    if pool is None:
+        return [await asyncio.to_thread(scan_pair, path, pair, rules, multiplier, start, end)
+                for path, pair, multiplier in jobs]
+    return await asyncio.gather(*(
+        loop.run_in_executor(pool, scan_pair, path, pair, rules, multiplier, start, end)
+        for path, pair, multiplier in jobs
+    ))
+
+def _sma(values: np.ndarray, period: int) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    if len(values) >= period:
+        # Centre on the first price so the running sum stays small and precise over long histories
+        sums = np.cumsum(values - values[0])
+        sums[period:] = sums[period:] - sums[:-period]
+        result[period - 1:] = sums[period - 1:] / period + values[0]
+    return result
+
+# Global worker pool
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_backtest_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool sized by BACKTEST_WORKERS, or None to scan in-process"""
+    global _pool
+
+    workers = int(os.getenv("BACKTEST_WORKERS", str(os.cpu_count() or 1)))
+    if _pool is None and workers > 1:
+        # Spawned workers don't inherit the server's threads and open clients
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    return _pool
@@ -0,0 +1,314 @@
+import fcntl
+import json
+import os
+import struct
+import threading
+import zlib
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+EVENT_TYPES = ("created", "updated", "closed", "deleted")
+TIME_FIELDS = ("open_time", "close_time", "created_at", "updated_at")
+FRAME_HEADER = struct.Struct(">II")  # payload length, crc32 of payload
+
+class EventLogCompacted(Exception):
+    """The requested offset was compacted into a snapshot; load the snapshot and resume after it"""
+
+    def __init__(self, snapshot_offset: int):
+        super().__init__(f"Events up to offset {snapshot_offset} were compacted; resume from the snapshot")
+        self.snapshot_offset = snapshot_offset
+
+def event_type(before: Optional[dict], after: Optional[dict]) -> str:
+    """Classify a trade mutation"""
+    if before is None:
+        return "created"
+    if after is None:
+        return "deleted"
+    if after.get("status") == "closed" and before.get("status") != "closed":
+        return "closed"
+    return "updated"
+
+def _encode(record: dict) -> bytes:
+    payload = json.dumps(record, separators=(",", ":"), default=_json_default).encode()
+    return FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Cannot log {type(value).__name__}")
+
+def _decode_trade(trade: Optional[dict]) -> Optional[dict]:
+    if trade:
+        for field in TIME_FIELDS:
+            if isinstance(trade.get(field), str):
+                trade[field] = datetime.fromisoformat(trade[field])
+    return trade
+
+def _read_frames(path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, dict]]:
+    """(end position, record) of each intact frame; stops at the first torn or corrupt one"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        position = start
+        while end is None or position < end:
+            header = f.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            length, crc = FRAME_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            position += FRAME_HEADER.size + length
+            yield position, json.loads(payload)
+
+class TradeEventLog:
+    """Append-only log of trade lifecycle events in local segment files, with compacted snapshots.
+
+    Each event has a global offset. Segments (segment-<first offset>.log) hold
+    length+crc framed JSON records and roll over at segment_bytes; a torn frame
+    at the tail from a crash is cut off on the next append. Every snapshot_every
+    events the full trade state is written to snapshot-<offset>.snap, and
+    segments that end before the previous snapshot are deleted, so consumers
+    always have one snapshot interval to catch up from an offset.
+
+    Appends from several worker processes sharing the directory serialize on a
+    lock file and continue the same offset sequence.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, snapshot_every: int = 100000,
+                 fsync: bool = False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(directory, ".lock"), "a+")
+        self._compacting: Optional[threading.Thread] = None
+        # Tail position as of our last append: (segment path, size, next offset)
+        self._tail: Optional[Tuple[str, int, int]] = None
+
+    def append(self, events: Iterable[dict]) -> List[int]:
+        """Append events (type, user_id, trade_id, trade); returns their offsets"""
+        events = list(events)
+        if not events:
+            return []
+        now = datetime.utcnow()
+        with self._locked():
+            path, size, offset = self._sync_tail()
+            if size >= self.segment_bytes:
+                path, size = self._segment_path(offset), 0
+            offsets = list(range(offset, offset + len(events)))
+            data = b"".join(_encode({"offset": o, "time": now, **event}) for o, event in zip(offsets, events))
+            with open(path, "ab") as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            self._tail = (path, size + len(data), offset + len(events))
+            next_offset = offset + len(events)
+
+        snapshot_offset = self.snapshot_offset()
+        if next_offset - max(snapshot_offset + 1, 0) >= self.snapshot_every:
+            self._start_compaction()
+        return offsets
+
+    def read(self, after: int = -1, user_id: Optional[str] = None, limit: Optional[int] = None) -> Tuple[List[dict], int]:
+        """Events with offset > after, optionally one user's; returns them and the last offset scanned"""
+        segments = self._segments()
+        if not segments:
+            return [], after
+        if after + 1 < segments[0][0]:
+            raise EventLogCompacted(self.snapshot_offset())
+
+        events = []
+        last = after
+        first_offsets = [first for first, _ in segments]
+        for first, path in segments[max(bisect_right(first_offsets, after + 1) - 1, 0):]:
+            for _, record in _read_frames(path):
+                if record["offset"] <= after:
+                    continue
+                last = record["offset"]
+                if user_id is None or record.get("user_id") == user_id:
+                    record["trade"] = _decode_trade(record.get("trade"))
+                    events.append(record)
+                    if limit is not None and len(events) >= limit:
+                        return events, last
+        return events, last
+
+    def snapshot_offset(self) -> int:
+        """Offset of the latest snapshot, -1 without one"""
+        snapshots = self._snapshots()
+        return snapshots[-1][0] if snapshots else -1
+
+    def load_snapshot(self, user_id: Optional[str] = None) -> Tuple[int, Dict[str, dict]]:
+        """Trades as of the latest snapshot, keyed by id, and its offset"""
+        snapshots = self._snapshots()
+        if not snapshots:
+            return -1, {}
+        offset, path = snapshots[-1]
+        trades = {}
+        for _, record in _read_frames(path):
+            if "trade" in record and (user_id is None or record["trade"].get("user_id") == user_id):
+                trade = _decode_trade(record["trade"])
+                trades[trade["id"]] = trade
+        return offset, trades
+
+    def replay(self, user_id: Optional[str] = None) -> Tuple[int, Dict[str, dict]]:
+        """Current trades rebuilt from the latest snapshot plus the events after it"""
+        offset, trades = self.load_snapshot(user_id)
+        events, last = self.read(offset, user_id)
+        apply_events(trades, events)
+        return last, trades
+
+    def compact(self) -> Optional[int]:
+        """Write a snapshot at the current end of the log and drop segments older than the previous one"""
+        with _file_lock(os.path.join(self.directory, ".compact.lock"), blocking=False) as acquired:
+            if not acquired:
+                return None
+            previous = self.snapshot_offset()
+            offset, trades = self.replay()
+            if offset <= previous:
+                return None
+
+            path = os.path.join(self.directory, f"snapshot-{offset:020d}.snap")
+            partial = path + ".partial"
+            with open(partial, "wb") as f:
+                f.write(_encode({"offset": offset, "trades": len(trades)}))
+                for trade in trades.values():
+                    f.write(_encode({"trade": trade}))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(partial, path)
+
+            for snapshot_offset, snapshot_path in self._snapshots()[:-2]:
+                os.remove(snapshot_path)
+            # A segment can go once the next one starts at or before the previous snapshot
+            segments = self._segments()
+            for (first, segment_path), (next_first, _) in zip(segments, segments[1:]):
+                if next_first <= previous + 1:
+                    os.remove(segment_path)
+            return offset
+
+    def close(self):
+        if self._compacting is not None:
+            self._compacting.join()
+        self._lock_file.close()
+
+    def _start_compaction(self):
+        if self._compacting is not None and self._compacting.is_alive():
+            return
+        self._compacting = threading.Thread(target=self._safe_compact, name="event-log-compact", daemon=True)
+        self._compacting.start()
+
+    def _safe_compact(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"Warning: event log compaction failed: {e}")
+
+    def _sync_tail(self) -> Tuple[str, int, int]:
+        """Find the end of the log, reading past our last append for events other processes wrote"""
+        segments = self._segments()
+        if not segments:
+            offset = self.snapshot_offset() + 1
+            return self._segment_path(offset), 0, offset
+
+        first, path = segments[-1]
+        size = os.path.getsize(path)
+        if self._tail is not None and self._tail[0] == path and self._tail[1] == size:
+            return self._tail
+
+        start, offset = (self._tail[1], self._tail[2]) if self._tail is not None and self._tail[0] == path else (0, first)
+        end = start
+        for end, record in _read_frames(path, start):
+            offset = record["offset"] + 1
+        if end < size:
+            # Torn frame from a crashed writer: cut it off so appends stay readable
+            with open(path, "r+b") as f:
+                f.truncate(end)
+            size = end
+        return path, size, offset
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        return self._list("segment-", ".log")
+
+    def _snapshots(self) -> List[Tuple[int, str]]:
+        return self._list("snapshot-", ".snap")
+
+    def _list(self, prefix: str, suffix: str) -> List[Tuple[int, str]]:
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(suffix):
+                entries.append((int(name[len(prefix):-len(suffix)]), os.path.join(self.directory, name)))
+        return sorted(entries)
+
+    def _segment_path(self, first_offset: int) -> str:
+        return os.path.join(self.directory, f"segment-{first_offset:020d}.log")
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+@contextmanager
+def _file_lock(path: str, blocking: bool = True):
+    with open(path, "a+") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def apply_events(trades: Dict[str, dict], events: Iterable[dict]):
+    """Fold events into a trade-id -> trade mapping"""
+    for event in events:
+        if event["type"] == "deleted":
+            trades.pop(event["trade_id"], None)
+        else:
+            trades[event["trade_id"]] = event["trade"]
+
+def trade_event(user_id: str, before: Optional[dict], after: Optional[dict]) -> dict:
+    """Log record for one trade mutation; carries the trade as it is after the change"""
+    trade = after if after is not None else before
+    return {"type": event_type(before, after), "user_id": user_id, "trade_id": trade["id"], "trade": after}
+
+# Global trade event log
+_event_log: Optional[TradeEventLog] = None
+
+def event_log_enabled() -> bool:
+    return bool(os.getenv("EVENT_LOG_DIR", "./data/events"))
+
+def get_event_log() -> Optional[TradeEventLog]:
+    """Get the process-wide trade event log, or None when EVENT_LOG_DIR is set empty"""
+    global _event_log
+
+    if _event_log is None and event_log_enabled():
+        _event_log = TradeEventLog(
+            os.getenv("EVENT_LOG_DIR", "./data/events"),
+            segment_bytes=int(os.getenv("EVENT_LOG_SEGMENT_BYTES", str(64 * 1024 * 1024))),
+            snapshot_every=int(os.getenv("EVENT_LOG_SNAPSHOT_EVERY", "100000")),
+            fsync=os.getenv("EVENT_LOG_FSYNC", "false").lower() == "true"
+        )
+
+    return _event_log
+
+def close_event_log():
+    """Wait for a running compaction and release the log"""
+    global _event_log
+
+    if _event_log is not None:
+        _event_log.close()
+        _event_log = None
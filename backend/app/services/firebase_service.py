@@ -1,15 +1,26 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
+import asyncio
+import bisect
 import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
 from typing import Optional
 
 # Global Firestore client
 _firestore_client: Optional[firestore.Client] = None
 
 def initialize_firebase():
-    """Initialize Firebase Admin SDK"""
+    """Initialize Firebase Admin SDK, or the mock store when no credentials are configured"""
     global _firestore_client
     
+    if _firestore_client is not None:
+        return _firestore_client
+    
     if not firebase_admin._apps:
         # For development, you can use the Firebase emulator
         # or provide your service account key
@@ -28,7 +39,8 @@ def initialize_firebase():
                 # For demo purposes, we'll create a mock implementation
                 # In production, you must provide proper Firebase credentials
                 print("Warning: No Firebase credentials found. Using mock implementation.")
-                return MockFirestoreClient()
+                _firestore_client = MockFirestoreClient(latency=mock_latency(), path=mock_store_path())
+                return _firestore_client
     
     _firestore_client = firestore.client()
     return _firestore_client
@@ -42,84 +54,695 @@ def get_firestore_client():
     
     return _firestore_client
 
+def close_firestore_client():
+    """Close the client so the next get_firestore_client starts fresh"""
+    global _firestore_client
+    
+    close = getattr(_firestore_client, "close", None)
+    if callable(close):
+        close()
+    _firestore_client = None
+
+def mock_latency() -> float:
+    """Simulated per-call Firestore latency for the mocks, in seconds"""
+    return float(os.getenv("MOCK_FIRESTORE_LATENCY_MS", "0")) / 1000
+
+def mock_store_path() -> Optional[str]:
+    """SQLite file shared by every worker's mock store, or None to keep it in memory"""
+    return os.getenv("MOCK_FIRESTORE_PATH") or None
+
 class MockFirestoreClient:
-    """Mock Firestore client for development without Firebase setup"""
+    """Mock Firestore client for development without Firebase setup.
     
-    def __init__(self):
-        self._data = {}
+    With a path, writes are journaled to a SQLite file that every process
+    opening the same path replays, so uvicorn workers share one store.
+    """
+    
+    def __init__(self, latency: float = 0.0, path: Optional[str] = None):
+        self._data = MockDatabase(SqliteMockJournal(path) if path else None)
+        self.latency = latency
     
     def collection(self, collection_name):
-        return MockCollection(collection_name, self._data)
+        return MockCollection(collection_name, self._data, self.latency)
+    
+    def batch(self):
+        return MockWriteBatch(self.latency)
+    
+    def transaction(self):
+        return MockTransaction(self.latency)
+    
+    def warm_indexes(self, indexes):
+        """Build query indexes ahead of the first request: (collection, kind, field) with kind hash/array/sorted"""
+        self._data.sync()
+        for collection_name, kind, field in indexes:
+            store = self._data.store(collection_name)
+            with store.lock:
+                getattr(store, f"{kind}_index")(field)
+    
+    def close(self):
+        if self._data.journal is not None:
+            self._data.journal.close()
+
+class MockDatabase:
+    """The collection stores of one mock client, optionally journaled to a shared file"""
+    
+    def __init__(self, journal=None):
+        self.stores = {}
+        self.journal = journal
+        self.lock = threading.RLock()
+        if journal is not None:
+            journal.load(self)
+    
+    def store(self, name):
+        store = self.stores.get(name)
+        if store is None:
+            store = self.stores.setdefault(name, MockCollectionStore(name, self))
+        return store
+    
+    def sync(self):
+        """Replay writes other processes made since the last sync"""
+        if self.journal is not None:
+            self.journal.sync(self)
+    
+    def commit(self, writes, reads=None):
+        """Apply (store, doc_id, action, data) writes, through the journal when shared.
+        
+        reads maps (store, doc_id) to the stored document a transaction saw (None
+        when missing); if any of them was replaced since, nothing is applied and
+        MockTransactionConflict is raised.
+        """
+        if self.journal is not None:
+            self.journal.commit(self, writes, reads)
+        else:
+            with self.lock:
+                _check_reads(reads)
+                _apply_writes(writes)
+
+class MockTransactionConflict(Exception):
+    """A document read in a mock transaction changed before the transaction committed"""
+
+def _check_reads(reads):
+    # Stored documents are replaced, never modified in place, so identity tells whether one changed
+    for (store, doc_id), seen in (reads or {}).items():
+        if store.docs.get(doc_id) is not seen:
+            raise MockTransactionConflict(f"{store.name}/{doc_id} changed during the transaction")
+
+def _apply_writes(writes):
+    for store, doc_id, action, data in writes:
+        if action == "set":
+            store.put(doc_id, data)
+        elif action == "update":
+            with store.lock:
+                if doc_id in store.docs:
+                    store.put(doc_id, {**store.docs[doc_id], **data})
+        else:
+            store.remove(doc_id)
+
+class SqliteMockJournal:
+    """Write-through SQLite log that keeps mock stores in several processes consistent.
+    
+    Every commit appends its resolved documents to a change log (and the latest
+    copy to a documents table) inside one write transaction. Readers poll
+    PRAGMA data_version, which only moves when another connection commits, and
+    replay the log from their last applied sequence number; a reader that fell
+    behind the trimmed log reloads from the documents table instead. Documents
+    are pickled, which keeps datetimes and nested values exact; the file is a
+    local development artefact written only by this app.
+    """
+    
+    TRIM_EVERY = 1000  # writes between change-log trims
+    RETAIN = 20000  # changes kept for processes that are behind
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.applied_seq = 0
+        self._data_version = None
+        self._since_trim = 0
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS documents "
+                           "(collection TEXT, doc_id TEXT, data BLOB, PRIMARY KEY (collection, doc_id))")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS changes "
+                           "(seq INTEGER PRIMARY KEY AUTOINCREMENT, collection TEXT, doc_id TEXT, data BLOB)")
+    
+    def load(self, database: MockDatabase):
+        """Replace the in-memory stores with the documents table"""
+        with self.lock:
+            conn = self._conn
+            # Read both tables from one snapshot; a commit in progress already holds a transaction
+            owns_transaction = not conn.in_transaction
+            if owns_transaction:
+                conn.execute("BEGIN")
+            try:
+                row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+                rows = conn.execute("SELECT collection, doc_id, data FROM documents").fetchall()
+            finally:
+                if owns_transaction:
+                    conn.execute("COMMIT")
+            
+            for store in database.stores.values():
+                store.clear()
+            for collection_name, doc_id, data in rows:
+                database.store(collection_name).put(doc_id, pickle.loads(data))
+            self.applied_seq = row[0] if row else 0
+            self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def sync(self, database: MockDatabase):
+        with self.lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return
+            self._data_version = version
+            self._catch_up(database)
+    
+    def commit(self, database: MockDatabase, writes, reads=None):
+        with self.lock:
+            conn = self._conn
+            # IMMEDIATE takes the write lock up front, so updates merge onto the latest documents
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._catch_up(database)
+                _check_reads(reads)
+                pending = {}
+                for store, doc_id, action, data in writes:
+                    key = (store, doc_id)
+                    if action == "update":
+                        current = pending[key] if key in pending else store.docs.get(doc_id)
+                        if current is None:
+                            continue
+                        data = {**current, **data}
+                    pending[key] = data if action != "delete" else None
+                
+                seq = self.applied_seq
+                for (store, doc_id), data in pending.items():
+                    blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL) if data is not None else None
+                    seq = conn.execute("INSERT INTO changes (collection, doc_id, data) VALUES (?, ?, ?)",
+                                       (store.name, doc_id, blob)).lastrowid
+                    if blob is None:
+                        conn.execute("DELETE FROM documents WHERE collection = ? AND doc_id = ?", (store.name, doc_id))
+                    else:
+                        conn.execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?)", (store.name, doc_id, blob))
+                
+                self._since_trim += len(pending)
+                if self._since_trim >= self.TRIM_EVERY:
+                    conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - self.RETAIN,))
+                    self._since_trim = 0
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            
+            self.applied_seq = seq
+            for (store, doc_id), data in pending.items():
+                if data is None:
+                    store.remove(doc_id)
+                else:
+                    store.put(doc_id, data)
+    
+    def close(self):
+        with self.lock:
+            self._conn.close()
+    
+    def _catch_up(self, database: MockDatabase):
+        rows = self._conn.execute("SELECT seq, collection, doc_id, data FROM changes WHERE seq > ? ORDER BY seq",
+                                  (self.applied_seq,)).fetchall()
+        if not rows:
+            return
+        if rows[0][0] != self.applied_seq + 1:
+            # Missed changes were trimmed from the log
+            self.load(database)
+            return
+        for seq, collection_name, doc_id, data in rows:
+            store = database.store(collection_name)
+            if data is None:
+                store.remove(doc_id)
+            else:
+                store.put(doc_id, pickle.loads(data))
+            self.applied_seq = seq
+
+class MockWriteBatch:
+    """Collects writes and applies them together on commit, like a Firestore WriteBatch"""
+    
+    MAX_WRITES = 500
+    
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._writes = []
+    
+    def set(self, reference, data):
+        self._add(reference, "set", dict(data))
+    
+    def update(self, reference, data):
+        self._add(reference, "update", dict(data))
+    
+    def delete(self, reference):
+        self._add(reference, "delete", None)
+    
+    def commit(self):
+        _block(self.latency)
+        if self._writes:
+            writes = [(reference.store, reference.id, action, data) for reference, action, data in self._writes]
+            writes[0][0].database.commit(writes)
+        self._writes = []
+    
+    def _add(self, reference, action, data):
+        if len(self._writes) >= self.MAX_WRITES:
+            raise ValueError(f"A batch can contain at most {self.MAX_WRITES} writes")
+        # Accept async mock references too
+        self._writes.append((getattr(reference, "_target", reference), action, data))
+
+class MockTransaction(MockWriteBatch):
+    """Optimistic counterpart of a Firestore transaction.
+    
+    Document reads made with get(transaction=...) remember the stored document
+    they saw; commit applies the buffered writes only if none of those changed
+    in the meantime and raises MockTransactionConflict otherwise.
+    """
+    
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.reads = {}
+    
+    def commit(self):
+        _block(self.latency)
+        writes = [(reference.store, reference.id, action, data) for reference, action, data in self._writes]
+        stores = [store for store, _ in self.reads] + [store for store, _, _, _ in writes]
+        if stores:
+            stores[0].database.commit(writes, self.reads)
+        self._writes = []
+
+def run_transaction(client, fn, max_attempts: int = 5):
+    """Call fn(client, transaction) and commit it atomically, starting over when a document it read changed first.
+    
+    fn gets the synchronous client to build references from and must do all of
+    its reads before its writes, as Firestore requires.
+    """
+    if isinstance(client, AsyncMockFirestoreClient):
+        client = client._sync
+    if not isinstance(client, MockFirestoreClient):
+        return firestore.transactional(lambda transaction: fn(client, transaction))(
+            client.transaction(max_attempts=max_attempts)
+        )
+    
+    for attempt in range(max_attempts):
+        transaction = client.transaction()
+        result = fn(client, transaction)
+        try:
+            transaction.commit()
+        except MockTransactionConflict:
+            if attempt == max_attempts - 1:
+                raise
+            continue
+        return result
+
+def _order_key(value):
+    """Sort/equality key following Firestore's cross-type value ordering"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return (3, value)
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, bytes):
+        return (5, value)
+    if isinstance(value, (list, tuple)):
+        return (8, tuple(_order_key(v) for v in value))
+    if isinstance(value, dict):
+        return (9, tuple(sorted((k, _order_key(v)) for k, v in value.items())))
+    return (10, str(value))
+
+class MockCollectionStore:
+    """Documents of one mock collection plus the indexes used to query them.
+    
+    Hash indexes (field value -> doc ids) serve equality/in/array-contains
+    filters; sorted indexes of (value key, doc id) serve range filters and
+    order_by. Indexes are built the first time a field is queried and kept in
+    sync on every write.
+    """
+    
+    def __init__(self, name: str = "", database: Optional[MockDatabase] = None):
+        self.name = name
+        self.database = database or MockDatabase()
+        self.docs = {}
+        self.hash_indexes = {}
+        self.array_indexes = {}
+        self.sorted_indexes = {}
+        self.lock = threading.RLock()
+    
+    def clear(self):
+        with self.lock:
+            self.docs = {}
+            self.hash_indexes = {}
+            self.array_indexes = {}
+            self.sorted_indexes = {}
+    
+    def put(self, doc_id, data):
+        with self.lock:
+            old = self.docs.get(doc_id)
+            if old is not None:
+                self._unindex(doc_id, old)
+            self.docs[doc_id] = data
+            self._index(doc_id, data)
+    
+    def remove(self, doc_id):
+        with self.lock:
+            old = self.docs.pop(doc_id, None)
+            if old is not None:
+                self._unindex(doc_id, old)
+    
+    def hash_index(self, field):
+        index = self.hash_indexes.get(field)
+        if index is None:
+            index = {}
+            for doc_id, data in self.docs.items():
+                if field in data:
+                    index.setdefault(_order_key(data[field]), set()).add(doc_id)
+            self.hash_indexes[field] = index
+        return index
+    
+    def array_index(self, field):
+        index = self.array_indexes.get(field)
+        if index is None:
+            index = {}
+            for doc_id, data in self.docs.items():
+                for key in _array_keys(data.get(field)):
+                    index.setdefault(key, set()).add(doc_id)
+            self.array_indexes[field] = index
+        return index
+    
+    def sorted_index(self, field):
+        index = self.sorted_indexes.get(field)
+        if index is None:
+            index = sorted((_order_key(data[field]), doc_id)
+                           for doc_id, data in self.docs.items() if field in data)
+            self.sorted_indexes[field] = index
+        return index
+    
+    def _index(self, doc_id, data):
+        for field, index in self.hash_indexes.items():
+            if field in data:
+                index.setdefault(_order_key(data[field]), set()).add(doc_id)
+        for field, index in self.array_indexes.items():
+            for key in _array_keys(data.get(field)):
+                index.setdefault(key, set()).add(doc_id)
+        for field, index in self.sorted_indexes.items():
+            if field in data:
+                bisect.insort(index, (_order_key(data[field]), doc_id))
+    
+    def _unindex(self, doc_id, data):
+        for field, index in self.hash_indexes.items():
+            if field in data:
+                key = _order_key(data[field])
+                ids = index.get(key)
+                if ids is not None:
+                    ids.discard(doc_id)
+                    if not ids:
+                        del index[key]
+        for field, index in self.array_indexes.items():
+            for key in _array_keys(data.get(field)):
+                ids = index.get(key)
+                if ids is not None:
+                    ids.discard(doc_id)
+                    if not ids:
+                        del index[key]
+        for field, index in self.sorted_indexes.items():
+            if field in data:
+                entry = (_order_key(data[field]), doc_id)
+                position = bisect.bisect_left(index, entry)
+                if position < len(index) and index[position] == entry:
+                    del index[position]
+
+def _array_keys(value):
+    if isinstance(value, (list, tuple)):
+        return {_order_key(v) for v in value}
+    return ()
+
+_RANGE_OPERATORS = ("<", "<=", ">", ">=")
+_EQUALITY_OPERATORS = ("==", "in", "array-contains", "array-contains-any")
+_SUPPORTED_OPERATORS = _RANGE_OPERATORS + _EQUALITY_OPERATORS + ("!=", "not-in")
+
+def _matches(data, field, operator, value):
+    if field not in data:
+        return False
+    key = _order_key(data[field])
+    if operator == "==":
+        return key == _order_key(value)
+    if operator == "!=":
+        return key != _order_key(value)
+    if operator == "in":
+        return key in {_order_key(v) for v in value}
+    if operator == "not-in":
+        return key not in {_order_key(v) for v in value}
+    if operator == "array-contains":
+        return _order_key(value) in _array_keys(data[field])
+    if operator == "array-contains-any":
+        return bool(_array_keys(data[field]) & {_order_key(v) for v in value})
+    bound = _order_key(value)
+    # Range comparisons only match values of the same type, as in Firestore
+    if key[0] != bound[0]:
+        return False
+    if operator == "<":
+        return key < bound
+    if operator == "<=":
+        return key <= bound
+    if operator == ">":
+        return key > bound
+    return key >= bound
 
 class MockCollection:
-    def __init__(self, name, data_store):
+    def __init__(self, name, database, latency=0.0):
         self.name = name
-        self.data = data_store.setdefault(name, {})
+        self.store = database.store(name)
+        self.latency = latency
     
-    def document(self, doc_id):
-        return MockDocument(doc_id, self.data)
+    def document(self, doc_id=None):
+        return MockDocument(doc_id or uuid.uuid4().hex, self.store, self.latency)
+    
+    def _query(self):
+        return MockQuery(self.store, [], latency=self.latency)
     
     def where(self, field, operator, value):
-        return MockQuery(self.data, [(field, operator, value)])
+        return self._query().where(field, operator, value)
+    
+    def order_by(self, field, direction="ASCENDING"):
+        return self._query().order_by(field, direction)
+    
+    def limit(self, count):
+        return self._query().limit(count)
+    
+    def start_after(self, values):
+        return self._query().start_after(values)
     
     def get(self):
-        return [MockDocumentSnapshot(doc_id, doc_data) for doc_id, doc_data in self.data.items()]
+        return self._query().get()
+    
+    def stream(self):
+        return self._query().stream()
 
 class MockQuery:
-    def __init__(self, data, filters):
-        self.data = data
+    def __init__(self, store, filters, orders=None, limit_count=None, cursor=None, latency=0.0):
+        self.store = store
         self.filters = filters
+        self.orders = orders or []
+        self.limit_count = limit_count
+        self.cursor = cursor
+        self.latency = latency
+    
+    def _copy(self, **changes):
+        state = {"filters": self.filters, "orders": self.orders, "limit_count": self.limit_count,
+                 "cursor": self.cursor, "latency": self.latency}
+        state.update(changes)
+        return MockQuery(self.store, **state)
     
     def where(self, field, operator, value):
-        new_filters = self.filters + [(field, operator, value)]
-        return MockQuery(self.data, new_filters)
+        if operator not in _SUPPORTED_OPERATORS:
+            raise ValueError(f"Unsupported operator: {operator}")
+        return self._copy(filters=self.filters + [(field, operator, value)])
     
     def order_by(self, field, direction="ASCENDING"):
-        return self
+        return self._copy(orders=self.orders + [(field, direction)])
     
     def limit(self, count):
-        return self
+        return self._copy(limit_count=count)
+    
+    def start_after(self, values):
+        return self._copy(cursor=values)
     
     def get(self):
-        # Simple mock filtering
+        return list(self.stream())
+    
+    def stream(self):
+        _block(self.latency)
+        self.store.database.sync()
+        with self.store.lock:
+            results = [MockDocumentSnapshot(doc_id, self.store.docs[doc_id]) for doc_id in self._execute()]
+        yield from results
+    
+    def _execute(self):
+        store = self.store
+        candidates = self._equality_candidates()
+        remaining = [f for f in self.filters if candidates is None or f[1] not in _EQUALITY_OPERATORS]
+        
+        if self.orders:
+            return self._ordered(candidates, remaining)
+        
+        if candidates is None:
+            candidates = self._range_candidates(remaining)
+        if candidates is None:
+            candidates = store.docs.keys()
+        
         results = []
-        for doc_id, doc_data in self.data.items():
-            match = True
-            for field, operator, value in self.filters:
-                if field in doc_data:
-                    if operator == "==" and doc_data[field] != value:
-                        match = False
-                        break
-                    elif operator == ">=" and doc_data[field] < value:
-                        match = False
-                        break
-                else:
-                    match = False
+        for doc_id in candidates:
+            if all(_matches(store.docs[doc_id], *f) for f in remaining):
+                results.append(doc_id)
+                if self.limit_count is not None and len(results) >= self.limit_count:
                     break
-            
-            if match:
-                results.append(MockDocumentSnapshot(doc_id, doc_data))
-        
         return results
+    
+    def _equality_candidates(self):
+        """Intersect hash-index lookups for every equality-style filter"""
+        sets = []
+        for field, operator, value in self.filters:
+            if operator == "==":
+                sets.append(self.store.hash_index(field).get(_order_key(value), set()))
+            elif operator == "in":
+                index = self.store.hash_index(field)
+                sets.append(set().union(*(index.get(_order_key(v), set()) for v in value)))
+            elif operator == "array-contains":
+                sets.append(self.store.array_index(field).get(_order_key(value), set()))
+            elif operator == "array-contains-any":
+                index = self.store.array_index(field)
+                sets.append(set().union(*(index.get(_order_key(v), set()) for v in value)))
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+    
+    def _range_candidates(self, filters):
+        """Slice the sorted index of the first range-filtered field"""
+        ranged = [f for f in filters if f[1] in _RANGE_OPERATORS]
+        if not ranged:
+            return None
+        field = ranged[0][0]
+        index = self.store.sorted_index(field)
+        lo, hi = 0, len(index)
+        for f, operator, value in ranged:
+            if f != field:
+                continue
+            bound = _order_key(value)
+            if operator == ">":
+                lo = max(lo, bisect.bisect_right(index, (bound, _MAX_ID)))
+            elif operator == ">=":
+                lo = max(lo, bisect.bisect_left(index, (bound, "")))
+            elif operator == "<":
+                hi = min(hi, bisect.bisect_left(index, (bound, "")))
+            else:
+                hi = min(hi, bisect.bisect_right(index, (bound, _MAX_ID)))
+        return [doc_id for _, doc_id in index[lo:hi]]
+    
+    def _ordered(self, candidates, filters):
+        """Walk the first order_by field's sorted index, stopping at the limit"""
+        store = self.store
+        field, direction = self.orders[0]
+        descending = direction == "DESCENDING"
+        index = store.sorted_index(field)
+        limit = self.limit_count
+        
+        if candidates is not None and len(candidates) * 8 < len(index):
+            # Few candidates: sorting them beats walking the whole index
+            entries = sorted((_order_key(store.docs[i][field]), i) for i in candidates if field in store.docs[i])
+        else:
+            entries = index
+        
+        lo, hi = 0, len(entries)
+        if self.cursor is not None and field in self.cursor:
+            bound = _order_key(self.cursor[field])
+            if descending:
+                hi = bisect.bisect_right(entries, (bound, _MAX_ID))
+            else:
+                lo = bisect.bisect_left(entries, (bound, ""))
+        positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+        
+        results = []
+        group, group_key = [], None
+        
+        def flush():
+            if len(self.orders) > 1:
+                for f, d in reversed(self.orders[1:]):
+                    group.sort(key=lambda i: _order_key(store.docs[i].get(f)), reverse=d == "DESCENDING")
+            for doc_id in group:
+                if self.cursor is not None and not self._is_after_cursor(store.docs[doc_id]):
+                    continue
+                results.append(doc_id)
+                if limit is not None and len(results) >= limit:
+                    return True
+            group.clear()
+            return False
+        
+        for position in positions:
+            key, doc_id = entries[position]
+            if candidates is not None and doc_id not in candidates:
+                continue
+            data = store.docs[doc_id]
+            if not all(_matches(data, *f) for f in filters):
+                continue
+            if any(f not in data for f, _ in self.orders[1:]):
+                continue
+            if key != group_key and group:
+                if flush():
+                    return results
+            group_key = key
+            group.append(doc_id)
+        
+        if group:
+            flush()
+        return results[:limit] if limit is not None else results
+    
+    def _is_after_cursor(self, doc_data):
+        for field, direction in self.orders:
+            if field not in self.cursor:
+                break
+            value, bound = _order_key(doc_data.get(field)), _order_key(self.cursor[field])
+            if value != bound:
+                return value < bound if direction == "DESCENDING" else value > bound
+        return False
+
+# Sorts after any real document id, for bisecting past every entry with a given value
+_MAX_ID = "\U0010ffff"
 
 class MockDocument:
-    def __init__(self, doc_id, collection_data):
+    def __init__(self, doc_id, store, latency=0.0):
         self.id = doc_id
-        self.collection_data = collection_data
+        self.store = store
+        self.latency = latency
     
     def set(self, data):
-        self.collection_data[self.id] = data
+        _block(self.latency)
+        self.store.database.commit([(self.store, self.id, "set", dict(data))])
     
     def update(self, data):
-        if self.id in self.collection_data:
-            self.collection_data[self.id].update(data)
+        _block(self.latency)
+        self.store.database.commit([(self.store, self.id, "update", dict(data))])
     
     def delete(self):
-        if self.id in self.collection_data:
-            del self.collection_data[self.id]
+        _block(self.latency)
+        self.store.database.commit([(self.store, self.id, "delete", None)])
     
-    def get(self):
-        return MockDocumentSnapshot(self.id, self.collection_data.get(self.id))
+    def get(self, transaction=None):
+        _block(self.latency)
+        self.store.database.sync()
+        data = self.store.docs.get(self.id)
+        if transaction is not None:
+            transaction.reads.setdefault((self.store, self.id), data)
+        return MockDocumentSnapshot(self.id, data)
 
 class MockDocumentSnapshot:
     def __init__(self, doc_id, data):
@@ -128,4 +751,82 @@ class MockDocumentSnapshot:
         self.exists = data is not None
     
     def to_dict(self):
-        return self._data or {}
+        # Firestore hands back a fresh dict per snapshot, never the stored one
+        return dict(self._data) if self._data else {}
+
+def _block(latency):
+    # Blocking sleep, like a round-trip on the synchronous Firestore client
+    if latency:
+        time.sleep(latency)
+
+class AsyncMockFirestoreClient:
+    """Async counterpart of MockFirestoreClient, shaped like firestore.AsyncClient.
+    
+    Shares the in-memory store of a sync mock; simulated latency is awaited
+    rather than slept, so concurrent requests overlap like they would in production.
+    """
+    
+    def __init__(self, sync_client: Optional[MockFirestoreClient] = None, latency: float = 0.0):
+        self._sync = sync_client or MockFirestoreClient()
+        self.latency = latency
+    
+    def collection(self, collection_name):
+        return AsyncMockReference(MockCollection(collection_name, self._sync._data), self.latency)
+    
+    def batch(self):
+        return AsyncMockWriteBatch(self.latency)
+    
+    def close(self):
+        self._sync.close()
+
+class AsyncMockWriteBatch:
+    """Async counterpart of MockWriteBatch; only commit is awaitable"""
+    
+    def __init__(self, latency=0.0):
+        self._batch = MockWriteBatch()
+        self.latency = latency
+    
+    def set(self, reference, data):
+        self._batch.set(reference, data)
+    
+    def update(self, reference, data):
+        self._batch.update(reference, data)
+    
+    def delete(self, reference):
+        self._batch.delete(reference)
+    
+    async def commit(self):
+        await asyncio.sleep(self.latency)
+        self._batch.commit()
+
+class AsyncMockReference:
+    """Wraps a sync mock collection/document/query, making its I/O methods awaitable"""
+    
+    _IO_METHODS = ("get", "set", "update", "delete")
+    
+    def __init__(self, target, latency=0.0):
+        self._target = target
+        self.latency = latency
+    
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        
+        if name == "stream":
+            async def stream(*args, **kwargs):
+                await asyncio.sleep(self.latency)
+                for snapshot in attr(*args, **kwargs):
+                    yield snapshot
+            return stream
+        
+        if name in self._IO_METHODS:
+            async def call(*args, **kwargs):
+                await asyncio.sleep(self.latency)
+                return attr(*args, **kwargs)
+            return call
+        
+        # Builder methods (document, where, order_by, limit, ...) stay synchronous
+        def build(*args, **kwargs):
+            return AsyncMockReference(attr(*args, **kwargs), self.latency)
+        return build
@@ -0,0 +1,250 @@
+import asyncio
+import copy
+import inspect
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import AsyncIterator, Callable, Optional, Sequence, Tuple, TypeVar
+from app.services.firebase_service import (
+    get_firestore_client, run_transaction, AsyncMockFirestoreClient, MockFirestoreClient, mock_latency
+)
+from app.services.metrics import COALESCED_CALLS, record_firestore_call
+from app.services.single_flight import SingleFlight
+
+Filter = Tuple[str, str, object]
+Ordering = Tuple[str, str]
+Write = Tuple[str, str, str, Optional[dict]]
+T = TypeVar("T")
+
+BATCH_WRITE_LIMIT = 500
+
+TRANSACTION_ATTEMPTS = 5
+
+STREAM_CHUNK_SIZE = 100
+
+class FirestoreRepository:
+    """Non-blocking Firestore access for the routers.
+
+    Synchronous clients run on a bounded thread pool so a slow round-trip never
+    stalls the event loop; async clients are awaited directly. Identical queries
+    in flight at the same time share one round-trip; a query issued after a write
+    through this repository never joins one that started before it.
+    """
+
+    def __init__(self, client, is_async: bool = False, max_workers: int = 16):
+        self.client = client
+        self.is_async = is_async
+        self._executor = None if self.is_async else ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="firestore"
+        )
+        self._queries = SingleFlight()
+        self._write_generation = 0
+
+    def close(self):
+        """Wait for in-flight calls and stop the worker threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    async def execute(self, op, operation: str = "call", count_reads=None, writes: int = 0):
+        """Run a zero-argument Firestore call without blocking the event loop"""
+        start = time.perf_counter()
+        if self.is_async:
+            result = op()
+            if inspect.isawaitable(result):
+                result = await result
+        else:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, op)
+        
+        reads = count_reads(result) if count_reads else 0
+        record_firestore_call(operation, time.perf_counter() - start, reads=reads, writes=writes)
+        return result
+
+    async def get_document(self, collection: str, doc_id: str) -> Optional[dict]:
+        """Fetch a document as a dict, or None if it doesn't exist"""
+        snapshot = await self.execute(
+            lambda: self.client.collection(collection).document(doc_id).get(),
+            "get", count_reads=lambda snapshot: 1
+        )
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict()
+        data.setdefault("id", snapshot.id)
+        return data
+
+    async def set_document(self, collection: str, doc_id: str, data: dict):
+        await self.execute(lambda: self.client.collection(collection).document(doc_id).set(data), "set", writes=1)
+        self._write_generation += 1
+
+    async def update_document(self, collection: str, doc_id: str, data: dict):
+        await self.execute(lambda: self.client.collection(collection).document(doc_id).update(data), "update", writes=1)
+        self._write_generation += 1
+
+    async def delete_document(self, collection: str, doc_id: str):
+        await self.execute(lambda: self.client.collection(collection).document(doc_id).delete(), "delete", writes=1)
+        self._write_generation += 1
+
+    async def batch_write(self, writes: Sequence[Write]):
+        """Commit (action, collection, doc_id, data) writes atomically, at most 500 per call"""
+        batch = self.client.batch()
+        for action, collection, doc_id, data in writes:
+            _stage_write(batch, self.client.collection(collection).document(doc_id), action, data)
+        await self.execute(batch.commit, "batch_commit", writes=len(writes))
+        self._write_generation += 1
+
+    async def run_transaction(self, fn: Callable[["Transaction"], T],
+                              max_attempts: int = TRANSACTION_ATTEMPTS) -> T:
+        """Run fn(transaction) on a worker thread, committing its writes atomically with what it read.
+
+        fn must read every document before writing any, and is called again from the
+        start when a document it read changed before the commit.
+        """
+        transactions = []
+
+        def attempt(client, transaction):
+            transactions.append(Transaction(client, transaction))
+            return fn(transactions[-1])
+
+        start = time.perf_counter()
+        op = lambda: run_transaction(self.client, attempt, max_attempts)
+        try:
+            if self.is_async:
+                return await asyncio.to_thread(op)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, op)
+        finally:
+            self._write_generation += 1
+            record_firestore_call("transaction", time.perf_counter() - start,
+                                  reads=sum(t.reads for t in transactions),
+                                  writes=transactions[-1].writes if transactions else 0)
+
+    async def set_if_version(self, collection: str, doc_id: str, version: int, data: dict) -> bool:
+        """Replace a document only while its version is still `version`; False when it moved on"""
+        def replace(transaction: Transaction) -> bool:
+            if document_version(transaction.get_document(collection, doc_id)) != version:
+                return False
+            transaction.write("set", collection, doc_id, data)
+            return True
+
+        return await self.run_transaction(replace)
+
+    async def query(self, collection: str, filters: Sequence[Filter] = (),
+                    order_by: Sequence[Ordering] = (), limit: Optional[int] = None,
+                    start_after: Optional[dict] = None, record_type=None) -> list:
+        """Run a query and return the matching documents as dicts, or as record_type records"""
+        async def run():
+            query = self._build_query(collection, filters, order_by, limit, start_after)
+            snapshots = await self.execute(query.get, "query", count_reads=len)
+            if record_type is not None:
+                return [record_type.from_document(snapshot.id, snapshot.to_dict()) for snapshot in snapshots]
+            return [_snapshot_dict(snapshot) for snapshot in snapshots]
+
+        key = repr((collection, filters, order_by, limit, start_after, record_type, self._write_generation))
+        results, shared = await self._queries.do(key, run)
+        if not shared:
+            return results
+        COALESCED_CALLS.inc(operation=f"query:{collection}")
+        # Callers may modify what they get back, so a shared result is copied for each of them
+        return [copy.copy(result) for result in results]
+
+    async def stream(self, collection: str, filters: Sequence[Filter] = (),
+                     order_by: Sequence[Ordering] = (), limit: Optional[int] = None,
+                     start_after: Optional[dict] = None) -> AsyncIterator[dict]:
+        """Yield matching documents as they come off the query iterator"""
+        query = self._build_query(collection, filters, order_by, limit, start_after)
+
+        if self.is_async:
+            start = time.perf_counter()
+            count = 0
+            async for snapshot in query.stream():
+                count += 1
+                yield _snapshot_dict(snapshot)
+            record_firestore_call("stream", time.perf_counter() - start, reads=count)
+            return
+
+        iterator = await self.execute(lambda: iter(query.stream()), "stream")
+        while True:
+            chunk = await self.execute(lambda: list(islice(iterator, STREAM_CHUNK_SIZE)), "stream", count_reads=len)
+            if not chunk:
+                break
+            for snapshot in chunk:
+                yield _snapshot_dict(snapshot)
+
+    def _build_query(self, collection, filters, order_by, limit, start_after):
+        query = self.client.collection(collection)
+        for field, operator, value in filters:
+            query = query.where(field, operator, value)
+        for field, direction in order_by:
+            query = query.order_by(field, direction=direction)
+        if start_after:
+            query = query.start_after(start_after)
+        if limit:
+            query = query.limit(limit)
+        return query
+
+class Transaction:
+    """Reads and queued writes of one FirestoreRepository.run_transaction attempt"""
+
+    def __init__(self, client, transaction):
+        self.client = client
+        self.transaction = transaction
+        self.reads = 0
+        self.writes = 0
+
+    def get_document(self, collection: str, doc_id: str) -> Optional[dict]:
+        """Read a document as part of the transaction, or None if it doesn't exist"""
+        snapshot = self.client.collection(collection).document(doc_id).get(transaction=self.transaction)
+        self.reads += 1
+        return _snapshot_dict(snapshot) if snapshot.exists else None
+
+    def write(self, action: str, collection: str, doc_id: str, data: Optional[dict] = None):
+        """Queue a set/update/delete that commits with the transaction"""
+        _stage_write(self.transaction, self.client.collection(collection).document(doc_id), action, data)
+        self.writes += 1
+
+def document_version(data: Optional[dict]) -> int:
+    """Version counter of a document written through set_if_version; 0 when missing"""
+    return data.get("version", 0) if data else 0
+
+def _stage_write(batch, reference, action: str, data: Optional[dict]):
+    if action == "set":
+        batch.set(reference, data)
+    elif action == "update":
+        batch.update(reference, data)
+    elif action == "delete":
+        batch.delete(reference)
+    else:
+        raise ValueError(f"Unknown write action: {action}")
+
+def _snapshot_dict(snapshot) -> dict:
+    data = snapshot.to_dict()
+    data.setdefault("id", snapshot.id)
+    return data
+
+# Global repository
+_repository: Optional[FirestoreRepository] = None
+
+def get_repository() -> FirestoreRepository:
+    """Get the process-wide Firestore repository"""
+    global _repository
+
+    if _repository is None:
+        client = get_firestore_client()
+        is_async = isinstance(client, MockFirestoreClient) and os.getenv("MOCK_FIRESTORE_ASYNC", "").lower() == "true"
+        if is_async:
+            client = AsyncMockFirestoreClient(client, latency=mock_latency())
+        _repository = FirestoreRepository(
+            client,
+            is_async=is_async,
+            max_workers=int(os.getenv("FIRESTORE_MAX_WORKERS", "16"))
+        )
+
+    return _repository
+
+def close_repository():
+    """Close the process-wide repository, if one was created"""
+    global _repository
+
+    if _repository is not None:
+        _repository.close()
+        _repository = None
@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Tuple
+
+STANDARD_LOT_UNITS = 100000
+
+@dataclass(frozen=True, slots=True)
+class InstrumentSpec:
+    """How prices and lots of one instrument translate into money"""
+
+    symbol: str
+    base: str
+    quote: str
+    pip_size: float  # price increment of one pip
+    contract_size: float  # units of base per lot
+
+    @property
+    def pip_multiplier(self) -> int:
+        """Pips per 1.0 of price"""
+        return round(1 / self.pip_size)
+
+# Instruments that don't follow the FX defaults (4-decimal pips, 2 for JPY quotes; 100,000-unit lots)
+INSTRUMENT_OVERRIDES: Dict[str, Tuple[float, float]] = {
+    "XAU/USD": (0.01, 100),
+    "XAG/USD": (0.001, 5000),
+}
+
+def normalize_pair(pair: str) -> str:
+    """Normalize 'eurusd' / 'EUR/USD' / 'EUR_USD' to 'EUR/USD'"""
+    pair = pair.strip().upper().replace("_", "/").replace("-", "/")
+    if "/" not in pair and len(pair) == 6:
+        pair = f"{pair[:3]}/{pair[3:]}"
+    return pair
+
+@lru_cache(maxsize=4096)
+def instrument_spec(pair: str) -> InstrumentSpec:
+    """Spec of a pair in any spelling; unknown symbols get the FX defaults"""
+    symbol = normalize_pair(pair)
+    base, _, quote = symbol.partition("/")
+    if symbol in INSTRUMENT_OVERRIDES:
+        pip, contract_size = INSTRUMENT_OVERRIDES[symbol]
+    else:
+        pip = 0.01 if quote == "JPY" or (not quote and "JPY" in symbol) else 0.0001
+        contract_size = STANDARD_LOT_UNITS
+    return InstrumentSpec(symbol, base, quote, pip, contract_size)
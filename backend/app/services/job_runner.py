@@ -0,0 +1,326 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from app.services.response_cache import get_response_cache
+
+JOBS_COLLECTION = "jobs"
+PRIORITIES = {"interactive": 0, "normal": 10, "bulk": 20}
+FINISHED = ("completed", "failed", "cancelled")
+
+class Job:
+    """A unit of background work and its status, progress and result"""
+
+    def __init__(self, kind: str, user_id: str, params: dict, key: Optional[str], priority: str):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.user_id = user_id
+        self.params = params
+        self.key = key
+        self.priority = priority
+        self.status = "queued"
+        self.progress: Dict[str, object] = {}
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.expires_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+        self.on_finish: List[Callable[[], None]] = []
+
+    def report(self, done: Optional[float] = None, total: Optional[float] = None, **details):
+        """Update progress; done/total drive the percentage, details are shown as-is"""
+        if done is not None:
+            self.progress["done"] = done
+        if total is not None:
+            self.progress["total"] = total
+        self.progress.update(details)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        progress = dict(self.progress)
+        if progress.get("total"):
+            progress["percent"] = round(min(progress.get("done", 0) / progress["total"], 1.0) * 100, 1)
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "user_id": self.user_id,
+            "params": self.params,
+            "key": self.key,
+            "priority": self.priority,
+            "status": self.status,
+            "progress": progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "expires_at": self.expires_at,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+class JobRunner:
+    """In-process scheduler for long-running work, so heavy requests return a job id instead of blocking.
+
+    Jobs wait in a priority heap ordered by priority class, then by how many jobs
+    the same user already had waiting or running, so one user's burst queues
+    behind everyone else's first job. At most `concurrency` jobs run at once and
+    at most `per_user` of them for one user. Jobs hand CPU-bound steps to a
+    bounded process pool through run_cpu, keeping them off the event loop.
+
+    Submitting the same kind, user, parameters and trade-data version as a queued,
+    running or still-cached job returns that job instead of starting another.
+    Status changes are written to the jobs collection, and finished jobs kept
+    there for result_ttl seconds, so any worker can serve their status and
+    result; live progress and cancellation are handled by the owning worker.
+    """
+
+    def __init__(self, concurrency: int = 1, per_user: int = 1, result_ttl: float = 3600):
+        self.concurrency = concurrency
+        self.per_user = per_user
+        self.result_ttl = result_ttl
+        self.jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, Job] = {}
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        self._running: Dict[str, int] = {}
+        self._running_total = 0
+        self._saving: Set[asyncio.Future] = set()
+
+    async def submit(self, repo, kind: str, user_id: str, run: Callable[[Job], Awaitable[object]],
+                     params: Optional[dict] = None, priority: str = "normal", dedupe: bool = True,
+                     on_finish: Optional[List[Callable[[], None]]] = None,
+                     progress: Optional[dict] = None) -> Job:
+        """Queue run(job) unless an identical job is in flight or cached; returns the job.
+
+        Initial progress and on_finish callbacks are attached before the job can start
+        and only to a newly queued job; if submit raises, nothing was queued and the
+        callbacks never run.
+        """
+        self._sweep()
+        params = params or {}
+        key = job_key(kind, user_id, params, get_response_cache().version_tag(user_id)) if dedupe else None
+        if key is not None:
+            existing = self._by_key.get(key) or await self._load_cached(repo, key)
+            if existing is not None and existing.status not in ("failed", "cancelled"):
+                return existing
+
+        job = Job(kind, user_id, params, key, priority)
+        job.progress.update(progress or {})
+        job.on_finish.extend(on_finish or [])
+        await self._persist(repo, job)
+        rank = sum(1 for other in self.jobs.values() if other.user_id == user_id and not other.finished)
+        self.jobs[job.id] = job
+        if key is not None:
+            self._by_key[key] = job
+        heapq.heappush(self._queue, (PRIORITIES[priority], rank, next(self._sequence), job.id, repo, run))
+        self._dispatch()
+        return job
+
+    async def get(self, repo, job_id: str) -> Optional[Job]:
+        """A job from this process, or a finished one persisted by any worker"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        doc = await repo.get_document(JOBS_COLLECTION, job_id)
+        if doc is None:
+            return None
+        if doc.get("expires_at") is not None and doc["expires_at"] <= datetime.utcnow():
+            await repo.delete_document(JOBS_COLLECTION, job_id)
+            return None
+        return job_from_doc(doc)
+
+    async def list_jobs(self, repo, user_id: str) -> List[Job]:
+        """The user's jobs, newest first"""
+        jobs = {job.id: job for job in self.jobs.values() if job.user_id == user_id}
+        now = datetime.utcnow()
+        for doc in await repo.query(JOBS_COLLECTION, [("user_id", "==", user_id)]):
+            if doc["id"] not in jobs and (doc.get("expires_at") is None or doc["expires_at"] > now):
+                jobs[doc["id"]] = job_from_doc(doc)
+        return sorted(jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    async def cancel(self, repo, job: Job) -> bool:
+        """Cancel a queued or running job of this process; False when it already finished"""
+        if job.finished or job.id not in self.jobs:
+            return False
+        if job.task is not None:
+            job.task.cancel()
+            await asyncio.wait([job.task])
+            await self._settle()
+        else:
+            await self._finish(repo, job, "cancelled")
+        return True
+
+    async def run_cpu(self, fn: Callable, *args):
+        """Run fn(*args) in the job process pool, or a thread when there is no pool"""
+        pool = get_job_pool()
+        if pool is None:
+            return await asyncio.to_thread(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+    async def shutdown(self):
+        """Cancel queued and running jobs"""
+        for job in list(self.jobs.values()):
+            if not job.finished and job.task is not None:
+                job.task.cancel()
+        tasks = [job.task for job in self.jobs.values() if job.task is not None]
+        if tasks:
+            await asyncio.wait(tasks)
+        await self._settle()
+
+    def _dispatch(self):
+        """Start queued jobs while there are free slots, skipping users at their limit"""
+        waiting = []
+        while self._queue and self._running_total < self.concurrency:
+            entry = heapq.heappop(self._queue)
+            job = self.jobs.get(entry[3])
+            if job is None or job.status != "queued":
+                continue
+            if self._running.get(job.user_id, 0) >= self.per_user:
+                waiting.append(entry)
+                continue
+            self._running[job.user_id] = self._running.get(job.user_id, 0) + 1
+            self._running_total += 1
+            job.task = asyncio.ensure_future(self._run(entry[4], job, entry[5]))
+            job.task.add_done_callback(lambda task, repo=entry[4], job=job: self._release(repo, job))
+        for entry in waiting:
+            heapq.heappush(self._queue, entry)
+
+    async def _run(self, repo, job: Job, run: Callable[[Job], Awaitable[object]]):
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        try:
+            await self._persist(repo, job)
+            result = await run(job)
+        except asyncio.CancelledError:
+            await self._finish(repo, job, "cancelled")
+        except Exception as e:
+            await self._finish(repo, job, "failed", error=str(getattr(e, "detail", None) or e))
+        else:
+            await self._finish(repo, job, "completed", result=result)
+
+    def _release(self, repo, job: Job):
+        """Free a finished task's slot and start the next jobs; runs even if the task never started"""
+        self._running[job.user_id] -= 1
+        if not self._running[job.user_id]:
+            del self._running[job.user_id]
+        self._running_total -= 1
+        if not job.finished:
+            # Cancelled before its first step, so _run never got to record it
+            self._close(job, "cancelled")
+            saving = asyncio.ensure_future(self._save(repo, job))
+            self._saving.add(saving)
+            saving.add_done_callback(self._saving.discard)
+        self._dispatch()
+
+    async def _settle(self):
+        """Wait for status writes of jobs cancelled before they started"""
+        if self._saving:
+            await asyncio.wait(list(self._saving))
+
+    async def _finish(self, repo, job: Job, status: str, result=None, error: Optional[str] = None):
+        self._close(job, status, result, error)
+        await self._save(repo, job)
+
+    def _close(self, job: Job, status: str, result=None, error: Optional[str] = None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        job.expires_at = job.finished_at + timedelta(seconds=self.result_ttl)
+        for callback in job.on_finish:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Warning: cleanup for job {job.id} failed: {e}")
+
+    async def _save(self, repo, job: Job):
+        try:
+            await self._persist(repo, job)
+        except Exception as e:
+            print(f"Warning: could not persist job {job.id}: {e}")
+
+    async def _persist(self, repo, job: Job):
+        await repo.set_document(JOBS_COLLECTION, job.id, job.to_dict(include_result=job.finished))
+
+    async def _load_cached(self, repo, key: str) -> Optional[Job]:
+        now = datetime.utcnow()
+        for doc in await repo.query(JOBS_COLLECTION, [("key", "==", key)]):
+            if doc.get("status") == "completed" and doc.get("expires_at") and doc["expires_at"] > now:
+                return job_from_doc(doc)
+        return None
+
+    def _sweep(self):
+        """Forget finished jobs past their TTL; their persisted copies expire on read"""
+        now = datetime.utcnow()
+        for job_id, job in list(self.jobs.items()):
+            if job.finished and job.expires_at <= now:
+                del self.jobs[job_id]
+                if job.key is not None and self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+
+def job_key(kind: str, user_id: str, params: dict, version_tag: str) -> str:
+    """Identity of a job's inputs: the same key means the same result"""
+    payload = json.dumps([kind, user_id, params, version_tag], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+def job_from_doc(doc: dict) -> Job:
+    """A read-only Job for a record persisted by any worker"""
+    job = Job.__new__(Job)
+    job.__dict__.update({
+        "task": None, "on_finish": [],
+        "result": None, "error": None, "started_at": None, "finished_at": None, "expires_at": None,
+        **{field: value for field, value in doc.items() if field != "progress"},
+        "progress": {k: v for k, v in (doc.get("progress") or {}).items() if k != "percent"},
+    })
+    return job
+
+# Global job runner and its worker pool
+_runner: Optional[JobRunner] = None
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_job_runner() -> JobRunner:
+    """Get the process-wide job runner"""
+    global _runner
+
+    if _runner is None:
+        _runner = JobRunner(
+            concurrency=int(os.getenv("JOB_CONCURRENCY", "2")),
+            per_user=int(os.getenv("JOB_MAX_PER_USER", "1")),
+            result_ttl=float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+        )
+
+    return _runner
+
+def get_job_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool sized by JOB_WORKERS, or None to run CPU-bound steps in a thread"""
+    global _pool
+
+    workers = int(os.getenv("JOB_WORKERS", str(max((os.cpu_count() or 1) - 1, 1))))
+    if _pool is None and workers > 1:
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    return _pool
+
+async def close_job_runner():
+    """Cancel outstanding jobs and stop the worker pool"""
+    global _runner, _pool
+
+    if _runner is not None:
+        await _runner.shutdown()
+        _runner = None
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
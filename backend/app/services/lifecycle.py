@@ -0,0 +1,79 @@
+import asyncio
+import importlib
+import os
+from datetime import datetime, timedelta
+from app.services.pnl import trade_profits
+from app.services.position_sizing import size_positions
+from app.services import analytics_engine, firestore_repository
+from app.services.event_log import close_event_log
+from app.services.job_runner import close_job_runner
+from app.services.firebase_service import MockFirestoreClient, close_firestore_client, get_firestore_client
+from app.services.metrics import timed
+from app.services.portfolio_risk import get_risk_models
+from app.services.rate_service import get_rate_cache
+from app.services.response_cache import get_response_cache
+
+# Indexes the routers' queries hit first; the mock builds them lazily on the first query otherwise
+MOCK_WARM_INDEXES = (
+    ("trades", "hash", "user_id"),
+    ("trades", "hash", "status"),
+    ("trades", "hash", "pair"),
+    ("trades", "array", "tags"),
+    ("trades", "sorted", "created_at"),
+    ("analytics_aggregates", "hash", "user_id"),
+    ("analytics_rollups", "hash", "user_id"),
+    ("analytics_rollups", "hash", "granularity"),
+    ("analytics_rollups", "sorted", "bucket"),
+    ("trade_tags", "hash", "user_id"),
+    ("jobs", "hash", "user_id"),
+    ("jobs", "hash", "key"),
+)
+
+# Imported lazily by the code that uses them; loading them here keeps it off the first request
+OPTIONAL_MODULES = ("pyarrow.parquet",)
+
+def warmup_enabled() -> bool:
+    return os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+
+async def startup():
+    """Create clients and caches and warm first-call paths before serving traffic"""
+    with timed("startup"):
+        repo = firestore_repository.get_repository()
+        get_rate_cache()
+        get_response_cache()
+        if not warmup_enabled():
+            return
+
+        client = get_firestore_client()
+        if isinstance(client, MockFirestoreClient):
+            await asyncio.to_thread(client.warm_indexes, MOCK_WARM_INDEXES)
+        # One read opens the channel and fetches credentials on a real client
+        await repo.get_document("trades", "__warmup__")
+        await asyncio.to_thread(warm_numeric_paths)
+        # Reads every price history file once; later refreshes only read what was appended
+        await asyncio.to_thread(get_risk_models().get)
+        for name in OPTIONAL_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+
+def warm_numeric_paths():
+    """Run the numpy/pandas paths once so their lazy imports and caches are loaded"""
+    now = datetime(2024, 1, 1)
+    trades = [
+        {"status": "closed", "profit": profit, "close_time": now + timedelta(days=i), "tags": ["warmup"]}
+        for i, profit in enumerate((10.0, -5.0, 7.5))
+    ]
+    frame = analytics_engine.load_closed_trades(trades)
+    analytics_engine.compute_overview(frame, len(trades))
+    analytics_engine.monthly_performance(frame)
+    trade_profits([1.1], [1.101], [1.0], ["long"], ["EUR/USD"])
+    size_positions([10000.0], [1.0], [1.1], [1.095], ["EUR/USD"])
+
+async def shutdown():
+    """Stop background jobs, drain Firestore calls and release the client"""
+    await close_job_runner()
+    await asyncio.to_thread(firestore_repository.close_repository)
+    close_firestore_client()
+    await asyncio.to_thread(close_event_log)
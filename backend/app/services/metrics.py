@@ -0,0 +1,269 @@
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional, Tuple
+from fastapi.routing import APIRoute
+
+# Prometheus' default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    """Cumulative-bucket latency histogram keyed by label set"""
+
+    def __init__(self, name: str, description: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series: Dict[LabelSet, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One count per bucket, then +Inf, then sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_labels(key, le=le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(key)} {series[-1]}")
+                lines.append(f"{self.name}_count{_labels(key)} {cumulative}")
+        return "\n".join(lines)
+
+class CounterMetric:
+    """Monotonic counter keyed by label set"""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._series: Dict[LabelSet, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._series.items():
+                lines.append(f"{self.name}{_labels(key)} {value}")
+        return "\n".join(lines)
+
+def _labels(key: LabelSet, **extra) -> str:
+    items = list(key) + list(extra.items())
+    if not items:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in items)
+    return "{" + ",".join(escaped) + "}"
+
+REQUEST_LATENCY = Histogram("mckay_request_duration_seconds", "HTTP request latency by route")
+ENDPOINT_LATENCY = Histogram("mckay_endpoint_duration_seconds", "Time spent inside route handlers, excluding validation and serialization")
+PHASE_LATENCY = Histogram("mckay_phase_duration_seconds", "Time spent in named code sections")
+FIRESTORE_LATENCY = Histogram("mckay_firestore_call_duration_seconds", "Firestore round-trip latency by operation")
+FIRESTORE_DOCUMENTS = CounterMetric("mckay_firestore_documents_total", "Firestore documents read or written")
+REQUESTS = CounterMetric("mckay_requests_total", "HTTP requests by route and status")
+COALESCED_CALLS = CounterMetric("mckay_coalesced_calls_total", "Reads that shared one in-flight call with identical concurrent reads")
+RATE_LIMITED = CounterMetric("mckay_rate_limited_requests_total", "Requests rejected by the per-client rate limit")
+
+METRICS = (REQUESTS, REQUEST_LATENCY, ENDPOINT_LATENCY, PHASE_LATENCY, FIRESTORE_LATENCY, FIRESTORE_DOCUMENTS,
+           COALESCED_CALLS, RATE_LIMITED)
+
+class RequestStats:
+    """Timings and Firestore usage accumulated while serving one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.firestore_calls = 0
+        self.firestore_reads = 0
+        self.firestore_writes = 0
+
+    def add_phase(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        """Format the Server-Timing header value"""
+        entries = [f"total;dur={total * 1000:.2f}"]
+        endpoint = self.phases.get("endpoint")
+        for name, seconds in self.phases.items():
+            entries.append(f"{name};dur={seconds * 1000:.2f}")
+        if endpoint is not None:
+            entries.append(f"framework;dur={max(total - endpoint, 0) * 1000:.2f};desc=\"validation+serialization\"")
+        if self.firestore_calls:
+            entries.append(f"firestore-ops;desc=\"{self.firestore_calls} calls, "
+                           f"{self.firestore_reads} reads, {self.firestore_writes} writes\"")
+        return ", ".join(entries)
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Stats of the request being served in this context, if any"""
+    return _current_request.get()
+
+@contextmanager
+def timed(name: str):
+    """Time a block of code into the phase histogram and the request's Server-Timing"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        PHASE_LATENCY.observe(elapsed, phase=name)
+        stats = _current_request.get()
+        if stats is not None:
+            stats.add_phase(name, elapsed)
+
+def record_firestore_call(operation: str, seconds: float, reads: int = 0, writes: int = 0):
+    """Account one Firestore round-trip to the global metrics and the current request"""
+    FIRESTORE_LATENCY.observe(seconds, op=operation)
+    if reads:
+        FIRESTORE_DOCUMENTS.inc(reads, kind="read")
+    if writes:
+        FIRESTORE_DOCUMENTS.inc(writes, kind="write")
+
+    stats = _current_request.get()
+    if stats is not None:
+        stats.firestore_calls += 1
+        stats.firestore_reads += reads
+        stats.firestore_writes += writes
+        stats.add_phase("firestore", seconds)
+
+def render_metrics() -> str:
+    """Render every metric in Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in METRICS) + "\n"
+
+class InstrumentedRoute(APIRoute):
+    """APIRoute that times the endpoint function itself, separately from FastAPI's
+    request validation and response serialization"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        # include_router rebuilds routes with the same class; wrap only once
+        if not getattr(endpoint, "_instrumented", False):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+def _timed_endpoint(endpoint):
+    @wraps(endpoint)
+    async def timed_endpoint(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            stats = _current_request.get()
+            if stats is not None:
+                stats.add_phase("endpoint", time.perf_counter() - start)
+
+    timed_endpoint._instrumented = True
+    return timed_endpoint
+
+class SlowRequestProfiler:
+    """Opt-in sampling profiler for slow requests.
+
+    A daemon thread samples the event-loop thread's stack every interval into a
+    ring buffer; when a request exceeds the threshold, the samples taken while
+    it was running are folded into a top-stacks report.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.005, max_samples: int = 20000, max_reports: int = 20):
+        self.threshold = threshold
+        self.interval = interval
+        self._samples = deque(maxlen=max_samples)
+        self.reports = deque(maxlen=max_reports)
+        self._thread_id: Optional[int] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, thread_id: int):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread_id = thread_id
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < 30:
+                code = frame.f_code
+                stack.append(f"{code.co_filename}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self._samples.append((time.perf_counter(), tuple(reversed(stack))))
+
+    def check(self, route: str, started: float, finished: float):
+        """Record a report if a request that ran from started to finished was slow"""
+        if finished - started < self.threshold:
+            return
+        stacks = Counter(stack for ts, stack in list(self._samples) if started <= ts <= finished)
+        report = {
+            "route": route,
+            "duration_ms": round((finished - started) * 1000, 2),
+            "samples": sum(stacks.values()),
+            "top_stacks": [{"count": count, "stack": list(stack[-12:])} for stack, count in stacks.most_common(5)],
+        }
+        self.reports.append(report)
+        print(f"Warning: slow request {route} took {report['duration_ms']}ms "
+              f"({report['samples']} samples)")
+
+_profiler: Optional[SlowRequestProfiler] = None
+
+def get_slow_request_profiler() -> Optional[SlowRequestProfiler]:
+    """Profiler enabled by SLOW_REQUEST_PROFILE_MS, or None when profiling is off"""
+    global _profiler
+
+    threshold_ms = os.getenv("SLOW_REQUEST_PROFILE_MS")
+    if _profiler is None and threshold_ms:
+        _profiler = SlowRequestProfiler(float(threshold_ms) / 1000)
+        _profiler.start(threading.get_ident())
+
+    return _profiler
+
+async def metrics_middleware(request, call_next):
+    """Record per-route latency and emit a Server-Timing header"""
+    stats = RequestStats()
+    token = _current_request.set(stats)
+    profiler = get_slow_request_profiler()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        total = time.perf_counter() - stats.started
+        response.headers["Server-Timing"] = stats.server_timing(total)
+        return response
+    finally:
+        finished = time.perf_counter()
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_LATENCY.observe(finished - stats.started, route=route, method=request.method)
+        if "endpoint" in stats.phases:
+            ENDPOINT_LATENCY.observe(stats.phases["endpoint"], route=route, method=request.method)
+        REQUESTS.inc(route=route, method=request.method, status=str(status))
+        if profiler is not None:
+            profiler.check(f"{request.method} {route}", stats.started, finished)
+        _current_request.reset(token)
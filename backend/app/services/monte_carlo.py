@@ -0,0 +1,151 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, List, Optional
+import numpy as np
+from app.services.analytics_engine import is_closed_trade, normalize_time
+
+PERCENTILES = (5, 25, 50, 75, 95, 99)
+CHUNK_SAMPLES = 500_000  # trade draws generated per chunk
+POOL_MIN_SAMPLES = 20_000_000  # below this, process start-up costs more than it saves
+
+def trade_returns(trades: List[dict]) -> dict:
+    """Closed-trade profits in close order, plus each trade's R-multiple.
+
+    R is the price move over the stop distance, which cancels lot size and pip value;
+    trades without a stop fall back to profit over the average loss.
+    """
+    closed = sorted((t for t in trades if is_closed_trade(t)),
+                    key=lambda t: normalize_time(t.get("close_time")) or datetime.min)
+    profits = np.array([t["profit"] for t in closed], dtype=np.float64)
+
+    losses = profits[profits < 0]
+    unit_loss = abs(losses.mean()) if len(losses) else (abs(profits).mean() if len(profits) else 0.0)
+    r_multiples = np.empty(len(closed))
+    for i, trade in enumerate(closed):
+        entry, stop, exit_price = trade.get("entry_price"), trade.get("stop_loss"), trade.get("exit_price")
+        if stop and exit_price and entry and entry != stop:
+            sign = 1.0 if trade.get("direction") == "long" else -1.0
+            r_multiples[i] = (exit_price - entry) * sign / abs(entry - stop)
+        else:
+            r_multiples[i] = profits[i] / unit_loss if unit_loss else 0.0
+
+    return {"profits": profits, "r_multiples": r_multiples}
+
+def resample_indices(rng: np.random.Generator, n: int, paths: int, horizon: int, block_size: int) -> np.ndarray:
+    """Draw (paths, horizon) trade indices; block_size > 1 keeps runs of consecutive trades together"""
+    if block_size <= 1:
+        return rng.integers(0, n, size=(paths, horizon), dtype=np.int32)
+    # Circular block bootstrap: random block starts, wrapped around the end of the history
+    blocks = -(-horizon // block_size)
+    starts = rng.integers(0, n, size=(paths, blocks, 1), dtype=np.int32)
+    indices = (starts + np.arange(block_size, dtype=np.int32)) % n
+    return indices.reshape(paths, blocks * block_size)[:, :horizon]
+
+def simulate_chunk(samples: np.ndarray, paths: int, horizon: int, block_size: int, seed: np.random.SeedSequence,
+                   balance: float, risk_fraction: Optional[float], ruin_equity: float) -> dict:
+    """Simulate one chunk of equity paths and reduce each to per-path statistics.
+
+    With risk_fraction, samples are R-multiples compounded at that fraction of current
+    equity; otherwise samples are fixed-size dollar profits added to the balance.
+    """
+    rng = np.random.default_rng(seed)
+    draws = samples[resample_indices(rng, len(samples), paths, horizon, block_size)]
+
+    if risk_fraction is None:
+        equity = np.cumsum(draws, axis=1, out=draws)
+        equity += balance
+    else:
+        growth = np.maximum(1.0 + draws * risk_fraction, 0.0)
+        equity = np.cumprod(growth, axis=1, out=growth)
+        equity *= balance
+
+    peaks = np.maximum.accumulate(equity, axis=1)
+    np.maximum(peaks, balance, out=peaks)
+    at_high = equity >= peaks
+
+    # Trades since the last equity high; the longest such stretch is the path's recovery time
+    steps = np.arange(1, horizon + 1, dtype=np.int32)
+    last_high = np.maximum.accumulate(np.where(at_high, steps, 0), axis=1)
+    longest_underwater = (steps - last_high).max(axis=1)
+
+    drawdown = np.subtract(peaks, equity, out=peaks)
+    drawdown /= drawdown + equity  # (peak - equity) / peak, reusing the peaks buffer
+
+    return {
+        "max_drawdown": drawdown.max(axis=1),
+        "final_equity": equity[:, -1].copy(),
+        "ruined": equity.min(axis=1) <= ruin_equity,
+        "longest_underwater": longest_underwater,
+        "recovered": at_high[:, -1],
+    }
+
+async def run_simulation(samples: np.ndarray, paths: int, horizon: int, block_size: int, seed: int,
+                         balance: float, risk_fraction: Optional[float], ruin_equity: float,
+                         progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """Simulate paths in chunks and summarize; large runs fan out to worker processes.
+
+    Each chunk gets its own child of one SeedSequence, so results depend only on the
+    seed and chunking, not on which process ran which chunk. progress(done, total)
+    is called as chunks complete.
+    """
+    chunk_paths = max(1, min(paths, CHUNK_SAMPLES // max(horizon, 1)))
+    sizes = [min(chunk_paths, paths - start) for start in range(0, paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(samples, size, horizon, block_size, child, balance, risk_fraction, ruin_equity)
+            for size, child in zip(sizes, seeds)]
+
+    pool = get_simulation_pool() if paths * horizon >= POOL_MIN_SAMPLES and len(sizes) > 1 else None
+    report = progress or (lambda done, total: None)
+    if pool is None:
+        def simulate_all():
+            chunks = []
+            for a in args:
+                chunks.append(simulate_chunk(*a))
+                report(len(chunks), len(args))
+            return chunks
+        chunks = await asyncio.to_thread(simulate_all)
+    else:
+        loop = asyncio.get_running_loop()
+        futures = [loop.run_in_executor(pool, simulate_chunk, *a) for a in args]
+        for done, future in enumerate(asyncio.as_completed(futures), start=1):
+            await future
+            report(done, len(args))
+        chunks = [future.result() for future in futures]
+
+    results = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+    return summarize_simulation(results, balance)
+
+def summarize_simulation(results: dict, balance: float) -> dict:
+    """Percentiles and rates over the simulated paths"""
+    def percentiles(values, scale=1.0, digits=2):
+        points = np.percentile(values, PERCENTILES)
+        return {f"p{p}": round(float(v) * scale, digits) for p, v in zip(PERCENTILES, points)}
+
+    final_equity = results["final_equity"]
+    return {
+        "max_drawdown": percentiles(results["max_drawdown"], 100),
+        "final_equity": percentiles(final_equity),
+        "final_return": percentiles(final_equity / balance - 1, 100),
+        "probability_of_loss": round(float((final_equity < balance).mean()) * 100, 2),
+        "risk_of_ruin": round(float(results["ruined"].mean()) * 100, 2),
+        "time_to_recover": {
+            **percentiles(results["longest_underwater"], digits=0),
+            "unrecovered": round(float((~results["recovered"]).mean()) * 100, 2),
+        },
+    }
+
+# Global worker pool
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_simulation_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool sized by MONTE_CARLO_WORKERS, or None to simulate in-process"""
+    global _pool
+
+    workers = int(os.getenv("MONTE_CARLO_WORKERS", str(os.cpu_count() or 1)))
+    if _pool is None and workers > 1:
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    return _pool
@@ -0,0 +1,28 @@
+from typing import Sequence
+import numpy as np
+from app.services.rate_service import get_rate_cache
+
+def point_values(pairs: Sequence[str]) -> np.ndarray:
+    """Point value per lot of each pair, looked up once per distinct pair"""
+    unique_pairs, pair_index = np.unique(np.asarray(pairs, dtype=str), return_inverse=True)
+    rates = get_rate_cache()
+    return np.array([rates.point_value(pair) for pair in unique_pairs], dtype=np.float64)[pair_index]
+
+def trade_profits(entry_prices, exit_prices, lot_sizes, directions, pairs) -> np.ndarray:
+    """Realized P&L in the account currency for many trades: price move * point value * lots"""
+    entry = np.asarray(entry_prices, dtype=np.float64)
+    exit = np.asarray(exit_prices, dtype=np.float64)
+    lots = np.asarray(lot_sizes, dtype=np.float64)
+    sign = np.where(_direction_values(directions) == "long", 1.0, -1.0)
+    return np.round((exit - entry) * sign * point_values(pairs) * lots, 2)
+
+def _direction_values(directions) -> np.ndarray:
+    if isinstance(directions, np.ndarray) and directions.dtype.kind == "U":
+        return directions
+    # TradeDirection members must compare by value; a unicode array would hold their stringified names
+    return np.array([getattr(direction, "value", direction) for direction in directions], dtype=object)
+
+def trade_profit(entry_price: float, exit_price: float, lot_size: float, direction: str, pair: str) -> float:
+    """Realized P&L of one trade, same formula as trade_profits"""
+    move = (exit_price - entry_price) if direction == "long" else (entry_price - exit_price)
+    return round(move * get_rate_cache().point_value(pair) * lot_size, 2)
@@ -0,0 +1,334 @@
+import math
+import os
+import threading
+import time
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app.services.price_history import available_pairs, load_bars
+from app.services.instruments import instrument_spec
+from app.services.rate_service import get_rate_cache
+
+DEFAULT_LAMBDA = 0.94  # RiskMetrics daily decay
+SEED_DAYS = 20  # returns averaged into the starting covariance before EWMA takes over
+
+def _daily_closes(path: str, pair: str, start: Optional[np.datetime64]) -> pd.Series:
+    """Last close of each day in a history file, from start onwards"""
+    bars = load_bars(path, pair, start.astype("datetime64[us]").item() if start is not None else None)
+    if not len(bars):
+        return pd.Series(dtype=np.float64)
+    days = bars.time.astype("datetime64[D]")
+    last = np.append(np.flatnonzero(days[1:] != days[:-1]), len(days) - 1)
+    return pd.Series(np.asarray(bars.close[last], dtype=np.float64), index=days[last])
+
+def currency_log_prices(closes: Dict[str, pd.Series]) -> pd.DataFrame:
+    """Daily log price of each currency in USD, from pair closes.
+
+    X/USD and USD/X pairs price X directly; a cross prices its other leg once one
+    leg is known. USD itself is a column of zeros. Days a currency has no close
+    carry its previous price forward.
+    """
+    logs = {"USD": None}
+    pending = dict(closes)
+    while pending:
+        progress = False
+        for pair, series in list(pending.items()):
+            base, quote = pair.split("/")
+            if quote in logs and base not in logs:
+                logs[base] = np.log(series) + _known(logs, quote, series.index)
+            elif base in logs and quote not in logs:
+                logs[quote] = _known(logs, base, series.index) - np.log(series)
+            elif base not in logs:
+                continue
+            del pending[pair]
+            progress = True
+        if not progress:
+            break  # crosses between currencies no other pair connects to USD
+
+    frame = pd.DataFrame({ccy: series for ccy, series in logs.items() if series is not None}).sort_index().ffill()
+    frame.insert(0, "USD", 0.0)
+    return frame.dropna()
+
+def _known(logs: Dict[str, Optional[pd.Series]], currency: str, index) -> pd.Series:
+    if logs[currency] is None:
+        return pd.Series(0.0, index=index)
+    return logs[currency].reindex(index, method="ffill")
+
+class RiskModel:
+    """EWMA covariance of daily currency returns against USD.
+
+    Folding in k new days is one weighted (k x n) product, so refreshing the
+    model as history files grow never revisits old days:
+    cov' = lambda^k cov + sum_i (1 - lambda) lambda^(k-1-i) r_i r_i^T.
+    """
+
+    def __init__(self, currencies: List[str], lam: float = DEFAULT_LAMBDA):
+        self.currencies = currencies
+        self.index = {ccy: i for i, ccy in enumerate(currencies)}
+        self.lam = lam
+        self.cov = np.zeros((len(currencies), len(currencies)))
+        self.observations = 0
+        self.last_day: Optional[np.datetime64] = None
+        self.last_prices: Optional[np.ndarray] = None  # log USD prices on last_day
+
+    @classmethod
+    def build(cls, log_prices: pd.DataFrame, lam: float = DEFAULT_LAMBDA) -> "RiskModel":
+        model = cls(list(log_prices.columns), lam)
+        model.update(log_prices)
+        return model
+
+    def update(self, log_prices: pd.DataFrame):
+        """Fold in the days after last_day; the final day is left out until it is complete"""
+        if self.last_day is not None:
+            log_prices = log_prices[log_prices.index > self.last_day]
+        log_prices = log_prices.iloc[:-1].reindex(columns=self.currencies)
+        if log_prices.empty:
+            return
+
+        prices = log_prices.to_numpy()
+        if self.last_prices is not None:
+            # A currency whose file did not grow keeps its last price: a zero return
+            prices = pd.DataFrame(np.vstack([self.last_prices, prices])).ffill().to_numpy()
+        returns = np.diff(prices, axis=0)
+
+        if self.observations < SEED_DAYS:
+            seed = returns[:SEED_DAYS - self.observations]
+            total = self.observations + len(seed)
+            self.cov = (self.cov * self.observations + seed.T @ seed) / total
+            self.observations = total
+            returns = returns[len(seed):]
+        if len(returns):
+            k = len(returns)
+            weights = (1 - self.lam) * self.lam ** np.arange(k - 1, -1, -1)
+            self.cov = self.lam ** k * self.cov + (returns * weights[:, None]).T @ returns
+            self.observations += k
+
+        self.last_day = np.datetime64(log_prices.index[-1], "D")
+        self.last_prices = prices[-1]
+
+    def usd_price(self, currency: str) -> Optional[float]:
+        i = self.index.get(currency)
+        if i is None or self.last_prices is None:
+            return None
+        return float(np.exp(self.last_prices[i]))
+
+    def relative_to(self, account_currency: str) -> np.ndarray:
+        """Covariance of currency returns measured in the account currency"""
+        a = self.index.get(account_currency)
+        if a is None:
+            return self.cov
+        column = self.cov[:, a]
+        return self.cov - column[:, None] - column[None, :] + self.cov[a, a]
+
+    def correlation(self, cov: np.ndarray) -> np.ndarray:
+        vol = np.sqrt(np.diag(cov))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(vol, vol)
+        return np.nan_to_num(corr)
+
+class RiskModelCache:
+    """The risk model for the local price history, refreshed as files change.
+
+    Files are re-checked at most every refresh_seconds. Grown files are read
+    from the model's last day only and folded in; a pair added or removed
+    rebuilds from scratch.
+    """
+
+    def __init__(self, lam: float = DEFAULT_LAMBDA, refresh_seconds: float = 60.0):
+        self.lam = lam
+        self.refresh_seconds = refresh_seconds
+        self.model: Optional[RiskModel] = None
+        self._signature: Dict[str, Tuple[str, float, int]] = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[RiskModel]:
+        """Current model, or None without enough price history; blocking, so call off the event loop"""
+        if time.monotonic() - self._checked_at < self.refresh_seconds:
+            return self.model
+        with self._lock:
+            if time.monotonic() - self._checked_at >= self.refresh_seconds:
+                self._refresh()
+                self._checked_at = time.monotonic()
+        return self.model
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+    def _refresh(self):
+        paths = available_pairs()
+        signature = {pair: (path, os.path.getmtime(path), os.path.getsize(path)) for pair, path in paths.items()}
+        if signature == self._signature:
+            return
+        model = self.model
+        if model is not None and set(signature) == set(self._signature) and model.last_day is not None:
+            start = model.last_day + np.timedelta64(1, "D")
+            model.update(self._load(paths, start))
+        else:
+            prices = self._load(paths, None)
+            model = RiskModel.build(prices, self.lam) if len(prices.columns) > 1 else None
+        self.model = model if model is not None and model.observations >= SEED_DAYS else None
+        self._signature = signature
+
+    @staticmethod
+    def _load(paths: Dict[str, str], start: Optional[np.datetime64]) -> pd.DataFrame:
+        closes = {pair: _daily_closes(path, pair, start) for pair, path in paths.items()}
+        return currency_log_prices({pair: series for pair, series in closes.items() if len(series)})
+
+def trade_exposure(pair: str, direction: str, lot_size: float, entry_price: float) -> Dict[str, float]:
+    """Currency units a trade is long (+) or short (-): buying base means selling quote"""
+    spec = instrument_spec(pair)
+    units = (1.0 if direction == "long" else -1.0) * lot_size * spec.contract_size
+    return {spec.base: units, spec.quote: -units * entry_price}
+
+def net_exposures(trades: Iterable[dict]) -> Dict[str, float]:
+    """Open trades netted into currency units per currency"""
+    exposures: Dict[str, float] = {}
+    for trade in trades:
+        direction = getattr(trade["direction"], "value", trade["direction"])
+        for ccy, units in trade_exposure(trade["pair"], direction, trade["lot_size"], trade["entry_price"]).items():
+            exposures[ccy] = exposures.get(ccy, 0.0) + units
+    return exposures
+
+class PortfolioRisk:
+    """A user's currency exposures valued in the account currency, against one risk model"""
+
+    def __init__(self, model: Optional[RiskModel], exposures: Dict[str, float], account_currency: str = "USD"):
+        self.model = model
+        self.account_currency = account_currency
+        self.units = exposures
+        self.values = {ccy: units * price for ccy, units in exposures.items()
+                       if (price := self.price(ccy)) is not None}
+        self.cov = model.relative_to(account_currency) if model is not None else None
+        self.vector = self.exposure_vector(self.values)
+        # Sigma e, reused by every sizing call against this portfolio
+        self.cov_exposure = self.cov @ self.vector if model is not None else None
+
+    def price(self, currency: str) -> Optional[float]:
+        """Value of one unit of a currency in the account currency: cached rates, else the last history close"""
+        rate = get_rate_cache().get_rate(currency, self.account_currency)
+        if rate is not None:
+            return rate
+        if self.model is not None:
+            usd, account = self.model.usd_price(currency), self.model.usd_price(self.account_currency)
+            if usd is not None and account is not None:
+                return usd / account
+        return None
+
+    def exposure_vector(self, values: Dict[str, float]) -> Optional[np.ndarray]:
+        if self.model is None:
+            return None
+        vector = np.zeros(len(self.model.currencies))
+        for ccy, value in values.items():
+            i = self.model.index.get(ccy)
+            if i is not None:
+                vector[i] = value
+        return vector
+
+    def variance(self) -> Optional[float]:
+        if self.model is None:
+            return None
+        return float(self.vector @ self.cov_exposure)
+
+    def unmodelled(self) -> List[str]:
+        """Exposed currencies the model has no price history for, or that could not be valued"""
+        known = self.model.index if self.model is not None else {}
+        return sorted(ccy for ccy in self.units
+                      if ccy != self.account_currency and (ccy not in known or ccy not in self.values))
+
+    def summary(self, confidence: float = 0.99, horizon_days: int = 1) -> dict:
+        """Exposures, VaR, per-currency risk contributions and the correlation matrix"""
+        result = {
+            "account_currency": self.account_currency,
+            "exposures": [
+                {"currency": ccy, "units": round(units, 2),
+                 "value": round(self.values[ccy], 2) if ccy in self.values else None}
+                for ccy, units in sorted(self.units.items())
+            ],
+            "gross_exposure": round(sum(abs(v) for ccy, v in self.values.items() if ccy != self.account_currency), 2),
+            "unmodelled": self.unmodelled(),
+            "var": None,
+            "volatility": None,
+            "contributions": [],
+            "correlation": None,
+            "model": None,
+        }
+        if self.model is None:
+            return result
+
+        z = NormalDist().inv_cdf(confidence)
+        sigma = math.sqrt(max(self.variance(), 0.0))
+        scale = math.sqrt(horizon_days)
+        result["var"] = round(z * sigma * scale, 2)
+        result["volatility"] = round(sigma, 2)
+        if sigma > 0:
+            # Euler allocation: contributions sum to the portfolio VaR
+            contributions = self.vector * self.cov_exposure / sigma * z * scale
+            result["contributions"] = [
+                {"currency": ccy, "var": round(float(contributions[self.model.index[ccy]]), 2)}
+                for ccy in self.model.currencies if self.vector[self.model.index[ccy]] != 0
+            ]
+        held = [ccy for ccy in self.model.currencies
+                if ccy != self.account_currency and (self.vector[self.model.index[ccy]] != 0 or not self.values)]
+        corr = self.model.correlation(self.cov)
+        ids = [self.model.index[ccy] for ccy in held]
+        result["correlation"] = {"currencies": held, "matrix": np.round(corr[np.ix_(ids, ids)], 3).tolist()}
+        result["model"] = {
+            "as_of": str(self.model.last_day),
+            "observations": self.model.observations,
+            "lambda": self.model.lam,
+            "confidence": confidence,
+            "horizon_days": horizon_days,
+        }
+        return result
+
+    def size_trade(self, pair: str, direction: str, entry_price: float, standalone_lots: float,
+                   confidence: float = 0.99) -> dict:
+        """Correlation-adjusted lot size for a new trade.
+
+        The trade may add as much portfolio variance as an uncorrelated trade of
+        the standalone size would: a L^2 + 2 b L = a L0^2, with a the variance of
+        one lot and b its covariance with the book. Adding to correlated exposure
+        shrinks it; a hedge is never sized above the standalone lots.
+        """
+        values = {ccy: units * price for ccy, units in trade_exposure(pair, direction, 1.0, entry_price).items()
+                  if (price := self.price(ccy)) is not None}
+        d = self.exposure_vector(values)
+        if self.model is None or d is None or len(values) < 2:
+            return {"suggested_lot_size": round(standalone_lots, 2), "adjusted": False, "correlation": None,
+                    "var_before": None, "var_after": None}
+
+        a = float(d @ self.cov @ d)  # variance of one lot on its own
+        b = float(d @ self.cov_exposure)  # covariance of one lot with the book
+        c = max(self.variance(), 0.0)
+        if a <= 0:
+            lots = standalone_lots
+        else:
+            lots = (-b + math.sqrt(b * b + (a * standalone_lots) ** 2)) / a
+            lots = min(lots, standalone_lots)
+
+        z = NormalDist().inv_cdf(confidence)
+        after = max(a * lots * lots + 2 * b * lots + c, 0.0)
+        return {
+            "suggested_lot_size": round(lots, 2),
+            "adjusted": round(lots, 2) != round(standalone_lots, 2),
+            "correlation": round(b / math.sqrt(a * c), 3) if a > 0 and c > 0 else None,
+            "var_before": round(z * math.sqrt(c), 2),
+            "var_after": round(z * math.sqrt(after), 2),
+        }
+
+# Global risk model cache
+_risk_models: Optional[RiskModelCache] = None
+
+def get_risk_models() -> RiskModelCache:
+    """Get the process-wide risk model cache"""
+    global _risk_models
+
+    if _risk_models is None:
+        _risk_models = RiskModelCache(
+            lam=float(os.getenv("RISK_EWMA_LAMBDA", str(DEFAULT_LAMBDA))),
+            refresh_seconds=float(os.getenv("RISK_MODEL_REFRESH_SECONDS", "60"))
+        )
+
+    return _risk_models
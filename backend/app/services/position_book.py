@@ -0,0 +1,258 @@
+import asyncio
+import csv
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set
+from app.services.rate_service import get_rate_cache, normalize_pair
+
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+class Tick:
+    __slots__ = ("pair", "bid", "ask", "time")
+
+    def __init__(self, pair: str, bid: float, ask: float, time: Optional[datetime] = None):
+        self.pair = normalize_pair(pair)
+        self.bid = bid
+        self.ask = ask
+        self.time = time
+
+class Position:
+    """An open trade reduced to what floating P&L needs"""
+
+    __slots__ = ("trade_id", "user_id", "pair", "is_long", "entry_price", "factor", "pnl")
+
+    def __init__(self, trade: dict):
+        self.trade_id = trade["id"]
+        self.user_id = trade["user_id"]
+        self.pair = normalize_pair(trade["pair"])
+        self.is_long = trade["direction"] == "long"
+        self.entry_price = trade["entry_price"]
+        # Same formula as pnl.trade_profit: price move * point value * lots
+        self.factor = (1 if self.is_long else -1) * get_rate_cache().point_value(self.pair) * trade["lot_size"]
+        self.pnl: Optional[float] = None
+
+    def mark(self, bid: float, ask: float) -> float:
+        # Longs close at the bid, shorts at the ask
+        price = bid if self.is_long else ask
+        return round((price - self.entry_price) * self.factor, 2)
+
+class PositionBook:
+    """Open positions of users with live subscribers, indexed by pair.
+
+    A tick only touches the positions in its pair's bucket, and only P&L values
+    that actually changed are pushed to the owning user's subscribers.
+    """
+
+    def __init__(self):
+        self.positions: Dict[str, Position] = {}
+        self.by_pair: Dict[str, Dict[str, Position]] = {}
+        self.by_user: Dict[str, Set[str]] = {}
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.last_ticks: Dict[str, Tick] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        # Trade changes seen while a user's open trades are being queried, one buffer per load
+        self._pending: Dict[str, List[List[tuple]]] = {}
+
+    async def subscribe(self, repo, user_id: str) -> asyncio.Queue:
+        """Register a subscriber, loading the user's open trades on first use"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        if user_id not in self.by_user:
+            task = self._loading.get(user_id)
+            if task is None:
+                task = self._loading[user_id] = asyncio.ensure_future(self._load_user(repo, user_id))
+                task.add_done_callback(lambda done: self._loaded(user_id, done))
+            try:
+                # Shielded, so one subscriber going away doesn't cancel the load the others wait on
+                await asyncio.shield(task)
+            except BaseException:
+                # Don't leave a queue nobody will read registered for the user
+                self.unsubscribe(user_id, queue)
+                raise
+        return queue
+
+    def _loaded(self, user_id: str, task: asyncio.Task):
+        if self._loading.get(user_id) is task:
+            del self._loading[user_id]
+        if not task.cancelled():
+            # Mark a failure as retrieved even when every waiter left before it finished
+            task.exception()
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        """Drop a subscriber; the user's positions are evicted with the last one"""
+        queues = self.subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[user_id]
+            for trade_id in list(self.by_user.pop(user_id, ())):
+                self._remove(trade_id)
+
+    def snapshot(self, user_id: str) -> List[dict]:
+        """Current P&L of every open position of a user"""
+        return [
+            {"trade_id": p.trade_id, "pair": p.pair, "pnl": p.pnl}
+            for p in (self.positions[t] for t in self.by_user.get(user_id, ()))
+        ]
+
+    def on_trade_changed(self, before: Optional[dict], after: Optional[dict]):
+        """Keep the book in step with trade mutations for users being streamed"""
+        trade = after or before
+        if trade is None:
+            return
+        for changes in self._pending.get(trade.get("user_id"), ()):
+            changes.append((before, after))
+        if trade.get("user_id") in self.by_user:
+            self._apply_change(before, after)
+
+    def _apply_change(self, before: Optional[dict], after: Optional[dict]):
+        if before is not None:
+            self._remove(before["id"])
+        if after is not None and after.get("status") == "open":
+            self._add(after)
+
+    async def reload_user(self, repo, user_id: str):
+        """Reload a streamed user's open trades after a bulk write"""
+        if user_id not in self.by_user:
+            return
+        for trade_id in list(self.by_user.pop(user_id)):
+            self._remove(trade_id)
+        await self._load_user(repo, user_id)
+
+    def apply_tick(self, tick: Tick) -> int:
+        """Reprice the positions in the tick's pair and publish changed P&L; returns how many changed"""
+        self.last_ticks[tick.pair] = tick
+        bucket = self.by_pair.get(tick.pair)
+        if not bucket:
+            return 0
+
+        updates: Dict[str, List[dict]] = {}
+        for position in bucket.values():
+            pnl = position.mark(tick.bid, tick.ask)
+            if pnl != position.pnl:
+                previous = position.pnl
+                position.pnl = pnl
+                updates.setdefault(position.user_id, []).append({
+                    "trade_id": position.trade_id,
+                    "pnl": pnl,
+                    "delta": round(pnl - previous, 2) if previous is not None else None
+                })
+
+        for user_id, changes in updates.items():
+            self._publish(user_id, {"pair": tick.pair, "bid": tick.bid, "ask": tick.ask, "updates": changes})
+        return sum(len(changes) for changes in updates.values())
+
+    async def _load_user(self, repo, user_id: str):
+        changes: List[tuple] = []
+        self._pending.setdefault(user_id, []).append(changes)
+        try:
+            trades = await repo.query("trades", [("user_id", "==", user_id), ("status", "==", "open")])
+        finally:
+            buffers = self._pending[user_id]
+            buffers.remove(changes)
+            if not buffers:
+                del self._pending[user_id]
+        if user_id not in self.subscribers:
+            # The last subscriber left while the query ran
+            return
+        self.by_user.setdefault(user_id, set())
+        for trade in trades:
+            self._add(trade)
+        # Replaying by trade id is idempotent, whether or not the query already saw a change
+        for before, after in changes:
+            self._apply_change(before, after)
+
+    def _add(self, trade: dict):
+        position = Position(trade)
+        self.positions[position.trade_id] = position
+        self.by_pair.setdefault(position.pair, {})[position.trade_id] = position
+        self.by_user.setdefault(position.user_id, set()).add(position.trade_id)
+        tick = self.last_ticks.get(position.pair)
+        if tick is not None:
+            position.pnl = position.mark(tick.bid, tick.ask)
+
+    def _remove(self, trade_id: str):
+        position = self.positions.pop(trade_id, None)
+        if position is None:
+            return
+        bucket = self.by_pair.get(position.pair)
+        if bucket is not None:
+            bucket.pop(trade_id, None)
+            if not bucket:
+                del self.by_pair[position.pair]
+        user_trades = self.by_user.get(position.user_id)
+        if user_trades is not None:
+            user_trades.discard(trade_id)
+
+    def _publish(self, user_id: str, event: dict):
+        for queue in self.subscribers.get(user_id, ()):
+            if queue.full():
+                # Slow consumer: drop its oldest event rather than block the feed
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+class TickSource:
+    """Base class for price feeds"""
+
+    def ticks(self) -> AsyncIterator[Tick]:
+        raise NotImplementedError
+
+class ReplayTickSource(TickSource):
+    """Replays a CSV of time,pair,bid,ask rows, optionally paced by their timestamps"""
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+
+    async def ticks(self) -> AsyncIterator[Tick]:
+        while True:
+            previous = None
+            with open(self.path, newline="") as f:
+                for row in csv.DictReader(f):
+                    tick_time = datetime.fromisoformat(row["time"]) if row.get("time") else None
+                    if self.speed > 0 and previous is not None and tick_time is not None:
+                        await asyncio.sleep(max((tick_time - previous).total_seconds(), 0) / self.speed)
+                    else:
+                        await asyncio.sleep(0)
+                    previous = tick_time
+                    yield Tick(row["pair"], float(row["bid"]), float(row["ask"]), tick_time)
+            if not self.loop:
+                return
+
+async def run_tick_feed(book: PositionBook, source: TickSource):
+    """Drive a position book from a tick source until the source ends"""
+    async for tick in source.ticks():
+        book.apply_tick(tick)
+
+# Global position book
+_position_book: Optional[PositionBook] = None
+_feed_task: Optional[asyncio.Task] = None
+
+def get_position_book() -> PositionBook:
+    """Get the process-wide position book"""
+    global _position_book
+
+    if _position_book is None:
+        _position_book = PositionBook()
+
+    return _position_book
+
+def tick_push_enabled() -> bool:
+    """Whether POST /api/stream/ticks may inject prices; off unless TICK_PUSH_ENABLED is true"""
+    return os.getenv("TICK_PUSH_ENABLED", "false").lower() == "true"
+
+def ensure_tick_feed():
+    """Start replaying TICK_REPLAY_PATH into the book, if configured and not running"""
+    global _feed_task
+
+    path = os.getenv("TICK_REPLAY_PATH")
+    if not path or (_feed_task is not None and not _feed_task.done()):
+        return
+    source = ReplayTickSource(
+        path,
+        speed=float(os.getenv("TICK_REPLAY_SPEED", "1")),
+        loop=os.getenv("TICK_REPLAY_LOOP", "true").lower() == "true"
+    )
+    _feed_task = asyncio.ensure_future(run_tick_feed(get_position_book(), source))
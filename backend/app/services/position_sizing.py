@@ -0,0 +1,48 @@
+import numpy as np
+from app.services.instruments import instrument_spec
+from app.services.rate_service import get_rate_cache
+
+def size_positions(account_balance, risk_percentage, entry_price, stop_loss, pair) -> dict:
+    """Vectorized position sizing; invalid rows are flagged instead of raising"""
+    balance = np.asarray(account_balance, dtype=np.float64)
+    risk = np.asarray(risk_percentage, dtype=np.float64)
+    entry = np.asarray(entry_price, dtype=np.float64)
+    stop = np.asarray(stop_loss, dtype=np.float64)
+    
+    # Resolve pip metadata once per distinct pair rather than once per row
+    unique_pairs, pair_index = np.unique(np.asarray(pair, dtype=str), return_inverse=True)
+    specs = [instrument_spec(p) for p in unique_pairs]
+    rates = get_rate_cache()
+    multipliers = np.array([spec.pip_multiplier for spec in specs], dtype=np.float64)[pair_index]
+    contract_sizes = np.array([spec.contract_size for spec in specs], dtype=np.float64)[pair_index]
+    pip_values = np.array([rates.pip_value(p) for p in unique_pairs], dtype=np.float64)[pair_index]
+    
+    risk_amount = balance * risk / 100
+    pips_at_risk = np.abs(entry - stop) * multipliers
+    
+    checks = [
+        (~(balance > 0), "account_balance must be greater than 0"),
+        (~((risk > 0) & (risk <= 100)), "risk_percentage must be greater than 0 and at most 100"),
+        (~(entry > 0), "entry_price must be greater than 0"),
+        (~(stop > 0), "stop_loss must be greater than 0"),
+        (np.char.str_len(unique_pairs)[pair_index] == 0, "pair is required"),
+        (~(pips_at_risk > 0), "Stop loss must be different from entry price"),
+    ]
+    error = np.full(len(balance), None, dtype=object)
+    for failed, message in reversed(checks):
+        error[failed] = message
+    valid = np.array([e is None for e in error], dtype=bool)
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lot_size = np.where(valid, risk_amount / (pips_at_risk * pip_values), np.nan)
+    position_value = lot_size * contract_sizes * entry
+    
+    return {
+        "valid": valid,
+        "error": error,
+        "lot_size": np.round(lot_size, 2),
+        "risk_amount": np.round(risk_amount, 2),
+        "position_value": np.round(position_value, 2),
+        "pip_value": pip_values,
+        "pips_at_risk": np.round(pips_at_risk, 1),
+    }
@@ -0,0 +1,94 @@
+import os
+from datetime import datetime
+from typing import Dict, Optional
+import numpy as np
+from app.services.analytics_engine import normalize_time
+from app.services.rate_service import normalize_pair
+
+BAR_FIELDS = ("open", "high", "low", "close")
+
+class Bars:
+    """OHLC columns for one pair; arrays may be read-only views of a memory-mapped file"""
+
+    __slots__ = ("pair", "time", "open", "high", "low", "close")
+
+    def __init__(self, pair: str, time, open, high, low, close):
+        self.pair = pair
+        self.time = time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+def history_dir() -> str:
+    return os.getenv("PRICE_HISTORY_DIR", "./data/prices")
+
+def history_path(pair: str, directory: Optional[str] = None) -> Optional[str]:
+    """Find the .npy or .parquet history file for a pair (EURUSD.npy, EUR_USD.parquet, ...)"""
+    directory = directory or history_dir()
+    symbol = normalize_pair(pair).replace("/", "")
+    for name in (symbol, f"{symbol[:3]}_{symbol[3:]}"):
+        for extension in (".npy", ".parquet"):
+            path = os.path.join(directory, name + extension)
+            if os.path.exists(path):
+                return path
+    return None
+
+def available_pairs(directory: Optional[str] = None) -> Dict[str, str]:
+    """Every pair with a history file in the directory, mapped to its path"""
+    directory = directory or history_dir()
+    if not os.path.isdir(directory):
+        return {}
+    pairs = {}
+    for name in sorted(os.listdir(directory)):
+        symbol, extension = os.path.splitext(name)
+        symbol = symbol.replace("_", "")
+        if extension in (".npy", ".parquet") and len(symbol) == 6 and symbol.isalpha():
+            pairs.setdefault(normalize_pair(symbol), os.path.join(directory, name))
+    return pairs
+
+def load_bars(path: str, pair: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Bars:
+    """Load bars in [start, end) from a history file.
+
+    .npy files hold a structured array with time/open/high/low/close fields sorted
+    by time and are memory-mapped, so only the pages of the requested range are read.
+    """
+    if path.endswith(".parquet"):
+        columns = _read_parquet(path)
+    else:
+        data = np.load(path, mmap_mode="r")
+        columns = {field: data[field] for field in ("time",) + BAR_FIELDS}
+
+    times = columns["time"]
+    lo = np.searchsorted(times, _time_key(times, start)) if start else 0
+    hi = np.searchsorted(times, _time_key(times, end)) if end else len(times)
+
+    return Bars(
+        pair,
+        _as_datetime64(times[lo:hi]),
+        *(np.asarray(columns[field][lo:hi], dtype=np.float64) for field in BAR_FIELDS)
+    )
+
+def _read_parquet(path: str) -> dict:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Reading .parquet price history requires pyarrow")
+    table = pq.read_table(path, columns=["time", *BAR_FIELDS], memory_map=True)
+    return {name: table.column(name).to_numpy() for name in table.column_names}
+
+def _time_key(times: np.ndarray, value: datetime):
+    # Search in the file's own representation so the time column isn't converted wholesale
+    moment = np.datetime64(normalize_time(value), "us")
+    if np.issubdtype(times.dtype, np.datetime64):
+        return moment
+    return moment.astype("datetime64[s]").astype(np.int64)
+
+def _as_datetime64(values: np.ndarray) -> np.ndarray:
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[us]", copy=False)
+    # Integer times are epoch seconds
+    return values.astype("datetime64[s]").astype("datetime64[us]")
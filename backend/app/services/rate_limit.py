@@ -0,0 +1,82 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from fastapi.responses import JSONResponse
+from app.services.metrics import RATE_LIMITED
+
+class TokenBucketLimiter:
+    """Token bucket per key: refills at `rate` tokens per second up to `burst`.
+
+    Buckets refill lazily when touched, so idle users cost nothing but an LRU slot;
+    the least recently seen keys are dropped past max_keys (a dropped key starts full).
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """Take cost tokens; returns 0 when allowed, else seconds until they are available"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / self.rate
+
+# Global rate limiter
+_limiter: Optional[TokenBucketLimiter] = None
+
+def get_rate_limiter() -> Optional[TokenBucketLimiter]:
+    """Per-client API limiter from RATE_LIMIT_PER_SECOND / RATE_LIMIT_BURST, or None when the rate is 0 (the default)"""
+    global _limiter
+
+    rate = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))
+    if _limiter is None and rate > 0:
+        _limiter = TokenBucketLimiter(rate, float(os.getenv("RATE_LIMIT_BURST", "60")))
+
+    return _limiter
+
+def client_address(request) -> str:
+    """The caller's address, read from X-Forwarded-For when RATE_LIMIT_TRUSTED_PROXIES says proxies append to it.
+
+    With n trusted proxies in front of the app, the nth address from the right is
+    the one the outermost proxy saw; entries left of it are client-supplied.
+    """
+    trusted = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+    if trusted > 0:
+        forwarded = [address.strip() for address in request.headers.get("x-forwarded-for", "").split(",")]
+        forwarded = [address for address in forwarded if address]
+        if forwarded:
+            return forwarded[-min(trusted, len(forwarded))]
+    return request.client.host if request.client else ""
+
+async def rate_limit_middleware(request, call_next):
+    """Reject /api requests over the client's budget with 429 and a Retry-After hint"""
+    limiter = get_rate_limiter()
+    if limiter is None or not request.url.path.startswith("/api/"):
+        return await call_next(request)
+
+    # user_id is an unauthenticated query parameter, so budgets follow the client address instead
+    wait = limiter.acquire(client_address(request))
+    if wait > 0:
+        RATE_LIMITED.inc(method=request.method)
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests; retry after the Retry-After delay"},
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+    return await call_next(request)
@@ -0,0 +1,210 @@
+import csv
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from app.services.instruments import INSTRUMENT_OVERRIDES, instrument_spec, normalize_pair
+
+DEFAULT_PIP_VALUE = 10.0
+FX_SYMBOL = re.compile(r"[A-Z]{3}/[A-Z]{3}")
+
+class RateSource:
+    """Base class for quote providers feeding the rate cache"""
+
+    def fetch(self) -> Dict[str, float]:
+        """Return mid rates keyed by normalized pair, e.g. {'EUR/USD': 1.0842}"""
+        raise NotImplementedError
+
+class StaticRateSource(RateSource):
+    """Fixed rates, mainly for tests and defaults"""
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        self.rates = {normalize_pair(pair): float(rate) for pair, rate in (rates or {}).items()}
+
+    def fetch(self) -> Dict[str, float]:
+        return dict(self.rates)
+
+class CsvRateSource(RateSource):
+    """Rates read from a local CSV with a pair column and either rate or bid/ask"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self) -> Dict[str, float]:
+        rates = {}
+        with open(self.path, newline="") as f:
+            for row in csv.DictReader(f):
+                if row.get("rate"):
+                    rate = float(row["rate"])
+                else:
+                    rate = (float(row["bid"]) + float(row["ask"])) / 2
+                rates[normalize_pair(row["pair"])] = rate
+        return rates
+
+class RateCache:
+    """In-process TTL cache of FX rates and derived per-instrument values.
+
+    Each refresh precomputes, per pair, the point value (account-currency value of
+    a 1.0 price move on one lot: contract size times the quote-to-account rate) and
+    the pip value derived from it. Lookups are plain dict reads; refreshes happen
+    on a background thread and swap in new tables atomically, so requests never
+    wait on the source. Values of other well-formed pairs (any spelling, or pairs
+    the source has no rate for) are memoized in a bounded LRU that each refresh
+    clears, so arbitrary symbols can't grow it.
+    """
+
+    MEMO_SIZE = 4096
+
+    def __init__(self, source: RateSource, account_currency: str = "USD", ttl_seconds: float = 60.0):
+        self.source = source
+        self.account_currency = account_currency.upper()
+        self.ttl_seconds = ttl_seconds
+        self._rates: Dict[str, float] = {}
+        self._pip_values: Dict[str, float] = {}
+        self._point_values: Dict[str, float] = {}
+        self._memo: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._expires_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self):
+        """Fetch rates from the source and rebuild the lookup tables"""
+        with self._refresh_lock:
+            rates = self.source.fetch()
+            values = {pair: self._compute_values(pair, rates) for pair in rates}
+            self._rates = rates
+            self._point_values = {pair: point for pair, (point, _) in values.items()}
+            self._pip_values = {pair: pip for pair, (_, pip) in values.items()}
+            self._memo = OrderedDict()
+            self._expires_at = time.monotonic() + self.ttl_seconds
+
+    def start(self):
+        """Refresh now and keep refreshing every TTL on a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self.refresh()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="rate-cache-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def get_rate(self, base: str, quote: str) -> Optional[float]:
+        """Price of one unit of base in quote, using direct, inverse or USD cross rates"""
+        return self._lookup_rate(base.upper(), quote.upper(), self._rates)
+
+    def pip_value(self, pair: str) -> float:
+        """Value of one pip per lot in the account currency"""
+        return self._value(pair, self._pip_values, 1)
+
+    def point_value(self, pair: str) -> float:
+        """Value of a 1.0 price move per lot in the account currency; P&L is move * point value * lots"""
+        return self._value(pair, self._point_values, 0)
+
+    def _value(self, pair: str, table: Dict[str, float], column: int) -> float:
+        value = table.get(pair)
+        if value is None:
+            value = self._memoized(pair)[column]
+        if time.monotonic() > self._expires_at:
+            self._schedule_refresh()
+        return value
+
+    def _memoized(self, pair: str) -> Tuple[float, float]:
+        """(point value, pip value) of a pair the refreshed tables don't hold under this spelling"""
+        memo = self._memo
+        values = memo.get(pair)
+        if values is not None:
+            memo.move_to_end(pair)
+            return values
+        normalized = normalize_pair(pair)
+        values = self._compute_values(normalized, self._rates)
+        if FX_SYMBOL.fullmatch(normalized) or normalized in INSTRUMENT_OVERRIDES:
+            memo[pair] = values
+            if len(memo) > self.MEMO_SIZE:
+                memo.popitem(last=False)
+        return values
+
+    def _refresh_loop(self):
+        while not self._stop_event.wait(self.ttl_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the last good tables if the source is unavailable
+                print(f"Warning: rate refresh failed: {e}")
+
+    def _schedule_refresh(self):
+        if self._thread and self._thread.is_alive():
+            return
+        if self._refresh_lock.locked():
+            return
+        # Push the deadline out so concurrent lookups don't each spawn a refresh
+        self._expires_at = time.monotonic() + self.ttl_seconds
+        threading.Thread(target=self._safe_refresh, name="rate-cache-refresh-once", daemon=True).start()
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Warning: rate refresh failed: {e}")
+
+    def _compute_values(self, pair: str, rates: Dict[str, float]) -> Tuple[float, float]:
+        """(point value, pip value) of a pair; without a conversion rate the pip is worth DEFAULT_PIP_VALUE"""
+        spec = instrument_spec(pair)
+        conversion = self._lookup_rate(spec.quote, self.account_currency, rates) if spec.quote else None
+        if conversion is None:
+            return DEFAULT_PIP_VALUE / spec.pip_size, DEFAULT_PIP_VALUE
+        point_value = spec.contract_size * conversion
+        return point_value, round(spec.pip_size * point_value, 5)
+
+    @staticmethod
+    def _lookup_rate(base: str, quote: str, rates: Dict[str, float]) -> Optional[float]:
+        if base == quote:
+            return 1.0
+        direct = rates.get(f"{base}/{quote}")
+        if direct:
+            return direct
+        inverse = rates.get(f"{quote}/{base}")
+        if inverse:
+            return 1.0 / inverse
+        if "USD" not in (base, quote):
+            to_usd = RateCache._lookup_rate(base, "USD", rates)
+            from_usd = RateCache._lookup_rate("USD", quote, rates)
+            if to_usd and from_usd:
+                return to_usd * from_usd
+        return None
+
+# Global rate cache
+_rate_cache: Optional[RateCache] = None
+
+def create_rate_source() -> RateSource:
+    """Build the configured rate source"""
+    csv_path = os.getenv("RATES_CSV_PATH")
+    if csv_path and os.path.exists(csv_path):
+        return CsvRateSource(csv_path)
+    return StaticRateSource()
+
+def get_rate_cache() -> RateCache:
+    """Get the process-wide rate cache, starting its refresher on first use"""
+    global _rate_cache
+
+    if _rate_cache is None:
+        cache = RateCache(
+            create_rate_source(),
+            account_currency=os.getenv("ACCOUNT_CURRENCY", "USD"),
+            ttl_seconds=float(os.getenv("RATES_TTL_SECONDS", "60"))
+        )
+        try:
+            cache.start()
+        except Exception as e:
+            print(f"Warning: could not load FX rates ({e}). Using default pip values.")
+        _rate_cache = cache
+
+    return _rate_cache
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from app.services.metrics import COALESCED_CALLS
+from app.services.single_flight import SingleFlight
+
+class CacheBackend:
+    """Storage for cached response bodies and per-user version counters"""
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        raise NotImplementedError
+
+    def set(self, key: str, body: bytes, etag: str):
+        raise NotImplementedError
+
+    def get_version(self, user_id: str) -> int:
+        raise NotImplementedError
+
+    def bump_version(self, user_id: str) -> int:
+        raise NotImplementedError
+
+    def version_tag(self, user_id: str) -> str:
+        """The user's version as a string that never names two different states"""
+        return str(self.get_version(user_id))
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU capped by entry count and total body bytes"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 10000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        # Versions restart at 0 with the process and differ between workers
+        self._instance = uuid.uuid4().hex[:12]
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, body: bytes, etag: str):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._entries[key] = (body, etag)
+            self._size += len(body)
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get_version(self, user_id: str) -> int:
+        return self._versions.get(user_id, 0)
+
+    def bump_version(self, user_id: str) -> int:
+        with self._lock:
+            version = self._versions.get(user_id, 0) + 1
+            self._versions[user_id] = version
+            return version
+
+    def version_tag(self, user_id: str) -> str:
+        return f"{self._instance}.{self.get_version(user_id)}"
+
+class SqliteCacheBackend(CacheBackend):
+    """File-backed cache shared by every worker process on the host"""
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, body BLOB, etag TEXT, size INTEGER, accessed REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS versions (user_id TEXT PRIMARY KEY, version INTEGER)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        conn = self._connect()
+        row = conn.execute("SELECT body, etag FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        return bytes(row[0]), row[1]
+
+    def set(self, key: str, body: bytes, etag: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                         (key, body, etag, len(body), time.time()))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                # Drop the least recently used quarter in one statement
+                conn.execute("DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT "
+                             "(SELECT COUNT(*) / 4 + 1 FROM entries))")
+
+    def get_version(self, user_id: str) -> int:
+        row = self._connect().execute("SELECT version FROM versions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, user_id: str) -> int:
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT INTO versions VALUES (?, 1) "
+                         "ON CONFLICT(user_id) DO UPDATE SET version = version + 1", (user_id,))
+            return conn.execute("SELECT version FROM versions WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+class ResponseCache:
+    """Caches JSON responses per (user, endpoint, params) and answers If-None-Match.
+
+    Keys embed the user's version counter, so a trade mutation invalidates every
+    cached response for that user at once; stale entries simply age out of the LRU.
+    Concurrent misses on one key (a dashboard open in several tabs) share a
+    single computation.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._inflight = SingleFlight()
+
+    def invalidate_user(self, user_id: str):
+        """Invalidate every cached response for a user"""
+        self.backend.bump_version(user_id)
+
+    def user_version(self, user_id: str) -> int:
+        """Current cache version for a user"""
+        return self.backend.get_version(user_id)
+
+    def version_tag(self, user_id: str) -> str:
+        """Current version, safe to persist or compare across workers and restarts"""
+        return self.backend.version_tag(user_id)
+
+    async def respond(self, request: Request, user_id: str, endpoint: str, params: dict,
+                      compute: Callable[[], Awaitable[object]]) -> Response:
+        """Serve a cached response, a 304, or compute, cache and serve a fresh one"""
+        version = self.backend.get_version(user_id)
+        key = f"{user_id}:{version}:{endpoint}:{json.dumps(params, sort_keys=True, default=str)}"
+
+        entry = self.backend.get(key)
+        if entry is None:
+            (body, etag), shared = await self._inflight.do(key, lambda: self._compute(key, compute))
+            if shared:
+                COALESCED_CALLS.inc(operation=endpoint)
+        else:
+            body, etag = entry
+
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag in _parse_if_none_match(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[object]]) -> Tuple[bytes, str]:
+        payload = await compute()
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.backend.set(key, body, etag)
+        return body, etag
+
+def _parse_if_none_match(value: Optional[str]) -> set:
+    if not value:
+        return set()
+    return {tag.strip().removeprefix("W/") for tag in value.split(",")}
+
+# Global response cache
+_response_cache: Optional[ResponseCache] = None
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache"""
+    global _response_cache
+
+    if _response_cache is None:
+        max_bytes = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        if os.getenv("RESPONSE_CACHE_BACKEND", "memory") == "sqlite":
+            backend = SqliteCacheBackend(os.getenv("RESPONSE_CACHE_PATH", "./response-cache.sqlite3"), max_bytes)
+        else:
+            backend = MemoryCacheBackend(max_bytes, int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000")))
+        _response_cache = ResponseCache(backend)
+
+    return _response_cache
@@ -0,0 +1,60 @@
+from datetime import date, datetime
+from typing import Optional
+from fastapi import Response
+from app.services.trade_records import TradeRecord
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Opt-in media types for the fast path; plain application/json keeps the validated response
+ORJSON_MEDIA_TYPE = "application/vnd.mckay+json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+# Every representation of a negotiated URL carries this, so shared caches key on Accept
+VARY_ACCEPT = {"Vary": "Accept"}
+
+def negotiate_fast_format(accept: Optional[str]) -> Optional[str]:
+    """Pick 'orjson' or 'msgpack' from an Accept header, if requested and installed"""
+    if not accept:
+        return None
+    for media_range in accept.split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        if any(_is_zero_quality(param) for param in params):
+            continue
+        media_type = media_type.lower()
+        if media_type == ORJSON_MEDIA_TYPE and orjson is not None:
+            return "orjson"
+        if media_type in MSGPACK_MEDIA_TYPES and msgpack is not None:
+            return "msgpack"
+    return None
+
+def fast_response(data: dict, fast_format: str, message: Optional[str] = None) -> Response:
+    """Serialize an ApiResponse envelope holding TradeRecords without building models"""
+    body = {"success": True, "message": message, "data": data, "error": None}
+    if fast_format == "msgpack":
+        content = msgpack.packb(body, default=_serialize_default, use_bin_type=True)
+        media_type = MSGPACK_MEDIA_TYPES[0]
+    else:
+        content = orjson.dumps(body, default=_serialize_default)
+        media_type = ORJSON_MEDIA_TYPE
+    return Response(content=content, media_type=media_type, headers=VARY_ACCEPT)
+
+def _is_zero_quality(param: str) -> bool:
+    name, _, value = param.partition("=")
+    try:
+        return name.strip().lower() == "q" and float(value) == 0
+    except ValueError:
+        return False
+
+def _serialize_default(value):
+    if isinstance(value, TradeRecord):
+        return value.to_dict()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
@@ -0,0 +1,33 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List, Tuple
+
+class SingleFlight:
+    """Coalesces concurrent identical calls: callers with the same key while one is
+    in flight await that call's result instead of starting their own.
+
+    The call runs as its own task, so a caller that goes away (client disconnect)
+    doesn't cancel it for the others. Nothing is kept once it finishes.
+    """
+
+    def __init__(self):
+        # key -> [task, number of callers awaiting it]
+        self._calls: Dict[Hashable, List] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[object]]) -> Tuple[object, bool]:
+        """Result of fn() or of the identical call already running, and whether several callers got it"""
+        call = self._calls.get(key)
+        if call is None or call[0].done():
+            task = asyncio.ensure_future(fn())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _: self._forget(key, call))
+        call[1] += 1
+        result = await asyncio.shield(call[0])
+        # Nobody joins a finished call, so the count is final once the result is in
+        return result, call[1] > 1
+
+    def _forget(self, key: Hashable, call: List):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call[0].cancelled():
+            # Retrieved here so a failure nobody awaited anymore isn't logged as unhandled
+            call[0].exception()
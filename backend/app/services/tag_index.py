@@ -0,0 +1,262 @@
+import asyncio
+import os
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from app.services.analytics_engine import is_closed_trade
+from app.services.user_index import UserIndexStore
+
+TAGS_COLLECTION = "trade_tags"
+DEFAULT_TAG_COLOR = "#6b7280"
+COMBINATION_METRICS = ("expectancy", "win_rate", "profit_factor", "total_profit", "trades")
+MAX_COMBINATIONS = 20000  # frequent combinations evaluated per top-k query
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def popcount(bits: np.ndarray) -> int:
+    """Number of set bits in a packed bitmap"""
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(bits).sum(dtype=np.int64))
+    return int(_POPCOUNT_TABLE[bits].sum(dtype=np.int64))
+
+def tag_id(user_id: str, name: str) -> str:
+    """Document id of a tag's metadata"""
+    return f"{user_id}:{name}"
+
+class TagIndex:
+    """One user's trades as slots in packed bitmaps: one bitmap per tag plus a closed-trade mask.
+
+    Tags get dense integer ids in first-seen order. AND/OR/NOT filters are byte-wise
+    ops over the bitmaps (n/8 bytes each), so membership tests cost the same for any
+    number of trades per tag; profits are only gathered for the final selection.
+    """
+
+    def __init__(self, user_id: str, version: int = 0):
+        self.user_id = user_id
+        self.version = version
+        self.tag_ids: Dict[str, int] = {}
+        self.tag_names: List[str] = []
+        self.tag_bits: List[np.ndarray] = []
+        self.metadata: Dict[str, dict] = {}
+        self.slots: Dict[str, int] = {}
+        self.slot_tags: List[tuple] = []
+        self.free: List[int] = []
+        self.size = 0
+        self.profits = np.zeros(0)
+        self.closed = np.zeros(0, dtype=np.uint8)
+
+    @classmethod
+    def build(cls, user_id: str, trades: Iterable[dict], metadata: Iterable[dict] = (), version: int = 0) -> "TagIndex":
+        """Index a user's trades in one pass"""
+        index = cls(user_id, version)
+        trades = list(trades)
+        index._grow(len(trades))
+        for trade in trades:
+            index.set_trade(trade)
+        for tag in metadata:
+            index.metadata[tag["name"]] = tag
+        return index
+
+    def set_trade(self, trade: dict):
+        """Add a trade, or move an existing one to its new tags and result"""
+        slot = self.slots.get(trade["id"])
+        if slot is None:
+            slot = self._allocate(trade["id"])
+        else:
+            self._clear_slot(slot)
+
+        ids = tuple(self._tag_id(tag) for tag in dict.fromkeys(trade.get("tags") or []))
+        self.slot_tags[slot] = ids
+        for i in ids:
+            _set_bit(self.tag_bits[i], slot)
+        if is_closed_trade(trade):
+            self.profits[slot] = trade["profit"]
+            _set_bit(self.closed, slot)
+
+    def remove_trade(self, trade_id: str):
+        slot = self.slots.pop(trade_id, None)
+        if slot is not None:
+            self._clear_slot(slot)
+            self.free.append(slot)
+
+    def select(self, all_of: Sequence[str] = (), any_of: Sequence[str] = (),
+               none_of: Sequence[str] = ()) -> np.ndarray:
+        """Bitmap of closed trades having every all_of tag, at least one any_of tag and no none_of tag"""
+        bits = self.closed.copy()
+        for tag in all_of:
+            if tag not in self.tag_ids:
+                return np.zeros_like(bits)
+            np.bitwise_and(bits, self.tag_bits[self.tag_ids[tag]], out=bits)
+        if any_of:
+            union = np.zeros_like(bits)
+            for tag in any_of:
+                if tag in self.tag_ids:
+                    np.bitwise_or(union, self.tag_bits[self.tag_ids[tag]], out=union)
+            np.bitwise_and(bits, union, out=bits)
+        for tag in none_of:
+            if tag in self.tag_ids:
+                np.bitwise_and(bits, ~self.tag_bits[self.tag_ids[tag]], out=bits)
+        return bits
+
+    def stats(self, bits: np.ndarray) -> dict:
+        """Win rate, expectancy and profit factor of the trades in a bitmap"""
+        mask = np.unpackbits(bits, count=self.size, bitorder="little").view(bool)
+        profits = self.profits[:self.size][mask]
+        trades = len(profits)
+        gains = profits[profits > 0]
+        losses = profits[profits < 0]
+        gross_profit = float(gains.sum())
+        gross_loss = float(-losses.sum())
+        return {
+            "trades": trades,
+            "wins": len(gains),
+            "losses": len(losses),
+            "win_rate": round(len(gains) / trades * 100, 2) if trades else 0.0,
+            "total_profit": round(float(profits.sum()), 2),
+            "expectancy": round(float(profits.mean()), 2) if trades else 0.0,
+            "average_win": round(float(gains.mean()), 2) if len(gains) else 0.0,
+            "average_loss": round(float(losses.mean()), 2) if len(losses) else 0.0,
+            "profit_factor": round(gross_profit / gross_loss, 2) if gross_loss > 0 else 0.0,
+        }
+
+    def trade_ids(self, bits: np.ndarray) -> List[str]:
+        """Ids of the trades in a bitmap"""
+        owners = {slot: trade_id for trade_id, slot in self.slots.items()}
+        slots = np.flatnonzero(np.unpackbits(bits, count=self.size, bitorder="little"))
+        return [owners[slot] for slot in slots.tolist()]
+
+    def tag_summary(self) -> List[dict]:
+        """Every tag with its metadata and closed-trade stats, most used first"""
+        tags = []
+        for name in set(self.tag_names) | set(self.metadata):
+            meta = self.metadata.get(name, {})
+            bits = self.select(all_of=[name])
+            tags.append({
+                "id": meta.get("id", tag_id(self.user_id, name)),
+                "name": name,
+                "color": meta.get("color", DEFAULT_TAG_COLOR),
+                "description": meta.get("description"),
+                "created_at": meta.get("created_at"),
+                "open_trades": self._open_count(name),
+                **self.stats(bits),
+            })
+        tags.sort(key=lambda tag: (-tag["trades"], tag["name"]))
+        return tags
+
+    def top_combinations(self, k: int = 10, min_size: int = 2, max_size: int = 2, min_trades: int = 10,
+                         metric: str = "expectancy", tags: Optional[Sequence[str]] = None) -> List[dict]:
+        """Best AND-combinations of tags by metric, among those with at least min_trades closed trades.
+
+        Combinations are grown a tag at a time (Apriori): a combination below
+        min_trades can only shrink when extended, so it is never extended.
+        """
+        if metric not in COMBINATION_METRICS:
+            raise ValueError(f"metric must be one of {', '.join(COMBINATION_METRICS)}")
+
+        names = [name for name in (tags if tags is not None else self.tag_names) if name in self.tag_ids]
+        level = []
+        for name in sorted(set(names)):
+            bits = self.closed & self.tag_bits[self.tag_ids[name]]
+            if popcount(bits) >= min_trades:
+                level.append(((name,), bits))
+        singles = list(level)
+
+        results = []
+        evaluated = 0
+        for size in range(1, max_size + 1):
+            if size >= min_size:
+                for combo, bits in level:
+                    results.append({"tags": list(combo), **self.stats(bits)})
+            if size == max_size:
+                break
+
+            next_level = []
+            for combo, bits in level:
+                # Extend only with tags after the last one, so each combination is built once
+                for (name,), tag_bits in singles:
+                    if name <= combo[-1]:
+                        continue
+                    joined = bits & tag_bits
+                    evaluated += 1
+                    if evaluated > MAX_COMBINATIONS:
+                        raise ValueError("Too many tag combinations; raise min_trades or lower max_size")
+                    if popcount(joined) >= min_trades:
+                        next_level.append((combo + (name,), joined))
+            level = next_level
+
+        results.sort(key=lambda row: (row[metric], row["trades"]), reverse=True)
+        return results[:k]
+
+    def _open_count(self, name: str) -> int:
+        if name not in self.tag_ids:
+            return 0
+        return popcount(self.tag_bits[self.tag_ids[name]] & ~self.closed)
+
+    def _tag_id(self, name: str) -> int:
+        index = self.tag_ids.get(name)
+        if index is None:
+            index = self.tag_ids[name] = len(self.tag_names)
+            self.tag_names.append(name)
+            self.tag_bits.append(np.zeros_like(self.closed))
+        return index
+
+    def _allocate(self, trade_id: str) -> int:
+        if self.free:
+            slot = self.free.pop()
+        else:
+            if self.size == len(self.profits):
+                self._grow(max(64, self.size * 2))
+            slot = self.size
+            self.size += 1
+            self.slot_tags.append(())
+        self.slots[trade_id] = slot
+        return slot
+
+    def _clear_slot(self, slot: int):
+        for i in self.slot_tags[slot]:
+            _clear_bit(self.tag_bits[i], slot)
+        self.slot_tags[slot] = ()
+        _clear_bit(self.closed, slot)
+        self.profits[slot] = 0.0
+
+    def _grow(self, capacity: int):
+        if capacity <= len(self.profits):
+            return
+        capacity = -(-capacity // 8) * 8
+        extra_bytes = capacity // 8 - len(self.closed)
+        self.profits = np.concatenate([self.profits, np.zeros(capacity - len(self.profits))])
+        self.closed = _extend(self.closed, extra_bytes)
+        self.tag_bits = [_extend(bits, extra_bytes) for bits in self.tag_bits]
+
+def _set_bit(bits: np.ndarray, slot: int):
+    bits[slot >> 3] |= 1 << (slot & 7)
+
+def _clear_bit(bits: np.ndarray, slot: int):
+    bits[slot >> 3] &= ~(1 << (slot & 7)) & 0xFF
+
+def _extend(bits: np.ndarray, extra_bytes: int) -> np.ndarray:
+    return np.concatenate([bits, np.zeros(extra_bytes, dtype=np.uint8)])
+
+class TagIndexStore(UserIndexStore):
+    """Per-user tag indexes plus tag metadata edits made through the API"""
+
+    def set_metadata(self, user_id: str, tag: dict):
+        index = self.indexes.get(user_id)
+        if index is not None:
+            index.metadata[tag["name"]] = tag
+
+    async def _load(self, repo, user_id: str, version: int) -> TagIndex:
+        trades = await repo.query("trades", [("user_id", "==", user_id)])
+        metadata = await repo.query(TAGS_COLLECTION, [("user_id", "==", user_id)])
+        return await asyncio.to_thread(TagIndex.build, user_id, trades, metadata, version)
+
+# Global tag index store
+_tag_indexes: Optional[TagIndexStore] = None
+
+def get_tag_indexes() -> TagIndexStore:
+    """Get the process-wide tag index store"""
+    global _tag_indexes
+
+    if _tag_indexes is None:
+        _tag_indexes = TagIndexStore(max_users=int(os.getenv("TAG_INDEX_MAX_USERS", "1000")))
+
+    return _tag_indexes
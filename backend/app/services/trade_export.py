@@ -0,0 +1,200 @@
+import asyncio
+import glob
+import hashlib
+import os
+import tempfile
+import uuid
+from typing import AsyncIterator, List, Optional
+import numpy as np
+import pandas as pd
+from app.services.analytics_engine import normalize_time
+from app.services.instruments import instrument_spec
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+STRING_COLUMNS = ("id", "pair", "direction", "status", "notes")
+FLOAT_COLUMNS = ("entry_price", "exit_price", "stop_loss", "take_profit", "lot_size", "profit", "pips", "r_multiple")
+TIME_COLUMNS = ("open_time", "close_time", "created_at", "updated_at")
+EXPORT_COLUMNS = ("id", "pair", "direction", "status", "entry_price", "exit_price", "stop_loss", "take_profit",
+                  "lot_size", "profit", "pips", "r_multiple", "tags", "notes", *TIME_COLUMNS)
+
+def format_available(file_format: str) -> bool:
+    """CSV needs only pandas; Arrow and Parquet need pyarrow"""
+    if file_format == "csv":
+        return True
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def export_cache_dir() -> str:
+    return os.getenv("EXPORT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "mckay-exports")
+
+def export_chunk_rows() -> int:
+    return int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+def export_path(user_id: str, file_format: str, version_tag: str) -> str:
+    """Cache file of one user's export at one version"""
+    return os.path.join(export_cache_dir(), f"{_user_key(user_id)}-{version_tag}.{EXPORT_FORMATS[file_format][1]}")
+
+def cached_export(user_id: str, file_format: str, version_tag: str) -> Optional[str]:
+    path = export_path(user_id, file_format, version_tag)
+    return path if os.path.exists(path) else None
+
+def export_frame(trades: List[dict]) -> pd.DataFrame:
+    """Trade documents as export columns, plus pip distance and R-multiple derived from the prices"""
+    def column(name):
+        return [trade.get(name) for trade in trades]
+
+    entry = np.array(column("entry_price"), dtype=np.float64)
+    exit_price = np.array(column("exit_price"), dtype=np.float64)
+    stop = np.array(column("stop_loss"), dtype=np.float64)
+    pairs = [pair or "" for pair in column("pair")]
+    directions = column("direction")
+    sign = np.where(np.array(directions, dtype=object) == "short", -1.0, 1.0)
+    move = (exit_price - entry) * sign
+
+    multipliers = {pair: instrument_spec(pair).pip_multiplier for pair in set(pairs)}
+    risk = np.abs(entry - stop)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r_multiple = np.where(risk > 0, move / risk, np.nan)
+
+    frame = pd.DataFrame({
+        "id": pd.Series(column("id"), dtype=object),
+        "pair": pd.Series(pairs, dtype=object),
+        "direction": pd.Series(directions, dtype=object),
+        "status": pd.Series(column("status"), dtype=object),
+        "entry_price": entry,
+        "exit_price": exit_price,
+        "stop_loss": stop,
+        "take_profit": np.array(column("take_profit"), dtype=np.float64),
+        "lot_size": np.array(column("lot_size"), dtype=np.float64),
+        "profit": np.array(column("profit"), dtype=np.float64),
+        "pips": np.round(move * np.array([multipliers[pair] for pair in pairs], dtype=np.float64), 1),
+        "r_multiple": np.round(r_multiple, 2),
+        "tags": pd.Series([list(tags or ()) for tags in column("tags")], dtype=object),
+        "notes": pd.Series(column("notes"), dtype=object),
+    })
+    for name in TIME_COLUMNS:
+        frame[name] = pd.to_datetime([normalize_time(value) for value in column(name)]).astype("datetime64[us]")
+    return frame
+
+class ExportWriter:
+    """Writes frames to a file in one format and returns the bytes each write added.
+
+    The file doubles as the cache entry, so the response streams exactly what is
+    stored; only one chunk of rows is in memory at a time.
+    """
+
+    def __init__(self, file_format: str, path: str):
+        self.file_format = file_format
+        self.sink = open(path, "wb")
+        self.tail = open(path, "rb")
+        self.writer = None
+
+    def write(self, frame: pd.DataFrame) -> bytes:
+        if self.file_format == "csv":
+            # to_csv's date_format runs strftime per cell; numpy formats whole columns at once
+            times = {name: _iso_strings(frame[name].to_numpy()) for name in TIME_COLUMNS}
+            frame = frame.assign(tags=frame["tags"].map(";".join), **times)
+            self.sink.write(frame.to_csv(index=False, header=self.writer is None).encode())
+            self.writer = True
+        else:
+            import pyarrow as pa
+            table = pa.Table.from_pandas(frame, schema=arrow_schema(), preserve_index=False)
+            if self.writer is None:
+                self.writer = self._open_arrow_writer(table.schema)
+            self.writer.write_table(table)
+        return self._drain()
+
+    def close(self) -> bytes:
+        try:
+            data = b""
+            if self.writer is None:
+                # Nothing exported still yields a valid, empty file with the header/schema
+                data = self.write(export_frame([]))
+            if self.file_format != "csv":
+                self.writer.close()
+            return data + self._drain()
+        finally:
+            self.sink.close()
+            self.tail.close()
+
+    def abort(self):
+        self.sink.close()
+        self.tail.close()
+
+    def _open_arrow_writer(self, schema):
+        import pyarrow as pa
+        if self.file_format == "arrow":
+            return pa.ipc.new_stream(self.sink, schema)
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(self.sink, schema, compression="zstd")
+
+    def _drain(self) -> bytes:
+        self.sink.flush()
+        return self.tail.read()
+
+def _iso_strings(values: np.ndarray) -> np.ndarray:
+    strings = np.datetime_as_string(values, unit="us")
+    strings[np.isnat(values)] = ""
+    return strings
+
+def arrow_schema():
+    import pyarrow as pa
+    types = {
+        **{name: pa.string() for name in STRING_COLUMNS},
+        **{name: pa.float64() for name in FLOAT_COLUMNS},
+        **{name: pa.timestamp("us") for name in TIME_COLUMNS},
+        "tags": pa.list_(pa.string()),
+    }
+    return pa.schema([(name, types[name]) for name in EXPORT_COLUMNS])
+
+async def stream_export(repo, user_id: str, file_format: str, version_tag: str) -> AsyncIterator[bytes]:
+    """Export a user's trades oldest first, yielding bytes as each chunk is written to the cache file"""
+    path = export_path(user_id, file_format, version_tag)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.{uuid.uuid4().hex}.partial"
+    writer = ExportWriter(file_format, partial)
+    chunk_rows = export_chunk_rows()
+    try:
+        trades = repo.stream("trades", [("user_id", "==", user_id)],
+                             [("created_at", "ASCENDING"), ("id", "ASCENDING")])
+        chunk = []
+        async for trade in trades:
+            chunk.append(trade)
+            if len(chunk) >= chunk_rows:
+                yield await asyncio.to_thread(_write_chunk, writer, chunk)
+                chunk = []
+        if chunk:
+            yield await asyncio.to_thread(_write_chunk, writer, chunk)
+        yield await asyncio.to_thread(writer.close)
+    except BaseException:
+        # Client went away or the query failed: never leave a partial file behind as a cache entry
+        writer.abort()
+        os.remove(partial)
+        raise
+
+    os.replace(partial, path)
+    _remove_older_exports(user_id, path)
+
+def _write_chunk(writer: ExportWriter, trades: List[dict]) -> bytes:
+    return writer.write(export_frame(trades))
+
+def _remove_older_exports(user_id: str, keep: str):
+    extension = os.path.splitext(keep)[1]
+    for path in glob.glob(os.path.join(export_cache_dir(), f"{_user_key(user_id)}-*{extension}")):
+        if path != keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def _user_key(user_id: str) -> str:
+    # User ids go into file names; hash them so any id is a safe, fixed-length name
+    return hashlib.blake2b(user_id.encode(), digest_size=12).hexdigest()
@@ -0,0 +1,75 @@
+import asyncio
+import weakref
+from typing import List, Optional, Tuple
+from app.services.analytics_aggregate import record_trade_change, rebuild_aggregate
+from app.services import analytics_rollups
+from app.services.event_log import get_event_log, trade_event
+from app.services.response_cache import get_response_cache
+from app.services.position_book import get_position_book
+from app.services.tag_index import get_tag_indexes
+from app.services.trade_search import get_trade_search
+
+# Per-user locks serializing this process's trade transactions, so they don't retry against each other
+_user_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+async def commit_trade_change(repo, user_id: str, trade_id: str, action: str,
+                              data: Optional[dict] = None) -> Tuple[Optional[dict], Optional[dict]]:
+    """Write one trade ("set", "update" or "delete") in a transaction with the user's aggregate and rollups,
+    then refresh the rest of the derived state; returns the trade (before, after), both None if it is gone"""
+    def commit(transaction):
+        before = transaction.get_document("trades", trade_id)
+        if action == "set":
+            after = data
+        elif action == "update" and before is not None:
+            after = {**before, **data}
+        else:
+            after = None
+        if before is None and after is None:
+            return None, None
+
+        # Every read happens before the first write is queued
+        writes = record_trade_change(transaction, user_id, before, after)
+        writes += analytics_rollups.record_trade_change(transaction, user_id, before, after)
+        writes.append((action, "trades", trade_id, data))
+        for write in writes:
+            transaction.write(*write)
+        return before, after
+
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = _user_locks[user_id] = asyncio.Lock()
+    async with lock:
+        before, after = await repo.run_transaction(commit)
+    if before is not None or after is not None:
+        await on_trade_changed(repo, user_id, before, after)
+    return before, after
+
+async def on_trade_changed(repo, user_id: str, before: Optional[dict], after: Optional[dict]):
+    """Keep derived state in step with a single committed trade create/update/delete"""
+    get_response_cache().invalidate_user(user_id)
+    get_position_book().on_trade_changed(before, after)
+    get_tag_indexes().on_trade_changed(user_id, before, after)
+    get_trade_search().on_trade_changed(user_id, before, after)
+    await log_trade_events(user_id, [(before, after)])
+
+async def on_trades_bulk_changed(repo, user_id: str):
+    """Refresh derived state after many trades were written at once"""
+    await rebuild_aggregate(repo, user_id)
+    await analytics_rollups.rebuild_rollups(repo, user_id)
+    get_response_cache().invalidate_user(user_id)
+    await get_position_book().reload_user(repo, user_id)
+    get_tag_indexes().invalidate(user_id)
+    get_trade_search().invalidate(user_id)
+
+async def log_trade_events(user_id: str, changes: List[tuple]):
+    """Append (before, after) trade changes to the event log; before is None for created trades.
+
+    The trades are already committed, so a failed append is reported and skipped
+    rather than failing the write that made them.
+    """
+    log = get_event_log()
+    if log is not None and changes:
+        try:
+            await asyncio.to_thread(log.append, [trade_event(user_id, before, after) for before, after in changes])
+        except Exception as e:
+            print(f"Warning: could not log {len(changes)} trade events for {user_id}: {e}")
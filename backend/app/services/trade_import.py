@@ -0,0 +1,86 @@
+import csv
+import json
+import os
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+from pydantic import ValidationError
+from app.models import TradeCreate
+from app.services.analytics_engine import normalize_time
+
+MAX_REPORTED_ERRORS = 100
+
+def max_upload_bytes() -> int:
+    """Largest accepted upload, from IMPORT_MAX_BYTES"""
+    return int(os.getenv("IMPORT_MAX_BYTES", str(100 * 1024 * 1024)))
+
+def import_progress() -> dict:
+    """Initial progress counters of an import job"""
+    return {"rows_read": 0, "rows_imported": 0, "rows_failed": 0, "errors": []}
+
+def record_row_error(progress: dict, row_number: int, error: str):
+    """Count a rejected row, keeping the first few messages for the report"""
+    progress["rows_failed"] += 1
+    if len(progress["errors"]) < MAX_REPORTED_ERRORS:
+        progress["errors"].append({"row": row_number, "error": error})
+
+def detect_format(filename: str, content_type: Optional[str]) -> Optional[str]:
+    """Infer csv/ndjson from the upload's name or content type"""
+    name = (filename or "").lower()
+    if name.endswith(".csv") or content_type == "text/csv":
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return None
+
+def iter_raw_rows(path: str, file_format: str) -> Iterator[Tuple[int, object]]:
+    """Stream raw rows from an uploaded file one line at a time"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if file_format == "csv":
+            for row_number, row in enumerate(csv.DictReader(f), start=1):
+                yield row_number, row
+        else:
+            for row_number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield row_number, line
+
+def parse_trade_row(raw, file_format: str) -> dict:
+    """Validate one uploaded row against TradeCreate plus the optional close fields"""
+    row = json.loads(raw) if file_format == "ndjson" else dict(raw)
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+
+    # Empty CSV cells mean "not provided"
+    row = {key.strip(): value for key, value in row.items() if key and value not in ("", None)}
+
+    tags = row.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.replace("|", ";").split(";") if tag.strip()]
+    row["tags"] = tags
+
+    trade = TradeCreate(**row)
+    parsed = trade.dict()
+    # Stored and priced as the plain string, like trades created through the API
+    parsed["direction"] = trade.direction.value
+
+    exit_price = row.get("exit_price")
+    if exit_price is not None:
+        exit_price = float(exit_price)
+        if exit_price <= 0:
+            raise ValueError("exit_price must be greater than 0")
+    parsed["exit_price"] = exit_price
+    parsed["open_time"] = _parse_time(row.get("open_time"))
+    parsed["close_time"] = _parse_time(row.get("close_time"))
+    return parsed
+
+def format_row_error(error: Exception) -> str:
+    """Flatten a validation error into a single message"""
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+def _parse_time(value) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value)
+    return normalize_time(str(value))
@@ -0,0 +1,51 @@
+from dataclasses import dataclass, fields
+from datetime import datetime
+from operator import attrgetter
+from typing import List, Optional
+
+@dataclass(slots=True)
+class TradeRecord:
+    """Compact, unvalidated trade as stored in Firestore.
+
+    Used on read-heavy paths instead of per-row dicts and pydantic models; orjson
+    serializes slotted dataclasses natively.
+    """
+
+    id: str
+    user_id: Optional[str] = None
+    pair: Optional[str] = None
+    direction: Optional[str] = None
+    status: Optional[str] = None
+    entry_price: Optional[float] = None
+    exit_price: Optional[float] = None
+    lot_size: Optional[float] = None
+    stop_loss: Optional[float] = None
+    take_profit: Optional[float] = None
+    profit: Optional[float] = None
+    tags: Optional[List[str]] = None
+    notes: Optional[str] = None
+    open_time: Optional[datetime] = None
+    close_time: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    @classmethod
+    def from_document(cls, doc_id: str, data: dict) -> "TradeRecord":
+        """Build a record from a Firestore document, ignoring unknown fields"""
+        return cls(
+            data.get("id", doc_id), data.get("user_id"), data.get("pair"), data.get("direction"),
+            data.get("status"), data.get("entry_price"), data.get("exit_price"), data.get("lot_size"),
+            data.get("stop_loss"), data.get("take_profit"), data.get("profit"), data.get("tags"),
+            data.get("notes"), data.get("open_time"), data.get("close_time"), data.get("created_at"),
+            data.get("updated_at"),
+        )
+
+    def values(self) -> tuple:
+        """Field values in TRADE_RECORD_FIELDS order"""
+        return _record_values(self)
+
+    def to_dict(self) -> dict:
+        return dict(zip(TRADE_RECORD_FIELDS, _record_values(self)))
+
+TRADE_RECORD_FIELDS = tuple(field.name for field in fields(TradeRecord))
+_record_values = attrgetter(*TRADE_RECORD_FIELDS)
@@ -0,0 +1,229 @@
+import asyncio
+import os
+import re
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from app.services.analytics_engine import normalize_time
+from app.services.user_index import UserIndexStore
+
+TIME_FIELDS = ("created_at", "updated_at", "open_time", "close_time")
+NUMERIC_FIELDS = ("profit", "entry_price", "exit_price", "lot_size", "stop_loss", "take_profit")
+SORT_FIELDS = TIME_FIELDS + NUMERIC_FIELDS
+EQUALITY_FIELDS = ("status", "pair", "direction")
+MAX_ID = "\U0010ffff"  # sorts after every trade id, so (key, MAX_ID) bounds all entries with that key
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lower-cased word tokens of a note or search string"""
+    return _TOKEN.findall(text.lower()) if text else []
+
+def _sort_key(field: str, value):
+    if value is None:
+        return None
+    return normalize_time(value) if field in TIME_FIELDS else float(value)
+
+class TradeSearchIndex:
+    """One user's trades with the indexes the trade log queries need, maintained on every write.
+
+    - an inverted index from note tokens to trade ids, plus a sorted vocabulary so
+      a search token also matches every word it prefixes ("brea" finds "breakout")
+    - posting sets per status/pair/direction value and per tag
+    - a sorted list of (value, trade id) per time and numeric field, sliced with
+      bisect for range filters and walked in order for sorting
+
+    Filters intersect the smallest candidate sets first. An unfiltered or broad
+    query walks the sort field's index and stops once the page is full.
+    """
+
+    def __init__(self, user_id: str, version: int = 0):
+        self.user_id = user_id
+        self.version = version
+        self.trades: Dict[str, dict] = {}
+        self.sorted: Dict[str, List[tuple]] = {field: [] for field in SORT_FIELDS}
+        self.values: Dict[str, Dict[str, set]] = {field: {} for field in EQUALITY_FIELDS}
+        self.tags: Dict[str, set] = {}
+        self.postings: Dict[str, set] = {}
+        self.vocabulary: List[str] = []
+
+    @classmethod
+    def build(cls, user_id: str, trades: Iterable[dict], version: int = 0) -> "TradeSearchIndex":
+        """Index a user's trades a column at a time, sorting each field once instead of inserting row by row"""
+        index = cls(user_id, version)
+        index.trades = {trade["id"]: trade for trade in trades}
+        for field in SORT_FIELDS:
+            index.sorted[field] = sorted(
+                (_sort_key(field, value), trade_id) for trade_id, trade in index.trades.items()
+                if (value := trade.get(field)) is not None
+            )
+        for trade_id, trade in index.trades.items():
+            index._add_postings(trade_id, trade)
+        index.vocabulary = sorted(index.postings)
+        return index
+
+    def set_trade(self, trade: dict):
+        """Add a trade, or re-index an existing one"""
+        trade_id = trade["id"]
+        self.remove_trade(trade_id)
+        self.trades[trade_id] = trade
+        for field in SORT_FIELDS:
+            key = _sort_key(field, trade.get(field))
+            if key is not None:
+                insort(self.sorted[field], (key, trade_id))
+        new_tokens = self._add_postings(trade_id, trade)
+        for token in new_tokens:
+            insort(self.vocabulary, token)
+
+    def remove_trade(self, trade_id: str):
+        trade = self.trades.pop(trade_id, None)
+        if trade is None:
+            return
+        for field in SORT_FIELDS:
+            key = _sort_key(field, trade.get(field))
+            if key is not None:
+                entries = self.sorted[field]
+                del entries[bisect_left(entries, (key, trade_id))]
+        for field in EQUALITY_FIELDS:
+            _discard(self.values[field], _value(trade.get(field)), trade_id)
+        for tag in set(trade.get("tags") or ()):
+            _discard(self.tags, tag, trade_id)
+        for token in set(tokenize(trade.get("notes"))):
+            if _discard(self.postings, token, trade_id):
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+
+    def search(self, text: Optional[str] = None, equals: Optional[Dict[str, str]] = None,
+               all_tags: Sequence[str] = (), any_tags: Sequence[str] = (),
+               ranges: Optional[Dict[str, Tuple[object, object]]] = None,
+               sort: str = "created_at", descending: bool = True,
+               offset: int = 0, limit: int = 50) -> Tuple[int, List[dict]]:
+        """Total number of matching trades and one page of them in sort order.
+
+        ranges maps a sort field to inclusive (low, high) bounds, either may be None.
+        Trades missing the sort field come last.
+        """
+        sets = []
+        for field, value in (equals or {}).items():
+            sets.append(self.values[field].get(_value(value), set()))
+        for tag in all_tags:
+            sets.append(self.tags.get(tag, set()))
+        if any_tags:
+            sets.append(set().union(*(self.tags.get(tag, set()) for tag in any_tags)))
+        for token in tokenize(text):
+            sets.append(self._prefix_matches(token))
+
+        candidates = None
+        if sets:
+            sets.sort(key=len)
+            candidates = set(sets[0])
+            for other in sets[1:]:
+                candidates &= other
+
+        for field, (low, high) in (ranges or {}).items():
+            candidates = self._apply_range(candidates, field, _sort_key(field, low), _sort_key(field, high))
+
+        if candidates is None:
+            total = len(self.trades)
+        else:
+            total = len(candidates)
+        page = self._ordered_page(candidates, sort, descending, offset, limit)
+        return total, [self.trades[trade_id] for trade_id in page]
+
+    def _add_postings(self, trade_id: str, trade: dict) -> List[str]:
+        """Add a trade to the posting sets; returns note tokens seen for the first time"""
+        for field in EQUALITY_FIELDS:
+            self.values[field].setdefault(_value(trade.get(field)), set()).add(trade_id)
+        for tag in set(trade.get("tags") or ()):
+            self.tags.setdefault(tag, set()).add(trade_id)
+        new_tokens = []
+        for token in set(tokenize(trade.get("notes"))):
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = set()
+                new_tokens.append(token)
+            posting.add(trade_id)
+        return new_tokens
+
+    def _key(self, trade_id: str, field: str):
+        return _sort_key(field, self.trades[trade_id].get(field))
+
+    def _prefix_matches(self, prefix: str) -> set:
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + MAX_ID)
+        words = self.vocabulary[start:end]
+        if len(words) == 1:
+            return self.postings[words[0]]
+        return set().union(*(self.postings[word] for word in words))
+
+    def _apply_range(self, candidates: Optional[set], field: str, low, high) -> set:
+        entries = self.sorted[field]
+        start = bisect_left(entries, (low, "")) if low is not None else 0
+        end = bisect_right(entries, (high, MAX_ID)) if high is not None else len(entries)
+        if candidates is not None and len(candidates) < end - start:
+            # Checking the few candidates beats materializing a wide slice
+            return {
+                trade_id for trade_id in candidates
+                if (key := self._key(trade_id, field)) is not None
+                and (low is None or key >= low)
+                and (high is None or key <= high)
+            }
+        matches = {trade_id for _, trade_id in entries[start:end]}
+        return matches if candidates is None else candidates & matches
+
+    def _ordered_page(self, candidates: Optional[set], sort: str, descending: bool,
+                      offset: int, limit: int) -> List[str]:
+        entries = self.sorted[sort]
+        wanted = offset + limit
+        if candidates is not None and len(candidates) * 16 < len(entries):
+            # Few matches: sorting them is cheaper than walking the whole index
+            keyed = sorted((key, i) for i in candidates if (key := self._key(i, sort)) is not None)
+            missing = sorted(i for i in candidates if self._key(i, sort) is None)
+            ordered = [i for _, i in (reversed(keyed) if descending else keyed)] + missing
+            return ordered[offset:wanted]
+
+        walk = reversed(entries) if descending else iter(entries)
+        page = []
+        for _, trade_id in walk:
+            if candidates is None or trade_id in candidates:
+                page.append(trade_id)
+                if len(page) == wanted:
+                    return page[offset:]
+        # Trades without the sort field (e.g. open trades by close_time) come last
+        if len(entries) < len(self.trades):
+            missing = sorted(i for i in (self.trades if candidates is None else candidates)
+                             if self._key(i, sort) is None)
+            page.extend(missing[:wanted - len(page)])
+        return page[offset:]
+
+def _value(value):
+    # Enum members are stored as their string values; search parameters arrive as strings
+    return getattr(value, "value", value)
+
+def _discard(postings: Dict[str, set], key, trade_id: str) -> bool:
+    """Remove a trade from a posting set; True when that emptied and dropped the set"""
+    posting = postings.get(key)
+    if posting is None:
+        return False
+    posting.discard(trade_id)
+    if not posting:
+        del postings[key]
+        return True
+    return False
+
+class TradeSearchStore(UserIndexStore):
+    """Per-user trade search indexes"""
+
+    async def _load(self, repo, user_id: str, version: int) -> TradeSearchIndex:
+        trades = await repo.query("trades", [("user_id", "==", user_id)])
+        return await asyncio.to_thread(TradeSearchIndex.build, user_id, trades, version)
+
+# Global trade search store
+_trade_search: Optional[TradeSearchStore] = None
+
+def get_trade_search() -> TradeSearchStore:
+    """Get the process-wide trade search store"""
+    global _trade_search
+
+    if _trade_search is None:
+        _trade_search = TradeSearchStore(max_users=int(os.getenv("TRADE_SEARCH_MAX_USERS", "1000")))
+
+    return _trade_search
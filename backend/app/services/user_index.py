@@ -0,0 +1,73 @@
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Optional
+from app.services.response_cache import get_response_cache
+
+class UserIndexStore:
+    """Per-user in-memory indexes over trades, built on first query and kept in step by the trade hooks.
+
+    An index remembers the response-cache version it reflects, and a query that
+    finds the version moved rebuilds instead of answering from stale state. Only
+    writes that bump this process's version are seen: with several workers on one
+    shared store, set RESPONSE_CACHE_BACKEND=sqlite so every worker's writes move
+    the same counter; the per-process memory backend only tracks local writes.
+    Least recently used users are evicted.
+
+    Indexes implement set_trade(trade) and remove_trade(trade_id); subclasses
+    implement _load(repo, user_id, version) to build one from the repository.
+    """
+
+    def __init__(self, max_users: int = 1000):
+        self.max_users = max_users
+        self.indexes: "OrderedDict[str, object]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Task] = {}
+
+    async def get(self, repo, user_id: str):
+        while True:
+            version = get_response_cache().user_version(user_id)
+            index = self.indexes.get(user_id)
+            if index is not None and index.version == version:
+                self.indexes.move_to_end(user_id)
+                return index
+
+            task = self._loading.get(user_id)
+            if task is None:
+                task = self._loading[user_id] = asyncio.ensure_future(self._build(repo, user_id, version))
+            try:
+                index = await task
+            finally:
+                if self._loading.get(user_id) is task:
+                    del self._loading[user_id]
+            # A build joined in flight may predate the version this caller saw
+            if index.version >= version:
+                return index
+
+    def on_trade_changed(self, user_id: str, before: Optional[dict], after: Optional[dict]):
+        """Apply one trade mutation to a loaded index; call after the user's cache was invalidated"""
+        index = self.indexes.get(user_id)
+        if index is None:
+            return
+        version = get_response_cache().user_version(user_id)
+        if index.version != version - 1:
+            # Other writes landed since the index was built; patching it would hide them
+            self.invalidate(user_id)
+            return
+        if after is None:
+            index.remove_trade(before["id"])
+        else:
+            index.set_trade(after)
+        index.version = version
+
+    def invalidate(self, user_id: str):
+        self.indexes.pop(user_id, None)
+
+    async def _build(self, repo, user_id: str, version: int):
+        index = await self._load(repo, user_id, version)
+        self.indexes[user_id] = index
+        self.indexes.move_to_end(user_id)
+        while len(self.indexes) > self.max_users:
+            self.indexes.popitem(last=False)
+        return index
+
+    async def _load(self, repo, user_id: str, version: int):
+        raise NotImplementedError
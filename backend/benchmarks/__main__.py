@@ -0,0 +1,84 @@
+"""Run the microbenchmarks and load tests, and diff them against a saved baseline.
+
+Run from backend/:
+  python -m benchmarks                         # run everything, compare with benchmarks/baseline.json
+  python -m benchmarks --save-baseline         # run everything and overwrite the baseline
+  python -m benchmarks --compare results.json  # diff a saved run without re-running
+  python -m benchmarks --quick --output run.json
+
+Exits with status 1 when any compared metric regresses by more than --threshold.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from benchmarks.harness import (BASELINE_PATH, compare_results, load_results, print_comparison,
+                                save_results, stamp)
+from benchmarks.load import run_load
+from benchmarks.micro import DEFAULT_SIZES, run_micro
+
+QUICK_SIZES = (1000, 10000)
+
+def run_all(args) -> dict:
+    config = {
+        "sizes": list(QUICK_SIZES if args.quick else DEFAULT_SIZES),
+        "repeat": args.repeat,
+        "trades": args.trades,
+        "concurrency": args.concurrency,
+        "scale": 0.25 if args.quick else 1.0,
+    }
+    results = {"config": config}
+    if not args.skip_micro:
+        print("Microbenchmarks")
+        results["micro"] = run_micro(config["sizes"], config["repeat"])
+    if not args.skip_load:
+        print(f"Load tests ({config['trades']} trades, {config['concurrency']} concurrent clients)")
+        results["load"] = asyncio.run(run_load(config["trades"], config["concurrency"], config["scale"]))
+    return stamp(results, args.note)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--compare", metavar="RESULTS", help="Compare saved results instead of running")
+    parser.add_argument("--output", help="Also write this run's results here")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--quick", action="store_true", help="Skip the 100k size and run fewer requests")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--trades", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--all-rows", action="store_true", help="Print unchanged metrics too")
+    parser.add_argument("--note", help="Free-text note stored with the results")
+    args = parser.parse_args()
+
+    current = load_results(args.compare) if args.compare else run_all(args)
+    if args.output:
+        save_results(args.output, current)
+    if args.save_baseline:
+        save_results(args.baseline, current)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return
+    baseline = load_results(args.baseline)
+    if baseline.get("environment") != current.get("environment"):
+        print("Warning: baseline was recorded on a different machine or library versions")
+    if baseline.get("config") != current.get("config"):
+        print("Warning: baseline used different settings; only matching rows are compared")
+
+    rows = compare_results(baseline, current, args.threshold)
+    regressions = [row for row in rows if row["regressed"]]
+    improvements = [row for row in rows if row["improved"]]
+    print(f"Compared {len(rows)} metrics with {args.baseline} (threshold {args.threshold * 100:.0f}%): "
+          f"{len(regressions)} regressed, {len(improvements)} improved")
+    print_comparison(rows, only_changes=not args.all_rows)
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
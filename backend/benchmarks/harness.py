@@ -0,0 +1,111 @@
+"""Timing, result files and baseline comparison shared by the benchmark suites"""
+import json
+import os
+import platform
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+import numpy as np
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Metrics compared against the baseline, and whether a larger value is better
+COMPARED_METRICS = {
+    "micro": (("median_ms", False),),
+    "load": (("p50_ms", False), ("p99_ms", False), ("throughput_rps", True)),
+}
+
+def timed_runs(fn: Callable, repeat: int) -> List[float]:
+    """Wall-clock milliseconds of repeat calls, after one warm-up call"""
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def latency_summary(samples: List[float]) -> dict:
+    """p50/p90/p99/max of latency samples in milliseconds"""
+    p50, p90, p99 = np.percentile(samples, (50, 90, 99))
+    return {
+        "p50_ms": round(float(p50), 3),
+        "p90_ms": round(float(p90), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(max(samples)), 3),
+    }
+
+def environment() -> dict:
+    """Machine details stored alongside results; numbers only compare on similar boxes"""
+    import fastapi
+    import pydantic
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "fastapi": fastapi.__version__,
+        "pydantic": pydantic.__version__,
+    }
+
+def save_results(path: str, results: dict):
+    with open(path, "w") as out:
+        json.dump(results, out, indent=2, sort_keys=True)
+        out.write("\n")
+
+def load_results(path: str) -> dict:
+    with open(path) as source:
+        return json.load(source)
+
+def result_key(suite: str, row: dict) -> str:
+    return f"{row['name']}@{row['size']}" if suite == "micro" else row["name"]
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> List[dict]:
+    """Relative change of every metric present in both runs.
+
+    A row regresses when it is more than threshold (a fraction) worse than the baseline;
+    changes under a millisecond are ignored as timer noise.
+    """
+    rows = []
+    for suite, metrics in COMPARED_METRICS.items():
+        previous = {result_key(suite, row): row for row in baseline.get(suite, [])}
+        for row in current.get(suite, []):
+            key = result_key(suite, row)
+            if key not in previous:
+                continue
+            for metric, higher_is_better in metrics:
+                before, after = previous[key].get(metric), row.get(metric)
+                if not before or after is None:
+                    continue
+                change = (after - before) / before
+                worse = -change if higher_is_better else change
+                noise = not higher_is_better and abs(after - before) < 1.0
+                rows.append({
+                    "suite": suite,
+                    "key": key,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": change,
+                    "regressed": worse > threshold and not noise,
+                    "improved": -worse > threshold and not noise,
+                })
+    return rows
+
+def print_comparison(rows: List[dict], only_changes: bool = False):
+    for row in rows:
+        if only_changes and not (row["regressed"] or row["improved"]):
+            continue
+        flag = "REGRESSED" if row["regressed"] else ("improved" if row["improved"] else "")
+        print(f"  {row['suite']:<5} {row['key']:<44} {row['metric']:<15} "
+              f"{row['baseline']:>11.2f} -> {row['current']:>11.2f}  {row['change'] * 100:+7.1f}%  {flag}")
+
+def stamp(results: dict, note: Optional[str] = None) -> dict:
+    """Attach environment and creation time to a results document"""
+    return {
+        **results,
+        "environment": environment(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "note": note,
+    }
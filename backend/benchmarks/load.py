@@ -0,0 +1,291 @@
+"""In-process ASGI load tests of every router against the mock Firestore store.
+
+Each scenario is driven by a fixed number of concurrent clients issuing requests
+back to back (closed loop), so latencies include time spent queued on the event loop.
+Server-sent event streams are timed to their first event, after which the client disconnects.
+
+Run from backend/: python -m benchmarks.load [--trades 10000] [--concurrency 8] [--scale 1.0]
+"""
+import argparse
+import asyncio
+import csv
+import io
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+from urllib.parse import urlencode
+import httpx
+from app.main import app
+from app.services.firebase_service import MockFirestoreClient
+from app.services.firestore_repository import get_repository
+from app.services.job_runner import JOBS_COLLECTION, Job, get_job_runner
+from app.services.response_cache import get_response_cache
+from benchmarks.harness import latency_summary
+from benchmarks.synthetic import PAIRS, seed_trades, synthetic_trades, write_price_history
+
+READ_USER = "bench_load"
+WRITE_USER = "bench_load_writes"
+PRICE_BARS = 30 * 1440  # a month of one-minute bars per pair
+FAST_ACCEPT = {"Accept": "application/vnd.mckay+json"}
+
+class Scenario:
+    """One endpoint under load; request(i) returns the httpx request arguments for call i"""
+
+    __slots__ = ("name", "method", "path", "requests", "request", "before", "concurrency", "event_stream")
+
+    def __init__(self, name: str, method: str, path: str, requests: int,
+                 request: Optional[Callable[[int], dict]] = None, before: Optional[Callable[[], None]] = None,
+                 concurrency: Optional[int] = None, event_stream: bool = False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.requests = requests
+        self.request = request or (lambda i: {})
+        self.before = before  # untimed, runs before every request
+        self.concurrency = concurrency  # overrides the run's concurrency
+        self.event_stream = event_stream  # timed to the first server-sent event
+
+def scenarios(scale: float, trade_ids: List[str], write_ids: List[str], job_id: str) -> List[Scenario]:
+    def count(n):
+        return max(10, int(n * scale))
+
+    def read(params=None, **extra):
+        return lambda i: {"params": {"user_id": READ_USER, **(params or {})}, **extra}
+
+    def write(params=None, **extra):
+        return lambda i: {"params": {"user_id": WRITE_USER, **(params or {})}, **extra}
+
+    def uncached(name, path, requests, params=None):
+        # One client at a time, or concurrent requests would share each other's fresh cache entries
+        return Scenario(name, "GET", path, requests, read(params), concurrency=1,
+                        before=lambda: get_response_cache().invalidate_user(READ_USER))
+
+    def new_trade(i):
+        pair, price, _ = PAIRS[i % len(PAIRS)]
+        return {"params": {"user_id": WRITE_USER}, "json": {
+            "pair": pair, "entry_price": price, "lot_size": 0.5, "direction": "long",
+            "exit_price": round(price * 1.001, 5), "tags": ["breakout", "london"],
+        }}
+
+    sizing = {"account_balance": 10000, "risk_percentage": 1, "entry_price": 1.1, "stop_loss": 1.095, "pair": "EUR/USD"}
+    sizing_items = [{**sizing, "entry_price": 1.1 + i * 1e-5} for i in range(1000)]
+    ticks = [{"pair": pair, "bid": price, "ask": price * 1.0001} for pair, price, _ in PAIRS]
+    backtest = {
+        "pairs": ["EUR/USD", "USD/JPY"],
+        "rules": [{"tag": "breakout", "direction": "long", "lookback": 60, "stop_pips": 15, "target_pips": 30}],
+    }
+    upload = import_csv(200)
+
+    return [
+        Scenario("health", "GET", "/health", count(2000)),
+        Scenario("metrics", "GET", "/metrics", count(200)),
+        Scenario("trades.list", "GET", "/api/trades/", count(300), read({"limit": 100})),
+        Scenario("trades.list_orjson", "GET", "/api/trades/", count(300), read({"limit": 100}, headers=FAST_ACCEPT)),
+        Scenario("trades.list_1000", "GET", "/api/trades/", count(50), read({"limit": 1000})),
+        Scenario("trades.get", "GET", "/api/trades/{id}", count(1000),
+                 lambda i: {"path": f"/api/trades/{trade_ids[i % len(trade_ids)]}", "params": {"user_id": READ_USER}}),
+        Scenario("trades.create", "POST", "/api/trades/", count(300), new_trade),
+        Scenario("trades.update", "PUT", "/api/trades/{id}", count(300),
+                 lambda i: {"path": f"/api/trades/{write_ids[i % len(write_ids)]}",
+                            "params": {"user_id": WRITE_USER}, "json": {"notes": f"note {i}"}}),
+        Scenario("trades.search_text", "GET", "/api/trades/search", count(300),
+                 read({"q": "pullba", "status": "closed", "limit": 50})),
+        Scenario("trades.search_filtered", "GET", "/api/trades/search", count(300),
+                 read({"tags": ["breakout", "london"], "min_profit": 0, "sort": "profit",
+                       "opened_from": "2022-01-01T00:00:00", "limit": 50})),
+        Scenario("trades.export_csv", "GET", "/api/trades/export", count(20), read({"format": "csv"})),
+        Scenario("trades.import", "POST", "/api/trades/import", count(20),
+                 lambda i: {"params": {"user_id": WRITE_USER}, "files": {"file": ("trades.csv", upload, "text/csv")}}),
+        Scenario("trades.events", "GET", "/api/trades/events", count(300), write({"limit": 500})),
+        Scenario("tags.list", "GET", "/api/tags/", count(300), read()),
+        Scenario("tags.filter", "GET", "/api/tags/filter", count(300),
+                 read({"all": ["breakout"], "any": ["london", "new-york"], "none": ["news"]})),
+        Scenario("tags.combinations", "GET", "/api/tags/combinations", count(100),
+                 read({"k": 10, "max_size": 3})),
+        Scenario("tags.update", "PUT", "/api/tags/{name}", count(300),
+                 lambda i: {"path": f"/api/tags/setup-{i % 20}", "params": {"user_id": WRITE_USER},
+                            "json": {"color": "#3366ff", "description": f"setup {i}"}}),
+        Scenario("jobs.list", "GET", "/api/jobs/", count(300), write()),
+        Scenario("jobs.get", "GET", "/api/jobs/{job_id}", count(1000),
+                 lambda i: {"path": f"/api/jobs/{job_id}", "params": {"user_id": WRITE_USER}}),
+        Scenario("analytics.overview", "GET", "/api/analytics/overview", count(500), read()),
+        uncached("analytics.overview_uncached", "/api/analytics/overview", count(100)),
+        uncached("analytics.wins_by_tag_uncached", "/api/analytics/wins-by-tag", count(30)),
+        uncached("analytics.monthly_uncached", "/api/analytics/monthly-performance", count(100), {"months": 24}),
+        uncached("analytics.performance_week_uncached", "/api/analytics/performance", count(30),
+                 {"granularity": "week"}),
+        Scenario("analytics.monte_carlo", "GET", "/api/analytics/monte-carlo", count(30),
+                 lambda i: {"params": {"user_id": READ_USER, "paths": 2000, "horizon": 250, "seed": i}}),
+        Scenario("portfolio.exposure", "GET", "/api/portfolio/exposure", count(300), read()),
+        Scenario("portfolio.position_size", "POST", "/api/portfolio/position-size", count(300),
+                 lambda i: {"params": {"user_id": READ_USER}, "json": {**sizing, "direction": "long"}}),
+        Scenario("calculator.position_size", "POST", "/api/calculator/position-size", count(1000),
+                 lambda i: {"json": sizing}),
+        Scenario("calculator.batch_1000", "POST", "/api/calculator/position-size/batch", count(50),
+                 lambda i: {"json": {"items": sizing_items}}),
+        Scenario("calculator.pip_value", "GET", "/api/calculator/pip-value/{pair}", count(1000),
+                 lambda i: {"path": "/api/calculator/pip-value/USDJPY"}),
+        Scenario("calculator.risk_reward", "POST", "/api/calculator/risk-reward", count(1000),
+                 lambda i: {"params": {"entry_price": 1.1, "stop_loss": 1.095, "take_profit": 1.11}}),
+        Scenario("stream.ticks", "POST", "/api/stream/ticks", count(1000), lambda i: {"json": ticks}),
+        Scenario("stream.pnl", "GET", "/api/stream/pnl", count(300), read(), event_stream=True),
+        Scenario("backtest.run", "POST", "/api/backtest/run", count(20), lambda i: {"json": backtest}),
+    ]
+
+def import_csv(rows: int) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["pair", "entry_price", "exit_price", "lot_size", "direction", "tags"])
+    for i in range(rows):
+        pair, price, _ = PAIRS[i % len(PAIRS)]
+        writer.writerow([pair, price, round(price * (1.002 if i % 3 else 0.998), 5), 0.3, "long", "trend;london"])
+    return out.getvalue().encode()
+
+async def seed_job(repo) -> str:
+    """A finished job persisted like the runner does, for the jobs scenarios to read"""
+    job = Job("import", WRITE_USER, {"filename": "trades.csv", "format": "csv"}, None, "bulk")
+    job.status = "completed"
+    job.result = {"rows_read": 200, "rows_imported": 200, "rows_failed": 0}
+    job.started_at = job.finished_at = datetime.utcnow()
+    job.expires_at = job.finished_at + timedelta(days=1)
+    await repo.set_document(JOBS_COLLECTION, job.id, job.to_dict())
+    return job.id
+
+async def first_event(path: str, params: dict) -> int:
+    """Open a server-sent event stream straight on the ASGI app, disconnect after its first event; returns the status.
+
+    httpx's ASGI transport waits for the whole body, which an event stream never finishes.
+    """
+    status = 500
+    received = asyncio.Event()
+
+    async def receive():
+        await received.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and (message.get("body") or not message.get("more_body")):
+            received.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": urlencode(params, doseq=True).encode(),
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    await app(scope, receive, send)
+    return status
+
+async def issue(client: httpx.AsyncClient, scenario: Scenario, kwargs: dict) -> int:
+    """Send one request of a scenario and return its status code"""
+    path = kwargs.pop("path", scenario.path)
+    if scenario.event_stream:
+        return await first_event(path, kwargs.get("params", {}))
+    response = await client.request(scenario.method, path, **kwargs)
+    return response.status_code
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, concurrency: int) -> dict:
+    """Drive one scenario with concurrent closed-loop clients"""
+    latencies = []
+    errors = 0
+    next_call = 0
+
+    async def worker():
+        nonlocal errors, next_call
+        while next_call < scenario.requests:
+            i = next_call
+            next_call += 1
+            if scenario.before is not None:
+                scenario.before()
+            kwargs = scenario.request(i)
+            start = time.perf_counter()
+            status = await issue(client, scenario, kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "name": scenario.name,
+        "method": scenario.method,
+        "path": scenario.path,
+        "requests": scenario.requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        **latency_summary(latencies),
+        "throughput_rps": round(scenario.requests / elapsed, 1),
+    }
+
+async def wait_for_imports():
+    # Import jobs finish in the background; let them drain so they don't skew the next scenario
+    runner = get_job_runner()
+    # Finishing a job starts the next queued one, so repeat until nothing is running
+    while tasks := [job.task for job in runner.jobs.values() if job.task is not None and not job.task.done()]:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def run_load(trades: int = 10000, concurrency: int = 8, scale: float = 1.0,
+                   only: Optional[List[str]] = None, verbose: bool = True) -> List[dict]:
+    """Seed the mock store, then run every scenario (or those named in only) in order"""
+    # Scan and simulate in-process: the numbers should reflect the handlers, not pool start-up
+    os.environ.setdefault("BACKTEST_WORKERS", "1")
+    os.environ.setdefault("MONTE_CARLO_WORKERS", "1")
+    # Every scenario hammers from one client address, far beyond any configured rate limit
+    os.environ.setdefault("RATE_LIMIT_PER_SECOND", "0")
+    # stream.ticks drives the position book through the test-only tick endpoint
+    os.environ.setdefault("TICK_PUSH_ENABLED", "true")
+
+    repo = get_repository()
+    if not isinstance(repo.client, MockFirestoreClient):
+        raise RuntimeError("Load tests write synthetic data and only run against the mock Firestore client")
+
+    read_trades = synthetic_trades(trades, READ_USER, open_fraction=0.02)
+    write_trades = synthetic_trades(200, WRITE_USER, seed=13)
+    await seed_trades(repo, read_trades)
+    await seed_trades(repo, write_trades)
+    trade_ids = [t["id"] for t in read_trades[::max(1, trades // 500)]]
+    write_ids = [t["id"] for t in write_trades]
+    job_id = await seed_job(repo)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench-prices-") as price_dir:
+        os.environ["PRICE_HISTORY_DIR"] = price_dir
+        write_price_history(price_dir, PRICE_BARS)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for scenario in scenarios(scale, trade_ids, write_ids, job_id):
+                if only and scenario.name not in only:
+                    continue
+                # One untimed call warms caches, lazy rollups and imports
+                warm = scenario.request(0)
+                if scenario.before is not None:
+                    scenario.before()
+                await issue(client, scenario, warm)
+                await wait_for_imports()
+
+                row = await run_scenario(client, scenario, scenario.concurrency or concurrency)
+                await wait_for_imports()
+                results.append(row)
+                if verbose:
+                    print(f"  {row['name']:<36} p50 {row['p50_ms']:9.2f} ms   p99 {row['p99_ms']:9.2f} ms"
+                          f"   {row['throughput_rps']:9.1f} req/s   errors {row['errors']}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trades", type=int, default=10000, help="Trades seeded for the read user")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier on each scenario's request count")
+    parser.add_argument("--only", nargs="+", help="Scenario names to run")
+    args = parser.parse_args()
+    asyncio.run(run_load(args.trades, args.concurrency, args.scale, args.only))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Microbenchmarks of the analytics, calculator and mock-store hot paths.
+
+Run from backend/: python -m benchmarks.micro [--sizes 1000 10000 100000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import statistics
+from typing import Callable, Iterable, List, Tuple
+from app.routers.analytics import calculate_max_drawdown, calculate_wins_by_tag
+from app.services.position_sizing import size_positions
+from app.services.pnl import trade_profit, trade_profits
+from app.services import analytics_engine, monte_carlo
+from app.services.firebase_service import MockFirestoreClient
+from app.services.firestore_repository import FirestoreRepository
+from benchmarks.harness import timed_runs
+from benchmarks.synthetic import seed_trades, synthetic_trades
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+USER_ID = "bench_micro"
+
+def analytics_cases(trades: List[dict]) -> List[Tuple[str, Callable]]:
+    frame = analytics_engine.load_closed_trades(trades)
+    # The original per-dict helpers were only ever given closed trades
+    closed = [t for t in trades if analytics_engine.is_closed_trade(t)]
+    return [
+        ("analytics.calculate_max_drawdown", lambda: calculate_max_drawdown(closed)),
+        ("analytics.calculate_wins_by_tag", lambda: calculate_wins_by_tag(closed)),
+        ("engine.load_closed_trades", lambda: analytics_engine.load_closed_trades(trades)),
+        ("engine.compute_overview", lambda: analytics_engine.compute_overview(frame, len(trades))),
+        ("engine.wins_by_tag", lambda: analytics_engine.wins_by_tag(frame)),
+        ("engine.monthly_performance", lambda: analytics_engine.monthly_performance(frame)),
+        ("monte_carlo.trade_returns", lambda: monte_carlo.trade_returns(trades)),
+    ]
+
+def calculator_cases(trades: List[dict]) -> List[Tuple[str, Callable]]:
+    closed = [t for t in trades if t["exit_price"] is not None]
+    columns = {
+        field: [t[field] for t in closed]
+        for field in ("entry_price", "exit_price", "lot_size", "direction", "pair", "stop_loss")
+    }
+    balances = [10000.0] * len(closed)
+    risks = [1.0] * len(closed)
+
+    def profit_loop():
+        for t in closed:
+            trade_profit(t["entry_price"], t["exit_price"], t["lot_size"], t["direction"], t["pair"])
+
+    return [
+        ("pnl.trade_profit", profit_loop),
+        ("pnl.trade_profits", lambda: trade_profits(
+            columns["entry_price"], columns["exit_price"], columns["lot_size"], columns["direction"], columns["pair"])),
+        ("calculator.size_positions", lambda: size_positions(
+            balances, risks, columns["entry_price"], columns["stop_loss"], columns["pair"])),
+    ]
+
+def store_cases(trades: List[dict], loop: asyncio.AbstractEventLoop) -> List[Tuple[str, Callable]]:
+    # A private mock client so sizes don't share documents or indexes
+    repo = FirestoreRepository(MockFirestoreClient())
+    loop.run_until_complete(seed_trades(repo, trades))
+
+    def run(coroutine_fn):
+        return lambda: loop.run_until_complete(coroutine_fn())
+
+    return [
+        ("store.batch_write", run(lambda: seed_trades(repo, trades))),
+        ("store.query_closed", run(lambda: repo.query(
+            "trades", [("user_id", "==", USER_ID), ("status", "==", "closed")]))),
+        ("store.query_page", run(lambda: repo.query(
+            "trades", [("user_id", "==", USER_ID)], order_by=[("created_at", "DESCENDING")], limit=100))),
+        ("store.query_tag", run(lambda: repo.query(
+            "trades", [("user_id", "==", USER_ID), ("tags", "array-contains", "breakout")]))),
+    ]
+
+def run_micro(sizes: Iterable[int] = DEFAULT_SIZES, repeat: int = 5, verbose: bool = True) -> List[dict]:
+    """Time every case at every size; returns one result row per (case, size)"""
+    results = []
+    loop = asyncio.new_event_loop()
+    try:
+        for size in sizes:
+            trades = synthetic_trades(size, USER_ID, open_fraction=0.02)
+            if verbose:
+                print(f"{size} trades")
+            cases = analytics_cases(trades) + calculator_cases(trades) + store_cases(trades, loop)
+            for name, fn in cases:
+                samples = timed_runs(fn, repeat)
+                row = {
+                    "name": name,
+                    "size": size,
+                    "median_ms": round(statistics.median(samples), 3),
+                    "min_ms": round(min(samples), 3),
+                    "per_trade_us": round(statistics.median(samples) * 1000 / size, 3),
+                }
+                results.append(row)
+                if verbose:
+                    print(f"  {name:<36} median {row['median_ms']:10.2f} ms   min {row['min_ms']:10.2f} ms"
+                          f"   {row['per_trade_us']:8.3f} us/trade")
+    finally:
+        loop.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run_micro(args.sizes, args.repeat)
+
+if __name__ == "__main__":
+    main()
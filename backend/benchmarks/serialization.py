@@ -0,0 +1,67 @@
+"""Compare the default trade-list response path with the orjson/msgpack fast path.
+
+Run from backend/: python -m benchmarks.serialization [--trades 10000] [--repeat 7]
+"""
+import argparse
+import asyncio
+import statistics
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import ApiResponse
+from app.routers.trades import MAX_PAGE_SIZE
+from app.services.firestore_repository import get_repository
+from app.services.serialization import fast_response
+from app.services.trade_records import TradeRecord
+from benchmarks.harness import timed_runs
+from benchmarks.synthetic import seed_trades, synthetic_trades
+
+USER_ID = "bench_serialization"
+
+ACCEPT_HEADERS = {
+    "json (default)": "application/json",
+    "orjson": "application/vnd.mckay+json",
+    "msgpack": "application/msgpack",
+}
+
+def report(name: str, samples: list, size: int):
+    print(f"  {name:<18} median {statistics.median(samples):8.2f} ms   min {min(samples):8.2f} ms   {size / 1024:8.1f} KiB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trades", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    trades = synthetic_trades(args.trades, USER_ID)
+    asyncio.run(seed_trades(get_repository(), trades))
+
+    print(f"Serialization only ({args.trades} trades)")
+    # What FastAPI does for the default path: validate against response_model, encode, render
+    route = next(r for r in app.routes if getattr(r, "path", None) == "/api/trades/" and "GET" in r.methods)
+    data = {"trades": trades, "count": len(trades), "next_cursor": None}
+
+    def default_path():
+        content = asyncio.run(serialize_response(field=route.response_field,
+                                                 response_content=ApiResponse(success=True, data=data)))
+        return JSONResponse(content)
+
+    report("pydantic+json", timed_runs(default_path, args.repeat), len(default_path().body))
+    records = [TradeRecord.from_document(t["id"], t) for t in trades]
+    record_data = {"trades": records, "count": len(records), "next_cursor": None}
+    for fast_format in ("orjson", "msgpack"):
+        body = fast_response(record_data, fast_format).body
+        report(fast_format, timed_runs(lambda: fast_response(record_data, fast_format), args.repeat), len(body))
+
+    page_size = min(args.trades, MAX_PAGE_SIZE)
+    print(f"GET /api/trades/?limit={page_size} end to end")
+    client = TestClient(app)
+    url = f"/api/trades/?user_id={USER_ID}&limit={page_size}"
+    for name, accept in ACCEPT_HEADERS.items():
+        response = client.get(url, headers={"Accept": accept})
+        response.raise_for_status()
+        report(name, timed_runs(lambda: client.get(url, headers={"Accept": accept}), args.repeat), len(response.content))
+
+if __name__ == "__main__":
+    main()
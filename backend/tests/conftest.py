@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+import uuid
+
+import pytest
+
+# Configure the app before it is imported: mock store in memory, no warmup, rate limit or worker processes
+DATA_DIR = tempfile.mkdtemp(prefix="mckaytrader-tests-")
+RATES = {"EUR/USD": 1.1, "GBP/USD": 1.25, "USD/JPY": 150.0, "XAU/USD": 2000.0}
+
+with open(os.path.join(DATA_DIR, "rates.csv"), "w") as rates_file:
+    rates_file.write("pair,rate\n" + "".join(f"{pair},{rate}\n" for pair, rate in RATES.items()))
+
+os.environ.pop("FIRESTORE_EMULATOR_HOST", None)
+os.environ.update({
+    "FIREBASE_SERVICE_ACCOUNT_PATH": "",
+    "MOCK_FIRESTORE_PATH": "",
+    "MOCK_FIRESTORE_ASYNC": "false",
+    "MOCK_FIRESTORE_LATENCY_MS": "0",
+    "RATES_CSV_PATH": os.path.join(DATA_DIR, "rates.csv"),
+    "ACCOUNT_CURRENCY": "USD",
+    "PRICE_HISTORY_DIR": os.path.join(DATA_DIR, "prices"),
+    "EVENT_LOG_DIR": os.path.join(DATA_DIR, "events"),
+    "EXPORT_CACHE_DIR": os.path.join(DATA_DIR, "exports"),
+    "RESPONSE_CACHE_BACKEND": "memory",
+    "STARTUP_WARMUP": "false",
+    "RATE_LIMIT_PER_SECOND": "0",
+    "JOB_WORKERS": "1",
+    "BACKTEST_WORKERS": "1",
+    "MONTE_CARLO_WORKERS": "1",
+})
+
+from fastapi.testclient import TestClient
+from app.main import app
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+@pytest.fixture
+def user_id():
+    """A user of its own per test, so tests never see each other's trades"""
+    return f"user-{uuid.uuid4().hex[:12]}"
@@ -0,0 +1,28 @@
+import time
+
+def create_trade(client, user_id: str, **fields) -> str:
+    """Create a trade through the API and return its id"""
+    trade = {"pair": "EUR/USD", "direction": "long", "entry_price": 1.1, "lot_size": 1.0, **fields}
+    response = client.post(f"/api/trades/?user_id={user_id}", json=trade)
+    assert response.status_code == 200, response.text
+    return response.json()["data"]["trade_id"]
+
+def close_trade(client, user_id: str, trade_id: str, exit_price: float, **fields):
+    """Close a trade through the API"""
+    response = client.put(f"/api/trades/{trade_id}?user_id={user_id}", json={"exit_price": exit_price, **fields})
+    assert response.status_code == 200, response.text
+
+def get_trade(client, user_id: str, trade_id: str) -> dict:
+    response = client.get(f"/api/trades/{trade_id}?user_id={user_id}")
+    assert response.status_code == 200, response.text
+    return response.json()["data"]["trade"]
+
+def wait_for_job(client, user_id: str, job_id: str, timeout: float = 30) -> dict:
+    """Poll a background job until it finishes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}?user_id={user_id}").json()["data"]["job"]
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish in {timeout}s")
@@ -0,0 +1,132 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+
+from app.routers import analytics
+from app.services.analytics_aggregate import AGGREGATES_COLLECTION, get_aggregate, rebuild_aggregate
+from app.services.firebase_service import MockFirestoreClient
+from app.services.firestore_repository import FirestoreRepository
+from app.services.trade_hooks import commit_trade_change
+from tests.helpers import close_trade, create_trade
+
+def overview(client, user_id):
+    return client.get(f"/api/analytics/overview?user_id={user_id}").json()["data"]
+
+def rebuilt(client, user_id):
+    response = client.post(f"/api/analytics/rebuild?user_id={user_id}")
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+def test_incremental_overview_matches_rebuild(client, user_id):
+    winner = create_trade(client, user_id, tags=["breakout"])
+    loser = create_trade(client, user_id, direction="short", tags=["breakout", "news"])
+    create_trade(client, user_id)
+    overview(client, user_id)  # builds the aggregate; later changes are applied incrementally
+    close_trade(client, user_id, winner, 1.102)
+    close_trade(client, user_id, loser, 1.103)
+    create_trade(client, user_id, pair="USD/JPY", entry_price=150.0)
+
+    incremental = overview(client, user_id)
+    assert incremental["total_trades"] == 2
+    assert incremental["total_profit"] == -100.0
+    assert incremental["wins_by_tag"]["breakout"] == {"wins": 1, "total": 2, "win_rate": 50.0}
+    assert incremental == rebuilt(client, user_id)
+
+def test_concurrent_trade_changes_are_not_lost(client, user_id):
+    create_trade(client, user_id)
+    overview(client, user_id)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        trade_ids = list(pool.map(lambda _: create_trade(client, user_id), range(31)))
+        list(pool.map(lambda trade_id: close_trade(client, user_id, trade_id, 1.101), trade_ids))
+
+    incremental = overview(client, user_id)
+    assert incremental["total_trades"] == 31
+    assert incremental["total_profit"] == 3100.0
+    assert incremental == rebuilt(client, user_id)
+
+def test_first_change_marks_the_aggregate_stale_until_read(user_id):
+    repo = FirestoreRepository(MockFirestoreClient())
+
+    async def scenario():
+        trade = {"id": "t1", "user_id": user_id, "status": "closed", "profit": 25.0,
+                 "close_time": datetime(2024, 1, 2), "tags": []}
+        await commit_trade_change(repo, user_id, "t1", "set", trade)
+        marker = await repo.get_document(AGGREGATES_COLLECTION, user_id)
+        aggregate = await get_aggregate(repo, user_id)
+        return marker, aggregate
+
+    marker, aggregate = asyncio.run(scenario())
+    repo.close()
+    assert marker["stale"] is True
+    assert aggregate["stale"] is False
+    assert (aggregate["closed_count"], aggregate["total_profit"]) == (1, 25.0)
+
+def test_rebuild_never_overwrites_a_change_committed_while_it_ran(user_id):
+    repo = FirestoreRepository(MockFirestoreClient())
+    start = datetime(2024, 1, 1)
+
+    def closed_trade(n):
+        return {"id": f"t{n}", "user_id": user_id, "status": "closed", "profit": 10.0,
+                "close_time": start + timedelta(days=n), "tags": []}
+
+    async def scenario():
+        await commit_trade_change(repo, user_id, "t0", "set", closed_trade(0))
+        await rebuild_aggregate(repo, user_id)
+        committed = []
+
+        async def run_cpu(fn, *args):
+            # A trade lands between the rebuild's query and its write
+            if not committed:
+                committed.append(await commit_trade_change(repo, user_id, "t1", "set", closed_trade(1)))
+            return fn(*args)
+
+        returned = await rebuild_aggregate(repo, user_id, run_cpu=run_cpu)
+        stored = await repo.get_document(AGGREGATES_COLLECTION, user_id)
+        return returned, stored
+
+    returned, stored = asyncio.run(scenario())
+    repo.close()
+    assert returned["closed_count"] == stored["closed_count"] == 2
+    assert stored["total_profit"] == 20.0
+
+def test_removing_an_ordinary_closed_trade_updates_in_place(user_id):
+    repo = FirestoreRepository(MockFirestoreClient())
+    start = datetime(2024, 1, 1)
+    profits = [100.0, -40.0, 30.0, 10.0]
+
+    def closed_trade(n, profit):
+        return {"id": f"t{n}", "user_id": user_id, "status": "closed", "profit": profit,
+                "close_time": start + timedelta(days=n), "tags": []}
+
+    async def scenario():
+        for n, profit in enumerate(profits):
+            await commit_trade_change(repo, user_id, f"t{n}", "set", closed_trade(n, profit))
+        await rebuild_aggregate(repo, user_id)
+        # The latest close sets no extreme, peak or drawdown: re-closing and deleting it stay O(1)
+        await commit_trade_change(repo, user_id, "t4", "set", closed_trade(4, -20.0))
+        await commit_trade_change(repo, user_id, "t4", "update", {"profit": -25.0})
+        await commit_trade_change(repo, user_id, "t4", "delete")
+        fresh = await repo.get_document(AGGREGATES_COLLECTION, user_id)
+        # An older close can't be taken off the equity curve
+        await commit_trade_change(repo, user_id, "t2", "delete")
+        marked = await repo.get_document(AGGREGATES_COLLECTION, user_id)
+        return fresh, marked, await rebuild_aggregate(repo, user_id)
+
+    fresh, marked, rebuilt_aggregate = asyncio.run(scenario())
+    repo.close()
+    assert fresh["stale"] is False
+    assert (fresh["closed_count"], fresh["total_profit"], fresh["equity"]) == (4, 100.0, 100.0)
+    assert fresh["max_drawdown"] == 0.4
+    assert marked["stale"] is True
+    assert (rebuilt_aggregate["closed_count"], rebuilt_aggregate["total_profit"]) == (3, 70.0)
+
+def test_http_errors_raised_inside_handlers_keep_their_status(client, user_id, monkeypatch):
+    async def missing(repo, user_id):
+        raise HTTPException(status_code=404, detail="No aggregate")
+
+    monkeypatch.setattr(analytics, "get_aggregate", missing)
+    response = client.get(f"/api/analytics/overview?user_id={user_id}")
+    assert response.status_code == 404
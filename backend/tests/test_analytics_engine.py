@@ -0,0 +1,87 @@
+import random
+import statistics
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.routers.analytics import calculate_max_drawdown, calculate_wins_by_tag
+from app.services import analytics_engine
+
+def random_trades(count, seed):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "status": rng.choice(["closed", "closed", "open"]),
+            "profit": round(rng.gauss(10, 100), 2),
+            "close_time": start + timedelta(hours=rng.randint(0, 9000)),
+            "tags": rng.sample(["a", "b", "c", "d", "e"], rng.randint(0, 3)),
+        }
+        for _ in range(count)
+    ]
+
+def reference_overview(closed):
+    """The per-trade overview math the router used before the engine"""
+    profits = [t["profit"] for t in closed]
+    wins = [p for p in profits if p > 0]
+    losses = [p for p in profits if p < 0]
+    gross_loss = abs(sum(losses))
+    return {
+        "total_trades": len(closed),
+        "win_rate": round(len(wins) / len(closed) * 100, 2),
+        "total_profit": round(sum(profits), 2),
+        "average_win": round(statistics.mean(wins), 2) if wins else 0.0,
+        "average_loss": round(statistics.mean(losses), 2) if losses else 0.0,
+        "profit_factor": round(sum(wins) / gross_loss, 2) if gross_loss > 0 else 0.0,
+        "max_drawdown": round(calculate_max_drawdown(closed), 2),
+        "best_trade": round(max(profits), 2),
+        "worst_trade": round(min(profits), 2),
+        "wins_by_tag": calculate_wins_by_tag(closed),
+    }
+
+@pytest.mark.parametrize("count,seed", [(1, 1), (5, 2), (200, 3), (2000, 4)])
+def test_engine_matches_the_reference_implementations(count, seed):
+    trades = random_trades(count, seed)
+    closed = [t for t in trades if t["status"] == "closed"]
+    frame = analytics_engine.load_closed_trades(trades)
+
+    assert analytics_engine.max_drawdown(frame) == pytest.approx(calculate_max_drawdown(closed), abs=1e-9)
+    assert analytics_engine.wins_by_tag(frame) == calculate_wins_by_tag(closed)
+    if closed:
+        overview = analytics_engine.compute_overview(frame, len(trades))
+        expected = reference_overview(closed)
+        assert overview.pop("wins_by_tag") == expected.pop("wins_by_tag")
+        assert overview == pytest.approx(expected)
+
+def test_monthly_performance_matches_grouping_by_month():
+    trades = random_trades(500, 5)
+    expected = defaultdict(lambda: [0.0, 0])
+    for trade in trades:
+        if trade["status"] == "closed":
+            month = expected[trade["close_time"].strftime("%Y-%m")]
+            month[0] += trade["profit"]
+            month[1] += 1
+
+    rows = analytics_engine.monthly_performance(analytics_engine.load_closed_trades(trades))
+    assert [row["month"] for row in rows] == sorted(expected)
+    for row in rows:
+        profit, count = expected[row["month"]]
+        assert (row["profit"], row["trades"]) == (round(profit, 2), count)
+
+def test_trades_without_close_time_sort_first_like_the_reference():
+    trades = [
+        {"status": "closed", "profit": 50.0, "close_time": datetime(2024, 1, 2), "tags": []},
+        {"status": "closed", "profit": -80.0, "close_time": None, "tags": []},
+        {"status": "closed", "profit": 100.0, "close_time": "2024-01-01T00:00:00Z", "tags": []},
+    ]
+    frame = analytics_engine.load_closed_trades(trades)
+    reference = [dict(t, close_time=analytics_engine.normalize_time(t["close_time"]) or datetime.min) for t in trades]
+    assert analytics_engine.max_drawdown(frame) == pytest.approx(calculate_max_drawdown(reference))
+    assert analytics_engine.monthly_performance(frame) == [{"month": "2024-01", "profit": 150.0, "trades": 2}]
+
+def test_empty_history():
+    frame = analytics_engine.load_closed_trades([{"status": "open", "profit": None}])
+    assert analytics_engine.compute_overview(frame, 1)["total_trades"] == 1
+    assert analytics_engine.wins_by_tag(frame) == {}
+    assert analytics_engine.monthly_performance(frame) == []
@@ -0,0 +1,175 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import analytics_rollups
+from app.services.analytics_aggregate import rebuild_aggregate
+from app.services.analytics_rollups import ROLLUPS_COLLECTION, get_rollups, rollup_id, state_id
+from app.services.firebase_service import MockFirestoreClient
+from app.services.firestore_repository import FirestoreRepository
+from app.services.trade_hooks import commit_trade_change
+from tests.helpers import close_trade, create_trade
+
+DAY = datetime(2024, 3, 5)
+
+def performance(client, user_id, granularity="day"):
+    response = client.get(f"/api/analytics/performance?user_id={user_id}&granularity={granularity}")
+    assert response.status_code == 200, response.text
+    return response.json()["data"]["performance"]
+
+def rebuild(client, user_id):
+    assert client.post(f"/api/analytics/rebuild?user_id={user_id}").status_code == 200
+
+def closed_trade(user_id, n, profit, close_time=DAY, **fields):
+    return {"id": f"t{n}", "user_id": user_id, "status": "closed", "profit": profit, "pair": "EUR/USD",
+            "close_time": close_time, "tags": [], **fields}
+
+def run(body):
+    repo = FirestoreRepository(MockFirestoreClient())
+    try:
+        return asyncio.run(body(repo))
+    finally:
+        repo.close()
+
+def test_incremental_rollups_match_rebuild(client, user_id):
+    kept = create_trade(client, user_id, tags=["breakout"])
+    moved = create_trade(client, user_id, direction="short")
+    removed = create_trade(client, user_id, pair="USD/JPY", entry_price=150.0)
+    performance(client, user_id)  # builds the rollups; later changes are applied incrementally
+
+    close_trade(client, user_id, kept, 1.102, close_time="2024-03-05T10:00:00")
+    close_trade(client, user_id, moved, 1.099, close_time="2024-03-05T11:00:00")
+    close_trade(client, user_id, removed, 150.5, close_time="2024-03-06T09:00:00")
+    close_trade(client, user_id, moved, 1.099, close_time="2024-03-12T11:00:00", tags=["news"])
+    client.delete(f"/api/trades/{removed}?user_id={user_id}")
+
+    incremental = {g: performance(client, user_id, g) for g in ("day", "week", "month")}
+    assert [(row["period"], row["trades"], row["profit"]) for row in incremental["day"]] == [
+        ("2024-03-05", 1, 200.0), ("2024-03-12", 1, 100.0)]
+    assert incremental["week"][1]["tags"] == {"news": {"profit": 100.0, "trades": 1, "wins": 1}}
+    assert incremental["month"][0]["pairs"] == {"EUR/USD": {"profit": 300.0, "trades": 2, "wins": 2}}
+
+    rebuild(client, user_id)
+    assert {g: performance(client, user_id, g) for g in ("day", "week", "month")} == incremental
+
+def test_concurrent_closes_are_not_lost(client, user_id):
+    trade_ids = [create_trade(client, user_id) for _ in range(21)]
+    performance(client, user_id)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda trade_id: close_trade(client, user_id, trade_id, 1.101,
+                                                   close_time="2024-03-05T12:00:00"), trade_ids))
+
+    day = performance(client, user_id)
+    assert [(row["trades"], row["wins"], row["profit"]) for row in day] == [(21, 21, 2100.0)]
+    rebuild(client, user_id)
+    assert performance(client, user_id) == day
+
+def test_profits_are_stored_at_full_precision(user_id):
+    async def scenario(repo):
+        await get_rollups(repo, user_id, "day")
+        for n in range(3):
+            await commit_trade_change(repo, user_id, f"t{n}", "set", closed_trade(user_id, n, 0.004))
+        bucket = await repo.get_document(ROLLUPS_COLLECTION, rollup_id(user_id, "day", DAY))
+        return bucket, analytics_rollups.rollup_to_performance(bucket)
+
+    bucket, row = run(scenario)
+    assert abs(bucket["profit"] - 0.012) < 1e-12
+    assert row["profit"] == 0.01
+    assert row["pairs"]["EUR/USD"]["profit"] == 0.01
+
+def test_first_change_marks_the_rollups_stale_until_read(user_id):
+    async def scenario(repo):
+        await commit_trade_change(repo, user_id, "t1", "set", closed_trade(user_id, 1, 25.0))
+        marker = await repo.get_document(ROLLUPS_COLLECTION, state_id(user_id))
+        buckets = await get_rollups(repo, user_id, "month")
+        state = await repo.get_document(ROLLUPS_COLLECTION, state_id(user_id))
+        return marker, buckets, state
+
+    marker, buckets, state = run(scenario)
+    assert marker["stale"] is True
+    assert [(b["trades"], b["profit"]) for b in buckets] == [(1, 25.0)]
+    assert state["stale"] is False and (state["trades"], state["profit"]) == (1, 25.0)
+
+def test_drift_from_the_aggregate_triggers_a_rebuild(user_id):
+    async def scenario(repo):
+        await commit_trade_change(repo, user_id, "t1", "set", closed_trade(user_id, 1, 25.0))
+        await rebuild_aggregate(repo, user_id)
+        await get_rollups(repo, user_id, "day")
+
+        # A trade written without the hooks, later picked up by an aggregate rebuild
+        await repo.batch_write([("set", "trades", "t2", closed_trade(user_id, 2, 10.0))])
+        await rebuild_aggregate(repo, user_id)
+        return await get_rollups(repo, user_id, "day")
+
+    buckets = run(scenario)
+    assert [(b["trades"], b["profit"]) for b in buckets] == [(2, 35.0)]
+
+def test_rebuild_never_keeps_buckets_that_missed_a_concurrent_change(user_id):
+    class Repository(FirestoreRepository):
+        committed = []
+
+        async def batch_write(self, writes):
+            result = await super().batch_write(writes)
+            if not self.committed and any(w[1] == ROLLUPS_COLLECTION for w in writes):
+                # A trade lands after the rebuild read the trades
+                self.committed.append(await commit_trade_change(
+                    self, user_id, "t2", "set", closed_trade(user_id, 2, 10.0, DAY + timedelta(days=1))))
+            return result
+
+    async def scenario():
+        repo = Repository(MockFirestoreClient())
+        try:
+            await commit_trade_change(repo, user_id, "t1", "set", closed_trade(user_id, 1, 25.0))
+            rebuilt = await analytics_rollups.rebuild_rollups(repo, user_id)
+            return rebuilt, await get_rollups(repo, user_id, "day")
+        finally:
+            repo.close()
+
+    rebuilt, buckets = asyncio.run(scenario())
+    assert rebuilt is True
+    assert [(b["trades"], b["profit"]) for b in buckets] == [(1, 25.0), (1, 10.0)]
+
+def test_concurrent_readers_share_one_rebuild(user_id):
+    class Repository(FirestoreRepository):
+        trade_scans = 0
+
+        async def query(self, collection, *args, **kwargs):
+            if collection == "trades":
+                Repository.trade_scans += 1
+            return await super().query(collection, *args, **kwargs)
+
+    async def scenario():
+        repo = Repository(MockFirestoreClient())
+        try:
+            await commit_trade_change(repo, user_id, "t1", "set", closed_trade(user_id, 1, 25.0))
+            return await asyncio.gather(*(get_rollups(repo, user_id, "day") for _ in range(8)))
+        finally:
+            repo.close()
+
+    results = asyncio.run(scenario())
+    assert Repository.trade_scans == 1
+    assert all([(b["trades"], b["profit"]) for b in buckets] == [(1, 25.0)] for buckets in results)
+
+def test_readers_get_an_error_instead_of_half_written_buckets(user_id, monkeypatch):
+    async def always_conflicts(repo, user_id):
+        return False
+
+    monkeypatch.setattr(analytics_rollups, "rebuild_rollups", always_conflicts)
+
+    async def scenario(repo):
+        await commit_trade_change(repo, user_id, "t1", "set", closed_trade(user_id, 1, 25.0))
+        with pytest.raises(analytics_rollups.RollupsUnavailable):
+            await get_rollups(repo, user_id, "day")
+
+    run(scenario)
+
+def test_unavailable_rollups_answer_503(client, user_id, monkeypatch):
+    async def unavailable(repo, user_id):
+        raise analytics_rollups.RollupsUnavailable("busy")
+
+    monkeypatch.setattr(analytics_rollups, "ensure_rollups", unavailable)
+    response = client.get(f"/api/analytics/performance?user_id={user_id}")
+    assert response.status_code == 503 and response.headers["retry-after"] == "1"
@@ -0,0 +1,132 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.backtest import entry_signals, simulate_rule
+from app.services.price_history import Bars, history_path, load_bars
+
+def random_bars(seed: int, n: int = 2000, start: float = 1.1) -> Bars:
+    rng = np.random.default_rng(seed)
+    close = start + np.cumsum(rng.normal(0, 0.0004, n))
+    open_ = np.concatenate([[start], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.0003, n))
+    times = np.datetime64("2024-01-01T00:00", "us") + np.arange(n) * np.timedelta64(1, "m")
+    return Bars("EUR/USD", times, open_, np.maximum(open_, close) + spread, np.minimum(open_, close) - spread, close)
+
+def write_history(path, bars: Bars, epoch_seconds: bool = False):
+    dtype = [("time", "i8" if epoch_seconds else "M8[us]")] + [(f, "f8") for f in ("open", "high", "low", "close")]
+    data = np.zeros(len(bars), dtype=dtype)
+    data["time"] = bars.time.astype("M8[s]").astype("i8") if epoch_seconds else bars.time
+    for field in ("open", "high", "low", "close"):
+        data[field] = getattr(bars, field)
+    np.save(path, data)
+
+def rule(**fields) -> dict:
+    return {"tag": "t", "direction": "long", "signal": "breakout", "lookback": 20, "fast_period": 5,
+            "stop_pips": 10, "target_pips": 20, "max_bars": 60, **fields}
+
+def reference_signals(bars: Bars, rule: dict) -> list:
+    """Entry signals checked one bar at a time"""
+    close, is_long, active = bars.close, rule["direction"] == "long", []
+    for i in range(len(bars)):
+        if rule["signal"] == "breakout":
+            lb = rule["lookback"]
+            on = i >= lb and (close[i] > bars.high[i - lb:i].max() if is_long else close[i] < bars.low[i - lb:i].min())
+        else:
+            fast_n, slow_n = rule["fast_period"], rule["lookback"]
+            if i + 1 < max(fast_n, slow_n):
+                on = False
+            else:
+                fast, slow = close[i + 1 - fast_n:i + 1].mean(), close[i + 1 - slow_n:i + 1].mean()
+                on = fast > slow if is_long else fast < slow
+        active.append(bool(on))
+    return [on and (i == 0 or not active[i - 1]) for i, on in enumerate(active)]
+
+def reference_fills(bars: Bars, rule: dict, pip_multiplier: float) -> list:
+    """Fills simulated bar by bar"""
+    sign = 1 if rule["direction"] == "long" else -1
+    signals, fills, i = reference_signals(bars, rule), [], 0
+    while i < len(bars):
+        if not signals[i]:
+            i += 1
+            continue
+        entry = bars.close[i]
+        stop, target = entry - sign * rule["stop_pips"] / pip_multiplier, entry + sign * rule["target_pips"] / pip_multiplier
+        fill = None
+        for j in range(i + 1, min(i + rule["max_bars"], len(bars) - 1) + 1):
+            hit_stop = bars.low[j] <= stop if sign > 0 else bars.high[j] >= stop
+            hit_target = bars.high[j] >= target if sign > 0 else bars.low[j] <= target
+            if hit_stop or hit_target:
+                fill = (i, j, stop if hit_stop else target, 0 if hit_stop else 1)
+                break
+        if fill is None:
+            if i + rule["max_bars"] >= len(bars):
+                break
+            fill = (i, i + rule["max_bars"], bars.close[i + rule["max_bars"]], 2)
+        fills.append(fill)
+        i = fill[1] + 1
+    return fills
+
+@pytest.mark.parametrize("fields", [
+    {}, {"direction": "short"}, {"signal": "sma_cross", "lookback": 30},
+    {"signal": "sma_cross", "direction": "short", "fast_period": 3, "lookback": 12, "max_bars": 5},
+])
+def test_vectorized_rule_matches_bar_by_bar_replay(fields):
+    bars, r = random_bars(7), rule(**fields)
+    assert entry_signals(bars, r).tolist() == reference_signals(bars, r)
+
+    result = simulate_rule(bars, r, 10000)
+    fills = list(zip(result["entry_price"], result["exit_price"], result["exit_reason"]))
+    expected = reference_fills(bars, r, 10000)
+    assert len(fills) == len(expected) > 0
+    for (entry, exit_price, reason), (i, j, price, why) in zip(fills, expected):
+        assert entry == bars.close[i] and reason == why
+        assert exit_price == pytest.approx(price)
+
+def test_bar_touching_stop_and_target_exits_at_the_stop():
+    close = np.array([1.0, 1.0, 1.0, 1.01, 1.01])
+    bars = Bars("EUR/USD", np.arange(5).astype("M8[m]").astype("M8[us]"), close,
+                np.array([1.0, 1.0, 1.0, 1.01, 1.05]), np.array([1.0, 1.0, 1.0, 1.01, 0.95]), close)
+    result = simulate_rule(bars, rule(lookback=2, stop_pips=100, target_pips=100), 10000)
+    assert result["exit_reason"].tolist() == [0]
+    assert result["exit_price"][0] == pytest.approx(1.0)
+
+def test_load_bars_slices_by_time(tmp_path):
+    bars = random_bars(1, n=100)
+    for epoch_seconds in (False, True):
+        path = str(tmp_path / f"EURUSD{int(epoch_seconds)}.npy")
+        write_history(path, bars, epoch_seconds)
+        loaded = load_bars(path, "EUR/USD", datetime(2024, 1, 1, 0, 10), datetime(2024, 1, 1, 0, 20))
+        assert len(loaded) == 10
+        assert loaded.time[0] == np.datetime64("2024-01-01T00:10", "us")
+        assert loaded.close.tolist() == bars.close[10:20].tolist()
+
+def test_backtest_endpoint(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("PRICE_HISTORY_DIR", str(tmp_path))
+    write_history(str(tmp_path / "EURUSD.npy"), random_bars(3))
+    write_history(str(tmp_path / "GBP_USD.npy"), random_bars(4, start=1.25))
+    assert history_path("GBP/USD") == str(tmp_path / "GBP_USD.npy")
+
+    request = {"pairs": ["EURUSD", "GBP/USD"], "rules": [rule(direction="long"), rule(tag="s", direction="short")],
+               "include_trades": True}
+    response = client.post("/api/backtest/run", json=request)
+    assert response.status_code == 200, response.text
+    data = response.json()["data"]
+    assert data["bars"] == {"EUR/USD": 2000, "GBP/USD": 2000}
+
+    trades = data["trades"]
+    assert len(trades) == data["overview"]["total_trades"] > 0
+    assert sum(p["total_trades"] for p in data["by_pair"].values()) == len(trades)
+    assert data["overview"]["total_profit"] == pytest.approx(sum(t["profit"] for t in trades), abs=0.01)
+    for trade in trades:
+        move = trade["exit_price"] - trade["entry_price"]
+        if trade["exit_reason"] != "timeout":
+            # Sized to risk 1% of the balance at the stop
+            assert abs(trade["profit"]) == pytest.approx(200 if trade["exit_reason"] == "target" else 100, rel=0.05)
+        assert (trade["profit"] > 0) == ((move > 0) == (trade["direction"] == "long")) or move == 0
+
+def test_backtest_without_history_is_404(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("PRICE_HISTORY_DIR", str(tmp_path))
+    response = client.post("/api/backtest/run", json={"pairs": ["EUR/USD"], "rules": [rule()]})
+    assert response.status_code == 404
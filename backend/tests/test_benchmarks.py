@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from benchmarks.harness import compare_results, latency_summary, load_results, save_results, timed_runs
+
+def run(micro=(), load=()):
+    return {"micro": list(micro), "load": list(load)}
+
+def micro_row(name, median_ms, size=1000):
+    return {"name": name, "size": size, "median_ms": median_ms}
+
+def load_row(name, p50_ms, p99_ms, throughput_rps):
+    return {"name": name, "p50_ms": p50_ms, "p99_ms": p99_ms, "throughput_rps": throughput_rps}
+
+def flags(rows):
+    return {(row["key"], row["metric"]): (row["regressed"], row["improved"]) for row in rows}
+
+def test_slower_timings_past_the_threshold_regress():
+    baseline = run([micro_row("a", 10.0), micro_row("b", 10.0), micro_row("c", 10.0)])
+    current = run([micro_row("a", 12.4), micro_row("b", 12.6), micro_row("c", 7.0)])
+    assert flags(compare_results(baseline, current, 0.25)) == {
+        ("a@1000", "median_ms"): (False, False),
+        ("b@1000", "median_ms"): (True, False),
+        ("c@1000", "median_ms"): (False, True),
+    }
+
+def test_lower_throughput_regresses():
+    baseline = run(load=[load_row("list", 20.0, 50.0, 400.0)])
+    current = run(load=[load_row("list", 20.0, 50.0, 250.0)])
+    assert flags(compare_results(baseline, current, 0.25)) == {
+        ("list", "p50_ms"): (False, False),
+        ("list", "p99_ms"): (False, False),
+        ("list", "throughput_rps"): (True, False),
+    }
+
+def test_sub_millisecond_changes_are_noise():
+    rows = compare_results(run([micro_row("a", 0.2)]), run([micro_row("a", 0.9)]), 0.25)
+    assert flags(rows) == {("a@1000", "median_ms"): (False, False)}
+    assert rows[0]["change"] == pytest.approx(3.5)
+
+def test_only_rows_present_in_both_runs_are_compared():
+    baseline = run([micro_row("a", 10.0), micro_row("a", 10.0, size=10000), micro_row("gone", 1.0)])
+    current = run([micro_row("a", 50.0, size=10000), micro_row("new", 5.0), {"name": "x", "size": 1}])
+    assert [row["key"] for row in compare_results(baseline, current, 0.25)] == ["a@10000"]
+
+def test_results_round_trip(tmp_path):
+    path = str(tmp_path / "results.json")
+    results = run([micro_row("a", 1.5)])
+    save_results(path, results)
+    assert load_results(path) == results
+    assert json.loads(open(path).read()) == results
+
+def test_timing_helpers():
+    calls = []
+    samples = timed_runs(lambda: calls.append(1), 4)
+    assert len(samples) == 4 and len(calls) == 5  # plus one warm-up call
+    summary = latency_summary([1.0] * 98 + [5.0, 100.0])
+    assert summary["p50_ms"] == 1.0 and summary["max_ms"] == 100.0
+    assert summary["p90_ms"] <= summary["p99_ms"] <= summary["max_ms"]
@@ -0,0 +1,136 @@
+import os
+import random
+from datetime import datetime
+
+import pytest
+
+from app.routers import trades as trades_router
+from app.services import trade_hooks
+from app.services.event_log import EventLogCompacted, TradeEventLog, apply_events, trade_event
+from tests.helpers import close_trade, create_trade
+
+def random_changes(rng, count, users=("u", "v")):
+    """(user, before, after) trade mutations and the trades they leave behind"""
+    state, changes = {}, []
+    for n in range(count):
+        trade_id = f"t{rng.randint(0, 30)}"
+        before = state.get(trade_id)
+        if before is not None and rng.random() < 0.25:
+            after = None
+            del state[trade_id]
+        else:
+            after = {"id": trade_id, "user_id": before["user_id"] if before else rng.choice(users),
+                     "status": rng.choice(["open", "closed"]), "profit": float(n),
+                     "close_time": datetime(2024, 1, 1, n % 24)}
+            state[trade_id] = after
+        changes.append(((after or before)["user_id"], before, after))
+    return changes, state
+
+def log_changes(log, changes, batch=7):
+    for i in range(0, len(changes), batch):
+        log.append([trade_event(user, before, after) for user, before, after in changes[i:i + batch]])
+
+def test_replay_after_compaction_matches_the_full_history(tmp_path):
+    changes, expected = random_changes(random.Random(2), 400)
+    log = TradeEventLog(str(tmp_path), segment_bytes=2000, snapshot_every=10 ** 9)
+    log_changes(log, changes[:150])
+    assert log.compact() == 149
+    log_changes(log, changes[150:300])
+    assert log.compact() == 299
+    log_changes(log, changes[300:])
+
+    last, trades = log.replay()
+    assert last == 399 and trades == expected
+    assert log.replay("u")[1] == {k: t for k, t in expected.items() if t["user_id"] == "u"}
+
+    # Segments before the previous snapshot are gone; a consumer from there can still catch up
+    with pytest.raises(EventLogCompacted) as error:
+        log.read(10)
+    assert error.value.snapshot_offset == 299
+    events, _ = log.read(149)
+    assert [e["offset"] for e in events] == list(range(150, 400))
+    log.close()
+
+def test_reads_page_through_segments(tmp_path):
+    changes, _ = random_changes(random.Random(5), 60)
+    log = TradeEventLog(str(tmp_path), segment_bytes=500)
+    log_changes(log, changes)
+    assert len(log._segments()) > 3
+
+    seen, after = [], -1
+    while True:
+        events, after = log.read(after, limit=8)
+        if not events:
+            break
+        seen.extend(events)
+    assert [e["offset"] for e in seen] == list(range(60))
+    assert seen[0]["trade"]["close_time"] == changes[0][2]["close_time"]
+    trades = {}
+    apply_events(trades, seen)
+    assert trades == random_changes(random.Random(5), 60)[1]
+    log.close()
+
+def test_torn_tail_is_cut_off_on_the_next_append(tmp_path):
+    log = TradeEventLog(str(tmp_path))
+    log.append([trade_event("u", None, {"id": "a", "user_id": "u"})])
+    with open(log._segments()[-1][1], "ab") as f:
+        f.write(b"\x00\x00\x01\x00garbage")  # a crash mid-write
+
+    other = TradeEventLog(str(tmp_path))  # another process finds the torn frame
+    assert other.append([trade_event("u", None, {"id": "b", "user_id": "u"})]) == [1]
+    assert [e["trade_id"] for e in log.read()[0]] == ["a", "b"]
+    log.close()
+    other.close()
+
+def test_processes_sharing_a_directory_continue_one_sequence(tmp_path):
+    first, second = TradeEventLog(str(tmp_path)), TradeEventLog(str(tmp_path))
+    offsets = []
+    for i in range(10):
+        log = first if i % 3 else second
+        offsets += log.append([trade_event("u", None, {"id": f"t{i}", "user_id": "u"})] * 2)
+    assert offsets == list(range(20))
+    assert first.read()[1] == second.read()[1] == 19
+    first.close()
+    second.close()
+
+def test_event_types():
+    open_trade = {"id": "t", "user_id": "u", "status": "open"}
+    closed = {**open_trade, "status": "closed"}
+    assert [trade_event("u", before, after)["type"] for before, after in
+            ((None, open_trade), (open_trade, open_trade), (open_trade, closed), (closed, closed), (closed, None))
+            ] == ["created", "updated", "closed", "updated", "deleted"]
+
+def test_events_endpoint(client, user_id):
+    trade_id = create_trade(client, user_id)
+    close_trade(client, user_id, trade_id, 1.101)
+    client.delete(f"/api/trades/{trade_id}?user_id={user_id}")
+
+    data = client.get(f"/api/trades/events?user_id={user_id}").json()["data"]
+    assert [e["type"] for e in data["events"]] == ["created", "closed", "deleted"]
+    assert data["events"][1]["trade"]["profit"] == 100.0
+    after = data["events"][0]["offset"]
+    assert client.get(f"/api/trades/events?user_id={user_id}&after={after}").json()["data"]["count"] == 2
+
+def test_events_endpoint_reports_compacted_offsets(client, user_id, tmp_path, monkeypatch):
+    log = TradeEventLog(str(tmp_path), segment_bytes=200)
+    monkeypatch.setattr(trades_router, "get_event_log", lambda: log)
+    for _ in range(2):
+        log.append([trade_event(user_id, None, {"id": f"t{i}", "user_id": user_id}) for i in range(10)])
+        log.compact()
+
+    response = client.get(f"/api/trades/events?user_id={user_id}&after=-1")
+    assert response.status_code == 410
+    assert response.headers["x-snapshot-offset"] == "19"
+    assert os.path.exists(os.path.join(str(tmp_path), "snapshot-00000000000000000019.snap"))
+    log.close()
+
+def test_a_failed_append_does_not_fail_the_committed_write(client, user_id, monkeypatch):
+    class BrokenLog:
+        def append(self, events):
+            raise OSError("disk full")
+
+    create_trade(client, user_id)
+    assert client.get(f"/api/trades/?user_id={user_id}").json()["data"]["count"] == 1
+    monkeypatch.setattr(trade_hooks, "get_event_log", lambda: BrokenLog())
+    create_trade(client, user_id)
+    assert client.get(f"/api/trades/?user_id={user_id}").json()["data"]["count"] == 2
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from app.services.firebase_service import AsyncMockFirestoreClient, MockFirestoreClient, MockTransactionConflict
+from app.services.firestore_repository import FirestoreRepository
+
+def increment(transaction):
+    counter = transaction.get_document("counters", "c") or {"value": 0}
+    transaction.write("set", "counters", "c", {"value": counter["value"] + 1})
+
+def test_transactions_from_several_repositories_never_lose_updates():
+    client = MockFirestoreClient()
+    repos = [FirestoreRepository(client, max_workers=4) for _ in range(2)]
+
+    async def scenario():
+        await asyncio.gather(*(repos[i % 2].run_transaction(increment, max_attempts=100) for i in range(40)))
+        return await repos[0].get_document("counters", "c")
+
+    assert asyncio.run(scenario())["value"] == 40
+    for repo in repos:
+        repo.close()
+
+def test_transaction_conflicts_when_a_read_document_changes():
+    client = MockFirestoreClient()
+    reference = client.collection("counters").document("c")
+    reference.set({"value": 1})
+
+    transaction = client.transaction()
+    reference.get(transaction=transaction)
+    transaction.set(reference, {"value": 2})
+    reference.set({"value": 5})
+    with pytest.raises(MockTransactionConflict):
+        transaction.commit()
+    assert reference.get().to_dict() == {"value": 5}
+
+def test_set_if_version_only_replaces_the_expected_version():
+    repo = FirestoreRepository(MockFirestoreClient())
+
+    async def scenario():
+        created = await repo.set_if_version("docs", "d", 0, {"version": 1, "value": "a"})
+        stale = await repo.set_if_version("docs", "d", 0, {"version": 1, "value": "b"})
+        replaced = await repo.set_if_version("docs", "d", 1, {"version": 2, "value": "c"})
+        return created, stale, replaced, await repo.get_document("docs", "d")
+
+    created, stale, replaced, doc = asyncio.run(scenario())
+    repo.close()
+    assert (created, stale, replaced) == (True, False, True)
+    assert doc["value"] == "c"
+
+def test_slow_sync_calls_run_off_the_event_loop():
+    repo = FirestoreRepository(MockFirestoreClient(latency=0.05), max_workers=8)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        ticking = asyncio.ensure_future(ticker())
+        start = asyncio.get_running_loop().time()
+        await asyncio.gather(*(repo.get_document("trades", str(i)) for i in range(8)))
+        elapsed = asyncio.get_running_loop().time() - start
+        ticking.cancel()
+        return elapsed, ticks
+
+    elapsed, ticks = asyncio.run(scenario())
+    repo.close()
+    assert elapsed < 0.3
+    assert ticks >= 5
+
+def test_async_mock_client_shares_the_store():
+    sync_client = MockFirestoreClient()
+    repo = FirestoreRepository(AsyncMockFirestoreClient(sync_client), is_async=True)
+
+    async def scenario():
+        await repo.set_document("trades", "t1", {"user_id": "u", "status": "open"})
+        await repo.batch_write([("set", "trades", "t2", {"user_id": "u", "status": "closed"}),
+                                ("update", "trades", "t1", {"status": "closed"})])
+        closed = await repo.query("trades", [("user_id", "==", "u"), ("status", "==", "closed")])
+        streamed = [doc async for doc in repo.stream("trades", [("user_id", "==", "u")])]
+        await repo.run_transaction(increment)
+        return closed, streamed
+
+    closed, streamed = asyncio.run(scenario())
+    assert sorted(doc["id"] for doc in closed) == ["t1", "t2"]
+    assert len(streamed) == 2
+    assert sync_client.collection("counters").document("c").get().to_dict() == {"value": 1}
+
+def test_stream_yields_every_document_in_order():
+    repo = FirestoreRepository(MockFirestoreClient())
+    writes = [("set", "trades", f"t{i:04d}", {"user_id": "u", "n": i}) for i in range(250)]
+
+    async def scenario():
+        await repo.batch_write(writes)
+        return [doc["n"] async for doc in repo.stream("trades", [("user_id", "==", "u")], [("n", "ASCENDING")])]
+
+    assert asyncio.run(scenario()) == list(range(250))
+    repo.close()
+
+def test_missing_documents_and_unknown_writes():
+    repo = FirestoreRepository(MockFirestoreClient())
+
+    async def scenario():
+        missing = await repo.get_document("trades", "nope")
+        await repo.set_document("trades", "t1", {"user_id": "u"})
+        found = await repo.get_document("trades", "t1")
+        with pytest.raises(ValueError):
+            await repo.batch_write([("upsert", "trades", "t1", {})])
+        return missing, found
+
+    missing, found = asyncio.run(scenario())
+    repo.close()
+    assert missing is None
+    assert found == {"user_id": "u", "id": "t1"}
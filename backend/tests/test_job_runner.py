@@ -0,0 +1,186 @@
+import asyncio
+
+from app.services.firebase_service import MockFirestoreClient
+from app.services.firestore_repository import FirestoreRepository
+from app.services.job_runner import JobRunner
+from tests.helpers import close_trade, create_trade, wait_for_job
+
+def run_with(runner_args, scenario):
+    repo = FirestoreRepository(MockFirestoreClient())
+    runner = JobRunner(**runner_args)
+    try:
+        return asyncio.run(scenario(repo, runner))
+    finally:
+        repo.close()
+
+async def drain(runner):
+    await asyncio.wait([job.task for job in runner.jobs.values() if job.task is not None])
+
+def test_identical_jobs_share_one_run():
+    calls = []
+
+    async def work(job):
+        calls.append(job.params["n"])
+        await asyncio.sleep(0.01)
+        return job.params["n"] * 2
+
+    async def scenario(repo, runner):
+        first = await runner.submit(repo, "double", "u", work, {"n": 2})
+        same = await runner.submit(repo, "double", "u", work, {"n": 2})
+        other = await runner.submit(repo, "double", "u", work, {"n": 3})
+        forced = await runner.submit(repo, "double", "u", work, {"n": 2}, dedupe=False)
+        await drain(runner)
+        # A finished job still answers for its inputs, here and from a fresh runner's persisted lookup
+        again = await runner.submit(repo, "double", "u", work, {"n": 2})
+        elsewhere = await JobRunner().submit(repo, "double", "u", work, {"n": 2})
+        return first, same, other, forced, again, elsewhere
+
+    first, same, other, forced, again, elsewhere = run_with({"concurrency": 4, "per_user": 4}, scenario)
+    assert same is first and again is first
+    assert other is not first and forced is not first
+    assert elsewhere.id == first.id and elsewhere.result == 4
+    assert sorted(calls) == [2, 2, 3]
+
+def test_failed_jobs_are_retried_by_the_next_submit():
+    attempts = []
+
+    async def flaky(job):
+        attempts.append(job.id)
+        if len(attempts) == 1:
+            raise ValueError("boom")
+        return "ok"
+
+    async def scenario(repo, runner):
+        failed = await runner.submit(repo, "flaky", "u", flaky)
+        await drain(runner)
+        retried = await runner.submit(repo, "flaky", "u", flaky)
+        await drain(runner)
+        stored = await repo.get_document("jobs", failed.id)
+        return failed, retried, stored
+
+    failed, retried, stored = run_with({}, scenario)
+    assert (failed.status, failed.error) == ("failed", "boom")
+    assert stored["status"] == "failed" and stored["error"] == "boom"
+    assert retried is not failed and (retried.status, retried.result) == ("completed", "ok")
+
+def test_a_users_burst_queues_behind_other_users_and_priorities():
+    order = []
+    release = None
+
+    async def work(job):
+        order.append(job.params["name"])
+        await release.wait()
+
+    async def scenario(repo, runner):
+        nonlocal release
+        release = asyncio.Event()
+        for name in ("a1", "a2", "a3"):
+            await runner.submit(repo, "work", "a", work, {"name": name})
+        await runner.submit(repo, "work", "b", work, {"name": "b1"})
+        await runner.submit(repo, "work", "c", work, {"name": "c-bulk"}, priority="bulk")
+        await runner.submit(repo, "work", "a", work, {"name": "a-interactive"}, priority="interactive")
+        release.set()
+        while any(not job.finished for job in runner.jobs.values()):
+            await drain(runner)
+
+    run_with({"concurrency": 1, "per_user": 1}, scenario)
+    # a1 starts on submit; then interactive work, each user's first job, the rest of the burst, bulk
+    assert order == ["a1", "a-interactive", "b1", "a2", "a3", "c-bulk"]
+
+def test_per_user_limit_lets_other_users_run():
+    running, peak = [], {}
+
+    async def work(job):
+        running.append(job.user_id)
+        for key in (job.user_id, "total"):
+            peak[key] = max(peak.get(key, 0), len(running) if key == "total" else running.count(key))
+        await asyncio.sleep(0.01)
+        running.remove(job.user_id)
+
+    async def scenario(repo, runner):
+        for user in ("a", "a", "a", "b", "b"):
+            await runner.submit(repo, "work", user, work, dedupe=False)
+        while any(not job.finished for job in runner.jobs.values()):
+            await drain(runner)
+
+    run_with({"concurrency": 3, "per_user": 1}, scenario)
+    assert peak == {"a": 1, "b": 1, "total": 2}
+
+def test_cancel_queued_and_running_jobs():
+    started = []
+
+    async def slow(job):
+        started.append(job.id)
+        job.report(1, 4, stage="waiting")
+        await asyncio.sleep(10)
+
+    async def scenario(repo, runner):
+        running = await runner.submit(repo, "slow", "u", slow, {"n": 1})
+        queued = await runner.submit(repo, "slow", "u", slow, {"n": 2})
+        await asyncio.sleep(0.01)
+        progress = running.to_dict()["progress"]
+        cancelled = [await runner.cancel(repo, queued), await runner.cancel(repo, running)]
+        await asyncio.sleep(0.01)
+        again = await runner.cancel(repo, running)
+        stored = await repo.get_document("jobs", running.id)
+        return running, queued, progress, cancelled, again, stored
+
+    running, queued, progress, cancelled, again, stored = run_with({"concurrency": 1}, scenario)
+    assert progress == {"done": 1, "total": 4, "stage": "waiting", "percent": 25.0}
+    assert cancelled == [True, True] and again is False
+    assert (running.status, queued.status) == ("cancelled", "cancelled")
+    assert started == [running.id]
+    assert stored["status"] == "cancelled"
+
+def test_cancel_before_the_first_step_frees_the_slot():
+    async def quick(job):
+        return job.params["n"]
+
+    async def scenario(repo, runner):
+        first = await runner.submit(repo, "quick", "u", quick, {"n": 1})
+        cancelled = await runner.cancel(repo, first)
+        second = await runner.submit(repo, "quick", "u", quick, {"n": 2})
+        await drain(runner)
+        stored = await repo.get_document("jobs", first.id)
+        return first, cancelled, second, stored
+
+    first, cancelled, second, stored = run_with({"concurrency": 1}, scenario)
+    assert cancelled is True
+    assert (first.status, first.started_at, stored["status"]) == ("cancelled", None, "cancelled")
+    assert (second.status, second.result) == ("completed", 2)
+
+def test_initial_progress_is_set_before_the_job_can_run():
+    seen = []
+
+    async def count(job):
+        seen.append(dict(job.progress))
+        job.progress["rows"] += 5
+        return job.progress["rows"]
+
+    async def scenario(repo, runner):
+        job = await runner.submit(repo, "count", "u", count, progress={"rows": 0})
+        queued = await repo.get_document("jobs", job.id)
+        await drain(runner)
+        return job, queued
+
+    job, queued = run_with({}, scenario)
+    assert queued["progress"] == {"rows": 0}
+    assert seen == [{"rows": 0}]
+    assert (job.result, job.progress) == (5, {"rows": 5})
+
+def test_jobs_endpoints(client, user_id):
+    for exit_price in (1.101, 1.099):
+        close_trade(client, user_id, create_trade(client, user_id), exit_price)
+
+    response = client.get("/api/analytics/monte-carlo",
+                          params={"user_id": user_id, "paths": 100, "background": True})
+    job_id = response.json()["data"]["job_id"]
+    job = wait_for_job(client, user_id, job_id)
+    assert job["status"] == "completed" and job["result"]["paths"] == 100
+
+    listed = client.get("/api/jobs/", params={"user_id": user_id}).json()["data"]
+    assert [entry["id"] for entry in listed["jobs"]] == [job_id]
+    assert "result" not in listed["jobs"][0]
+    assert client.get(f"/api/jobs/{job_id}", params={"user_id": "someone-else"}).status_code == 404
+    assert client.delete(f"/api/jobs/{job_id}", params={"user_id": user_id}).status_code == 409
+    assert client.get("/api/jobs/missing", params={"user_id": user_id}).status_code == 404
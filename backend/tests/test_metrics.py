@@ -0,0 +1,65 @@
+import threading
+import time
+
+from app.services.metrics import CounterMetric, Histogram, SlowRequestProfiler, render_metrics, timed
+from tests.helpers import create_trade
+
+def timing_names(response) -> list:
+    return [entry.strip().split(";")[0] for entry in response.headers["server-timing"].split(",")]
+
+def test_server_timing_splits_endpoint_framework_and_firestore(client, user_id):
+    create_trade(client, user_id)
+    response = client.get(f"/api/trades/?user_id={user_id}")
+    names = timing_names(response)
+    assert names[0] == "total"
+    assert {"endpoint", "framework", "firestore", "firestore-ops"} <= set(names)
+    assert 'firestore-ops;desc="1 calls, 1 reads, 0 writes"' in response.headers["server-timing"]
+
+def test_metrics_endpoint_counts_requests_by_route(client, user_id):
+    client.get(f"/api/trades/?user_id={user_id}")
+    client.get("/api/trades/missing-trade?user_id=" + user_id)
+    body = client.get("/metrics").text
+    assert 'mckay_requests_total{method="GET",route="/api/trades/",status="200"}' in body
+    assert 'mckay_requests_total{method="GET",route="/api/trades/{trade_id}",status="404"}' in body
+    assert 'mckay_firestore_call_duration_seconds_count{op="query"}' in body
+    assert "# TYPE mckay_request_duration_seconds histogram" in body
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("h", "test", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value, route="/x")
+    lines = histogram.render().splitlines()
+    assert 'h_bucket{route="/x",le="0.1"} 2' in lines
+    assert 'h_bucket{route="/x",le="1.0"} 3' in lines
+    assert 'h_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'h_count{route="/x"} 4' in lines
+    assert 'h_sum{route="/x"} 5.65' in lines
+
+def test_counter_escapes_label_values():
+    counter = CounterMetric("c", "test")
+    counter.inc(route='a"b\\c')
+    counter.inc(2, route='a"b\\c')
+    assert 'c{route="a\\"b\\\\c"} 3' in counter.render().splitlines()
+
+def test_timed_outside_a_request_only_records_the_histogram():
+    with timed("test-phase"):
+        pass
+    assert 'mckay_phase_duration_seconds_count{phase="test-phase"} 1' in render_metrics()
+
+def test_slow_request_profiler_reports_stacks_of_slow_requests():
+    profiler = SlowRequestProfiler(threshold=0.05, interval=0.002)
+    profiler.start(threading.get_ident())
+    try:
+        started = time.perf_counter()
+        deadline = started + 0.1
+        while time.perf_counter() < deadline:
+            sum(range(1000))
+        profiler.check("GET /slow", started, time.perf_counter())
+        profiler.check("GET /fast", started, started + 0.01)
+    finally:
+        profiler.stop()
+
+    assert [report["route"] for report in profiler.reports] == ["GET /slow"]
+    report = profiler.reports[0]
+    assert report["samples"] > 0
+    assert any("test_slow_request_profiler" in frame for frame in report["top_stacks"][0]["stack"])
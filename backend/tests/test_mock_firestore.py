@@ -0,0 +1,119 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.firebase_service import MockFirestoreClient, _matches, _order_key
+
+FILTERS = [
+    ("user_id", "==", "a"), ("status", "==", "closed"), ("profit", ">=", 0), ("profit", "<", 3),
+    ("tags", "array-contains", "y"), ("status", "in", ["open"]), ("profit", "!=", 0),
+    ("tags", "array-contains-any", ["x", "z"]), ("user_id", "not-in", ["b"]), ("profit", "<=", 2.5),
+]
+ORDERS = [[], [("created_at", "DESCENDING"), ("id", "DESCENDING")], [("created_at", "ASCENDING")],
+          [("profit", "ASCENDING"), ("id", "ASCENDING")]]
+
+def random_doc(rng, doc_id):
+    doc = {
+        "id": doc_id,
+        "user_id": rng.choice("ab"),
+        "status": rng.choice(["open", "closed"]),
+        "profit": rng.choice([None, rng.randint(-5, 5), rng.random()]),
+        "created_at": datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 50)),
+        "tags": rng.sample("xyz", rng.randint(0, 2)),
+    }
+    if rng.random() < 0.2:
+        del doc["profit"]
+    return doc
+
+def scan(docs, filters, orders, limit, cursor):
+    """What a query should return, by checking every document"""
+    ids = [doc_id for doc_id, doc in docs.items()
+           if all(_matches(doc, *f) for f in filters) and all(field in doc for field, _ in orders)]
+    for field, direction in reversed(orders):
+        ids.sort(key=lambda doc_id: _order_key(docs[doc_id][field]), reverse=direction == "DESCENDING")
+    if cursor:
+        def after(doc_id):
+            for field, direction in orders:
+                value, bound = _order_key(docs[doc_id][field]), _order_key(cursor[field])
+                if value != bound:
+                    return value < bound if direction == "DESCENDING" else value > bound
+            return False
+        ids = [doc_id for doc_id in ids if after(doc_id)]
+    return ids[:limit] if limit else ids
+
+@pytest.fixture
+def populated():
+    """A collection whose indexes were built and then kept up through sets, updates and deletes"""
+    rng = random.Random(5)
+    collection = MockFirestoreClient().collection("t")
+    docs = {}
+    for i in range(300):
+        doc = random_doc(rng, f"d{i:03d}")
+        collection.document(doc["id"]).set(doc)
+        docs[doc["id"]] = doc
+
+    collection.where("user_id", "==", "a").order_by("created_at").get()
+    collection.where("profit", ">", 0).get()
+    collection.where("tags", "array-contains", "x").get()
+
+    for _ in range(100):
+        doc_id = f"d{rng.randint(0, 299):03d}"
+        roll = rng.random()
+        if roll < 0.3:
+            collection.document(doc_id).delete()
+            docs.pop(doc_id, None)
+        elif roll < 0.6 and doc_id in docs:
+            update = {"profit": rng.randint(-3, 3), "status": "closed"}
+            collection.document(doc_id).update(update)
+            docs[doc_id] = {**docs[doc_id], **update}
+        else:
+            docs[doc_id] = random_doc(rng, doc_id)
+            collection.document(doc_id).set(docs[doc_id])
+    return collection, docs, rng
+
+def test_indexed_queries_match_a_full_scan(populated):
+    collection, docs, rng = populated
+    for _ in range(2000):
+        filters = rng.sample(FILTERS, rng.randint(0, 3))
+        orders = rng.choice(ORDERS)
+        limit = rng.choice([None, 1, 5, 50])
+        cursor = None
+        if orders and rng.random() < 0.5:
+            doc = docs[rng.choice(list(docs))]
+            if all(field in doc for field, _ in orders):
+                cursor = {field: doc[field] for field, _ in orders}
+
+        query = collection
+        for f in filters:
+            query = query.where(*f)
+        for field, direction in orders:
+            query = query.order_by(field, direction=direction)
+        if cursor:
+            query = query.start_after(cursor)
+        if limit:
+            query = query.limit(limit)
+        found = [snapshot.id for snapshot in query.get()]
+
+        expected = scan(docs, filters, orders, limit, cursor)
+        if orders:
+            assert found == expected, (filters, orders, limit, cursor)
+        elif limit:
+            assert len(found) == len(expected)
+            assert set(found) <= set(scan(docs, filters, orders, None, None))
+        else:
+            assert sorted(found) == sorted(expected), filters
+
+def test_range_filters_only_match_values_of_the_same_type():
+    collection = MockFirestoreClient().collection("t")
+    for doc_id, value in (("n", 5), ("s", "5"), ("none", None), ("t", datetime(2024, 1, 1))):
+        collection.document(doc_id).set({"v": value})
+    assert [s.id for s in collection.where("v", ">", 1).get()] == ["n"]
+    assert [s.id for s in collection.where("v", ">=", "").get()] == ["s"]
+
+def test_snapshots_are_copies_of_the_stored_documents():
+    collection = MockFirestoreClient().collection("t")
+    collection.document("d").set({"tags": ["a"], "n": 1})
+    collection.document("d").get().to_dict()["n"] = 2
+    assert collection.document("d").get().to_dict()["n"] == 1
+    assert [s.id for s in collection.where("n", "==", 1).get()] == ["d"]
@@ -0,0 +1,88 @@
+import asyncio
+import subprocess
+import sys
+from datetime import datetime
+
+from app.services import lifecycle
+from app.services.firebase_service import (MockFirestoreClient, SqliteMockJournal, get_firestore_client,
+                                           initialize_firebase)
+from app.services.firestore_repository import FirestoreRepository
+from tests.test_firestore_repository import increment
+
+def ids(collection, *filters):
+    query = collection
+    for f in filters:
+        query = query.where(*f)
+    return sorted(snapshot.id for snapshot in query.get())
+
+def test_clients_on_one_path_share_the_store(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    first, second = MockFirestoreClient(path=path), MockFirestoreClient(path=path)
+    trades, other = first.collection("trades"), second.collection("trades")
+
+    trades.document("a").set({"user_id": "u", "status": "open", "close_time": datetime(2024, 1, 1, 12)})
+    trades.document("b").set({"user_id": "u", "status": "open"})
+    # Indexes built before a change made elsewhere still see it
+    assert ids(other, ("status", "==", "open")) == ["a", "b"]
+
+    other.document("a").update({"status": "closed"})
+    other.document("b").delete()
+    assert ids(trades, ("status", "==", "open")) == []
+    assert trades.document("a").get().to_dict() == {
+        "user_id": "u", "status": "closed", "close_time": datetime(2024, 1, 1, 12)}
+
+    # A new client loads the current documents
+    assert ids(MockFirestoreClient(path=path).collection("trades")) == ["a"]
+    first.close()
+    second.close()
+
+def test_transactions_across_journaled_clients_never_lose_updates(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    repos = [FirestoreRepository(MockFirestoreClient(path=path), max_workers=4) for _ in range(2)]
+
+    async def scenario():
+        await asyncio.gather(*(repos[i % 2].run_transaction(increment, max_attempts=100) for i in range(30)))
+        return [await repo.get_document("counters", "c") for repo in repos]
+
+    assert [doc["value"] for doc in asyncio.run(scenario())] == [30, 30]
+    for repo in repos:
+        repo.close()
+        repo.client.close()
+
+def test_client_behind_the_trimmed_log_reloads(tmp_path, monkeypatch):
+    monkeypatch.setattr(SqliteMockJournal, "TRIM_EVERY", 5)
+    monkeypatch.setattr(SqliteMockJournal, "RETAIN", 3)
+    path = str(tmp_path / "store.sqlite3")
+    writer, reader = MockFirestoreClient(path=path), MockFirestoreClient(path=path)
+    assert ids(reader.collection("docs")) == []
+
+    for n in range(20):
+        writer.collection("docs").document(f"d{n:02d}").set({"n": n})
+    writer.collection("docs").document("d00").delete()
+    assert ids(reader.collection("docs"), ("n", ">=", 18)) == ["d18", "d19"]
+    assert len(ids(reader.collection("docs"))) == 19
+    writer.close()
+    reader.close()
+
+def test_another_process_sees_writes(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    client = MockFirestoreClient(path=path)
+    client.collection("trades").document("mine").set({"user_id": "u"})
+
+    script = ("import sys; from app.services.firebase_service import MockFirestoreClient; "
+              "c = MockFirestoreClient(path=sys.argv[1]); "
+              "assert c.collection('trades').document('mine').get().exists; "
+              "c.collection('trades').document('theirs').set({'user_id': 'u'})")
+    subprocess.run([sys.executable, "-c", script, path], check=True)
+    assert ids(client.collection("trades"), ("user_id", "==", "u")) == ["mine", "theirs"]
+    client.close()
+
+def test_startup_warms_the_mock_indexes(client, monkeypatch):
+    monkeypatch.setenv("STARTUP_WARMUP", "true")
+    client.portal.call(lifecycle.startup)
+    stores = get_firestore_client()._data.stores
+    for collection_name, kind, field in lifecycle.MOCK_WARM_INDEXES:
+        assert field in getattr(stores[collection_name], f"{kind}_indexes"), (collection_name, kind, field)
+
+def test_initialize_returns_the_same_client(client):
+    assert initialize_firebase() is get_firestore_client()
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.monte_carlo import resample_indices, run_simulation, simulate_chunk, trade_returns
+from tests.helpers import close_trade, create_trade, wait_for_job
+
+def simulate(samples, paths=200, horizon=50, block_size=1, seed=0, balance=10000.0,
+             risk_fraction=None, ruin_equity=5000.0):
+    return asyncio.run(run_simulation(np.asarray(samples, dtype=np.float64), paths, horizon, block_size,
+                                      seed, balance, risk_fraction, ruin_equity))
+
+def test_chunk_matches_path_by_path_replay():
+    samples = np.array([120.0, -80.0, 45.0, -200.0, 300.0, -60.0])
+    seed = np.random.SeedSequence(11)
+    result = simulate_chunk(samples.copy(), 50, 40, 1, seed, 1000.0, None, 500.0)
+    indices = resample_indices(np.random.default_rng(seed), len(samples), 50, 40, 1)
+
+    for path, draws in enumerate(samples[indices]):
+        equity, peak, worst, underwater, longest = 1000.0, 1000.0, 0.0, 0, 0
+        lowest = equity
+        for draw in draws:
+            equity += draw
+            lowest = min(lowest, equity)
+            peak = max(peak, equity)
+            worst = max(worst, (peak - equity) / peak)
+            underwater = 0 if equity >= peak else underwater + 1
+            longest = max(longest, underwater)
+        assert result["final_equity"][path] == pytest.approx(equity)
+        assert result["max_drawdown"][path] == pytest.approx(worst)
+        assert result["longest_underwater"][path] == longest
+        assert result["ruined"][path] == (lowest <= 500.0)
+        assert result["recovered"][path] == (underwater == 0)
+
+def test_block_bootstrap_draws_consecutive_trades():
+    indices = resample_indices(np.random.default_rng(0), 10, 100, 23, 5)
+    assert indices.shape == (100, 23)
+    for path in indices:
+        for block in range(0, 23, 5):
+            run = path[block:block + 5]
+            assert ((np.diff(run) % 10) == 1).all()
+
+def test_same_seed_gives_the_same_summary():
+    samples = [100, -50, 30, -120, 80]
+    assert simulate(samples, seed=3) == simulate(samples, seed=3)
+    assert simulate(samples, seed=3) != simulate(samples, seed=4)
+
+def test_always_winning_never_draws_down():
+    summary = simulate([10, 20, 30])
+    assert summary["max_drawdown"]["p99"] == 0
+    assert summary["probability_of_loss"] == 0 and summary["risk_of_ruin"] == 0
+    assert summary["time_to_recover"]["unrecovered"] == 0
+    assert 10500 <= summary["final_equity"]["p50"] <= 11500
+
+def test_compounded_losses_hit_the_ruin_level():
+    # Losing 1R at 10% risk leaves 0.9^k of the balance: below 50% after 7 trades
+    assert simulate([-1, -1], horizon=7, risk_fraction=0.1)["risk_of_ruin"] == 100
+    summary = simulate([-1, -1], horizon=6, risk_fraction=0.1)
+    assert summary["risk_of_ruin"] == 0
+    assert summary["final_equity"]["p50"] == pytest.approx(10000 * 0.9 ** 6, abs=0.01)
+    assert summary["max_drawdown"]["p50"] == pytest.approx((1 - 0.9 ** 6) * 100, abs=0.01)
+
+def test_r_multiples_use_the_stop_distance():
+    trades = [
+        {"status": "closed", "profit": 100.0, "direction": "long", "entry_price": 1.1, "exit_price": 1.102,
+         "stop_loss": 1.099, "close_time": datetime(2024, 1, 2)},
+        {"status": "closed", "profit": -50.0, "direction": "short", "entry_price": 1.1, "exit_price": 1.1005,
+         "stop_loss": 1.101, "close_time": datetime(2024, 1, 1)},
+        {"status": "closed", "profit": -25.0, "direction": "long", "entry_price": 1.1, "exit_price": 1.09,
+         "close_time": datetime(2024, 1, 3)},
+        {"status": "open", "profit": None},
+    ]
+    returns = trade_returns(trades)
+    assert returns["profits"].tolist() == [-50.0, 100.0, -25.0]
+    # No stop: profit over the average loss
+    assert returns["r_multiples"] == pytest.approx([-0.5, 2.0, -25 / 37.5])
+
+def test_background_job_matches_the_direct_response(client, user_id):
+    for exit_price in (1.102, 1.099, 1.1015, 1.0985):
+        close_trade(client, user_id, create_trade(client, user_id), exit_price)
+    query = f"/api/analytics/monte-carlo?user_id={user_id}&paths=500&seed=9&method=block&block_size=2"
+
+    direct = client.get(query).json()["data"]
+    job_id = client.get(query + "&background=true").json()["data"]["job_id"]
+    job = wait_for_job(client, user_id, job_id)
+    assert job["status"] == "completed"
+    assert job["result"] == direct
+    assert direct["trades_sampled"] == 4 and direct["horizon"] == 4
+
+def test_simulation_needs_two_closed_trades(client, user_id):
+    close_trade(client, user_id, create_trade(client, user_id), 1.102)
+    assert client.get(f"/api/analytics/monte-carlo?user_id={user_id}").status_code == 400
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from app.models import TradeDirection
+from app.services.firestore_repository import get_repository
+from app.services.pnl import trade_profit, trade_profits
+from benchmarks.micro import run_micro
+from benchmarks.synthetic import synthetic_trades
+from tests.helpers import close_trade, create_trade, get_trade, wait_for_job
+
+def test_profits_convert_the_quote_currency():
+    assert trade_profit(1.1, 1.101, 1.0, "long", "EUR/USD") == 100.0
+    assert trade_profit(1.1, 1.101, 1.0, "short", "EUR/USD") == -100.0
+    # A 1.00 yen move on 100,000 units is 100,000 JPY, or 666.67 USD at 150
+    assert trade_profit(150.0, 151.0, 1.0, "long", "USD/JPY") == 666.67
+    assert trade_profit(150.0, 150.2, 0.5, "short", "usdjpy") == -66.67
+    # Gold lots are 100 ounces
+    assert trade_profit(2000.0, 2010.0, 1.0, "long", "XAU/USD") == 1000.0
+
+def test_vectorized_profits_match_the_scalar_formula():
+    rng = np.random.default_rng(5)
+    pairs = rng.choice(["EUR/USD", "GBP/USD", "USD/JPY", "XAU/USD"], 500)
+    prices = np.select([pairs == "USD/JPY", pairs == "XAU/USD"], [150.0, 2000.0], 1.2)
+    entry = prices * (1 + rng.normal(0, 0.01, 500))
+    exit_price = entry * (1 + rng.normal(0, 0.005, 500))
+    lots = np.round(rng.uniform(0.01, 3, 500), 2)
+    directions = rng.choice(["long", "short"], 500)
+
+    expected = [trade_profit(*row) for row in zip(entry.tolist(), exit_price.tolist(), lots.tolist(),
+                                                   directions.tolist(), pairs.tolist())]
+    enums = [TradeDirection(direction) for direction in directions]
+    for given in (directions, directions.tolist(), enums):
+        assert trade_profits(entry, exit_price, lots, given, pairs).tolist() == expected
+    assert [trade_profit(e, x, n, d, p) for e, x, n, d, p in zip(entry, exit_price, lots, enums, pairs)] == expected
+
+def test_recompute_job_rewrites_stale_profits(client, user_id):
+    stale = create_trade(client, user_id)
+    close_trade(client, user_id, stale, 1.101)
+    current = create_trade(client, user_id, pair="USD/JPY", entry_price=150.0)
+    close_trade(client, user_id, current, 151.0)
+    other_user = f"{user_id}_other"
+    other = create_trade(client, other_user)
+    close_trade(client, other_user, other, 1.101)
+    client.portal.call(get_repository().batch_write, [("update", "trades", trade_id, {"profit": 1.0})
+                                                      for trade_id in (stale, other)])
+
+    # Only the caller's trades are rewritten
+    response = client.post("/api/trades/recompute-profits", params={"user_id": user_id, "all_users": True})
+    job = wait_for_job(client, user_id, response.json()["data"]["job_id"])
+
+    assert job["status"] == "completed"
+    assert job["result"] == {"trades_checked": 2, "trades_updated": 1}
+    assert get_trade(client, user_id, stale)["profit"] == 100.0
+    assert get_trade(client, user_id, current)["profit"] == 666.67
+    assert get_trade(client, other_user, other)["profit"] == 1.0
+    overview = client.get("/api/analytics/overview", params={"user_id": user_id}).json()["data"]
+    assert overview["total_profit"] == pytest.approx(766.67)
+
+def test_benchmark_inputs_use_the_app_formula():
+    trades = [t for t in synthetic_trades(200, open_fraction=0.1) if t["status"] == "closed"]
+    assert len(trades) == 180
+    stored = [t["profit"] for t in trades]
+    recomputed = trade_profits(*([t[field] for t in trades]
+                                 for field in ("entry_price", "exit_price", "lot_size", "direction", "pair")))
+    # Synthetic profits are booked before prices are rounded to the pair's digits
+    assert recomputed.tolist() == pytest.approx(stored, abs=2.0)
+
+def test_micro_benchmarks_run():
+    rows = run_micro([100], repeat=1, verbose=False)
+    names = {row["name"] for row in rows}
+    assert {"pnl.trade_profit", "pnl.trade_profits"} <= names
+    assert all(row["size"] == 100 and row["median_ms"] >= 0 for row in rows)
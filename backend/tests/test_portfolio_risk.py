@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.portfolio_risk import (PortfolioRisk, RiskModel, RiskModelCache, currency_log_prices,
+                                         net_exposures, trade_exposure)
+from app.services.price_history import Bars
+from tests.helpers import create_trade
+from tests.test_backtest import write_history
+
+def log_prices(days: int, seed: int = 1) -> pd.DataFrame:
+    """Correlated EUR and GBP plus an independent JPY, as log USD prices"""
+    rng = np.random.default_rng(seed)
+    common = rng.normal(0, 0.006, days)
+    returns = np.column_stack([common + rng.normal(0, 0.002, days), common + rng.normal(0, 0.002, days),
+                               rng.normal(0, 0.005, days)])
+    start = np.log([1.1, 1.25, 1 / 150])
+    index = pd.date_range("2024-01-01", periods=days, freq="D").values.astype("datetime64[D]")
+    frame = pd.DataFrame(start + np.cumsum(returns, axis=0), index=index, columns=["EUR", "GBP", "JPY"])
+    frame.insert(0, "USD", 0.0)
+    return frame
+
+def test_incremental_updates_match_a_full_build():
+    prices = log_prices(120)
+    model = RiskModel.build(prices.iloc[:50])
+    model.update(prices.iloc[40:90])
+    model.update(prices)
+    full = RiskModel.build(prices)
+    assert model.observations == full.observations == 118  # the last day is not complete yet
+    assert np.allclose(model.cov, full.cov, rtol=1e-10, atol=1e-16)
+    assert model.last_day == full.last_day
+
+def test_cross_pairs_price_the_missing_leg():
+    days = pd.Index(np.array(["2024-01-01", "2024-01-02"], dtype="datetime64[D]"))
+    logs = currency_log_prices({
+        "EUR/USD": pd.Series([1.1, 1.2], index=days),
+        "EUR/GBP": pd.Series([0.88, 0.9], index=days),
+        "USD/JPY": pd.Series([150.0, 140.0], index=days),
+    })
+    assert np.exp(logs["GBP"]).tolist() == pytest.approx([1.1 / 0.88, 1.2 / 0.9])
+    assert np.exp(logs["JPY"]).tolist() == pytest.approx([1 / 150, 1 / 140])
+    assert (logs["USD"] == 0).all()
+
+def test_exposures_net_by_currency():
+    assert trade_exposure("EUR/USD", "long", 1.0, 1.1) == {"EUR": 100000.0, "USD": pytest.approx(-110000.0)}
+    exposures = net_exposures([
+        {"pair": "EUR/USD", "direction": "long", "lot_size": 1.0, "entry_price": 1.1},
+        {"pair": "USD/JPY", "direction": "short", "lot_size": 0.5, "entry_price": 150.0},
+    ])
+    assert exposures == {"EUR": 100000.0, "USD": pytest.approx(-160000.0), "JPY": pytest.approx(7500000.0)}
+
+def test_var_contributions_add_up():
+    model = RiskModel.build(log_prices(200))
+    book = PortfolioRisk(model, {"EUR": 100000.0, "GBP": -50000.0, "JPY": 5000000.0, "USD": -20000.0})
+    summary = book.summary(0.99, horizon_days=4)
+    assert summary["var"] > 0
+    assert sum(c["var"] for c in summary["contributions"]) == pytest.approx(summary["var"], abs=0.05)
+    assert summary["correlation"]["currencies"] == ["EUR", "GBP", "JPY"]
+    assert summary["correlation"]["matrix"][0][1] > 0.8
+
+def test_correlated_trades_are_sized_down_and_hedges_are_not_sized_up():
+    model = RiskModel.build(log_prices(200))
+    book = PortfolioRisk(model, net_exposures([{"pair": "EUR/USD", "direction": "long",
+                                               "lot_size": 2.0, "entry_price": 1.1}]))
+    correlated = book.size_trade("GBP/USD", "long", 1.25, 1.0)
+    assert correlated["adjusted"] and correlated["suggested_lot_size"] < 1.0
+    assert correlated["correlation"] > 0.8
+
+    hedge = book.size_trade("GBP/USD", "short", 1.25, 1.0)
+    assert hedge["suggested_lot_size"] == 1.0 and hedge["var_after"] < hedge["var_before"]
+
+    no_model = PortfolioRisk(None, {}).size_trade("EUR/USD", "long", 1.1, 0.7)
+    assert no_model == {"suggested_lot_size": 0.7, "adjusted": False, "correlation": None,
+                        "var_before": None, "var_after": None}
+
+def test_cache_folds_in_grown_history_files(tmp_path, monkeypatch):
+    monkeypatch.setenv("PRICE_HISTORY_DIR", str(tmp_path))
+    prices = log_prices(80)
+    minutes = np.timedelta64(60, "m")
+
+    def write(days):
+        for ccy, pair, invert in (("EUR", "EURUSD", False), ("JPY", "USDJPY", True)):
+            closes = np.exp(-prices[ccy].to_numpy()[:days] if invert else prices[ccy].to_numpy()[:days])
+            # Two bars a day; the daily close is the later one
+            times = np.repeat(prices.index.values[:days].astype("datetime64[us]"), 2)
+            times[1::2] += minutes
+            bars = np.repeat(closes, 2)
+            write_history(str(tmp_path / f"{pair}.npy"), Bars(pair, times, bars, bars, bars, bars))
+
+    write(50)
+    cache = RiskModelCache(refresh_seconds=0)
+    first = cache.get()
+    assert first is not None and first.observations == 48
+    write(80)
+    grown = cache.get()
+    assert grown is first  # updated in place, not rebuilt
+    rebuilt = RiskModelCache(refresh_seconds=0).get()
+    assert grown.observations == rebuilt.observations == 78
+    assert np.allclose(grown.cov, rebuilt.cov, rtol=1e-9, atol=1e-16)
+
+def test_exposure_endpoint_without_price_history(client, user_id):
+    create_trade(client, user_id)
+    response = client.get(f"/api/portfolio/exposure?user_id={user_id}")
+    assert response.status_code == 200, response.text
+    data = response.json()["data"]
+    assert {e["currency"]: e["units"] for e in data["exposures"]} == {"EUR": 100000.0, "USD": -110000.0}
+    assert data["gross_exposure"] == 110000.0
+    assert data["unmodelled"] == ["EUR"] and data["var"] is None
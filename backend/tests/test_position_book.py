@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+
+from app.services.firebase_service import MockFirestoreClient
+from app.services.firestore_repository import FirestoreRepository
+from app.services.position_book import SUBSCRIBER_QUEUE_SIZE, PositionBook, Tick
+
+def open_trade(trade_id, user_id="u", pair="EUR/USD", direction="long", entry_price=1.1, lot_size=1.0):
+    return {"id": trade_id, "user_id": user_id, "pair": pair, "direction": direction,
+            "entry_price": entry_price, "lot_size": lot_size, "status": "open"}
+
+def run(trades, body):
+    async def main():
+        repo = FirestoreRepository(MockFirestoreClient())
+        await repo.batch_write([("set", "trades", t["id"], t) for t in trades])
+        try:
+            return await body(repo, PositionBook())
+        finally:
+            repo.close()
+    return asyncio.run(main())
+
+def test_ticks_publish_only_changed_pnl_to_the_owner():
+    async def body(repo, book):
+        queue = await book.subscribe(repo, "u")
+        other = await book.subscribe(repo, "v")
+
+        assert book.apply_tick(Tick("EURUSD", 1.101, 1.1012)) == 2
+        event = queue.get_nowait()
+        updates = {u["trade_id"]: u for u in event["updates"]}
+        assert updates["long"]["pnl"] == 100.0 and updates["long"]["delta"] is None
+        # Shorts close at the ask
+        assert updates["short"]["pnl"] == -120.0
+        assert other.empty()
+
+        # Same prices again: nothing moved, nothing is sent
+        assert book.apply_tick(Tick("EUR/USD", 1.101, 1.1012)) == 0
+        assert book.apply_tick(Tick("EUR/USD", 1.102, 1.1012)) == 1
+        assert queue.get_nowait()["updates"] == [{"trade_id": "long", "pnl": 200.0, "delta": 100.0}]
+
+        assert book.apply_tick(Tick("USD/JPY", 151, 151.01)) == 1
+        assert other.get_nowait()["updates"][0]["pnl"] > 0
+        assert queue.empty()
+
+    run([open_trade("long"), open_trade("short", direction="short"),
+         open_trade("jpy", user_id="v", pair="USD/JPY", entry_price=150)], body)
+
+def test_last_unsubscribe_evicts_the_users_positions():
+    async def body(repo, book):
+        first = await book.subscribe(repo, "u")
+        second = await book.subscribe(repo, "u")
+        book.unsubscribe("u", first)
+        assert [p["trade_id"] for p in book.snapshot("u")] == ["a"]
+        book.unsubscribe("u", second)
+        assert book.positions == {} and book.by_pair == {} and "u" not in book.subscribers
+
+    run([open_trade("a")], body)
+
+def test_trade_changes_update_streamed_users_only():
+    async def body(repo, book):
+        await book.subscribe(repo, "u")
+        book.apply_tick(Tick("EUR/USD", 1.101, 1.101))
+
+        added = open_trade("b")
+        book.on_trade_changed(None, added)
+        # Priced immediately from the pair's last tick
+        assert {p["trade_id"]: p["pnl"] for p in book.snapshot("u")} == {"a": 100.0, "b": 100.0}
+
+        book.on_trade_changed(added, {**added, "status": "closed"})
+        book.on_trade_changed(None, open_trade("c", user_id="nobody"))
+        assert [p["trade_id"] for p in book.snapshot("u")] == ["a"]
+        assert "c" not in book.positions
+
+    run([open_trade("a")], body)
+
+def test_slow_subscribers_drop_their_oldest_events():
+    async def body(repo, book):
+        queue = await book.subscribe(repo, "u")
+        for i in range(SUBSCRIBER_QUEUE_SIZE + 5):
+            book.apply_tick(Tick("EUR/USD", 1.1 + i / 10000, 1.2))
+        assert queue.qsize() == SUBSCRIBER_QUEUE_SIZE
+        assert queue.get_nowait()["bid"] == pytest.approx(1.1 + 5 / 10000)
+
+    run([open_trade("a")], body)
+
+class FailingRepository:
+    async def query(self, *args, **kwargs):
+        raise RuntimeError("firestore unavailable")
+
+def test_failed_load_does_not_leak_the_subscriber():
+    async def main():
+        book = PositionBook()
+        with pytest.raises(RuntimeError):
+            await book.subscribe(FailingRepository(), "u")
+        assert book.subscribers == {} and book._loading == {}
+
+    asyncio.run(main())
+
+class SlowRepository:
+    """Lets trade changes land while a user's open trades are being queried"""
+
+    def __init__(self, repo, during_query):
+        self.repo = repo
+        self.during_query = during_query
+
+    async def query(self, *args, **kwargs):
+        trades = await self.repo.query(*args, **kwargs)
+        self.during_query()
+        return trades
+
+def test_changes_during_the_initial_load_are_not_lost():
+    async def body(repo, book):
+        added, closed = open_trade("b"), open_trade("a")
+
+        def during_query():
+            book.on_trade_changed(None, added)
+            book.on_trade_changed(closed, {**closed, "status": "closed"})
+
+        await book.subscribe(SlowRepository(repo, during_query), "u")
+        assert [p["trade_id"] for p in book.snapshot("u")] == ["b"]
+        assert book._pending == {}
+
+    run([open_trade("a")], body)
+
+def test_cancelling_one_subscriber_keeps_the_shared_load_for_the_others():
+    class GatedRepository:
+        def __init__(self, repo):
+            self.repo = repo
+            self.release = asyncio.Event()
+
+        async def query(self, *args, **kwargs):
+            await self.release.wait()
+            return await self.repo.query(*args, **kwargs)
+
+    async def body(repo, book):
+        gated = GatedRepository(repo)
+        leaving = asyncio.ensure_future(book.subscribe(gated, "u"))
+        staying = asyncio.ensure_future(book.subscribe(gated, "u"))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        gated.release.set()
+        queue = await staying
+        assert leaving.cancelled()
+        assert book.subscribers == {"u": {queue}}
+        assert [p["trade_id"] for p in book.snapshot("u")] == ["a"]
+        assert book._loading == {}
+
+    run([open_trade("a")], body)
+
+def test_pushed_ticks_reach_the_global_book(client, user_id, monkeypatch):
+    monkeypatch.setenv("TICK_PUSH_ENABLED", "true")
+    response = client.post("/api/stream/ticks", json=[{"pair": "EUR/USD", "bid": 1.1, "ask": 1.1001}])
+    assert response.status_code == 200
+    assert response.json()["data"]["ticks"] == 1
+
+def test_tick_push_is_disabled_by_default(client):
+    response = client.post("/api/stream/ticks", json=[{"pair": "EUR/USD", "bid": 1.1, "ask": 1.1001}])
+    assert response.status_code == 404
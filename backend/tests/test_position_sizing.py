@@ -0,0 +1,51 @@
+import pytest
+
+SETUPS = [
+    {"account_balance": 10000, "risk_percentage": 1, "entry_price": 1.1, "stop_loss": 1.095, "pair": "EUR/USD"},
+    {"account_balance": 25000, "risk_percentage": 2, "entry_price": 150.0, "stop_loss": 149.5, "pair": "USD/JPY"},
+    {"account_balance": 5000, "risk_percentage": 0.5, "entry_price": 1.25, "stop_loss": 1.26, "pair": "GBP/USD"},
+]
+
+def single(client, setup):
+    response = client.post("/api/calculator/position-size", json=setup)
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+def batch(client, body):
+    response = client.post("/api/calculator/position-size/batch", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+def test_batch_items_match_the_single_endpoint(client):
+    data = batch(client, {"items": SETUPS})
+    assert (data["count"], data["succeeded"], data["errors"]) == (3, 3, [])
+    assert data["results"] == [single(client, setup) for setup in SETUPS]
+
+def test_columns_match_items(client):
+    columns = {field: [setup[field] for setup in SETUPS] for field in SETUPS[0]}
+    by_columns = batch(client, {"columns": columns})["columns"]
+    by_items = batch(client, {"items": SETUPS})["results"]
+    assert [{field: by_columns[field][i] for field in by_columns} for i in range(3)] == by_items
+
+def test_expected_sizes(client):
+    eur, jpy, _ = batch(client, {"items": SETUPS})["results"]
+    # 100 at risk over 50 pips of 10.00 each
+    assert (eur["lot_size"], eur["pips_at_risk"], eur["pip_value"]) == (0.2, 50.0, 10.0)
+    # 500 at risk over 50 pips of 100,000 * 0.01 / 150 each
+    assert jpy["lot_size"] == pytest.approx(1.5)
+
+def test_invalid_rows_are_reported_without_failing_the_batch(client):
+    items = [SETUPS[0], {**SETUPS[0], "stop_loss": 1.1}, {**SETUPS[0], "risk_percentage": 150}, {"pair": "EUR/USD"}]
+    data = batch(client, {"items": items})
+    assert data["succeeded"] == 1
+    assert data["results"][1:] == [None, None, None]
+    assert [error["index"] for error in data["errors"]] == [1, 2, 3]
+    assert data["errors"][0]["error"] == "Stop loss must be different from entry price"
+
+def test_exactly_one_input_shape_is_required(client):
+    columns = {field: [setup[field] for setup in SETUPS] for field in SETUPS[0]}
+    assert client.post("/api/calculator/position-size/batch", json={}).status_code == 400
+    response = client.post("/api/calculator/position-size/batch", json={"items": SETUPS, "columns": columns})
+    assert response.status_code == 400
+    columns["pair"] = columns["pair"][:2]
+    assert client.post("/api/calculator/position-size/batch", json={"columns": columns}).status_code == 400
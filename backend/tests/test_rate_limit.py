@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from app.services import rate_limit
+from app.services.firebase_service import MockFirestoreClient
+from app.services.firestore_repository import FirestoreRepository
+from app.services.rate_limit import TokenBucketLimiter
+from app.services.single_flight import SingleFlight
+
+def test_token_bucket_allows_a_burst_then_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    limiter = TokenBucketLimiter(rate=2, burst=3)
+
+    assert [limiter.acquire("u") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("u") == pytest.approx(0.5)
+    assert limiter.acquire("other") == 0.0
+
+    now[0] += 1.0
+    assert [limiter.acquire("u") for _ in range(2)] == [0.0, 0.0]
+    assert limiter.acquire("u") == pytest.approx(0.5)
+
+    # Idle time never banks more than the burst
+    now[0] += 60
+    assert [limiter.acquire("u") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("u") > 0
+
+def test_token_bucket_forgets_the_least_recent_keys(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: 0.0)
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("a")
+    limiter.acquire("c")
+    assert list(limiter._buckets) == ["a", "c"]
+    assert limiter.acquire("b") == 0.0
+
+def test_requests_over_budget_get_429_with_retry_after(client, user_id, monkeypatch):
+    monkeypatch.setattr(rate_limit, "_limiter", TokenBucketLimiter(rate=0.5, burst=2))
+
+    statuses = [client.get("/api/trades/", params={"user_id": user_id}).status_code for _ in range(3)]
+    rejected = client.get("/api/trades/", params={"user_id": user_id})
+    assert statuses == [200, 200, 429]
+    assert rejected.status_code == 429 and rejected.headers["Retry-After"] == "2"
+
+    # Budgets follow the client, so switching user_id doesn't reset them; non-API paths aren't limited
+    assert client.get("/api/trades/", params={"user_id": f"{user_id}-other"}).status_code == 429
+    assert client.get("/metrics").status_code == 200
+    assert 'mckay_rate_limited_requests_total{method="GET"}' in client.get("/metrics").text
+
+def test_limiter_is_off_by_default(client, monkeypatch):
+    monkeypatch.delenv("RATE_LIMIT_PER_SECOND", raising=False)
+    monkeypatch.setattr(rate_limit, "_limiter", None)
+    assert rate_limit.get_rate_limiter() is None
+    assert all(client.get("/api/trades/").status_code == 200 for _ in range(5))
+
+def test_anonymous_clients_are_budgeted_by_forwarded_address_only_behind_trusted_proxies(client, monkeypatch):
+    monkeypatch.setattr(rate_limit, "_limiter", TokenBucketLimiter(rate=0.5, burst=1))
+
+    def status(forwarded):
+        return client.get("/api/trades/", headers={"X-Forwarded-For": forwarded}).status_code
+
+    # Without trusted proxies the header is ignored and every request is the same client
+    assert [status("1.1.1.1"), status("2.2.2.2")] == [200, 429]
+
+    monkeypatch.setenv("RATE_LIMIT_TRUSTED_PROXIES", "1")
+    assert [status("3.3.3.3"), status("3.3.3.3")] == [200, 429]
+    # Only the address the proxy appended counts; a client-supplied prefix can't mint new budgets
+    assert status("9.9.9.9, 3.3.3.3") == 429
+    assert status("4.4.4.4") == 200
+
+def test_single_flight_runs_concurrent_identical_calls_once():
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 10
+
+    async def scenario():
+        flight = SingleFlight()
+        together = await asyncio.gather(*(flight.do("k", lambda: fetch(1)) for _ in range(5)),
+                                        flight.do("other", lambda: fetch(2)))
+        later = await flight.do("k", lambda: fetch(3))
+        return together, later, flight._calls
+
+    together, later, pending = asyncio.run(scenario())
+    assert together == [(10, True)] * 5 + [(20, False)]
+    assert later == (30, False)
+    assert calls == [1, 2, 3]
+    assert pending == {}
+
+def test_single_flight_survives_a_cancelled_caller_and_shares_failures():
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def broken():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        flight = SingleFlight()
+        leaving = asyncio.ensure_future(flight.do("k", slow))
+        staying = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        result = await staying
+
+        failures = await asyncio.gather(*(flight.do("bad", broken) for _ in range(3)), return_exceptions=True)
+        return leaving.cancelled(), result, failures
+
+    cancelled, result, failures = asyncio.run(scenario())
+    assert cancelled and result == ("done", True)
+    assert [str(failure) for failure in failures] == ["boom"] * 3
+
+def test_repository_coalesces_identical_queries_until_a_write():
+    repo = FirestoreRepository(MockFirestoreClient(latency=0.02), max_workers=8)
+    executed = []
+    execute = repo.execute
+
+    async def counting_execute(fn, operation, *args, **kwargs):
+        executed.append(operation)
+        return await execute(fn, operation, *args, **kwargs)
+
+    repo.execute = counting_execute
+
+    async def scenario():
+        await repo.set_document("trades", "t1", {"user_id": "u", "status": "open"})
+        executed.clear()
+        first = await asyncio.gather(*(repo.query("trades", [("user_id", "==", "u")]) for _ in range(4)))
+        first[0][0]["status"] = "changed by a caller"
+        await repo.set_document("trades", "t2", {"user_id": "u", "status": "open"})
+        second = await repo.query("trades", [("user_id", "==", "u")])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    repo.close()
+    assert executed == ["query", "set", "query"]
+    assert [doc["status"] for doc in first[1]] == ["open"]
+    assert sorted(doc["id"] for doc in second) == ["t1", "t2"]
@@ -0,0 +1,66 @@
+import pytest
+
+from app.services.rate_service import DEFAULT_PIP_VALUE, CsvRateSource, RateCache, StaticRateSource
+
+RATES = {"EUR/USD": 1.1, "GBP/USD": 1.25, "USD/JPY": 150.0}
+
+def cache(rates=RATES, account_currency="USD"):
+    rate_cache = RateCache(StaticRateSource(rates), account_currency=account_currency)
+    rate_cache.refresh()
+    return rate_cache
+
+def test_pip_values_convert_the_quote_currency_into_the_account_currency():
+    rates = cache()
+    assert rates.pip_value("EUR/USD") == 10.0
+    assert rates.pip_value("USD/JPY") == pytest.approx(6.66667)
+    # GBP quote converted through GBP/USD
+    assert rates.pip_value("EUR/GBP") == 12.5
+
+def test_any_pair_spelling_resolves_to_the_same_value():
+    rates = cache()
+    assert rates.pip_value("usdjpy") == rates.pip_value("USD_JPY") == rates.pip_value("USD/JPY")
+
+def test_well_formed_pairs_are_memoized_in_a_bounded_lru_cleared_by_refresh():
+    rates = cache()
+    rates.MEMO_SIZE = 3
+    for pair in ("usdjpy", "USD_JPY", "XAU-USD", "QQQQ/USD", "not a pair", "NZD/CHF"):
+        rates.pip_value(pair)
+    # The refreshed tables hold only the source's pairs
+    assert set(rates._pip_values) == {"EUR/USD", "GBP/USD", "USD/JPY"}
+    assert list(rates._memo) == ["USD_JPY", "XAU-USD", "NZD/CHF"]
+    assert rates._memo["NZD/CHF"] == (DEFAULT_PIP_VALUE / 0.0001, DEFAULT_PIP_VALUE)
+    rates.refresh()
+    assert not rates._memo
+
+def test_pairs_without_any_rates_are_memoized():
+    rates = RateCache(StaticRateSource())
+    rates.refresh()
+    assert rates.pip_value("EUR/USD") == rates.pip_value("EUR/USD") == 10.0
+    assert list(rates._memo) == ["EUR/USD"]
+
+def test_cross_rates_go_through_usd():
+    rates = cache()
+    assert rates.get_rate("EUR", "JPY") == pytest.approx(1.1 * 150.0)
+    assert rates.get_rate("JPY", "GBP") == pytest.approx(1 / 150.0 / 1.25)
+
+def test_non_usd_account_currency():
+    rates = cache(account_currency="EUR")
+    assert rates.pip_value("GBP/USD") == pytest.approx(10 / 1.1, abs=1e-5)
+    assert rates.pip_value("EUR/GBP") == pytest.approx(12.5 / 1.1, abs=1e-5)
+
+def test_pairs_without_a_conversion_rate_fall_back_to_the_default():
+    assert cache().pip_value("NZD/CHF") == DEFAULT_PIP_VALUE
+
+def test_refresh_swaps_in_new_rates():
+    source = StaticRateSource(RATES)
+    rates = RateCache(source)
+    rates.refresh()
+    assert rates.pip_value("EUR/GBP") == 12.5
+    source.rates["GBP/USD"] = 1.3
+    rates.refresh()
+    assert rates.pip_value("EUR/GBP") == 13.0
+
+def test_csv_source_reads_rates_and_bid_ask_midpoints(tmp_path):
+    path = tmp_path / "rates.csv"
+    path.write_text("pair,rate,bid,ask\neurusd,1.1,,\nUSD_JPY,,149.9,150.1\n")
+    assert CsvRateSource(str(path)).fetch() == {"EUR/USD": 1.1, "USD/JPY": pytest.approx(150.0)}
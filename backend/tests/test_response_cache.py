@@ -0,0 +1,73 @@
+from app.services.response_cache import MemoryCacheBackend, SqliteCacheBackend
+from tests.helpers import close_trade, create_trade
+
+def overview(client, user_id, **headers):
+    return client.get(f"/api/analytics/overview?user_id={user_id}", headers=headers)
+
+def test_matching_etag_gets_304(client, user_id):
+    first = overview(client, user_id)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    again = overview(client, user_id, **{"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert overview(client, user_id, **{"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+    assert overview(client, user_id, **{"If-None-Match": '"other"'}).status_code == 200
+
+def test_trade_changes_invalidate_only_that_users_responses(client, user_id):
+    other = user_id + "-other"
+    before = overview(client, user_id).headers["etag"]
+    other_before = overview(client, other).headers["etag"]
+
+    close_trade(client, user_id, create_trade(client, user_id), 1.101)
+
+    after = overview(client, user_id, **{"If-None-Match": before})
+    assert after.status_code == 200
+    assert after.json()["data"]["total_trades"] == 1
+    assert overview(client, other, **{"If-None-Match": other_before}).status_code == 304
+
+def test_same_content_has_the_same_etag(client, user_id):
+    first = overview(client, user_id).headers["etag"]
+    trade_id = create_trade(client, user_id)
+    client.delete(f"/api/trades/{trade_id}?user_id={user_id}")
+    # Recomputed after the invalidation but identical, so clients keep their copy
+    assert overview(client, user_id).headers["etag"] == first
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_bytes=10, max_entries=2)
+    backend.set("a", b"1", "ea")
+    backend.set("b", b"2", "eb")
+    backend.get("a")
+    backend.set("c", b"3", "ec")
+    assert backend.get("b") is None
+    assert backend.get("a") == (b"1", "ea")
+
+    backend.set("big", b"x" * 11, "e")
+    assert backend.get("big") is None
+    backend.set("d", b"x" * 9, "ed")
+    # "a" was read more recently than "c"
+    assert backend.get("c") is None
+    assert backend.get("d") is not None and backend.get("a") is not None
+
+def test_memory_backend_version_tags_differ_between_processes():
+    first, second = MemoryCacheBackend(), MemoryCacheBackend()
+    assert first.get_version("u") == second.get_version("u") == 0
+    assert first.version_tag("u") != second.version_tag("u")
+    assert first.bump_version("u") == 1 and first.get_version("u") == 1
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first, second = SqliteCacheBackend(path), SqliteCacheBackend(path)
+    first.set("k", b"body", '"e"')
+    assert second.get("k") == (b"body", '"e"')
+    assert first.bump_version("u") == 1
+    assert second.bump_version("u") == 2
+    assert first.version_tag("u") == "2"
+
+def test_sqlite_backend_trims_to_max_bytes(tmp_path):
+    backend = SqliteCacheBackend(str(tmp_path / "cache.sqlite3"), max_bytes=100)
+    for i in range(20):
+        backend.set(f"k{i}", b"x" * 10, "e")
+    total = backend._connect().execute("SELECT SUM(size) FROM entries").fetchone()[0]
+    assert total <= 100
+    assert backend.get("k19") is not None
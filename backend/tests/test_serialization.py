@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import pytest
+
+from app.services import serialization
+from app.services.serialization import negotiate_fast_format
+from app.services.trade_records import TRADE_RECORD_FIELDS, TradeRecord
+from tests.helpers import close_trade, create_trade
+
+def list_trades(client, user_id, accept=None, **params):
+    query = "&".join(f"{key}={value}" for key, value in {"user_id": user_id, **params}.items())
+    headers = {"Accept": accept} if accept else {}
+    response = client.get(f"/api/trades/?{query}", headers=headers)
+    assert response.status_code == 200, response.text
+    return response
+
+def seed(client, user_id):
+    close_trade(client, user_id, create_trade(client, user_id, tags=["a"], notes="n"), 1.101)
+    create_trade(client, user_id, pair="USD/JPY", direction="short", entry_price=150.0)
+    create_trade(client, user_id)
+
+def test_orjson_response_matches_the_default(client, user_id):
+    pytest.importorskip("orjson")
+    seed(client, user_id)
+    default_response = list_trades(client, user_id, limit=2)
+    assert default_response.headers["vary"] == "Accept"
+    default = default_response.json()
+    fast = list_trades(client, user_id, serialization.ORJSON_MEDIA_TYPE, limit=2)
+
+    assert fast.headers["content-type"] == serialization.ORJSON_MEDIA_TYPE
+    assert fast.headers["vary"] == "Accept"
+    body = fast.json()
+    assert body["data"]["next_cursor"] == default["data"]["next_cursor"] is not None
+    for fast_trade, trade in zip(body["data"]["trades"], default["data"]["trades"]):
+        assert set(fast_trade) == set(TRADE_RECORD_FIELDS)
+        assert {key: value for key, value in fast_trade.items() if key in trade} == trade
+
+def test_msgpack_response_matches_the_default(client, user_id):
+    msgpack = pytest.importorskip("msgpack")
+    seed(client, user_id)
+    default = list_trades(client, user_id).json()
+    body = msgpack.unpackb(list_trades(client, user_id, "application/x-msgpack").content)
+
+    assert body["success"] is True and body["data"]["count"] == 3
+    for fast_trade, trade in zip(body["data"]["trades"], default["data"]["trades"]):
+        assert {key: value for key, value in fast_trade.items() if key in trade} == trade
+
+def test_fast_format_negotiation():
+    fast = "orjson" if serialization.orjson else None
+    assert negotiate_fast_format(None) is None
+    assert negotiate_fast_format("application/json") is None
+    assert negotiate_fast_format(f"application/json, {serialization.ORJSON_MEDIA_TYPE}") == fast
+    assert negotiate_fast_format(f"{serialization.ORJSON_MEDIA_TYPE};q=0") is None
+    assert negotiate_fast_format(f"{serialization.ORJSON_MEDIA_TYPE.upper()};q=0.5") == fast
+
+def test_missing_libraries_fall_back_to_json(client, user_id, monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+    seed(client, user_id)
+    response = list_trades(client, user_id, serialization.ORJSON_MEDIA_TYPE)
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["data"]["count"] == 3
+
+def test_trade_record_from_document():
+    record = TradeRecord.from_document("t1", {"pair": "EUR/USD", "profit": 1.5, "unknown": "ignored",
+                                              "close_time": datetime(2024, 1, 1)})
+    assert record.id == "t1" and record.pair == "EUR/USD"
+    assert record.to_dict()["close_time"] == datetime(2024, 1, 1)
+    assert record.values() == tuple(record.to_dict().values())
+    assert not hasattr(record, "__dict__")
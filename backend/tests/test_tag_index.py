@@ -0,0 +1,130 @@
+import asyncio
+import random
+from itertools import combinations
+
+import pytest
+
+from app.services.response_cache import get_response_cache
+from app.services.tag_index import TagIndex, TagIndexStore
+from tests.helpers import close_trade, create_trade
+
+TAGS = ["a", "b", "c", "d", "e"]
+
+def random_trade(rng, trade_id):
+    closed = rng.random() < 0.8
+    return {"id": trade_id, "tags": rng.sample(TAGS, rng.randint(0, 3)),
+            "status": "closed" if closed else "open", "profit": rng.choice([-20, -5, 0, 5, 15, 40]) if closed else None}
+
+def matching(trades, all_of=(), any_of=(), none_of=()):
+    return sorted(t["id"] for t in trades.values()
+                  if t["status"] == "closed" and set(all_of) <= set(t["tags"])
+                  and (not any_of or set(any_of) & set(t["tags"])) and not set(none_of) & set(t["tags"]))
+
+@pytest.fixture
+def indexed():
+    """An index kept up through adds, moves and removals, and the trades it should hold"""
+    rng = random.Random(3)
+    trades = {f"t{i}": random_trade(rng, f"t{i}") for i in range(150)}
+    index = TagIndex.build("u", trades.values())
+    for i in range(300):
+        trade_id = f"t{rng.randint(0, 199)}"
+        if rng.random() < 0.3:
+            index.remove_trade(trade_id)
+            trades.pop(trade_id, None)
+        else:
+            trades[trade_id] = random_trade(rng, trade_id)
+            index.set_trade(trades[trade_id])
+    return index, trades, rng
+
+def test_filters_match_a_scan_of_the_trades(indexed):
+    index, trades, rng = indexed
+    for _ in range(300):
+        query = {key: rng.sample(TAGS + ["missing"], rng.randint(0, 2)) for key in ("all_of", "any_of", "none_of")}
+        bits = index.select(**query)
+        expected = matching(trades, **query)
+        assert sorted(index.trade_ids(bits)) == expected, query
+
+        profits = [trades[t]["profit"] for t in expected]
+        stats = index.stats(bits)
+        assert stats["trades"] == len(expected)
+        assert stats["total_profit"] == sum(profits)
+        assert stats["wins"] == sum(p > 0 for p in profits) and stats["losses"] == sum(p < 0 for p in profits)
+
+def test_top_combinations_match_brute_force(indexed):
+    index, trades, _ = indexed
+    expected = []
+    for size in (1, 2, 3):
+        for combo in combinations(sorted(TAGS), size):
+            stats = index.stats(index.select(all_of=combo))
+            if stats["trades"] >= 5:
+                expected.append({"tags": list(combo), **stats})
+    expected.sort(key=lambda row: (row["win_rate"], row["trades"]), reverse=True)
+
+    found = index.top_combinations(k=len(expected), min_size=1, max_size=3, min_trades=5, metric="win_rate")
+    key = lambda row: (row["win_rate"], row["trades"], tuple(row["tags"]))
+    assert sorted(map(key, found)) == sorted(map(key, expected))
+    assert [key(r)[:2] for r in found] == [key(r)[:2] for r in expected]
+
+    with pytest.raises(ValueError):
+        index.top_combinations(metric="luck")
+
+def test_tag_summary_counts_open_trades():
+    index = TagIndex.build("u", [
+        {"id": "1", "tags": ["a", "a"], "status": "closed", "profit": 10.0},
+        {"id": "2", "tags": ["a"], "status": "open", "profit": None},
+    ], metadata=[{"name": "b", "color": "#ff0000"}])
+    summary = {tag["name"]: tag for tag in index.tag_summary()}
+    assert (summary["a"]["trades"], summary["a"]["open_trades"], summary["a"]["total_profit"]) == (1, 1, 10.0)
+    assert summary["b"]["trades"] == 0 and summary["b"]["color"] == "#ff0000"
+
+def test_tag_endpoints_follow_trade_changes(client, user_id):
+    winner = create_trade(client, user_id, tags=["breakout", "london"])
+    loser = create_trade(client, user_id, direction="short", tags=["breakout"])
+    create_trade(client, user_id, tags=["london"])
+    close_trade(client, user_id, winner, 1.101)
+
+    def filtered(**params):
+        query = "&".join(f"{key}={value}" for key, value in params.items())
+        response = client.get(f"/api/tags/filter?user_id={user_id}&include_trades=true&{query}")
+        assert response.status_code == 200, response.text
+        return response.json()["data"]
+
+    assert filtered(all="breakout")["trade_ids"] == [winner]
+    close_trade(client, user_id, loser, 1.101, tags=["breakout", "news"])
+    data = filtered(all="breakout", none="london")
+    assert (data["trade_ids"], data["total_profit"]) == ([loser], -100.0)
+    client.delete(f"/api/trades/{winner}?user_id={user_id}")
+    assert filtered(any="london")["trades"] == 0
+    assert client.get(f"/api/tags/filter?user_id={user_id}").status_code == 400
+
+    saved = client.put(f"/api/tags/news?user_id={user_id}", json={"color": "#00ff00"})
+    assert saved.status_code == 200
+    tags = {tag["name"]: tag for tag in client.get(f"/api/tags/?user_id={user_id}").json()["data"]["tags"]}
+    assert tags["news"]["color"] == "#00ff00" and tags["news"]["trades"] == 1
+    assert tags["london"]["open_trades"] == 1
+
+def test_combinations_endpoint_validates_sizes(client, user_id):
+    response = client.get(f"/api/tags/combinations?user_id={user_id}&min_size=3&max_size=2")
+    assert response.status_code == 400
+
+def test_a_query_does_not_take_an_in_flight_build_older_than_its_version(user_id):
+    class GatedStore(TagIndexStore):
+        async def _load(self, repo, user_id, version):
+            await gate.wait()
+            return TagIndex.build(user_id, [], version=version)
+
+    async def scenario():
+        store = GatedStore()
+        first = asyncio.ensure_future(store.get(None, user_id))
+        await asyncio.sleep(0)
+        get_response_cache().invalidate_user(user_id)
+        second = asyncio.ensure_future(store.get(None, user_id))
+        await asyncio.sleep(0)
+        gate.set()
+        return await first, await second
+
+    gate = asyncio.Event()
+    version = get_response_cache().user_version(user_id)
+    first, second = asyncio.run(scenario())
+    assert first.version == version
+    assert second.version == version + 1
@@ -0,0 +1,81 @@
+import glob
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from app.services import trade_export
+from tests.helpers import close_trade, create_trade
+
+def export(client, user_id, file_format="csv", **headers):
+    response = client.get(f"/api/trades/export?user_id={user_id}&format={file_format}", headers=headers)
+    assert response.status_code in (200, 304), response.text
+    return response
+
+def seed(client, user_id):
+    first = create_trade(client, user_id, stop_loss=1.099, tags=["a", "b"], notes="first, with a comma")
+    close_trade(client, user_id, first, 1.102)
+    create_trade(client, user_id, pair="USD/JPY", direction="short", entry_price=150.0)
+    return first
+
+def test_csv_export(client, user_id):
+    first = seed(client, user_id)
+    frame = pd.read_csv(io.BytesIO(export(client, user_id).content))
+    assert list(frame.columns) == list(trade_export.EXPORT_COLUMNS)
+    assert frame["id"].iloc[0] == first
+    row = frame.iloc[0]
+    assert (row["pips"], row["r_multiple"], row["tags"], row["notes"]) == (20.0, 2.0, "a;b", "first, with a comma")
+    assert row["profit"] == 200.0
+    assert frame["pair"].tolist() == ["EUR/USD", "USD/JPY"]
+    assert pd.isna(frame["close_time"].iloc[1]) and pd.isna(frame["exit_price"].iloc[1])
+
+def test_chunked_export_matches_a_single_chunk(client, user_id, monkeypatch):
+    for i in range(7):
+        create_trade(client, user_id, entry_price=1.1 + i / 1000)
+    single = export(client, user_id).content
+
+    monkeypatch.setenv("EXPORT_CHUNK_ROWS", "2")
+    for path in glob.glob(os.path.join(trade_export.export_cache_dir(), "*")):
+        os.remove(path)
+    assert export(client, user_id).content == single
+    assert single.count(b"entry_price") == 1
+
+def test_export_is_cached_per_version(client, user_id):
+    seed(client, user_id)
+    first = export(client, user_id)
+    etag = first.headers["etag"]
+    assert export(client, user_id, **{"If-None-Match": etag}).status_code == 304
+    assert trade_export.cached_export(user_id, "csv", etag.strip('"').rsplit("-", 1)[0])
+    assert export(client, user_id).content == first.content
+
+    create_trade(client, user_id)
+    second = export(client, user_id, **{"If-None-Match": etag})
+    assert second.status_code == 200 and second.headers["etag"] != etag
+    assert second.content.count(b"\n") == first.content.count(b"\n") + 1
+    # Only the current version stays on disk
+    key = os.path.basename(trade_export.export_path(user_id, "csv", "x")).split("-")[0]
+    assert len(glob.glob(os.path.join(trade_export.export_cache_dir(), f"{key}-*.csv"))) == 1
+
+@pytest.mark.parametrize("file_format", ["arrow", "parquet"])
+def test_arrow_exports_match_csv(client, user_id, file_format):
+    pa = pytest.importorskip("pyarrow")
+    seed(client, user_id)
+    content = export(client, user_id, file_format).content
+    if file_format == "arrow":
+        table = pa.ipc.open_stream(content).read_all()
+    else:
+        import pyarrow.parquet as pq
+        table = pq.read_table(io.BytesIO(content))
+
+    assert table.schema == trade_export.arrow_schema()
+    rows = table.to_pylist()
+    assert rows[0]["tags"] == ["a", "b"] and rows[0]["pips"] == 20.0
+    assert rows[1]["close_time"] is None
+    csv = pd.read_csv(io.BytesIO(export(client, user_id).content))
+    assert [row["id"] for row in rows] == csv["id"].tolist()
+
+def test_empty_exports_still_have_a_header(client, user_id):
+    assert export(client, user_id).content.decode().splitlines() == [",".join(trade_export.EXPORT_COLUMNS)]
+    pa = pytest.importorskip("pyarrow")
+    assert pa.ipc.open_stream(export(client, user_id, "arrow").content).read_all().num_rows == 0
@@ -0,0 +1,96 @@
+import tempfile
+
+from app.routers import trades
+from app.services import trade_import
+from app.services.firestore_repository import BATCH_WRITE_LIMIT
+from app.services.job_runner import get_job_runner
+from tests.helpers import create_trade, wait_for_job
+
+CSV = """pair,direction,entry_price,exit_price,lot_size,tags,close_time
+EUR/USD,long,1.1,1.101,1.0,breakout;london,2024-03-01T10:00:00
+EUR/USD,short,1.1,1.101,1.0,,2024-03-01T11:00:00
+USD/JPY,long,150,150.5,1.0,,2024-03-01T12:00:00
+EUR/USD,sideways,1.1,1.101,1.0,,
+GBP/USD,long,1.25,,0.5,,
+"""
+
+def import_file(client, user_id, name, content):
+    response = client.post(f"/api/trades/import?user_id={user_id}", files={"file": (name, content)})
+    assert response.status_code == 200, response.text
+    job = wait_for_job(client, user_id, response.json()["data"]["job_id"])
+    assert job["status"] == "completed", job
+    return job
+
+def imported_trades(client, user_id):
+    return client.get(f"/api/trades/?user_id={user_id}&limit=100").json()["data"]["trades"]
+
+def test_parse_trade_row_returns_a_plain_direction():
+    row = trade_import.parse_trade_row({"pair": "EUR/USD", "direction": "long", "entry_price": "1.1",
+                                        "lot_size": "1", "tags": "a|b"}, "csv")
+    assert row["direction"] == "long" and type(row["direction"]) is str
+    assert row["tags"] == ["a", "b"]
+    assert row["exit_price"] is None and row["close_time"] is None
+
+def test_import_books_long_and_short_profits(client, user_id):
+    job = import_file(client, user_id, "trades.csv", CSV)
+    assert job["progress"]["rows_read"] == 5
+    assert job["progress"]["rows_imported"] == 4
+    assert [e["row"] for e in job["progress"]["errors"]] == [4]
+
+    trades = {(t["pair"], t["direction"]): t for t in imported_trades(client, user_id)}
+    assert trades[("EUR/USD", "long")]["profit"] == 100.0
+    assert trades[("EUR/USD", "long")]["status"] == "closed"
+    assert trades[("EUR/USD", "long")]["tags"] == ["breakout", "london"]
+    assert trades[("EUR/USD", "short")]["profit"] == -100.0
+    assert trades[("USD/JPY", "long")]["profit"] > 0
+    assert trades[("GBP/USD", "long")]["status"] == "open"
+
+def test_import_ndjson(client, user_id):
+    content = '{"pair": "EUR/USD", "direction": "long", "entry_price": 1.1, "exit_price": 1.102, "lot_size": 0.5}\n\n[1]\n'
+    job = import_file(client, user_id, "trades.ndjson", content)
+    assert job["progress"]["rows_imported"] == 1 and job["progress"]["rows_failed"] == 1
+    assert imported_trades(client, user_id)[0]["profit"] == 100.0
+
+def test_import_rejects_unknown_formats(client, user_id):
+    response = client.post(f"/api/trades/import?user_id={user_id}", files={"file": ("trades.xlsx", b"x")})
+    assert response.status_code == 400
+
+def test_a_failed_batch_still_refreshes_what_earlier_batches_wrote(client, user_id, monkeypatch):
+    create_trade(client, user_id)
+    client.get(f"/api/analytics/overview?user_id={user_id}")  # builds the aggregate
+    write_chunk = trades._write_import_chunk
+    calls = []
+
+    async def fail_second_batch(*args):
+        calls.append(1)
+        if len(calls) > 1:
+            raise RuntimeError("store unavailable")
+        await write_chunk(*args)
+
+    monkeypatch.setattr(trades, "_write_import_chunk", fail_second_batch)
+    rows = "".join("EUR/USD,long,1.1,1.101,1.0,,2024-03-01T10:00:00\n" for _ in range(BATCH_WRITE_LIMIT + 10))
+    response = client.post(f"/api/trades/import?user_id={user_id}",
+                           files={"file": ("trades.csv", CSV.splitlines()[0] + "\n" + rows)})
+    job = wait_for_job(client, user_id, response.json()["data"]["job_id"])
+    assert (job["status"], job["progress"]["rows_imported"]) == ("failed", BATCH_WRITE_LIMIT)
+
+    overview = client.get(f"/api/analytics/overview?user_id={user_id}").json()["data"]
+    assert overview["total_trades"] == BATCH_WRITE_LIMIT
+
+def test_oversized_uploads_are_rejected_without_leaving_a_spool_file(client, user_id, monkeypatch, tmp_path):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setenv("IMPORT_MAX_BYTES", "64")
+    response = client.post(f"/api/trades/import?user_id={user_id}", files={"file": ("trades.csv", CSV)})
+    assert response.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+def test_spool_file_is_removed_when_the_job_cannot_be_queued(client, user_id, monkeypatch, tmp_path):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    async def unavailable(*args, **kwargs):
+        raise RuntimeError("job store unavailable")
+
+    monkeypatch.setattr(get_job_runner(), "submit", unavailable)
+    response = client.post(f"/api/trades/import?user_id={user_id}", files={"file": ("trades.csv", CSV)})
+    assert response.status_code == 500
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from app.services.firestore_repository import get_repository
+from tests.helpers import close_trade, create_trade
+
+def list_trades(client, user_id, **params):
+    response = client.get("/api/trades/", params={"user_id": user_id, **params})
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+def all_pages(client, user_id, cursor=None, **params):
+    ids = []
+    while True:
+        page = list_trades(client, user_id, **params, **({"cursor": cursor} if cursor else {}))
+        ids += [trade["id"] for trade in page["trades"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+def seed_same_time(client, user_id, count):
+    # Trades sharing one created_at, so only the id breaks ties between them
+    created_at = datetime(2024, 3, 1, 12, 0)
+    writes = [
+        ("set", "trades", f"{user_id}-{i:03d}", {
+            "id": f"{user_id}-{i:03d}", "user_id": user_id, "pair": "EUR/USD", "direction": "long",
+            "entry_price": 1.1, "lot_size": 1.0, "status": "open", "tags": [],
+            "open_time": created_at, "created_at": created_at, "updated_at": created_at,
+        })
+        for i in range(count)
+    ]
+    client.portal.call(get_repository().batch_write, writes)
+    return [doc_id for _, _, doc_id, _ in writes]
+
+def test_pages_cover_every_trade_once_newest_first(client, user_id):
+    created = [create_trade(client, user_id) for _ in range(11)]
+    assert all_pages(client, user_id, limit=4) == created[::-1]
+
+def test_ties_on_created_at_are_broken_by_id(client, user_id):
+    seeded = seed_same_time(client, user_id, 9)
+    assert all_pages(client, user_id, limit=2) == sorted(seeded, reverse=True)
+
+def test_cursor_is_stable_while_trades_are_added_and_deleted(client, user_id):
+    created = [create_trade(client, user_id) for _ in range(8)]
+    first = list_trades(client, user_id, limit=3)
+
+    newer = create_trade(client, user_id)
+    client.delete(f"/api/trades/{created[0]}?user_id={user_id}")
+    rest = all_pages(client, user_id, limit=3, cursor=first["next_cursor"])
+
+    seen = [trade["id"] for trade in first["trades"]] + rest
+    assert newer not in seen
+    assert seen == [trade_id for trade_id in created[::-1] if trade_id != created[0]]
+
+def test_filters_apply_across_pages(client, user_id):
+    created = [create_trade(client, user_id) for _ in range(6)]
+    for trade_id in created[::2]:
+        close_trade(client, user_id, trade_id, 1.101)
+    assert all_pages(client, user_id, limit=2, status="closed") == created[::2][::-1]
+    assert all_pages(client, user_id, limit=2, status="open") == created[1::2][::-1]
+
+def test_invalid_cursor_is_rejected(client, user_id):
+    response = client.get("/api/trades/", params={"user_id": user_id, "cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("limit", [0, -1, 1001])
+def test_out_of_range_limit_is_rejected(client, user_id, limit):
+    response = client.get("/api/trades/", params={"user_id": user_id, "limit": limit})
+    assert response.status_code == 422
+
+def test_ndjson_streams_one_page_unless_full(client, user_id):
+    created = [create_trade(client, user_id) for _ in range(5)]
+    response = client.get("/api/trades/", params={"user_id": user_id, "format": "ndjson", "limit": 2})
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == created[::-1][:2]
+    response = client.get("/api/trades/", params={"user_id": user_id, "full": True})
+    assert response.status_code == 400
+
+def test_ndjson_streams_every_trade_in_page_order(client, user_id):
+    created = [create_trade(client, user_id) for _ in range(5)]
+    response = client.get("/api/trades/", params={"user_id": user_id, "format": "ndjson", "full": True, "limit": 2})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [trade["id"] for trade in lines] == created[::-1]
+    assert lines == list_trades(client, user_id)["trades"]
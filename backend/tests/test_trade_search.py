@@ -0,0 +1,114 @@
+import random
+from datetime import datetime, timedelta
+
+from app.services.firestore_repository import get_repository
+from app.services.response_cache import get_response_cache
+from app.services.trade_search import TradeSearchIndex, _sort_key, tokenize
+from tests.helpers import close_trade, create_trade
+
+WORDS = ["breakout", "break", "news", "london", "reversal", "revenge", "fomo"]
+START = datetime(2024, 1, 1)
+
+def random_trade(rng, trade_id):
+    closed = rng.random() < 0.6
+    return {
+        "id": trade_id,
+        "status": "closed" if closed else "open",
+        "pair": rng.choice(["EUR/USD", "GBP/USD"]),
+        "direction": rng.choice(["long", "short"]),
+        "tags": rng.sample(["a", "b", "c"], rng.randint(0, 2)),
+        "notes": " ".join(rng.sample(WORDS, rng.randint(0, 3))).title() or None,
+        "created_at": START + timedelta(hours=rng.randint(0, 100)),
+        "close_time": START + timedelta(hours=rng.randint(0, 100)) if closed else None,
+        "profit": float(rng.randint(-50, 50)) if closed else None,
+        "entry_price": 1.1,
+    }
+
+def reference(trades, text=None, equals=None, all_tags=(), any_tags=(), ranges=None,
+              sort="created_at", descending=True, offset=0, limit=50):
+    """Search by checking every trade"""
+    def matches(trade):
+        words = tokenize(trade.get("notes"))
+        for field, (low, high) in (ranges or {}).items():
+            key = _sort_key(field, trade.get(field))
+            if key is None or (low is not None and key < _sort_key(field, low)) \
+                    or (high is not None and key > _sort_key(field, high)):
+                return False
+        return (all(trade.get(f) == v for f, v in (equals or {}).items())
+                and set(all_tags) <= set(trade["tags"])
+                and (not any_tags or set(any_tags) & set(trade["tags"]))
+                and all(any(w.startswith(token) for w in words) for token in tokenize(text)))
+
+    found = [t for t in trades.values() if matches(t)]
+    keyed = sorted(((_sort_key(sort, t.get(sort)), t["id"]) for t in found if t.get(sort) is not None),
+                   reverse=descending)
+    missing = sorted(t["id"] for t in found if t.get(sort) is None)
+    return len(found), ([i for _, i in keyed] + missing)[offset:offset + limit]
+
+def test_search_matches_a_scan_of_the_trades():
+    rng = random.Random(8)
+    trades = {f"t{i:03d}": random_trade(rng, f"t{i:03d}") for i in range(200)}
+    index = TradeSearchIndex.build("u", trades.values())
+    for _ in range(200):
+        trade_id = f"t{rng.randint(0, 249):03d}"
+        if rng.random() < 0.3:
+            index.remove_trade(trade_id)
+            trades.pop(trade_id, None)
+        else:
+            trades[trade_id] = random_trade(rng, trade_id)
+            index.set_trade(trades[trade_id])
+
+    for _ in range(500):
+        query = {"sort": rng.choice(["created_at", "close_time", "profit"]),
+                 "descending": rng.random() < 0.5,
+                 "offset": rng.choice([0, 0, 5, 40]), "limit": rng.choice([1, 10, 50, 500])}
+        if rng.random() < 0.4:
+            query["text"] = " ".join(rng.sample(["brea", "news", "rev", "lon", "zzz", "Fomo"], rng.randint(1, 2)))
+        if rng.random() < 0.4:
+            query["equals"] = {rng.choice(["status", "pair", "direction"]): rng.choice(
+                ["closed", "open", "EUR/USD", "long", "short"])}
+        if rng.random() < 0.3:
+            query["all_tags"] = rng.sample(["a", "b", "c"], 1)
+        if rng.random() < 0.3:
+            query["any_tags"] = rng.sample(["a", "b", "c"], 2)
+        if rng.random() < 0.4:
+            low = START + timedelta(hours=rng.randint(0, 60))
+            query["ranges"] = {"close_time": (low, rng.choice([None, low + timedelta(hours=30)])),
+                               **({"profit": (rng.choice([None, -10]), 20)} if rng.random() < 0.5 else {})}
+
+        total, page = index.search(**query)
+        assert (total, [t["id"] for t in page]) == reference(trades, **query), query
+
+def test_note_vocabulary_follows_edits():
+    index = TradeSearchIndex.build("u", [{"id": "1", "notes": "Breakout at London open"}])
+    assert [t["id"] for t in index.search("lond")[1]] == ["1"]
+    index.set_trade({"id": "1", "notes": "news spike"})
+    assert index.search("lond")[0] == 0 and "london" not in index.vocabulary
+    index.remove_trade("1")
+    assert index.vocabulary == [] and index.postings == {}
+
+def test_search_endpoint(client, user_id):
+    breakout = create_trade(client, user_id, notes="Clean breakout", tags=["a"])
+    create_trade(client, user_id, notes="Chased the news", pair="GBP/USD", entry_price=1.25)
+    close_trade(client, user_id, breakout, 1.101)
+
+    def search(query):
+        response = client.get(f"/api/trades/search?user_id={user_id}&{query}")
+        assert response.status_code == 200, response.text
+        return response.json()["data"]
+
+    data = search("q=brea&status=closed&min_profit=50")
+    assert [t["id"] for t in data["trades"]] == [breakout] and data["next_offset"] is None
+    assert search("limit=1")["next_offset"] == 1
+    assert search("sort=close_time&order=asc")["trades"][-1]["pair"] == "GBP/USD"
+    assert client.get(f"/api/trades/search?user_id={user_id}&sort=notes").status_code == 422
+
+def test_writes_from_elsewhere_rebuild_the_index(client, user_id):
+    create_trade(client, user_id, notes="first")
+    assert client.get(f"/api/trades/search?user_id={user_id}").json()["data"]["total"] == 1
+
+    # Another worker's write only shows up here as a cache version bump
+    other = create_trade(client, user_id + "-elsewhere", notes="second")
+    client.portal.call(get_repository().update_document, "trades", other, {"user_id": user_id})
+    get_response_cache().invalidate_user(user_id)
+    assert client.get(f"/api/trades/search?user_id={user_id}").json()["data"]["total"] == 2
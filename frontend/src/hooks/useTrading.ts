@@ -1,14 +1,22 @@
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import { tradeService, calculatorService, analyticsService } from '../services/tradingService'
+import { TradeSearchFilters } from '../types'
 
 // Trade hooks
-export const useTrades = (filters?: { status?: string; pair?: string; limit?: number }) => {
+export const useTrades = (filters?: { status?: string; pair?: string; limit?: number; cursor?: string }) => {
   return useQuery({
     queryKey: ['trades', filters],
     queryFn: () => tradeService.getTrades(filters),
   })
 }
 
+export const useTradeSearch = (filters: TradeSearchFilters) => {
+  return useQuery({
+    queryKey: ['trades', 'search', filters],
+    queryFn: () => tradeService.searchTrades(filters),
+  })
+}
+
 export const useTrade = (tradeId: string) => {
   return useQuery({
     queryKey: ['trade', tradeId],
@@ -2,6 +2,8 @@ import axios from 'axios'
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8127/api'
 
+const MAX_RATE_LIMIT_RETRIES = 2
+
 const apiClient = axios.create({
   baseURL: API_BASE_URL,
   headers: {
@@ -27,7 +29,15 @@ apiClient.interceptors.request.use(
 // Response interceptor for error handling
 apiClient.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const config = error.config
+    if (error.response?.status === 429 && config && (config.__retries ?? 0) < MAX_RATE_LIMIT_RETRIES) {
+      // Rate limited: wait as long as the server asks, then try again
+      config.__retries = (config.__retries ?? 0) + 1
+      const retryAfter = Number(error.response.headers['retry-after']) || 1
+      await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000))
+      return apiClient(config)
+    }
     if (error.response?.status === 401) {
       // Handle unauthorized
       localStorage.removeItem('auth_token')
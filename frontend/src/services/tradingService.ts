@@ -1,18 +1,32 @@
 import apiClient from './api'
-import { Trade, TradeFormData, PositionSizeResult, Analytics } from '../types'
+import { Trade, TradeFormData, TradeSearchFilters, PositionSizeResult, Analytics } from '../types'
 
 export const tradeService = {
   // Get all trades
-  getTrades: async (filters?: { status?: string; pair?: string; limit?: number }) => {
+  getTrades: async (filters?: { status?: string; pair?: string; limit?: number; cursor?: string }) => {
     const params = new URLSearchParams()
     if (filters?.status) params.append('status', filters.status)
     if (filters?.pair) params.append('pair', filters.pair)
     if (filters?.limit) params.append('limit', filters.limit.toString())
+    if (filters?.cursor) params.append('cursor', filters.cursor)
     
     const response = await apiClient.get(`/trades?${params}`)
     return response.data
   },
 
+  // Filter, sort and search trades on the server
+  searchTrades: async (filters: TradeSearchFilters) => {
+    const params = new URLSearchParams()
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value === undefined || value === null || value === '') return
+      if (Array.isArray(value)) value.forEach(item => params.append(key, item))
+      else params.append(key, value.toString())
+    })
+    
+    const response = await apiClient.get(`/trades/search?${params}`)
+    return response.data
+  },
+
   // Create new trade
   createTrade: async (tradeData: TradeFormData) => {
     const response = await apiClient.post('/trades', tradeData)
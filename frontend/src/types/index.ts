@@ -86,6 +86,26 @@ export interface TradeFormData {
   notes?: string
 }
 
+// Query parameters of GET /api/trades/search (snake_case, sent as-is)
+export interface TradeSearchFilters {
+  q?: string
+  status?: 'open' | 'closed'
+  pair?: string
+  direction?: 'long' | 'short'
+  tags?: string[]
+  any_tags?: string[]
+  opened_from?: string
+  opened_to?: string
+  closed_from?: string
+  closed_to?: string
+  min_profit?: number
+  max_profit?: number
+  sort?: 'created_at' | 'updated_at' | 'open_time' | 'close_time' | 'profit' | 'entry_price' | 'exit_price' | 'lot_size' | 'stop_loss' | 'take_profit'
+  order?: 'asc' | 'desc'
+  limit?: number
+  offset?: number
+}
+
 export interface CalculatorFormData {
   accountBalance: number
   riskPercentage: number